@@ -13,6 +13,12 @@ To use this script:
            
        With the default value of OUTPUT_FILE_PATH below, the script will
        write its output to the file Schedule.csv in the same directory.
+       
+The script compiles the schedule via a schedule cache file (see the
+`vesper.util.schedule_cache` module), so when it is run again with the
+same location and offsets, for example for a longer range of nights,
+it does not need to recompute the sunset and sunrise times of nights
+for which it already computed them.
 """
 
 
@@ -20,7 +26,7 @@ import datetime
 
 import pytz
 
-import vesper.ephem.ephem_utils as ephem_utils
+from vesper.util.schedule_cache import ScheduleCache
 import vesper.util.os_utils as os_utils
 import vesper.util.time_utils as time_utils
 
@@ -59,22 +65,35 @@ TIME_ZONE = pytz.timezone('US/Mountain')
 
 OUTPUT_FILE_PATH = 'Schedule.csv'
 
+SCHEDULE_CACHE_FILE_PATH = 'Schedule Cache.json'
+
 
 def _main():
     
+    schedule_spec = {
+        'daily': {
+            'start_date': START_NIGHT,
+            'end_date': END_NIGHT,
+            'start_time': _get_time_spec('sunset', SUNSET_OFFSET),
+            'end_time': _get_time_spec('sunrise', SUNRISE_OFFSET)
+        }
+    }
+    
+    cache = ScheduleCache(SCHEDULE_CACHE_FILE_PATH)
+    schedule = cache.get_schedule(schedule_spec, LAT, LON, TIME_ZONE)
+    cache.save()
+    
     night = START_NIGHT
     one_day = datetime.timedelta(days=1)
-    sunset_offset = datetime.timedelta(minutes=SUNSET_OFFSET)
-    sunrise_offset = datetime.timedelta(minutes=SUNRISE_OFFSET)
     
     lines = ['Night,Start Time,End Time']
     
-    while night <= END_NIGHT:
-        
-        next_day = night + one_day
+    # The schedule has one interval per night, in order of increasing
+    # time.
+    for interval in schedule.get_intervals():
         
-        start_time = _get_time('Sunset', LAT, LON, night, sunset_offset)
-        end_time = _get_time('Sunrise', LAT, LON, next_day, sunrise_offset)
+        start_time = _format_time(interval.start)
+        end_time = _format_time(interval.end)
                 
         line = '{:s},{:s},{:s}'.format(str(night), start_time, end_time)
         lines.append(line)
@@ -85,13 +104,18 @@ def _main():
     os_utils.write_file(OUTPUT_FILE_PATH, text)
 
 
-def _get_time(event, lat, lon, date, offset):
+def _get_time_spec(event, offset):
     
-    dt = ephem_utils.get_event_time(event, lat, lon, date)
-    dt += offset
+    """Gets a schedule time specification for a solar event offset."""
+    
+    preposition = 'before' if offset < 0 else 'after'
+    hours, minutes = divmod(abs(offset), 60)
+    return f'{hours}:{minutes:02d}:00 {preposition} {event}'
+
+
+def _format_time(dt):
     dt = time_utils.round_datetime(dt, 60)
     dt = dt.astimezone(TIME_ZONE)
-    
     return dt.strftime('%Y-%m-%d %H:%M')
 
 
@@ -24,12 +24,19 @@ def initialize(archive_dir_path, archive_settings):
     archive_paths = Bunch(
         archive_dir_path=archive_dir_path,
         clip_dir_path=archive_dir_path / 'Clips',
+        clip_image_dir_path=archive_dir_path / 'Clip Images',
         deferred_action_dir_path=archive_dir_path / 'Deferred Actions',
+        ephem_cache_file_path=archive_dir_path / 'Ephemeris Cache.json',
         job_log_dir_path=archive_dir_path / 'Logs' / 'Jobs',
         preference_file_path=archive_dir_path / 'Preferences.yaml',
         preset_dir_path=archive_dir_path / 'Presets',
         recording_dir_paths=_create_recording_dir_paths(
             archive_settings, archive_dir_path),
+        recording_file_cache_file_path=
+            archive_dir_path / 'Recording File Cache.json',
+        recording_path_index_file_path=
+            archive_dir_path / 'Recording Path Index.json',
+        schedule_cache_file_path=archive_dir_path / 'Schedule Cache.json',
         sqlite_database_file_path=archive_dir_path / 'Archive Database.sqlite')
     
     
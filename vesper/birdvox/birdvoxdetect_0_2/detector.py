@@ -38,6 +38,11 @@ class _Detector:
     invokes a listener's `process_clip` method for each of the resulting
     clips. The `process_clip` method must accept two arguments, the start
     index and length of the detected clip.
+    
+    When its input is an entire single-channel audio file, an instance
+    can instead be handed the file via its `detect_file` method.
+    BirdVoxDetect then reads the file itself, which avoids writing a
+    copy of the input to a temporary file.
     """
     
     
@@ -56,18 +61,11 @@ class _Detector:
         self._clip_length = signal_utils.seconds_to_frames(
             _CLIP_DURATION, self._input_sample_rate)
         
-        # Create and open temporary wave file. Do not delete
-        # automatically on close. We will close the file after we
-        # finish writing it, and then BirdVoxDetect will open it
-        # again for reading. We delete the file ourselves after
-        # BirdVoxDetect finishes processing it.
-        self._audio_file = tempfile.NamedTemporaryFile(
-            suffix='.wav', delete=False)
-        
-        # Create wave file writer, through which we will write to the
-        # wave file.
-        self._audio_file_writer = WaveFileWriter(
-            self._audio_file, 1, self._input_sample_rate)
+        # We create the temporary audio file to which `detect` writes
+        # its input when `detect` is first called, so that we don't
+        # create one if the `detect_file` method is used instead.
+        self._audio_file = None
+        self._audio_file_writer = None
            
 
     @property
@@ -110,8 +108,107 @@ class _Detector:
         
         
     def detect(self, samples):
+        
         # print('_Detector.detect {} {}'.format(samples.shape, samples.dtype))
+        
+        if self._audio_file is None:
+            self._create_audio_file()
+            
         self._audio_file_writer.write(samples)
+        
+        
+    def _create_audio_file(self):
+        
+        # Create and open temporary wave file. Do not delete
+        # automatically on close. We will close the file after we
+        # finish writing it, and then BirdVoxDetect will open it
+        # again for reading. We delete the file ourselves after
+        # BirdVoxDetect finishes processing it.
+        self._audio_file = tempfile.NamedTemporaryFile(
+            suffix='.wav', delete=False)
+            
+        # Create wave file writer, through which we will write to the
+        # wave file.
+        self._audio_file_writer = WaveFileWriter(
+            self._audio_file, 1, self._input_sample_rate)
+            
+            
+    def detect_file(self, file_path, channel_num, start_index, length):
+        
+        """
+        Runs this detector on an interval of an audio file.
+        
+        This method is an alternative to the `detect` and
+        `complete_detection` methods: it performs detection on the
+        specified file interval and then completes detection. The
+        clip start indices passed to the listener are relative to
+        the start of the interval.
+        
+        BirdVoxDetect processes entire files, so this method runs it
+        on the entire file and discards detections whose peaks lie
+        outside of the interval. Since the cost of this method is thus
+        that of processing the entire file however short the interval,
+        callers should use it only for intervals that are all or most
+        of a file, and feed the samples of shorter intervals to the
+        `detect` method instead.
+        
+        Parameters
+        ----------
+        file_path : str
+            the path of the audio file.
+            
+        channel_num : int
+            the file channel on which to detect. This must be zero,
+            since the file must have only one channel.
+            
+        start_index : int
+            the start index of the interval in the file.
+            
+        length : int
+            the length of the interval.
+            
+        Raises
+        ------
+        ValueError
+            if the file does not have exactly one channel or its sample
+            rate differs from this detector's input sample rate.
+        """
+        
+        self._check_audio_file(file_path, channel_num)
+        
+        peak_indices, classifications, scores = \
+            self._run_birdvoxdetect(file_path)
+            
+        # Discard detections outside of interval and make peak indices
+        # relative to interval start.
+        end_index = start_index + length
+        mask = (peak_indices >= start_index) & (peak_indices < end_index)
+        peak_indices = peak_indices[mask] - start_index
+        classifications = classifications[mask]
+        scores = scores[mask]
+        
+        self._process_detections(peak_indices, classifications, scores)
+        
+        self._listener.complete_processing()
+        
+        
+    def _check_audio_file(self, file_path, channel_num):
+        
+        with wave.open(file_path, 'rb') as reader:
+            num_channels = reader.getnchannels()
+            sample_rate = reader.getframerate()
+            
+        if num_channels != 1 or channel_num != 0:
+            raise ValueError(
+                f'Cannot run BirdVoxDetect on channel {channel_num} of '
+                f'{num_channels}-channel audio file "{file_path}". '
+                f'Only channel 0 of single-channel files is supported.')
+                
+        if sample_rate != self._input_sample_rate:
+            raise ValueError(
+                f'Sample rate {sample_rate} Hz of audio file '
+                f'"{file_path}" differs from detector input sample rate '
+                f'{self._input_sample_rate} Hz.')
  
             
     def complete_detection(self):
@@ -123,16 +220,41 @@ class _Detector:
         
         # print('_Detector.complete_detection')
         
-        # Close wave writer and wave file.
-        self._audio_file_writer.close()
-        self._audio_file.close()
+        if self._audio_file is not None:
+            # `detect` was called
+            
+            # Close wave writer and wave file.
+            self._audio_file_writer.close()
+            self._audio_file.close()
+            
+            audio_file_path = self._audio_file.name
+            
+            try:
+                detections = self._run_birdvoxdetect(audio_file_path)
+            finally:
+                os_utils.delete_file(audio_file_path)
+                
+            self._process_detections(*detections)
+            
+        self._listener.complete_processing()
+        
+        
+    def _run_birdvoxdetect(self, audio_file_path):
+        
+        """
+        Runs BirdVoxDetect on an audio file.
+        
+        Returns
+        -------
+        tuple of three NumPy arrays
+            the peak indices, classifications, and scores of the
+            detections.
+        """
         
         with tempfile.TemporaryDirectory() as output_dir_path:
             
             # output_dir_path = '/Users/harold/Desktop/BirdVoxDetect Output'
             
-            audio_file_path = self._audio_file.name
-            
             birdvoxdetect.process_file(
                 audio_file_path,
                 bva_threshold=1,
@@ -144,11 +266,7 @@ class _Detector:
             output_file_path = self._get_output_file_path(
                 output_dir_path, audio_file_path)
             
-            self._process_detector_output(output_file_path)
-                
-        os_utils.delete_file(audio_file_path)
-        
-        self._listener.complete_processing()
+            return self._read_detector_output(output_file_path)
         
         
     def _get_output_file_path(self, output_dir_path, audio_file_path):
@@ -161,7 +279,14 @@ class _Detector:
         return os.path.join(output_dir_path, output_file_name)
     
     
-    def _process_detector_output(self, output_file_path):
+    def _read_detector_output(self, output_file_path):
+        
+        # BirdVoxDetect 0.2 reports detections only in its checklist
+        # file, so we read them from it into arrays.
+        
+        peak_indices = []
+        classifications = []
+        scores = []
         
         with open(output_file_path) as output_file:
                 
@@ -171,29 +296,40 @@ class _Detector:
             next(reader)
             
             for row in reader:
-                
-                # Get clip start index from peak time.
                 peak_time = self._parse_time(row[0])
-                peak_index = signal_utils.seconds_to_frames(
-                    peak_time, self._input_sample_rate)
-                start_index = peak_index - self._clip_length // 2
+                peak_indices.append(signal_utils.seconds_to_frames(
+                    peak_time, self._input_sample_rate))
+                classifications.append(row[1])
+                scores.append(float(row[2]))
                 
-                annotations = {}
+        return (
+            np.array(peak_indices, dtype=np.int64),
+            np.array(classifications, dtype=object),
+            np.array(scores, dtype=np.float64))
                 
-                # Get detector score.
-                annotations['Detector Score'] = float(row[2])
                 
-                # Get classification.
-                classification = row[1]
-                if classification != 'OTHE':
-                    annotations['Classification'] = 'Call.' + classification
+    def _process_detections(self, peak_indices, classifications, scores):
                 
-#                 print(
-#                     'processing clip', peak_time, start_index, score,
-#                     classification)
+        # Get clip start indices from peak indices.
+        start_indices = peak_indices - self._clip_length // 2
                 
-                self._listener.process_clip(
-                    start_index, self._clip_length, annotations=annotations)
+        for start_index, classification, score in \
+                zip(start_indices, classifications, scores):
+                
+            annotations = {}
+            
+            # Get detector score.
+            annotations['Detector Score'] = float(score)
+            
+            # Get classification.
+            if classification != 'OTHE':
+                annotations['Classification'] = 'Call.' + classification
+            
+#             print(
+#                 'processing clip', start_index, score, classification)
+            
+            self._listener.process_clip(
+                int(start_index), self._clip_length, annotations=annotations)
                 
                 
     def _parse_time(self, time):
@@ -13,7 +13,7 @@ from django.db import transaction
 from vesper.archive_paths import archive_paths
 from vesper.command.command import Command, CommandExecutionError
 from vesper.django.app.models import Recording, RecordingFile
-from vesper.singletons import recording_manager
+from vesper.singletons import recording_file_cache, recording_manager
 import vesper.command.command_utils as command_utils
 import vesper.command.recording_utils as recording_utils
 
@@ -141,38 +141,55 @@ class AddRecordingAudioFilesCommand(Command):
         }
     
         file_parser = recording_utils.create_recording_file_parser(spec)
+        file_parser_key = recording_utils.get_recording_file_parser_key(spec)
+        
+        # Get (relative path, absolute path) pairs of recording files.
+        file_paths = [
+            (file_path.relative_to(dir_path), file_path)
+            for dir_path in recordings_dir_paths
+            for file_path in dir_path.glob('**/*.wav')]
+            
+        self._logger.info(
+            f'Getting information for {len(file_paths)} recording files...')
+            
+        # Parse files, getting information for files that have not
+        # changed since they were last parsed from the recording
+        # file cache.
+        cache = recording_file_cache.instance
+        results = recording_utils.parse_recording_files(
+            file_paths, file_parser, file_parser_key, cache,
+            logger=self._logger)
+        cache.save()
         
         # `files` maps station names to nights to lists of file info bunches.
         files = defaultdict(lambda: defaultdict(list))
         
         # Build mapping from station names to nights to lists of files.
-        for dir_path in recordings_dir_paths:
+        for (_, file_path), f in zip(file_paths, results):
             
-            for file_path in dir_path.glob('**/*.wav'):
+            if random.random() < _SIMULATED_ERROR_PROBABILITY:
+                f = Exception('A simulated error occurred.')
                 
-                try:
-                    f = self._parse_file(file_path, file_parser)
+            if isinstance(f, Exception):
+                class_name = f.__class__.__name__
+                self._logger.warning(
+                    f'Could not parse recording file "{file_path}". '
+                    f'Attempt raised {class_name} exception with message: '
+                    f'{str(f)} File will be ignored.')
     
-                except Exception as e:
-                    class_name = e.__class__.__name__
-                    self._logger.warning(
-                        f'Could not parse recording file "{file_path}". '
-                        f'Attempt raised {class_name} exception with message: '
-                        f'{str(e)} File will be ignored.')
+            else:
+                # file parse succeeded
                     
-                else:
-                    # file parse succeeded
+                station_name = f.station.name
                     
-                    station_name = f.station.name
+                if station_name in self._station_names:
                     
-                    if station_name in self._station_names:
+                    night = f.station.get_night(f.start_time)
                         
-                        night = f.station.get_night(f.start_time)
+                    if night >= self._start_date and \
+                            night <= self._end_date:
                         
-                        if night >= self._start_date and \
-                                night <= self._end_date:
-        
-                            files[station_name][night].append(f)
+                        files[station_name][night].append(f)
                     
         # Sort file lists by start time.
         for station_files in files.values():
@@ -181,15 +198,6 @@ class AddRecordingAudioFilesCommand(Command):
                    
         return files
     
-    
-    def _parse_file(self, file_path, file_parser):
-        
-        if random.random() < _SIMULATED_ERROR_PROBABILITY:
-            raise Exception('A simulated error occurred.')
-        
-        else:
-            return file_parser.parse_file(str(file_path))
-    
                     
     def _show_files(self, files):
         for station_name in sorted(files.keys()):
@@ -1,24 +1,40 @@
 """Module containing class `AdjustClipsCommand`."""
 
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import time
 
 from django.db import transaction
+import numpy as np
 
-from vesper.command.command import Command
-from vesper.django.app.models import AnnotationInfo, StringAnnotation
-from vesper.singletons import clip_manager
+from vesper.command.command import Command, CommandExecutionError
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, RecordingFile, StringAnnotation)
+from vesper.singletons import clip_image_manager, clip_manager
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
 import vesper.util.archive_lock as archive_lock
+import vesper.util.job_metrics as job_metrics
 import vesper.util.text_utils as text_utils
-from vesper.django.app.views import clip
 
 
 _logger = logging.getLogger()
 
 
+_UPDATE_CHUNK_SIZE = 500
+"""
+Maximum number of clips to update per database transaction.
+
+We update clips in chunks of at most this size, each in a separate
+transaction, so that the archive lock is never held for long by a
+clip adjustment command.
+"""
+
+_FILE_REWRITE_THREAD_COUNT = 4
+
+
 class AdjustClipsCommand(Command):
     
     
@@ -76,37 +92,45 @@ class AdjustClipsCommand(Command):
         
         start_time = time.time()
         
-        value_tuples = self._create_clip_query_values_iterator()
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date, self._query_annotation_name,
+            self._query_annotation_value, 'The archive was not modified.')
         
         total_adjusted_count = 0
         total_count = 0
         
-        for detector, station, mic_output, date in value_tuples:
+        # We rewrite clip audio files on background threads so that
+        # file rewriting overlaps with clip adjustment and does not
+        # delay releasing the archive lock.
+        with ThreadPoolExecutor(_FILE_REWRITE_THREAD_COUNT) as executor:
             
-            clips = model_utils.get_clips(
-                station, mic_output, detector, date,
-                self._query_annotation_name, self._query_annotation_value,
-                order=False)
+            self._file_rewrite_executor = executor
+            self._file_rewrite_futures = []
             
-            adjusted_count = 0
-            count = 0
+            for detector, station, mic_output, date, _ in groups:
             
-            for clip in clips:
+                try:
+                    count, adjusted_count = self._adjust_group_clips(
+                        detector, station, mic_output, date)
                 
-                if self._adjust_clip(clip):
-                    adjusted_count += 1
-                    total_adjusted_count += 1
+                except Exception as e:
+                    batch_text = \
+                        _get_batch_text(detector, station, mic_output, date)
+                    command_utils.log_and_reraise_fatal_exception(
+                        e, 'Adjustment of clips for {}'.format(batch_text))
                     
-                count += 1
-                total_count += 1
+                total_adjusted_count += adjusted_count
+                total_count += count
+                
+                # Log clip count for this detector/station/mic_output/date.
+                count_text = text_utils.create_count_text(count, 'clip')
+                batch_text = \
+                    _get_batch_text(detector, station, mic_output, date)
+                _logger.info('Adjusted {} of {} for {}.'.format(
+                    adjusted_count, count_text, batch_text))
                 
-            # Log clip count for this detector/station/mic_output/date.
-            count_text = text_utils.create_count_text(count, 'clip')
-            _logger.info((
-                'Adjusted {} of {} for detector "{}", station "{}", mic '
-                'output "{}", and date {}.').format(
-                    adjusted_count, count_text, detector.name, station.name,
-                    mic_output.name, date))
+            self._wait_for_file_rewrites()
 
         # Log total clips and processing rate.
         count_text = text_utils.create_count_text(total_count, 'clip')
@@ -116,118 +140,278 @@ class AdjustClipsCommand(Command):
         _logger.info('Adjusted {} of a total of {}{}.'.format(
             total_adjusted_count, count_text, timing_text))
 
-
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
-                'The archive was not modified.')
-
     
-    def _adjust_clip(self, clip):
+    def _adjust_group_clips(self, detector, station, mic_output, date):
     
-        try:
-            with archive_lock.atomic():
-                with transaction.atomic():
-                    return self._adjust_clip_aux(clip)
+        """
+        Adjusts the clips of one clip group.
                     
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Processing of clip "{}"'.format(str(clip)),
-                'The clip was not modified.')
+        We get all of the clips of the group and the data needed to
+        adjust them (center index annotations and recording files) with
+        a few queries, compute the new clip bounds with NumPy, and then
+        update the clips whose bounds change in chunks of at most
+        `_UPDATE_CHUNK_SIZE` clips, each in its own transaction. After
+        each transaction commits, we queue rewrites of the audio files
+        of the chunk's clips and deletions of their cached images.
+        """
+        
+        query = model_utils.get_clips(
+            station, mic_output, detector, date,
+            self._query_annotation_name, self._query_annotation_value,
+            order=False)
+        
+        clips = list(
+            query.select_related('recording_channel__recording')
+            .order_by('id'))
+        
+        count = len(clips)
+        
+        clips = _exclude_clips_without_start_indices(clips)
+        
+        if len(clips) == 0:
+            return count, 0
+        
+        start_indices = np.array([c.start_index for c in clips])
+        lengths = np.array([c.length for c in clips])
+        
+        # Get new clip start indices and lengths.
+        center_indices = self._get_new_clip_center_indices(
+            query, clips, start_indices, lengths)
+        new_lengths = self._get_new_clip_lengths(clips, lengths)
+        new_start_indices = center_indices - new_lengths // 2
+        
+        # Get bounds of clip recording files.
+        file_start_indices, file_end_indices, files = \
+            _get_clip_recording_files(clips, start_indices, lengths)
+        
+        # Find clips whose new bounds are in their recording files.
+        new_end_indices = new_start_indices + new_lengths
+        in_file = \
+            (file_start_indices <= new_start_indices) & \
+            (new_end_indices <= file_end_indices)
+        
+        for i in np.flatnonzero(~in_file):
+            if files[i] is not None:
+                _logger.warning(
+                    ('New clip ({}, {}) would not be entirely in parent '
+                     'recording file "{}". Clip will not be '
+                     'adjusted.').format(
+                        new_start_indices[i], new_lengths[i], str(files[i])))
+        
+        # Find clips whose bounds will change.
+        changed = in_file & (
+            (new_start_indices != start_indices) | (new_lengths != lengths))
+        
+        changed_clips = []
+        
+        for i in np.flatnonzero(changed):
+            clip = clips[i]
+            clip.start_index = int(new_start_indices[i])
+            clip.length = int(new_lengths[i])
+            changed_clips.append(clip)
+            
+        for i in range(0, len(changed_clips), _UPDATE_CHUNK_SIZE):
+            chunk = changed_clips[i:i + _UPDATE_CHUNK_SIZE]
+            self._update_clips(chunk)
+            
+        return count, len(changed_clips)
 
 
-    def _adjust_clip_aux(self, clip):
+    def _get_new_clip_center_indices(
+            self, query, clips, start_indices, lengths):
         
-        f = model_utils.get_clip_recording_file(clip)
+        center_indices = start_indices + lengths // 2
             
-        if f is not None:
+        if self._center_index_annotation_info is not None:
+            # archive includes center index annotation
             
-            # Get new clip start index and length.
-            center_index = self._get_new_clip_center_index(clip)
-            length = self._get_new_clip_length(clip)
-            start_index = center_index - length // 2
-            end_index = start_index + length
+            # Get center index annotation values of all of the clips
+            # of the group with a single query.
+            annotations = StringAnnotation.objects.filter(
+                info=self._center_index_annotation_info,
+                clip__in=query.values('id')
+            ).values_list('clip_id', 'value')
             
-            if f.start_index <= start_index and end_index <= f.end_index:
+            indices = dict((c.id, i) for i, c in enumerate(clips))
                 
-                if start_index != clip.start_index or length != clip.length:
-                    # clip bounds will change
+            for clip_id, value in annotations:
+                i = indices.get(clip_id)
+                if i is not None:
+                    center_indices[i] = int(value)
                     
-                    # _logger.info(
-                    #     '({}, {}) -> ({}, {})'.format(
-                    #         clip.start_index, clip.length, start_index,
-                    #         length))
+        return center_indices
                     
-                    # Update clip model.
-                    clip.start_index = start_index
-                    clip.length = length
-                    clip.save()
                     
-                    # Update clip audio file.
-                    cm = self._clip_manager
-                    if cm.has_audio_file(clip):
-                        cm.delete_audio_file(clip)
-                        cm.create_audio_file(clip)
+    def _get_new_clip_lengths(self, clips, lengths):
                     
-                    return True
-                
-            else:
-                
-                _logger.warning(
-                    ('New clip ({}, {}) would not be entirely in parent '
-                     'recording file "{}". Clip will not be adjusted.').format(
-                        start_index, length, str(f)))
-                
-                return False
+        if self._duration is None:
+            return lengths
                 
         else:
-            # recording does not have files
+            sample_rates = np.array([c.sample_rate for c in clips])
+            return np.round(self._duration * sample_rates).astype(np.int64)
             
-            recording = clip.recording_channel.recording
-            _logger.warning(
-                ('Clip recording "{}" has no files, so clip will not be '
-                 'adjusted.').format(str(recording)))
             
-            return False
-
-
-    def _get_new_clip_center_index(self, clip):
+    def _update_clips(self, clips):
+        
+        with archive_lock.atomic(), \
+                job_metrics.timer(job_metrics.DATABASE_WRITE), \
+                transaction.atomic():
+            
+            Clip.objects.bulk_update(clips, ['start_index', 'length'])
+            
+        # Rewrite clip audio files and delete cached clip images. We
+        # do this after the transaction commits so that if the
+        # transaction fails, leaving the clips unchanged in the
+        # database and raising an exception, we don't modify any clip
+        # files.
+        future = self._file_rewrite_executor.submit(
+            self._rewrite_audio_files, clips)
+        self._file_rewrite_futures.append(future)
         
-        clip_center_index = clip.start_index + clip.length // 2
         
-        if self._center_index_annotation_info is None:
-            # archive does not include center index annotation
+    def _rewrite_audio_files(self, clips):
+        
+        cm = self._clip_manager
+        im = clip_image_manager.instance
+        
+        for clip in clips:
+            
+            if cm.has_audio_file(clip):
+                # Deleting and creating the clip's audio file also
+                # deletes its cached images.
+                
+                cm.delete_audio_file(clip)
+                cm.create_audio_file(clip)
+                
+            else:
+                im.delete_images(clip)
+            
             
-            return clip_center_index
+    def _wait_for_file_rewrites(self):
         
-        else:
+        failure_count = 0
+        
+        for future in self._file_rewrite_futures:
             
             try:
-                annotation = StringAnnotation.objects.get(
-                    clip=clip, info=self._center_index_annotation_info)
+                future.result()
                 
-            except Exception:
-                # clip does not have center index annotation
+            except Exception as e:
+                _logger.error(
+                    'Rewriting of clip audio files failed with {} exception. '
+                    'Exception message was: {}'.format(
+                        e.__class__.__name__, str(e)))
+                failure_count += 1
                 
-                return clip_center_index
+        if failure_count != 0:
+            raise CommandExecutionError(
+                'Rewriting of some clip audio files failed. See above '
+                'for details. The clips were adjusted in the archive '
+                'database.')
+
+
+def _get_batch_text(detector, station, mic_output, date):
+    return \
+        'detector "{}", station "{}", mic output "{}", and date {}'.format(
+            detector.name, station.name, mic_output.name, date)
+
+
+def _exclude_clips_without_start_indices(clips):
+    
+    included_clips = [c for c in clips if c.start_index is not None]
+    
+    excluded_count = len(clips) - len(included_clips)
+    
+    if excluded_count != 0:
+        count_text = text_utils.create_count_text(excluded_count, 'clip')
+        _logger.warning(
+            '{} with unknown start indices will not be adjusted.'.format(
+                count_text))
+        
+    return included_clips
+
+
+def _get_clip_recording_files(clips, start_indices, lengths):
+    
+    """
+    Gets the recording files containing the specified clips.
+    
+    This function is a vectorized version of
+    `model_utils.get_clip_recording_file` that gets the recording
+    files of all of the specified clips with a single query.
+    
+    Returns
+    -------
+    tuple
+        NumPy arrays of the start and end indices of the clips'
+        recording files, and a list of the files. The start and end
+        indices of a clip whose recording has no files are one and
+        zero, so that no clip bounds are within them, and the file
+        is `None`.
+        
+    Raises
+    ------
+    ValueError
+        If a clip is not contained by a single recording file, for
+        example if it straddles the boundary between two files.
+    """
+    
+    recording_ids = np.array(
+        [c.recording_channel.recording_id for c in clips])
+    
+    # Get recording files, grouped by recording and in order of
+    # increasing file number.
+    recording_files = defaultdict(list)
+    for f in RecordingFile.objects.filter(
+            recording_id__in=set(recording_ids)).order_by('file_num'):
+        recording_files[f.recording_id].append(f)
+        
+    file_start_indices = np.ones(len(clips), dtype=np.int64)
+    file_end_indices = np.zeros(len(clips), dtype=np.int64)
+    files = [None] * len(clips)
+    
+    for recording_id in np.unique(recording_ids):
+        
+        clip_nums = np.flatnonzero(recording_ids == recording_id)
+        recording_file_list = recording_files[recording_id]
+        
+        if len(recording_file_list) == 0:
+            # recording does not have files
             
-            else:
-                # clip has center index annotation
-                
-                return int(annotation.value)
+            recording = clips[clip_nums[0]].recording_channel.recording
+            count_text = text_utils.create_count_text(len(clip_nums), 'clip')
+            _logger.warning(
+                ('Clip recording "{}" has no files, so {} will not be '
+                 'adjusted.').format(str(recording), count_text))
             
+            continue
+
+        starts = np.array([f.start_index for f in recording_file_list])
+        ends = np.array([f.end_index for f in recording_file_list])
 
-    def _get_new_clip_length(self, clip):
+        # Find the first file that ends after each clip starts.
+        file_nums = np.searchsorted(
+            ends, start_indices[clip_nums], side='right')
         
-        if self._duration is None:
-            return clip.length
+        if np.any(file_nums == len(recording_file_list)):
+            # We should never get here, since by definition a clip is
+            # part of its parent recording.
+            raise ValueError(
+                'DATA INTEGRITY ERROR: Clip starts after end of last file '
+                'of parent recording. This is not supposed to happen, and '
+                'should be investigated ASAP.')
         
-        else:
-            return int(round(self._duration * clip.sample_rate))
+        file_start_indices[clip_nums] = starts[file_nums]
+        file_end_indices[clip_nums] = ends[file_nums]
+            
+        clip_end_indices = start_indices[clip_nums] + lengths[clip_nums]
+        if np.any(clip_end_indices > ends[file_nums]):
+            raise ValueError(
+                'Clip extends past end of recording file in which it '
+                'starts.')
+        
+        for clip_num, file_num in zip(clip_nums, file_nums):
+            files[clip_num] = recording_file_list[file_num]
+            
+    return file_start_indices, file_end_indices, files
@@ -41,6 +41,21 @@ class Annotator:
             creating_processor=self._creating_processor)
 
 
+    def _annotate_many(self, clip_values):
+        
+        """
+        Annotates clips in bulk.
+        
+        `clip_values` is an iterable of (clip, annotation value) pairs.
+        """
+        
+        model_utils.annotate_clips(
+            clip_values, self._annotation_info,
+            creating_user=self._creating_user,
+            creating_job=self._creating_job,
+            creating_processor=self._creating_processor)
+            
+            
     def _get_annotation_value(self, clip):
         try:
             annotation = StringAnnotation.objects.get(
@@ -49,4 +64,15 @@ class Annotator:
             return None
         else:
             return annotation.value
-    
\ No newline at end of file
+    
+        
+    def _get_annotation_values(self, clips):
+        
+        """
+        Gets a mapping from the IDs of those of the specified clips
+        that have this annotator's annotation to their annotation
+        values.
+        """
+        
+        return model_utils.get_clip_annotation_values(
+            clips, self._annotation_info)
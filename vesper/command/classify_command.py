@@ -9,6 +9,7 @@ from vesper.django.app.models import AnnotationInfo, Job, Processor
 from vesper.singletons import extension_manager
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.text_utils as text_utils
 
 
@@ -40,29 +41,14 @@ class ClassifyCommand(Command):
         
         classifier.begin_annotations()
     
-        value_tuples = self._create_clip_query_values_iterator()
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date)
         
-        for detector, station, mic_output, date in value_tuples:
-            
-            clips = _get_clips(station, mic_output, detector, date)
-            
-            count = clips.count()
-            count_text = text_utils.create_count_text(count, 'clip')
-            
-            _logger.info((
-                'Classifier will visit {} for detector "{}", station "{}", '
-                'mic output "{}", and date {}.').format(
-                    count_text, detector.name, station.name, mic_output.name,
-                    date))
-            
-            try:
-                _classify_clips(clips, classifier)
-                    
-            except Exception:
-                _logger.error(
-                    'Clip classification failed. See below for exception '
-                    'traceback.')
-                raise
+        if hasattr(classifier, 'annotate_clips'):
+            _classify_clip_batches(groups, classifier)
+        else:
+            _classify_clips_individually(groups, classifier)
             
         classifier.end_annotations()
     
@@ -81,18 +67,6 @@ class ClassifyCommand(Command):
         except Exception as e:
             command_utils.log_and_reraise_fatal_exception(
                 e, 'Classifier construction', 'The archive was not modified.')
-        
-
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction')
             
             
 def _get_annotation_info(name):
@@ -140,27 +114,29 @@ def _create_classifier(name, annotation_info, job, processor):
     
 def _get_clips(*args):
     try:
-        return model_utils.get_clips(*args)
+        with job_metrics.timer(job_metrics.DATABASE_READ):
+            return list(model_utils.get_clips(*args))
     except Exception as e:
         command_utils.log_and_reraise_fatal_exception(e, 'Clip query')
     
     
-_LOGGING_PERIOD = 500    # clips
+def _log_visit(clips, detector, station, mic_output, date):
+    
+    count_text = text_utils.create_count_text(len(clips), 'clip')
+    
+    _logger.info((
+        'Classifier will visit {} for detector "{}", station "{}", '
+        'mic output "{}", and date {}.').format(
+            count_text, detector.name, station.name, mic_output.name,
+            date))
 
 
-def _classify_clips(clips, classifier):
+def _log_classification(num_clips_classified, num_clips, start_time):
     
-    start_time = time.time()
+    job_metrics.increment(job_metrics.CLIPS_VISITED, num_clips)
+    job_metrics.increment(job_metrics.CLIPS_CLASSIFIED, num_clips_classified)
     
-    if hasattr(classifier, 'annotate_clips'):
-        classify = _classify_clip_batches
-    else:
-        classify = _classify_clips_individually
-        
-    num_clips_classified = classify(clips, classifier)
-
     elapsed_time = time.time() - start_time
-    num_clips = len(clips)
     timing_text = command_utils.get_timing_text(
         elapsed_time, num_clips, 'clips')
             
@@ -169,11 +145,83 @@ def _classify_clips(clips, classifier):
             num_clips_classified, num_clips, timing_text))
 
 
-def _classify_clip_batches(clips, classifier):
-    return classifier.annotate_clips(clips)
+def _log_classification_failure():
+    _logger.error(
+        'Clip classification failed. See below for exception traceback.')
+
+
+_LOGGING_PERIOD = 500    # clips
+
+_BATCH_SIZE = 512        # clips
+"""
+Number of clips per call to a classifier's `annotate_clips` method.
+
+A classifier that has an `annotate_clips` method is passed clips in
+batches of this size, regardless of the detectors, stations, mic
+outputs, and dates of the clips. This amortizes per-call classifier
+overhead (for example, neural network inference setup) over many
+clips even when each (detector, station, mic output, date) combination
+has only a few clips.
+"""
+
+
+def _classify_clip_batches(groups, classifier):
+    
+    batch = []
+    
+    for detector, station, mic_output, date, _ in groups:
+        
+        clips = _get_clips(station, mic_output, detector, date)
+        
+        _log_visit(clips, detector, station, mic_output, date)
+        
+        batch += clips
+        
+        while len(batch) >= _BATCH_SIZE:
+            _classify_clip_batch(batch[:_BATCH_SIZE], classifier)
+            batch = batch[_BATCH_SIZE:]
+            
+    if len(batch) != 0:
+        _classify_clip_batch(batch, classifier)
+        
+        
+def _classify_clip_batch(clips, classifier):
+    
+    start_time = time.time()
+    
+    try:
+        with job_metrics.timer(job_metrics.CLASSIFICATION):
+            num_clips_classified = classifier.annotate_clips(clips)
+        
+    except Exception:
+        _log_classification_failure()
+        raise
+    
+    _log_classification(num_clips_classified, len(clips), start_time)
 
 
-def _classify_clips_individually(clips, classifier):
+def _classify_clips_individually(groups, classifier):
+    
+    for detector, station, mic_output, date, _ in groups:
+        
+        clips = _get_clips(station, mic_output, detector, date)
+        
+        _log_visit(clips, detector, station, mic_output, date)
+        
+        start_time = time.time()
+        
+        try:
+            with job_metrics.timer(job_metrics.CLASSIFICATION):
+                num_clips_classified = _classify_clips(clips, classifier)
+            
+        except Exception:
+            _log_classification_failure()
+            raise
+        
+        _log_classification(num_clips_classified, len(clips), start_time)
+        
+        
+def _classify_clips(clips, classifier):
     
     num_visited_clips = 0
     num_classified_clips = 0
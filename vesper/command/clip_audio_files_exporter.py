@@ -13,6 +13,9 @@ import vesper.util.os_utils as os_utils
 _logger = logging.getLogger()
 
 
+_DEFAULT_NUM_THREADS = 4
+
+
 class ClipAudioFilesExporter:
     
     """
@@ -22,6 +25,12 @@ class ClipAudioFilesExporter:
     the `output_dir_path` argument. The name of each audio file is
     created from clip metadata with the aid of a clip file name formatter
     extension, specified by the `clip_file_name_formatter` argument.
+    
+    The exporter exports the clips of each export command clip group
+    together. It reads clip samples from recordings in order of
+    recording file and start index, and writes audio files with a pool
+    of threads whose size is specified by the optional `num_threads`
+    argument.
     """
         
     
@@ -33,6 +42,8 @@ class ClipAudioFilesExporter:
         get = command_utils.get_required_arg
         self._output_dir_path = get('output_dir_path', args)
         spec = get('clip_file_name_formatter', args)
+        self._num_threads = command_utils.get_optional_arg(
+            'num_threads', args, _DEFAULT_NUM_THREADS)
          
         self._file_name_formatter = _create_file_name_formatter(spec)
     
@@ -48,12 +59,26 @@ class ClipAudioFilesExporter:
         
     
     def export(self, clip):
-        file_name = self._file_name_formatter.get_file_name(clip)
-        file_path = os.path.join(self._output_dir_path, file_name)
+        file_path = self._get_file_path(clip)
         self._clip_manager.export_audio_file(clip, file_path)
         return True
         
         
+    def export_clips(self, clips):
+        
+        file_paths = [self._get_file_path(clip) for clip in clips]
+        
+        self._clip_manager.export_audio_files(
+            clips, file_paths, self._num_threads)
+        
+        return len(clips)
+    
+    
+    def _get_file_path(self, clip):
+        file_name = self._file_name_formatter.get_file_name(clip)
+        return os.path.join(self._output_dir_path, file_name)
+        
+        
     def end_exports(self):
         pass
             
@@ -1,18 +1,21 @@
 """Module containing class `ClipsHdf5FileExporter`."""
 
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 import h5py
 import math
+import numpy as np
 
-from vesper.command.command import CommandExecutionError
-from vesper.django.app.models import StringAnnotation
+from django.db import connections
+
+from vesper.command.command import CommandExecutionError, CommandSyntaxError
 from vesper.singletons import clip_manager
+from vesper.util.clips_hdf5_file import ClipsHdf5ArraysWriter
 import vesper.command.command_utils as command_utils
-
-
-# TODO: Make reading clip ids and classifications from output files faster?
+import vesper.util.clips_hdf5_file as clips_hdf5_file
 
 
 # Settings for exports from 2017 and 2018 MPG Ranch archives for coarse
@@ -47,6 +50,32 @@ _ANNOTATION_INFOS = [
 _DEFAULT_ANNOTATION_VALUES = {}
 _START_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
+_LAYOUTS = (clips_hdf5_file.LAYOUT_DATASETS, clips_hdf5_file.LAYOUT_ARRAYS)
+
+# Metadata column dtypes for the arrays layout. Annotation columns
+# are added to these by `_get_column_dtypes`.
+_COLUMN_DTYPES = {
+    'clip_id': np.int64,
+    'station': str,
+    'mic_output': str,
+    'detector': str,
+    'date': str,
+    'sample_rate': np.float64,
+    'clip_start_time': str,
+    'clip_start_index': np.int64,
+    'clip_length': np.int64,
+    'extraction_start_index': np.int64,
+}
+
+# Arrays layout value for a missing integer value.
+_MISSING_INT_VALUE = -1
+
+_DEFAULT_NUM_THREADS = 8
+
+# Number of clips whose samples we write to the output file at a time.
+# We keep up to twice this many sample reads in flight.
+_WRITE_BATCH_SIZE = 256
+
 
 _logger = logging.getLogger()
 
@@ -58,6 +87,20 @@ class ClipsHdf5FileExporter:
     
     The clips are written to the server-side HDF5 file specified in
     the `output_file_path` argument.
+    
+    The optional `layout` argument specifies the layout of the file,
+    either `"Datasets"` (the default) for one HDF5 dataset per clip or
+    `"Arrays"` for a single chunked and compressed 2-D samples array
+    with parallel metadata columns. See the `vesper.util.clips_hdf5_file`
+    module for more about the layouts. The arrays layout is much faster
+    to write and read for large numbers of clips.
+    
+    Clip samples are read by a pool of threads whose size is specified
+    by the optional `num_threads` argument. Since sample reads complete
+    after `export` returns, a clip whose samples cannot be read is
+    omitted from the output file with a warning, and `end_exports`
+    raises a `CommandExecutionError` reporting the number of such
+    clips after writing the other clips.
     """
         
     
@@ -65,8 +108,17 @@ class ClipsHdf5FileExporter:
     
     
     def __init__(self, args):
+        
+        get = command_utils.get_optional_arg
+        
         self._output_file_path = \
             command_utils.get_required_arg('output_file_path', args)
+        self._layout = get('layout', args, clips_hdf5_file.LAYOUT_DATASETS)
+        self._num_threads = get('num_threads', args, _DEFAULT_NUM_THREADS)
+        
+        if self._layout not in _LAYOUTS:
+            raise CommandSyntaxError(
+                f'Unrecognized clips HDF5 file layout "{self._layout}".')
     
     
     def begin_exports(self):
@@ -78,16 +130,84 @@ class ClipsHdf5FileExporter:
         
         self._clip_manager = clip_manager.instance
         
+        self._executor = ThreadPoolExecutor(self._num_threads)
+        
+        # Clips whose samples are being read, in export order.
+        self._pending_clips = deque()
+        
+        # Number of clips whose samples could not be read.
+        self._failed_clip_count = 0
+        
+        if self._layout == clips_hdf5_file.LAYOUT_ARRAYS:
+            group = self._file.create_group('clips')
+            self._arrays_writer = \
+                ClipsHdf5ArraysWriter(group, _get_column_dtypes())
+                
     
     def export(self, clip):
         
         annotations = _get_annotations(clip)
         
-        result = self._extract_samples(clip, annotations)
+        extent = _get_extraction_extent(clip, annotations)
         
-        if result is not None:
+        if extent is None:
+            return False
+            
+        start_offset, length = extent
+        
+        future = self._executor.submit(
+            self._get_samples, clip, start_offset, length)
+            
+        metadata = _get_clip_metadata(clip, start_offset, annotations)
+        
+        self._pending_clips.append((clip, metadata, future))
+        
+        if len(self._pending_clips) >= 2 * _WRITE_BATCH_SIZE:
+            self._write_pending_clips(_WRITE_BATCH_SIZE)
+            
+        return True
+        
+        
+    def _get_samples(self, clip, start_offset, length):
+        
+        try:
+            return self._clip_manager.get_samples(clip, start_offset, length)
+        
+        finally:
+            # Close this worker thread's database connections, which
+            # Django would otherwise leave open until the thread exits.
+            connections.close_all()
+        
+        
+    def _write_pending_clips(self, count):
+        
+        clips = []
+        
+        for _ in range(min(count, len(self._pending_clips))):
+            
+            clip, metadata, future = self._pending_clips.popleft()
+            
+            try:
+                samples = future.result()
+                
+            except Exception as e:
+                _logger.warning(
+                    f'Could not get samples for clip {clip}, so it will '
+                    f'not appear in output. Error message was: {e}')
+                self._failed_clip_count += 1
+                continue
+                
+            clips.append((clip, metadata, samples))
+            
+        if self._layout == clips_hdf5_file.LAYOUT_ARRAYS:
+            self._write_array_clips(clips)
+        else:
+            self._write_dataset_clips(clips)
+            
             
-            samples, start_index = result
+    def _write_dataset_clips(self, clips):
+        
+        for clip, metadata, samples in clips:
             
             # Create dataset from clip samples.
             name = '/clips/{:08d}'.format(clip.id)
@@ -95,19 +215,7 @@ class ClipsHdf5FileExporter:
             
             # Set dataset attributes from clip metadata.
             attrs = self._file[name].attrs
-            attrs['clip_id'] = clip.id
-            attrs['station'] = clip.station.name
-            attrs['mic_output'] = clip.mic_output.name
-            attrs['detector'] = clip.creating_processor.name
-            attrs['date'] = str(clip.date)
-            attrs['sample_rate'] = clip.sample_rate
-            attrs['clip_start_time'] = _format_datetime(clip.start_time)
-            attrs['clip_start_index'] = clip.start_index
-            attrs['clip_length'] = clip.length
-            attrs['extraction_start_index'] = start_index
-            
-            for name, value in annotations.items():
-                name = name.lower().replace(' ', '_')
+            for name, value in metadata.items():
                 try:
                     attrs[name] = value
                 except Exception:
@@ -116,40 +224,35 @@ class ClipsHdf5FileExporter:
                         f'"{name}" for clip starting at {clip.start_time}.')
                     raise
                 
-            return True
         
-        else:
-            return False
+    def _write_array_clips(self, clips):
         
+        if len(clips) == 0:
+            return
  
-    def _extract_samples(self, clip, annotations):
-        
-        extent = _get_extraction_extent(clip, annotations)
+        samples = [s for _, _, s in clips]
         
-        if extent is None:
-            return None
+        columns = dict(
+            (name, [_get_column_value(m[name], dtype) for _, m, _ in clips])
+            for name, dtype in _get_column_dtypes().items())
         
-        else:
-            
-            start_offset, length = extent
-            
-            try:
-                samples = \
-                    self._clip_manager.get_samples(clip, start_offset, length)
-            
-            except Exception as e:
-                _logger.warning(
-                    f'Could not get samples for clip {clip}, so it will '
-                    f'not appear in output. Error message was: {e}')
-                return None
-            
-            start_index = clip.start_index + start_offset
-            
-            return samples, start_index
+        self._arrays_writer.append(samples, columns)
     
 
     def end_exports(self):
-        pass
+        
+        try:
+            self._write_pending_clips(len(self._pending_clips))
+        finally:
+            self._executor.shutdown()
+            self._file.close()
+            
+        if self._failed_clip_count != 0:
+            raise CommandExecutionError(
+                f'Could not get samples for {self._failed_clip_count} '
+                f'clips, so they do not appear in output file '
+                f'"{self._output_file_path}". See warnings above for '
+                f'details.')
 
 
 def _get_extraction_extent(clip, annotations):
@@ -222,25 +325,77 @@ def _format_datetime(dt):
     return dt.strftime(_START_TIME_FORMAT)
     
 
+def _get_clip_metadata(clip, start_offset, annotations):
+    
+    metadata = {
+        'clip_id': clip.id,
+        'station': clip.station.name,
+        'mic_output': clip.mic_output.name,
+        'detector': clip.creating_processor.name,
+        'date': str(clip.date),
+        'sample_rate': clip.sample_rate,
+        'clip_start_time': _format_datetime(clip.start_time),
+        'clip_start_index': clip.start_index,
+        'clip_length': clip.length,
+        'extraction_start_index': clip.start_index + start_offset
+    }
+    
+    for name, value in annotations.items():
+        metadata[_get_attribute_name(name)] = value
+        
+    return metadata
+
+
+def _get_attribute_name(annotation_name):
+    return annotation_name.lower().replace(' ', '_')
+
+
+def _get_column_dtypes():
+    
+    dtypes = dict(_COLUMN_DTYPES)
+    
+    for name, value_converter in _ANNOTATION_INFOS:
+        dtype = str if value_converter is None else np.int64
+        dtypes[_get_attribute_name(name)] = dtype
+        
+    return dtypes
+
+
+def _get_column_value(value, dtype):
+    
+    if value is not None:
+        return value
+    elif dtype is str:
+        return ''
+    else:
+        return _MISSING_INT_VALUE
+
+
 def _get_annotations(clip):
     
+    # Get all annotation values with one query rather than one
+    # query per annotation.
+    names = [name for name, _ in _ANNOTATION_INFOS]
+    values = dict(
+        clip.string_annotations.filter(info__name__in=names).values_list(
+            'info__name', 'value'))
+            
     return dict([
-        (name, _get_annotation_value(clip, name, value_converter))
+        (name, _get_annotation_value(values, name, value_converter))
         for name, value_converter in _ANNOTATION_INFOS])
         
         
-def _get_annotation_value(clip, annotation_name, value_converter):
+def _get_annotation_value(values, annotation_name, value_converter):
     
     try:
-        annotation = clip.string_annotations.get(
-            info__name=annotation_name)
+        value = values[annotation_name]
         
-    except StringAnnotation.DoesNotExist:
+    except KeyError:
         return _DEFAULT_ANNOTATION_VALUES.get(annotation_name)
     
     else:
         
         if value_converter is None:
-            return annotation.value
+            return value
         else:
-            return value_converter(annotation.value)
+            return value_converter(value)
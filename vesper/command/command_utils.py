@@ -1,6 +1,7 @@
 import logging
 
 from vesper.command.command import CommandSyntaxError
+import vesper.util.text_utils as text_utils
 
 
 # TODO: Add type checking to functions that get arguments.
@@ -54,3 +55,39 @@ def log_and_reraise_fatal_exception(exception, action_text, result_text=None):
         error(result_text)
         
     raise
+
+    
+def get_clip_query_groups(
+        detector_names, sm_pair_ui_names, start_date, end_date,
+        annotation_name=None, annotation_value=None, result_text=None):
+    
+    """
+    Gets the nonempty clip groups of a clip query.
+    
+    This function calls `vesper.django.app.model_utils.get_clip_query_groups`
+    and logs the number of clips and nonempty clip groups of the query.
+    If the call raises an exception, the function logs the exception
+    and the optional `result_text` and reraises the exception.
+    """
+    
+    # We import `model_utils` here rather than at the top of this module
+    # since it requires Django, while many users of this module do not.
+    import vesper.django.app.model_utils as model_utils
+    
+    try:
+        groups = model_utils.get_clip_query_groups(
+            detector_names, sm_pair_ui_names, start_date, end_date,
+            annotation_name, annotation_value)
+        
+    except Exception as e:
+        log_and_reraise_fatal_exception(e, 'Clip query', result_text)
+        
+    clip_count = sum(group[4] for group in groups)
+    clip_count_text = text_utils.create_count_text(clip_count, 'clip')
+    group_count_text = text_utils.create_count_text(
+        len(groups), 'detector/station/mic output/date combination')
+    
+    _logger.info('Query found {} in {}.'.format(
+        clip_count_text, group_count_text))
+    
+    return groups
@@ -14,8 +14,23 @@ import vesper.util.text_utils as text_utils
 _logger = logging.getLogger()
 
 
+_DEFAULT_NUM_THREADS = 4
+
+
 class CreateClipAudioFilesCommand(Command):
     
+    """
+    Creates clip audio files.
+    
+    The command creates an audio file for each clip of the specified
+    detectors, station/mic outputs, classification, and dates that does
+    not already have one. The clips of each detector/station/mic
+    output/date combination are read from their recordings in order of
+    recording file and start index, and their audio files are written
+    by a pool of threads whose size is specified by the optional
+    `num_threads` argument.
+    """
+    
     
     extension_name = 'create_clip_audio_files'
     
@@ -28,6 +43,8 @@ class CreateClipAudioFilesCommand(Command):
         self._classification = get('classification', args)
         self._start_date = get('start_date', args)
         self._end_date = get('end_date', args)
+        self._num_threads = command_utils.get_optional_arg(
+            'num_threads', args, _DEFAULT_NUM_THREADS)
         
         
     def execute(self, job_info):
@@ -49,23 +66,31 @@ class CreateClipAudioFilesCommand(Command):
         
         start_time = time.time()
         
-        value_tuples = self._create_clip_query_values_iterator()
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date, self._annotation_name,
+            self._annotation_value, 'The archive was not modified.')
         
         total_num_clips = 0
         total_num_created_files = 0
         
-        for detector, station, mic_output, date in value_tuples:
+        for detector, station, mic_output, date, _ in groups:
             
             clips = model_utils.get_clips(
                 station, mic_output, detector, date, self._annotation_name,
                 self._annotation_value, order=False)
             
+            clips = list(clips.select_related('recording_channel__recording'))
+            
             num_clips = len(clips)
-            num_created_files = 0
             
-            for clip in clips:
-                if self._create_clip_audio_file_if_needed(clip):
-                    num_created_files += 1
+            clips = [
+                c for c in clips if not self._clip_manager.has_audio_file(c)]
+            
+            self._create_clip_audio_files_aux(
+                clips, detector, station, mic_output, date)
+            
+            num_created_files = len(clips)
                 
             # Log file creations for this detector/station/mic_output/date.
             count_text = text_utils.create_count_text(num_clips, 'clip')
@@ -87,30 +112,14 @@ class CreateClipAudioFilesCommand(Command):
             'Processed a total of {}{}.'.format(count_text, timing_text))
 
 
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
-                'The archive was not modified.')
-
-    
-    def _create_clip_audio_file_if_needed(self, clip):
+    def _create_clip_audio_files_aux(
+            self, clips, detector, station, mic_output, date):
         
         try:
-            
-            if not self._clip_manager.has_audio_file(clip):
-                self._clip_manager.create_audio_file(clip)
-                return True
-            
-            else:
-                return False
+            self._clip_manager.create_audio_files(clips, self._num_threads)
                     
         except Exception as e:
             command_utils.log_and_reraise_fatal_exception(
-                e, 'Creation of audio file for clip "{}"'.format(str(clip)))
+                e, ('Creation of audio files for detector "{}", station '
+                    '"{}", mic output "{}", and date {}').format(
+                        detector.name, station.name, mic_output.name, date))
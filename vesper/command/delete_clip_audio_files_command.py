@@ -49,12 +49,15 @@ class DeleteClipAudioFilesCommand(Command):
         
         start_time = time.time()
         
-        value_tuples = self._create_clip_query_values_iterator()
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date, self._annotation_name,
+            self._annotation_value, 'The archive was not modified.')
         
         total_num_clips = 0
         total_num_deleted_files = 0
         
-        for detector, station, mic_output, date in value_tuples:
+        for detector, station, mic_output, date, _ in groups:
             
             clips = model_utils.get_clips(
                 station, mic_output, detector, date, self._annotation_name,
@@ -87,19 +90,6 @@ class DeleteClipAudioFilesCommand(Command):
             'Processed a total of {}{}.'.format(count_text, timing_text))
 
 
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
-                'The archive was not modified.')
-
-    
     def _delete_clip_audio_file_if_needed(self, clip):
         
         try:
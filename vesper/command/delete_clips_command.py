@@ -1,24 +1,42 @@
 """Module containing class `DeleteClipsCommand`."""
 
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import random
 import time
 
-from django.db import transaction
-
-from vesper.command.command import Command
+from vesper.command.command import Command, CommandExecutionError
 from vesper.django.app.models import Clip
 from vesper.singletons import clip_manager
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
-import vesper.util.archive_lock as archive_lock
 import vesper.util.text_utils as text_utils
 
 
 _logger = logging.getLogger()
 
 
+_INITIAL_CHUNK_SIZE = 500
+_MIN_CHUNK_SIZE = 50
+_MAX_CHUNK_SIZE = 5000
+"""
+Initial, minimum, and maximum numbers of clips to delete per database
+transaction.
+"""
+
+_TARGET_TRANSACTION_DURATION = .25
+"""
+Target duration of a clip deletion transaction, in seconds.
+
+We adjust the number of clips deleted per transaction to keep
+transactions about this long, so that the archive lock is never held
+for long by a clip deletion command.
+"""
+
+_FILE_DELETION_THREAD_COUNT = 4
+
+
 class DeleteClipsCommand(Command):
     
     
@@ -44,107 +62,87 @@ class DeleteClipsCommand(Command):
             model_utils.get_clip_query_annotation_data(
                 'Classification', self._classification)
 
-        retain_indices = self._get_retain_clip_indices()
-        
         self._clip_manager = clip_manager.instance
         
-        self._delete_clips(retain_indices)
-        
-        return True
-    
-    
-    def _get_retain_clip_indices(self):
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date, self._annotation_name,
+            self._annotation_value, 'The archive was not modified.')
         
         if self._retain_count == 0:
-            indices = []
-            
-        else:
+            # will retain no clips
             
-            _logger.info('Getting indices of clips to retain...')
+            retain_indices = []
             
-            clip_count = self._count_clips()
+        else:
+            # will retain some clips
             
-            if clip_count <= self._retain_count:
-                # will retain all clips
-                
-                indices = list(range(clip_count))
-                
-            else:
-                # will not retain all clips
+            clip_count = sum(group[4] for group in groups)
+            retain_indices = self._get_retain_clip_indices(clip_count)
                 
-                indices = random.sample(range(clip_count), self._retain_count)
-            
-        return frozenset(indices)
-    
-    
-    def _count_clips(self):
-        
-        value_tuples = self._create_clip_query_values_iterator()
-        count = 0
+        # We delete clip audio files on background threads so that
+        # file deletion overlaps with database deletion and does not
+        # delay releasing the archive lock.
+        with ThreadPoolExecutor(_FILE_DELETION_THREAD_COUNT) as executor:
+            self._file_deletion_executor = executor
+            self._file_deletion_futures = []
+            self._delete_clips(groups, retain_indices)
+            self._wait_for_file_deletions()
         
-        for detector, station, mic_output, date in value_tuples:
+        return True
             
-            clips = model_utils.get_clips(
-                station, mic_output, detector, date, self._annotation_name,
-                self._annotation_value, order=False)
             
-            count += clips.count()
+    def _get_clips(self, detector, station, mic_output, date):
+        return model_utils.get_clips(
+            station, mic_output, detector, date, self._annotation_name,
+            self._annotation_value, order=False)
             
-        return count
             
-
-    def _create_clip_query_values_iterator(self):
+    def _get_retain_clip_indices(self, clip_count):
         
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
+        if clip_count <= self._retain_count:
+            # will retain all clips
+            
+            return list(range(clip_count))
+            
+        else:
+            # will not retain all clips
+            
+            return sorted(random.sample(range(clip_count), self._retain_count))
             
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
-                'The archive was not modified.')
 
-    
-    def _delete_clips(self, retain_indices):
+    def _delete_clips(self, groups, retain_indices):
         
         start_time = time.time()
         
-        retaining_clips = len(retain_indices) == 0
-        
-        value_tuples = self._create_clip_query_values_iterator()
-        
+        # Clip indices are global across clip groups, in order of
+        # increasing clip ID within each group. `index` is the index
+        # of the first clip of the current group, and `r` is the
+        # position in `retain_indices` of the first index that is at
+        # least `index`.
         index = 0
+        r = 0
+        
+        total_count = 0
         total_retained_count = 0
         
-        for detector, station, mic_output, date in value_tuples:
+        self._chunk_size = _INITIAL_CHUNK_SIZE
             
-            # Get clips for this detector, station, mic_output, and date
-            clips = model_utils.get_clips(
-                station, mic_output, detector, date, self._annotation_name,
-                self._annotation_value, order=False)
+        for detector, station, mic_output, date, group_count in groups:
             
+            # Get offsets within group of clips to retain.
+            end_index = index + group_count
+            retain_offsets = []
+            while r < len(retain_indices) and retain_indices[r] < end_index:
+                retain_offsets.append(retain_indices[r] - index)
+                r += 1
+            index = end_index
             
-            # Figure out which clips should be deleted.
+            clips = self._get_clips(detector, station, mic_output, date)
             
-            count = 0
-            retained_count = 0
-            clips_to_delete = []
-            
-            for clip in clips:
-                
-                if index not in retain_indices:
-                    clips_to_delete.append(clip)
-                else:
-                    retained_count += 1
-                    
-                count += 1
-                index += 1
-                
-                
-            # Delete clips.
             try:
-                self._delete_clip_batch(clips_to_delete)
+                count, retained_count = \
+                    self._delete_group_clips(clips, retain_offsets)
             except Exception as e:
                 batch_text = \
                     _get_batch_text(detector, station, mic_output, date)
@@ -152,7 +150,7 @@ class DeleteClipsCommand(Command):
                     e, 'Deletion of clips for {}'.format(batch_text))
 
             # Log deletions.
-            if retaining_clips:
+            if len(retain_indices) == 0:
                 prefix = 'Deleted'
             else:
                 deleted_count = count - retained_count
@@ -163,58 +161,124 @@ class DeleteClipsCommand(Command):
             _logger.info(
                 '{} {} for {}.'.format(prefix, count_text, batch_text))
 
+            total_count += count
             total_retained_count += retained_count
                 
         # Log total deletions and deletion rate.
         if total_retained_count == 0:
             prefix = 'Deleted'
         else:
-            deleted_count = index - total_retained_count
+            deleted_count = total_count - total_retained_count
             prefix = 'Deleted {} and retained {} of'.format(
                 deleted_count, total_retained_count)
-        count_text = text_utils.create_count_text(index, 'clip')
+        count_text = text_utils.create_count_text(total_count, 'clip')
         elapsed_time = time.time() - start_time
         timing_text = command_utils.get_timing_text(
-            elapsed_time, index, 'clips')
+            elapsed_time, total_count, 'clips')
         _logger.info('{} a total of {}{}.'.format(
             prefix, count_text, timing_text))
 
 
-    def _delete_clip_batch(self, clips):
+    def _delete_group_clips(self, clips, retain_offsets):
         
-        with archive_lock.atomic():
+        """
+        Deletes the clips of one clip group, except for those at the
+        specified offsets in order of increasing clip ID.
              
-            with transaction.atomic():
+        We get clip IDs a chunk at a time, in order of increasing clip
+        ID, and delete each chunk's clips in a separate transaction so
+        that other archive writers, such as clip album users, can use
+        the archive between chunks. We only ever get clip IDs, never
+        whole clips.
+        """
             
-                # Delete clips in chunks to limit the number of clip IDs
-                # we pass to `Clip.objects.filter`.
+        ids = clips.order_by('id').values_list('id', flat=True)
                 
-                # Setting this too large can result in a
-                # django.db.utils.OperationalError exception with the
-                # message "too many SQL variables". We have seen this
-                # happen with a maximum chunk size of 1000 on Windows,
-                # though not on macOS. The web page
-                # https://stackoverflow.com/questions/7106016/
-                # too-many-sql-variables-error-in-django-witih-sqlite3
-                # suggests that the maximum chunk size that will work
-                # on Windows is somewhere between 900 and 1000, and
-                # 900 seems to work.
-                max_chunk_size = 900
+        last_id = None
+        offset = 0
+        retain_offsets = set(retain_offsets)
+        retained_count = 0
                 
-                for i in range(0, len(clips), max_chunk_size):
+        while True:
                     
-                    chunk = clips[i:i + max_chunk_size]
+            if last_id is None:
+                chunk_ids = list(ids[:self._chunk_size])
+            else:
+                chunk_ids = list(ids.filter(id__gt=last_id)[:self._chunk_size])
                     
-                    # Delete clips from archive database.
-                    ids = [clip.id for clip in chunk]
-                    Clip.objects.filter(id__in=ids).delete()
+            if len(chunk_ids) == 0:
+                break
                     
-        # Delete clip audio files. We do this after the transaction so
-        # that if the transaction fails, leaving the clips in the
-        # database and raising an exception, we don't delete any clip
-        # files.
-        for clip in clips:
-            self._clip_manager.delete_audio_file(clip)
+            last_id = chunk_ids[-1]
+            
+            delete_ids = []
+            
+            for clip_id in chunk_ids:
+                
+                if offset in retain_offsets:
+                    retained_count += 1
+                else:
+                    delete_ids.append(clip_id)
+                    
+                offset += 1
+                
+            self._delete_clip_chunk(delete_ids)
+            
+        return offset, retained_count
+        
+        
+    def _delete_clip_chunk(self, clip_ids):
+        
+        if len(clip_ids) == 0:
+            return
+            
+        start_time = time.time()
+        
+        model_utils.delete_clips(clip_ids)
+        
+        # Adjust chunk size so that future deletion transactions take
+        # about `_TARGET_TRANSACTION_DURATION` seconds.
+        duration = time.time() - start_time
+        if duration < _TARGET_TRANSACTION_DURATION / 2:
+            self._chunk_size = min(2 * self._chunk_size, _MAX_CHUNK_SIZE)
+        elif duration > _TARGET_TRANSACTION_DURATION * 2:
+            self._chunk_size = max(self._chunk_size // 2, _MIN_CHUNK_SIZE)
+            
+        # Delete clip audio files. We do this after the transaction
+        # commits so that if the transaction fails, leaving the clips
+        # in the database and raising an exception, we don't delete
+        # any clip files.
+        future = self._file_deletion_executor.submit(
+            self._delete_audio_files, clip_ids)
+        self._file_deletion_futures.append(future)
+        
+        
+    def _delete_audio_files(self, clip_ids):
+        for clip_id in clip_ids:
+            self._clip_manager.delete_audio_file(Clip(id=clip_id))
+            
+            
+    def _wait_for_file_deletions(self):
+        
+        failure_count = 0
+        
+        for future in self._file_deletion_futures:
+            
+            try:
+                future.result()
+                
+            except Exception as e:
+                _logger.error(
+                    'Deletion of clip audio files failed with {} exception. '
+                    'Exception message was: {}'.format(
+                        e.__class__.__name__, str(e)))
+                failure_count += 1
+                
+        if failure_count != 0:
+            raise CommandExecutionError(
+                'Deletion of some clip audio files failed. See above '
+                'for details. The clips were deleted from the archive '
+                'database.')
 
 
 def _get_batch_text(detector, station, mic_output, date):
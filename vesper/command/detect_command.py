@@ -18,11 +18,13 @@ from vesper.django.app.models import (
 from vesper.old_bird.old_bird_detector_runner import OldBirdDetectorRunner
 from vesper.signal.wave_audio_file import WaveAudioFileReader
 from vesper.singletons import (
-    archive, clip_manager, extension_manager, preset_manager)
-from vesper.util.schedule import Interval, Schedule
+    archive, clip_manager, ephem_cache, extension_manager, preset_manager,
+    schedule_cache)
+from vesper.util.schedule import Interval
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
 import vesper.util.archive_lock as archive_lock
+import vesper.util.job_metrics as job_metrics
 import vesper.util.os_utils as os_utils
 import vesper.util.signal_utils as signal_utils
 import vesper.util.text_utils as text_utils
@@ -125,7 +127,6 @@ class DetectCommand(Command):
         self._create_clip_files = False  # get('create_clip_files', args)
         
         self._schedule = _get_schedule(self._schedule_name)
-        self._station_schedules = {}
                 
         self._process_random_station_nights = _PROCESS_RANDOM_STATION_NIGHTS
         self._start_station_night_index = _START_STATION_NIGHT_INDEX
@@ -345,39 +346,60 @@ class DetectCommand(Command):
                 
             else:
                 
-                recording_intervals = self._get_detection_intervals(recording)
+                file_intervals = self._get_detection_intervals(
+                    recording, recording_files)
             
-                for file_ in recording_files:
+                for file_, intervals in zip(recording_files, file_intervals):
                     self._run_other_detectors_on_file(
-                        detector_models, file_, recording_intervals)
+                        detector_models, file_, intervals)
+                    
+        # Job processes do not run `atexit` handlers, so we save any
+        # newly compiled schedules and solar event times explicitly.
+        schedule_cache.instance.save()
+        ephem_cache.instance.save()
                     
                     
-    def _get_detection_intervals(self, recording):
+    def _get_detection_intervals(self, recording, recording_files):
                     
-        schedule = self._get_detection_schedule(recording.station)
-        start_time = recording.start_time
-        end_time = recording.end_time
+        """
+        Gets the time intervals on which to run detectors for each
+        file of a recording.
+        """
+        
+        recording_interval = Interval(
+            start=recording.start_time, end=recording.end_time)
+        
+        # Get file intervals, restricted to the recording interval.
+        # Note that the start of an interval is greater than its end
+        # if a file does not intersect the recording interval.
+        query_intervals = [
+            Interval(
+                start=max(f.start_time, recording_interval.start),
+                end=min(f.end_time, recording_interval.end))
+            for f in recording_files]
+        
+        schedule = self._get_detection_schedule(
+            recording.station, recording_interval)
         
         if schedule is None:
-            return [Interval(start=start_time, end=end_time)]
+            return [
+                [i] if i.start <= i.end else []
+                for i in query_intervals]
         
         else:
-            # have schedule
-            
-            schedule_intervals = schedule.get_intervals(start_time, end_time)
-            
-            recording_interval = Interval(start=start_time, end=end_time)
-            
-            # Here we know from the contract of `Schedule.get_intervals`
-            # that each interval of `schedule_intervals` intersects the
-            # recording interval, so we don't have to worry about
-            # `_get_time_intervals_intersection` returning `None`.
-            return [
-                _get_time_intervals_intersection(i, recording_interval)
-                for i in schedule_intervals]
+            return schedule.get_interval_intersections(query_intervals)
         
     
-    def _get_detection_schedule(self, station):
+    def _get_detection_schedule(self, station, interval):
+        
+        """
+        Gets the detection schedule for the specified station, compiled
+        at least for the specified time interval.
+        
+        Schedules are obtained from the archive's schedule cache, which
+        compiles each schedule only for the time intervals for which it
+        is needed and shares compiled schedules across jobs.
+        """
         
         if self._schedule is None:
             return None
@@ -385,25 +407,12 @@ class DetectCommand(Command):
         else:
             # have schedule
             
-            try:
-                return self._station_schedules[station.name]
-            
-            except KeyError:
-                # schedule cache miss
-                
-                # Create schedule for this station.
-                schedule = Schedule.compile_dict(
-                    self._schedule, station.latitude, station.longitude,
-                    station.time_zone)
-                
-                # Add schedule to cache.
-                self._station_schedules[station.name] = schedule
-                
-                return schedule
+            return schedule_cache.instance.get_schedule(
+                self._schedule, station.latitude, station.longitude,
+                station.time_zone, interval.start, interval.end)
         
             
-    def _run_other_detectors_on_file(
-            self, detector_models, file_, recording_intervals):
+    def _run_other_detectors_on_file(self, detector_models, file_, intervals):
                 
         if file_.path is None:
             
@@ -424,9 +433,6 @@ class DetectCommand(Command):
                 
                 reader = WaveAudioFileReader(str(abs_path))
                 
-                intervals = _get_file_detection_intervals(
-                    file_, recording_intervals)
-                
                 if len(intervals) == 0:
                     self._logger.info(
                         f'        The detection schedule '
@@ -460,16 +466,39 @@ class DetectCommand(Command):
                 detector_models, file_.recording, file_reader,
                 file_.start_index, index_interval.start)
                   
-            # Detect.
-            for samples in _generate_sample_buffers(
-                    file_reader, index_interval):
-                for detector in detectors:
-                    channel_samples = samples[detector.channel_num]
-                    detector.detect(channel_samples)
+            file_detectors, sample_detectors = \
+                _partition_detectors_by_input(
+                    detectors, file_, index_interval)
                       
-            # Wrap up detection.
-            for detector in detectors:
-                detector.complete_detection()
+            # Note that the detection time of the job metrics includes
+            # the times of any metrics timers of the detectors and of
+            # the database writes of their listeners.
+            
+            # Hand recording file to detectors that can read it
+            # themselves, so that they need not receive its samples.
+            # This happens only when the detection interval is the
+            # entire file.
+            length = index_interval.end - index_interval.start
+            for detector in file_detectors:
+                with job_metrics.timer(job_metrics.DETECTION):
+                    detector.detect_file(
+                        str(file_path), detector.channel_num,
+                        index_interval.start, length)
+                    
+            if len(sample_detectors) != 0:
+                
+                # Detect.
+                for samples in _generate_sample_buffers(
+                        file_reader, index_interval):
+                    for detector in sample_detectors:
+                        channel_samples = samples[detector.channel_num]
+                        with job_metrics.timer(job_metrics.DETECTION):
+                            detector.detect(channel_samples)
+                        
+                # Wrap up detection.
+                for detector in sample_detectors:
+                    with job_metrics.timer(job_metrics.DETECTION):
+                        detector.complete_detection()
                 
         else:
             # don't run detectors
@@ -626,35 +655,50 @@ def _partition_detectors(detectors):
     return (old_bird_detectors, other_detectors)
 
 
-def _get_time_intervals_intersection(a, b):
+def _partition_detectors_by_input(detectors, file_, index_interval):
     
-    if a.end < b.start or b.end < a.start:
-        # intervals do not intersect
-        
-        return None
+    """
+    Partitions detectors into ones to which a recording file can be
+    handed directly and ones to which its samples must be fed.
     
-    else:
-        # intervals intersect
-        
-        start = a.start if b.start < a.start else b.start
-        end = a.end if a.end < b.end else b.end
-        return Interval(start=start, end=end)
-
-
-def _get_file_detection_intervals(file_, recording_intervals):
+    A detector can be handed a recording file if it has a `detect_file`
+    method, the detection interval is the entire file, the file has
+    only one channel, and the detector's input sample rate is the
+    file's sample rate.
     
-    """Gets the audio file time intervals on which to run detectors."""
+    Detectors are handed only entire files since a detector that reads
+    a file itself (BirdVoxDetect, for example) may process the entire
+    file regardless of the detection interval. Handing such a detector
+    the file once for each of several intervals of a detection schedule
+    would process the file once per interval. For an interval that is
+    only part of a file, we instead feed the detector the samples of
+    the interval, so that it processes only them.
     
-    file_interval = Interval(file_.start_time, file_.end_time)
+    Detectors are handed only single-channel files since a detector
+    that reads a multichannel file itself would have to decode all of
+    the file's channels to obtain the one it needs.
+    """
     
-    detection_intervals = [
-        _get_time_intervals_intersection(i, file_interval)
-        for i in recording_intervals]
+    entire_file = \
+        index_interval.start <= 0 and index_interval.end >= file_.length
     
-    # Remove any `None` elements from detection intervals list.
-    detection_intervals = [i for i in detection_intervals if i is not None]
+    file_detectors = []
+    sample_detectors = []
     
-    return detection_intervals
+    for detector in detectors:
+        
+        if hasattr(detector, 'detect_file') and \
+                entire_file and \
+                file_.num_channels == 1 and \
+                getattr(detector, 'input_sample_rate', None) == \
+                file_.sample_rate:
+            
+            file_detectors.append(detector)
+            
+        else:
+            sample_detectors.append(detector)
+            
+    return (file_detectors, sample_detectors)
     
 
 def _get_index_interval(time_interval, start_time, sample_rate):
@@ -679,8 +723,16 @@ def _generate_sample_buffers(file_reader, interval):
     end_index = interval.end
     
     while index != end_index:
+        
         length = min(_DETECTION_CHUNK_SIZE, end_index - index)
-        yield file_reader.read(index, length)
+        
+        with job_metrics.timer(job_metrics.AUDIO_READ):
+            samples = file_reader.read(index, length)
+            
+        job_metrics.increment(job_metrics.AUDIO_SAMPLES_READ, length)
+        
+        yield samples
+        
         index += length
         
         
@@ -752,8 +804,6 @@ class _DetectorListener:
         
         self._annotation_info_cache = {}
  
-#         self._num_transactions = 0
-#         self._total_transactions_duration = 0
         
         
     # TODO: Add `annotations` arguments to other detector listeners'
@@ -808,13 +858,15 @@ class _DetectorListener:
                 clips = []
              
             # Create database records for current batch of clips in one
-            # database transaction.
-            
-#             trans_start_time = time.time()
+            # database transaction. The database write timer of the job
+            # metrics excludes the archive lock wait, which is timed
+            # separately.
             
             try:
                 
-                with archive_lock.atomic(), transaction.atomic():
+                with archive_lock.atomic(), \
+                        job_metrics.timer(job_metrics.DATABASE_WRITE), \
+                        transaction.atomic():
                     
                     for start_index, length, annotations in self._clips:
                         
@@ -880,11 +932,6 @@ class _DetectorListener:
                             # database again.
                             raise _ClipCreationError(e)
 
-#                     trans_end_time = time.time()
-#                     self._num_transactions += 1
-#                     self._total_transactions_duration += \
-#                         trans_end_time - trans_start_time
-            
             except _ClipCreationError as e:
                 
                 duration = signal_utils.get_duration(length, sample_rate)
@@ -909,6 +956,9 @@ class _DetectorListener:
             else:
                 # clip creation succeeded
                 
+                job_metrics.increment(
+                    job_metrics.CLIPS_CREATED, len(self._clips))
+                
                 if create_clip_files:
                 
                     for clip in clips:
@@ -999,11 +1049,6 @@ class _DetectorListener:
                     clips_text, self._detector_model.name,
                     db_failures_text, file_failures_text))
         
-#         avg = self._total_transactions_duration / self._num_transactions
-#         self._logger.info((
-#             '        Average database transaction duration was {} '
-#             'seconds.').format(avg))
-
 
     def _write_deferred_clips_file(self):
         
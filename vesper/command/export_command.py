@@ -7,6 +7,7 @@ from vesper.command.command import Command, CommandSyntaxError
 from vesper.singletons import extension_manager
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.text_utils as text_utils
 
 
@@ -53,15 +54,17 @@ class ExportCommand(Command):
             model_utils.get_clip_query_annotation_data(
                 'Classification', self._classification)
             
-        value_tuples = self._create_clip_query_values_iterator()
+        groups = command_utils.get_clip_query_groups(
+            self._detector_names, self._sm_pair_ui_names,
+            self._start_date, self._end_date, annotation_name,
+            annotation_value)
         
-        for detector, station, mic_output, date in value_tuples:
+        for detector, station, mic_output, date, count in groups:
             
             clips = _get_clips(
                 station, mic_output, detector, date, annotation_name,
                 annotation_value)
             
-            count = clips.count()
             count_text = text_utils.create_count_text(count, 'clip')
             
             _logger.info((
@@ -71,7 +74,8 @@ class ExportCommand(Command):
                     date))
             
             try:
-                _export_clips(clips, self._exporter)
+                with job_metrics.timer(job_metrics.EXPORT):
+                    _export_clips(clips, self._exporter)
                     
             except Exception:
                 _logger.error(
@@ -81,18 +85,6 @@ class ExportCommand(Command):
         self._exporter.end_exports()
             
         return True
-
-
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                self._detector_names, self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction')
             
             
 def _parse_exporter_spec(spec):
@@ -136,6 +128,32 @@ _LOGGING_PERIOD = 500    # clips
 
 def _export_clips(clips, exporter):
     
+    if hasattr(exporter, 'export_clips'):
+        _export_clip_batch(clips, exporter)
+    else:
+        _export_clips_individually(clips, exporter)
+        
+        
+def _export_clip_batch(clips, exporter):
+    
+    # Get related objects needed for clip file names and clip samples
+    # with the clips, rather than with separate queries for each clip.
+    with job_metrics.timer(job_metrics.DATABASE_READ):
+        clips = list(clips.select_related(
+            'station', 'mic_output', 'creating_processor',
+            'recording_channel__recording'))
+    
+    exported_count = exporter.export_clips(clips)
+    
+    _increment_clip_counts(len(clips), exported_count)
+    
+    _logger.info(
+        'Exported {} of {} visited clips.'.format(
+            exported_count, len(clips)))
+    
+    
+def _export_clips_individually(clips, exporter):
+    
     visited_count = 0
     exported_count = 0
     
@@ -149,6 +167,13 @@ def _export_clips(clips, exporter):
         if visited_count % _LOGGING_PERIOD == 0:
             _logger.info('Visited {} clips...'.format(visited_count))
             
+    _increment_clip_counts(visited_count, exported_count)
+    
     _logger.info(
         'Exported {} of {} visited clips.'.format(
             exported_count, visited_count))
+
+
+def _increment_clip_counts(visited_count, exported_count):
+    job_metrics.increment(job_metrics.CLIPS_VISITED, visited_count)
+    job_metrics.increment(job_metrics.CLIPS_EXPORTED, exported_count)
@@ -18,6 +18,7 @@ from vesper.command.command import CommandSyntaxError
 from vesper.command.job_info import JobInfo
 from vesper.command.job_logging_manager import JobLoggingManager
 import vesper.util.django_utils as django_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.time_utils as time_utils
 
 
@@ -94,9 +95,14 @@ def run_job(job_info):
     from vesper.django.app.models import Job
     import vesper.util.archive_lock as archive_lock
     
+    # Reset the job metrics for this process. See the `job_metrics`
+    # module for details.
+    job_metrics.reset()
+    
     # Set the archive lock for this process. The lock is provided to
-    # this process by its creator.
-    archive_lock.set_lock(job_info.archive_lock)
+    # this process by its creator. We wrap it in a `TimedLock` to
+    # include archive lock waits in the job metrics.
+    archive_lock.set_lock(job_metrics.TimedLock(job_info.archive_lock))
 
     # Get the Django model instance for this job.
     job = Job.objects.get(id=job_info.job_id)
@@ -187,9 +193,22 @@ def run_job(job_info):
         # reported in log displays. See record counts handler
         # TODO in `job_logging_manager` module for more detail.
         
+        _write_job_metrics(job, logger)
+        
         logging_manager.shut_down_logging()
 
 
+def _write_job_metrics(job, logger):
+    
+    try:
+        job_metrics.write_metrics(job.metrics_file_path)
+        
+    except Exception as e:
+        logger.warning(
+            'Could not write job metrics file "{}". Error message '
+            'was: {}'.format(job.metrics_file_path, str(e)))
+
+
 def _create_count_phrase(counts, key, name):
     count = counts.get(key, 0)
     if count == 0:
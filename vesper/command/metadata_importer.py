@@ -4,6 +4,7 @@
 from collections import defaultdict
 import datetime
 import logging
+import time
 
 from django.db import transaction
 
@@ -13,6 +14,8 @@ from vesper.django.app.models import (
     DeviceInput, DeviceModel, DeviceModelInput, DeviceModelOutput,
     DeviceOutput, Job, Processor, Station, StationDevice)
 import vesper.command.command_utils as command_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.job_metrics as job_metrics
 import vesper.util.time_utils as time_utils
 import vesper.util.yaml_utils as yaml_utils
 
@@ -95,6 +98,20 @@ class MetadataImporter:
     The value of the argument is a mapping from string keys like `'stations'`
     and `'devices'` to collections of mappings, with each mapping in the
     collection describing the fields of one archive object.
+    
+    The importer imports metadata in two phases. In the first phase, it
+    plans the import, creating (but not saving) archive objects for all
+    of the metadata and resolving all names that the metadata refer to
+    (for example, the names of device models, devices, and stations)
+    in memory rather than by querying the archive database. This phase
+    also validates the metadata, so that invalid metadata are reported
+    before any archive objects are saved. In the second phase, the
+    importer saves the archive objects in a single database transaction,
+    with one bulk insert per archive object type.
+    
+    If the optional `dry_run` command argument is `True`, the importer
+    plans the import and logs the planned inserts, but does not modify
+    the archive database.
     """
     
     
@@ -102,32 +119,110 @@ class MetadataImporter:
     
     
     def __init__(self, args):
+        get = command_utils.get_optional_arg
         self.metadata = command_utils.get_required_arg('metadata', args)
+        self.dry_run = get('dry_run', args, False)
     
     
     def execute(self, job_info):
         
+        self._job_info = job_info
         self._logger = logging.getLogger()
         
+        if self.dry_run:
+            self._logger.info(
+                'This importer is running in dry run mode. After this '
+                'message it will log the same messages that it would '
+                'during normal operation, including messages indicating '
+                'that it is adding objects to the archive database. '
+                'However, it will not actually modify the database.')
+        
         try:
-            with transaction.atomic():
-                self._add_stations()
-                self._add_device_models()
-                self._add_devices()
-                self._add_station_devices()
-                self._add_detectors()
-                self._add_classifiers()
-                self._add_annotation_constraints(job_info)
-                self._add_annotations(job_info)
+            
+            start_time = time.time()
+            self._plan_import()
+            elapsed_time = time.time() - start_time
+            self._log_planned_inserts(elapsed_time)
+            
+            if not self.dry_run:
+                self._perform_inserts()
                 
         except Exception:
             self._logger.error(
-                'Metadata import failed with an exception. Database '
-                'has been restored to its state before the import. See '
-                'below for exception traceback.')
+                'Metadata import failed with an exception. The archive '
+                'database was not modified. See below for exception '
+                'traceback.')
             raise
         
         return True
+    
+    
+    def _plan_import(self):
+        
+        # New archive objects, by class.
+        self._new_objects = defaultdict(list)
+        
+        with job_metrics.timer(job_metrics.DATABASE_READ):
+            self._load_archive_objects()
+        
+        self._add_stations()
+        self._add_device_models()
+        self._add_devices()
+        self._add_station_devices()
+        self._add_detectors()
+        self._add_classifiers()
+        self._add_annotation_constraints()
+        self._add_annotations()
+        
+        
+    def _load_archive_objects(self):
+        
+        # Load the existing archive objects that metadata can refer to,
+        # with one query per object type. We add new objects to the
+        # resulting dictionaries as we plan them.
+        
+        self._stations = _create_objects_dict(
+            Station.objects.all(), long_names=False)
+        
+        self._device_models = _create_objects_dict(DeviceModel.objects.all())
+        
+        self._model_ports = {
+            'input': _create_ports_dict(
+                DeviceModelInput.objects.select_related('model'), 'model'),
+            'output': _create_ports_dict(
+                DeviceModelOutput.objects.select_related('model'), 'model')
+        }
+        
+        self._devices = _create_objects_dict(
+            Device.objects.select_related('model'))
+        
+        inputs = DeviceInput.objects.select_related(
+            'device__model', 'model_input')
+        outputs = DeviceOutput.objects.select_related(
+            'device__model', 'model_output')
+        
+        self._device_ports = {
+            'input': _create_ports_dict(inputs, 'device'),
+            'output': _create_ports_dict(outputs, 'device')
+        }
+        
+        self._ports = {
+            'input': _create_objects_dict(inputs),
+            'output': _create_objects_dict(outputs)
+        }
+        
+        self._annotation_constraints = _create_objects_dict(
+            AnnotationConstraint.objects.all(), long_names=False)
+        
+        self._annotation_info_names = frozenset(
+            AnnotationInfo.objects.values_list('name', flat=True))
+        
+        self._job = None
+        self._creation_time = time_utils.get_utc_now()
+        
+        
+    def _add_object(self, obj):
+        self._new_objects[obj.__class__].append(obj)
             
             
     def _add_stations(self):
@@ -140,6 +235,8 @@ class MetadataImporter:
             
                 name = _get_required(data, 'name', 'station')
                 
+                _check_name_available(name, self._stations, 'station')
+                
                 self._logger.info('Adding station "{}"...'.format(name))
                 
                 description = data.get('description', '')
@@ -148,13 +245,16 @@ class MetadataImporter:
                 elevation = _get_required(data, 'elevation', 'station')
                 time_zone = _get_required(data, 'time_zone', 'station')
                 
-                Station.objects.create(
+                station = Station(
                     name=name,
                     description=description,
                     latitude=latitude,
                     longitude=longitude,
                     elevation=elevation,
                     time_zone=time_zone)
+                
+                self._add_object(station)
+                self._stations[name] = station
 
 
     def _add_device_models(self):
@@ -173,6 +273,8 @@ class MetadataImporter:
         
         name = _get_required(data, 'name', 'device model')
         
+        _check_name_available(name, self._device_models, 'device model')
+        
         self._logger.info('Adding device model "{}"...'.format(name))
 
         type_ = _get_required(data, 'type', 'device model')
@@ -180,7 +282,7 @@ class MetadataImporter:
         model = _get_required(data, 'model', 'device model')
         description = data.get('description', '')
         
-        model = DeviceModel.objects.create(
+        model = DeviceModel(
             name=name,
             type=type_,
             manufacturer=manufacturer,
@@ -188,6 +290,13 @@ class MetadataImporter:
             description=description
         )
         
+        _check_name_available(
+            model.long_name, self._device_models, 'device model',
+            long_name=True)
+        
+        self._add_object(model)
+        _add_to_objects_dict(self._device_models, model)
+        
         return model
             
 
@@ -195,16 +304,21 @@ class MetadataImporter:
         
         port_data = self._get_port_data(data, port_type)
         
+        ports = self._model_ports[port_type][model.name]
+        
         for local_name, channel_num in port_data:
             
             self._logger.info(
                 'Adding device model "{}" {} "{}"...'.format(
                     model.name, port_type, local_name))
             
-            port_class.objects.create(
+            port = port_class(
                 model=model,
                 local_name=local_name,
                 channel_num=channel_num)
+            
+            self._add_object(port)
+            ports.append(port)
 
 
     def _get_port_data(self, data, port_type):
@@ -235,66 +349,71 @@ class MetadataImporter:
         
         if devices_data is not None:
             
-            models = _create_objects_dict(DeviceModel)
-        
             for data in devices_data:
-                device = self._add_device(data, models)
-                self._add_device_inputs(device)
-                self._add_device_outputs(device)
+                device = self._add_device(data)
+                self._add_device_ports(device, 'input', DeviceInput)
+                self._add_device_ports(device, 'output', DeviceOutput)
             
             
-    def _add_device(self, data, models):
+    def _add_device(self, data):
         
         name = _get_required(data, 'name', 'device')
         
+        _check_name_available(name, self._devices, 'device')
+        
         self._logger.info('Adding device "{}"...'.format(name))
         
-        model = self._get_device_model(data, models)
-        serial_number = _get_required(data, 'serial_number', 'device')
+        model = self._get_device_model(data)
         description = data.get('description', '')
         
-        return Device.objects.create(
+        # We convert the serial number to a string since YAML parses
+        # serial numbers like "0" as integers.
+        serial_number = str(
+            _get_required(data, 'serial_number', 'device'))
+        
+        device = Device(
             name=name,
             model=model,
             serial_number=serial_number,
             description=description)
 
+        _check_name_available(
+            device.long_name, self._devices, 'device', long_name=True)
 
-    def _get_device_model(self, data, models):
+        self._add_object(device)
+        _add_to_objects_dict(self._devices, device)
+        
+        return device
+        
+        
+    def _get_device_model(self, data):
 
         name = _get_required(data, 'model', 'device')
         
         try:
-            return models[name]
+            return self._device_models[name]
         except KeyError:
             raise CommandSyntaxError(
                 'Unrecognized device model name "{}".'.format(name))
 
 
-    def _add_device_inputs(self, device):
+    def _add_device_ports(self, device, port_type, port_class):
         
-        for model_input in device.model.inputs.all():
+        model_ports = self._model_ports[port_type][device.model.name]
+        device_ports = self._device_ports[port_type][device.name]
+        
+        for model_port in model_ports:
             
             self._logger.info(
-                'Adding device "{}" input "{}"...'.format(
-                    device.name, model_input.local_name))
-            
-            DeviceInput.objects.create(
-                device=device,
-                model_input=model_input)
-            
+                'Adding device "{}" {} "{}"...'.format(
+                    device.name, port_type, model_port.local_name))
             
-    def _add_device_outputs(self, device):
-                
-        for model_output in device.model.outputs.all():
-            
-            self._logger.info(
-                'Adding device "{}" output "{}"...'.format(
-                    device.name, model_output.local_name))
+            kwargs = {'device': device, 'model_' + port_type: model_port}
+            port = port_class(**kwargs)
             
-            DeviceOutput.objects.create(
-                device=device,
-                model_output=model_output)
+            self._add_object(port)
+            device_ports.append(port)
+            _add_to_objects_dict(self._ports[port_type], port)
 
 
     def _add_station_devices(self):
@@ -302,10 +421,6 @@ class MetadataImporter:
         station_devices_data = self.metadata.get('station_devices')
         
         if station_devices_data is not None:
-            
-            devices = _create_objects_dict(Device)
-            inputs = _create_objects_dict(DeviceInput)
-            outputs = _create_objects_dict(DeviceOutput)
         
             for data in station_devices_data:
                 
@@ -321,20 +436,20 @@ class MetadataImporter:
                 device_names = _get_required(data, 'devices', data_name)
                 station_devices = []
                 for name in device_names:
-                    device = self._get_device(name, devices)
+                    device = self._get_device(name)
                     self._add_station_device(
                         station, device, start_time, end_time)
                     station_devices.append(device)
                     
                 shorthand_inputs, shorthand_outputs = \
-                    _get_shorthand_ports(station_devices)
+                    self._get_shorthand_ports(station_devices)
                     
                 connections = _get_required(data, 'connections', data_name)
                 for connection in connections:
                     output = self._get_port(
-                        connection, 'output', shorthand_outputs, outputs)
+                        connection, 'output', shorthand_outputs)
                     input_ = self._get_port(
-                        connection, 'input', shorthand_inputs, inputs)
+                        connection, 'input', shorthand_inputs)
                     self._add_connection(
                         station, output, input_, start_time, end_time)
                             
@@ -342,8 +457,8 @@ class MetadataImporter:
     def _get_station(self, data):
         name = _get_required(data, 'station', 'station devices item')
         try:
-            return Station.objects.get(name=name)
-        except Station.DoesNotExist:
+            return self._stations[name]
+        except KeyError:
             raise CommandSyntaxError('Unrecognized station "{}".'.format(name))
             
 
@@ -354,9 +469,9 @@ class MetadataImporter:
         return station.local_to_utc(dt)
 
     
-    def _get_device(self, name, devices):
+    def _get_device(self, name):
         try:
-            return devices[name]
+            return self._devices[name]
         except KeyError:
             raise CommandSyntaxError('Unrecognized device "{}".'.format(name))
         
@@ -367,25 +482,49 @@ class MetadataImporter:
             'Adding station "{}" device "{}" from {} to {}"...'.format(
                 station.name, device.name, str(start_time), str(end_time)))
     
-        StationDevice.objects.create(
+        self._add_object(StationDevice(
             station=station,
             device=device,
             start_time=start_time,
-            end_time=end_time)
+            end_time=end_time))
         
 
-    def _get_port(self, connection, port_type, shorthand_ports, ports):
+    def _get_shorthand_ports(self, devices):
         
-        name = _get_required(connection, port_type, 'device connection')
+        # Create mapping from model names to lists of devices.
+        model_devices = defaultdict(list)
+        for device in devices:
+            if device not in model_devices[device.model.name]:
+                model_devices[device.model.name].append(device)
+            
+        # Create mappings from shorthand port names to ports. A shorthand
+        # port name is like a regular port name except that it includes
+        # only a model name rather than a device name. We include an item
+        # in this mapping for each port of each device that is the only one
+        # of its model in `devices`.
+        shorthand_inputs = {}
+        shorthand_outputs = {}
+        for model_name, devices in model_devices.items():
+            if len(devices) == 1:
+                device_name = devices[0].name
+                _add_shorthand_ports(
+                    shorthand_inputs,
+                    self._device_ports['input'][device_name], model_name)
+                _add_shorthand_ports(
+                    shorthand_outputs,
+                    self._device_ports['output'][device_name], model_name)
+                
+        return shorthand_inputs, shorthand_outputs
+                    
+                    
+    def _get_port(self, connection, port_type, shorthand_ports):
         
-        print(f'Getting port "{name}".')
-        print(sorted(shorthand_ports.keys()))
-        print(sorted(ports.keys()))
+        name = _get_required(connection, port_type, 'device connection')
         
         port = shorthand_ports.get(name)
         
         if port is None:
-            port = ports.get(name)
+            port = self._ports[port_type].get(name)
             
         if port is None:
             raise CommandSyntaxError(
@@ -403,11 +542,11 @@ class MetadataImporter:
                 station.name, output.name, input_.name,
                 str(start_time), str(end_time)))
     
-        DeviceConnection.objects.create(
+        self._add_object(DeviceConnection(
             output=output,
             input=input_,
             start_time=start_time,
-            end_time=end_time)
+            end_time=end_time))
 
 
     def _add_detectors(self):
@@ -429,17 +568,23 @@ class MetadataImporter:
                 
                 description = data.get('description', '')
                 
-                Processor.objects.create(
+                self._add_object(Processor(
                     name=name,
                     type=db_type_name,
-                    description=description)
+                    description=description))
 
         
     def _add_classifiers(self):
         self._add_processors('classifiers', 'classifier', 'Classifier')
         
         
-    def _add_annotation_constraints(self, job_info):
+    def _get_job(self):
+        if self._job is None:
+            self._job = Job.objects.get(id=self._job_info.job_id)
+        return self._job
+    
+    
+    def _add_annotation_constraints(self):
         
         constraints_data = self.metadata.get('annotation_constraints')
         
@@ -449,60 +594,156 @@ class MetadataImporter:
                 
                 name = _get_required(data, 'name', 'annotation constraint')
                 
+                _check_name_available(
+                    name, self._annotation_constraints,
+                    'annotation constraint')
+                
                 self._logger.info(
                     'Adding annotation constraint "{}"...'.format(name))
                 
                 description = data.get('description', '')
                 text = yaml_utils.dump(data)
-                creation_time = time_utils.get_utc_now()
-                creating_user = None
-                creating_job = Job.objects.get(id=job_info.job_id)
                 
-                AnnotationConstraint.objects.create(
+                constraint = AnnotationConstraint(
                     name=name,
                     description=description,
                     text=text,
-                    creation_time=creation_time,
-                    creating_user=creating_user,
-                    creating_job=creating_job)
+                    creation_time=self._creation_time,
+                    creating_user=None,
+                    creating_job=self._get_job())
+                
+                self._add_object(constraint)
+                self._annotation_constraints[name] = constraint
                 
                 
-    def _add_annotations(self, job_info):
+    def _add_annotations(self):
         
         annotations_data = self.metadata.get('annotations')
         
         if annotations_data is not None:
             
+            names = set(self._annotation_info_names)
+            
             for data in annotations_data:
                 
                 name = _get_required(data, 'name', 'annotation')
                 
+                if name in names:
+                    raise CommandSyntaxError(
+                        'Annotation "{}" already exists.'.format(name))
+                
+                names.add(name)
+                
                 self._logger.info('Adding annotation "{}"...'.format(name))
                 
                 description = data.get('description', '')
                 type_ = data.get('type', 'String')
                 constraint = self._get_annotation_constraint(data)
-                creation_time = time_utils.get_utc_now()
-                creating_user = None
-                creating_job = Job.objects.get(id=job_info.job_id)
                 
-                AnnotationInfo.objects.create(
+                self._add_object(AnnotationInfo(
                     name=name,
                     description=description,
                     type=type_,
                     constraint=constraint,
-                    creation_time=creation_time,
-                    creating_user=creating_user,
-                    creating_job=creating_job)
+                    creation_time=self._creation_time,
+                    creating_user=None,
+                    creating_job=self._get_job()))
     
     
     def _get_annotation_constraint(self, data):
+        
         try:
             name = data['constraint']
         except KeyError:
             return None
-        else:
-            return AnnotationConstraint.objects.get(name=name)
+        
+        try:
+            return self._annotation_constraints[name]
+        except KeyError:
+            raise CommandSyntaxError(
+                'Unrecognized annotation constraint "{}".'.format(name))
+    
+    
+    def _log_planned_inserts(self, elapsed_time):
+        
+        num_objects = sum(len(objs) for objs in self._new_objects.values())
+        
+        self._logger.info(
+            'Planned insertion of {} archive objects in {:.3f} '
+            'seconds:'.format(num_objects, elapsed_time))
+        
+        for cls, _ in _INSERTS:
+            objects = self._new_objects.get(cls)
+            if objects:
+                meta = cls._meta
+                name = meta.verbose_name if len(objects) == 1 \
+                    else meta.verbose_name_plural
+                self._logger.info('    {} {}'.format(len(objects), name))
+                
+                
+    def _perform_inserts(self):
+        
+        start_time = time.time()
+        
+        with archive_lock.atomic(), \
+                job_metrics.timer(job_metrics.DATABASE_WRITE), \
+                transaction.atomic():
+            
+            for cls, key_fields in _INSERTS:
+                objects = self._new_objects.get(cls)
+                if objects:
+                    _bulk_create(cls, objects, key_fields)
+                    
+        elapsed_time = time.time() - start_time
+        
+        self._logger.info(
+            'Inserted archive objects in {:.3f} seconds.'.format(
+                elapsed_time))
+        
+        
+_INSERTS = (
+    (Station, ('name',)),
+    (DeviceModel, ('name',)),
+    (DeviceModelInput, ('model_id', 'local_name')),
+    (DeviceModelOutput, ('model_id', 'local_name')),
+    (Device, ('name',)),
+    (DeviceInput, ('device_id', 'model_input_id')),
+    (DeviceOutput, ('device_id', 'model_output_id')),
+    (StationDevice, None),
+    (DeviceConnection, None),
+    (Processor, None),
+    (AnnotationConstraint, ('name',)),
+    (AnnotationInfo, None),
+)
+"""
+Archive object classes in insertion order, with their key fields.
+
+The objects of each class refer only to objects of classes that
+precede it. The key fields of a class uniquely identify its objects.
+They are used to get the IDs of bulk-inserted objects of classes
+whose objects are referred to by other objects, for database back
+ends that do not return the IDs of bulk-inserted objects. The key
+fields are `None` for classes whose objects are not referred to by
+other objects.
+"""
+
+
+def _bulk_create(cls, objects, key_fields):
+    
+    cls.objects.bulk_create(objects)
+    
+    if key_fields is not None and objects[0].pk is None:
+        # database did not return IDs of inserted objects
+        
+        # Get IDs of inserted objects from database. Objects that refer
+        # to these ones get their IDs from them when they are inserted.
+        ids = dict(
+            (row[:-1], row[-1])
+            for row in cls.objects.values_list(*key_fields, 'id'))
+        
+        for obj in objects:
+            key = tuple(getattr(obj, name) for name in key_fields)
+            obj.pk = ids[key]
     
         
 def _get_required(data, key, data_name):
@@ -516,37 +757,44 @@ def _get_required(data, key, data_name):
                 data_name.capitalize(), key))
         
         
-def _create_objects_dict(cls):
-    objects = {}
-    for obj in cls.objects.all():
-        objects[obj.name] = obj
-        objects[obj.long_name] = obj
-    return objects
+def _check_name_available(name, objects, type_name, long_name=False):
+    
+    obj = objects.get(name)
+    
+    if obj is not None and \
+            (obj.long_name if long_name else obj.name) == name:
+        
+        raise CommandSyntaxError(
+            '{} {}"{}" already exists.'.format(
+                type_name.capitalize(), 'with long name ' if long_name else '',
+                name))
 
 
-def _get_shorthand_ports(devices):
+def _create_objects_dict(objects, long_names=True):
+    objects_dict = {}
+    for obj in objects:
+        _add_to_objects_dict(objects_dict, obj, long_names)
+    return objects_dict
     
-    # Create mapping from model names to sets of devices.
-    model_devices = defaultdict(set)
-    for device in devices:
-        model_devices[device.model.name].add(device)
         
-    # Create mappings from shorthand port names to ports. A shorthand
-    # port name is like a regular port name except that it includes
-    # only a model name rather than a device name. We include an item
-    # in this mapping for each port of each device that is the only one
-    # of its model in `devices`.
-    shorthand_inputs = {}
-    shorthand_outputs = {}
-    for model_name, devices in model_devices.items():
-        if len(devices) == 1:
-            for device in devices:
-                _add_shorthand_ports(
-                    shorthand_inputs, device.inputs.all(), model_name)
-                _add_shorthand_ports(
-                    shorthand_outputs, device.outputs.all(), model_name)
+def _add_to_objects_dict(objects_dict, obj, long_names=True):
+    objects_dict[obj.name] = obj
+    if long_names:
+        objects_dict[obj.long_name] = obj
                 
-    return shorthand_inputs, shorthand_outputs
+        
+def _create_ports_dict(ports, owner_field_name):
+    
+    # Create mapping from owner (i.e. device model or device) names
+    # to lists of ports.
+    
+    ports_dict = defaultdict(list)
+    
+    for port in ports:
+        owner = getattr(port, owner_field_name)
+        ports_dict[owner.name].append(port)
+        
+    return ports_dict
                     
                     
 def _add_shorthand_ports(shorthand_ports, ports, model_name):
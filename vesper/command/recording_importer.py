@@ -11,10 +11,11 @@ from django.db import transaction
 from vesper.command.command import CommandExecutionError
 from vesper.django.app.models import (
     DeviceConnection, Job, Recording, RecordingChannel, RecordingFile)
-from vesper.singletons import recording_manager
+from vesper.singletons import recording_file_cache, recording_manager
 import vesper.command.command_utils as command_utils
 import vesper.command.recording_utils as recording_utils
 import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.signal_utils as signal_utils
 import vesper.util.time_utils as time_utils
 
@@ -32,7 +33,11 @@ class RecordingImporter:
     
     The importer obtains recording metadata for imported files with the
     aid of a recording file parser extension, specified by the
-    `recording_file_parser` argument.
+    `recording_file_parser` argument. Files are parsed concurrently by
+    the number of threads specified by the optional `num_threads`
+    argument. Parse results are cached in the archive's recording file
+    cache, so that files that have not changed since they were last
+    parsed need not be parsed again.
     """
     
     
@@ -45,6 +50,9 @@ class RecordingImporter:
             'recursive', args, True)
         spec = command_utils.get_optional_arg('recording_file_parser', args)
         self.file_parser = recording_utils.create_recording_file_parser(spec)
+        self.file_parser_key = \
+            recording_utils.get_recording_file_parser_key(spec)
+        self.num_threads = command_utils.get_optional_arg('num_threads', args)
     
     
     def execute(self, job_info):
@@ -56,12 +64,14 @@ class RecordingImporter:
             
             recordings = self._get_recordings()
             
-            new_recordings, old_recordings = \
-                self._partition_recordings(recordings)
+            with job_metrics.timer(job_metrics.DATABASE_READ):
+                new_recordings, old_recordings = \
+                    self._partition_recordings(recordings)
                 
             self._log_header(new_recordings, old_recordings)
             
-            with transaction.atomic():
+            with job_metrics.timer(job_metrics.DATABASE_WRITE), \
+                    transaction.atomic():
                 self._import_recordings(new_recordings)
             
         except Exception as e:
@@ -74,58 +84,107 @@ class RecordingImporter:
             raise
         
         else:
+            job_metrics.increment(
+                job_metrics.RECORDINGS_IMPORTED, len(new_recordings))
+            job_metrics.increment(
+                job_metrics.RECORDING_FILES_IMPORTED,
+                sum(len(r.files) for r in new_recordings))
             self._log_imports(new_recordings)
 
         return True
             
             
     def _get_recordings(self):
-        files = list(itertools.chain.from_iterable(
-            self._get_path_recording_files(path) for path in self.paths))
+        file_paths = list(itertools.chain.from_iterable(
+            self._get_path_file_paths(path) for path in self.paths))
+        files = self._parse_recording_files(file_paths)
         return recording_utils.group_recording_files(files)
 
                 
-    def _get_path_recording_files(self, path):
+    def _get_path_file_paths(self, path):
+        
+        """
+        Gets (relative path, absolute path) pairs for the recording
+        files at the specified directory or file path.
+        """
         
         if os.path.isdir(path):
-            return self._get_dir_recording_files(path)
+            return self._get_dir_file_paths(path)
         
         else:
-            file = self._get_recording_file(path)
-            return [] if file is None else [file]
+            return self._get_file_paths(Path(path))
 
 
-    def _get_dir_recording_files(self, path):
+    def _get_dir_file_paths(self, path):
         
-        files = []
+        file_paths = []
             
         for (dir_path, dir_names, file_names) in os.walk(path):
             
             for file_name in file_names:
-                file_path = os.path.join(dir_path, file_name)
-                file = self._get_recording_file(Path(file_path))
-                if file is not None:
-                    files.append(file)
+                file_path = Path(dir_path, file_name)
+                file_paths += self._get_file_paths(file_path)
                 
             if not self.recursive:
                 
                 # Stop `os.walk` from descending into subdirectories.
                 del dir_names[:]
                 
-        return files
-                
-                
-    def _get_recording_file(self, file_path):
+        return file_paths
         
-        if not audio_file_utils.is_wave_file_path(file_path):
-            return None
         
+    def _get_file_paths(self, file_path):
+        
+        if not audio_file_utils.is_wave_file_path(file_path):
+            return []
+            
         else:
-            rel_path, abs_path = self._get_recording_file_paths(file_path)
-            file = self._parse_recording_file(abs_path)
+            return [self._get_recording_file_paths(file_path)]
+            
+            
+    def _parse_recording_files(self, file_paths):
+        
+        self._logger.info(
+            f'Getting information for {len(file_paths)} recording files...')
+            
+        cache = recording_file_cache.instance
+        
+        with job_metrics.timer(job_metrics.RECORDING_FILE_PARSING):
+            results = recording_utils.parse_recording_files(
+                file_paths, self.file_parser, self.file_parser_key, cache,
+                self.num_threads, self._logger)
+            
+        # Save cache before processing parse results, so that the
+        # results are cached even if processing fails.
+        cache.save()
+        
+        files = []
+        
+        for (rel_path, abs_path), result in zip(file_paths, results):
+            file = self._get_recording_file(abs_path, result)
             file.path = rel_path
             _set_recording_file_channel_info(file)
-            return file
+            files.append(file)
+            
+        return files
+                
+                
+    def _get_recording_file(self, file_path, parse_result):
+        
+        if isinstance(parse_result, ValueError):
+            raise CommandExecutionError(
+                'Error parsing recording file "{}": {}'.format(
+                    file_path, str(parse_result)))
+            
+        elif isinstance(parse_result, Exception):
+            raise parse_result
+        
+        file = parse_result
+        
+        if file.recorder is None:
+            file.recorder = _get_recorder(file)
+            
+        return file
             
     
     def _get_recording_file_paths(self, file_path):
@@ -186,20 +245,6 @@ class RecordingImporter:
                 file_path, 'could not be found in', manager)
 
 
-    def _parse_recording_file(self, file_path):
-        
-        try:
-            file = self.file_parser.parse_file(str(file_path))
-        
-        except ValueError as e:
-            raise CommandExecutionError(
-                'Error parsing recording file "{}": {}'.format(
-                    file_path, str(e)))
-            
-        if file.recorder is None:
-            file.recorder = _get_recorder(file)
-            
-        return file
             
 
     def _partition_recordings(self, recordings):
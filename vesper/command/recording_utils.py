@@ -1,16 +1,36 @@
 """Utility functions pertaining to recordings."""
 
 
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import hashlib
+import json
 import logging
+import os
+import time
+
+import pytz
 
 from vesper.command.command import CommandExecutionError
-from vesper.django.app.models import Station
+from vesper.django.app.models import Device, Station, StationDevice
 from vesper.singletons import extension_manager, preset_manager
 from vesper.util.bunch import Bunch
 import vesper.util.signal_utils as signal_utils
 
 
+_DEFAULT_NUM_PARSER_THREADS = 8
+"""
+Default number of threads with which to parse recording files.
+
+Parsing a recording file is dominated by the latency of opening the
+file and reading its header, which can be large for files on network
+file systems, so it helps to parse many files concurrently.
+"""
+
+_PARSE_PROGRESS_LOG_PERIOD = 1000
+"""Number of recording files parsed between progress log messages."""
+
+
 def create_recording_file_parser(spec):
     
     # Get parser name.
@@ -41,12 +61,7 @@ def create_recording_file_parser(spec):
     
 def _get_station_name_aliases(spec):
     
-    args = spec.get('arguments')
-    
-    if args is None:
-        return {}
-    
-    preset_name = args.get('station_name_aliases_preset')
+    preset_name = _get_station_name_aliases_preset_name(spec)
     
     if preset_name is None:
         return {}
@@ -64,6 +79,243 @@ def _get_station_name_aliases(spec):
     return preset.data
 
 
+def _get_station_name_aliases_preset_name(spec):
+    
+    args = spec.get('arguments')
+    
+    if args is None:
+        return None
+        
+    return args.get('station_name_aliases_preset')
+
+
+def get_recording_file_parser_key(spec):
+    
+    """
+    Gets a key that identifies a recording file parser configuration.
+    
+    The key depends on the parser name, the parser's station name
+    aliases, the names and time zones of the archive's stations, and
+    the archive's devices and their station assignments, all of which
+    can affect the results of parsing a recording file (a parser can,
+    for example, determine a file's recorder from the devices assigned
+    to the file's station). Recording file information cached under
+    the key is thus valid only for the configuration that produced it.
+    """
+    
+    preset_name = _get_station_name_aliases_preset_name(spec)
+    
+    if preset_name is None:
+        aliases = {}
+    else:
+        preset = preset_manager.instance.get_preset(
+            'Station Name Aliases', preset_name)
+        aliases = {} if preset is None else preset.data
+        
+    stations = sorted(
+        Station.objects.values_list('id', 'name', 'time_zone'))
+    
+    devices = sorted(Device.objects.values_list('id', 'name'))
+    
+    station_devices = sorted(StationDevice.objects.values_list(
+        'station_id', 'device_id', 'start_time', 'end_time'))
+        
+    data = {
+        'parser': spec.get('name'),
+        'station_name_aliases': aliases,
+        'stations': stations,
+        'devices': devices,
+        'station_devices': station_devices
+    }
+    
+    text = json.dumps(data, sort_keys=True, default=str)
+    
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def parse_recording_files(
+        files, file_parser, parser_key, cache=None, num_threads=None,
+        logger=None):
+            
+    """
+    Parses recording files concurrently, with optional caching.
+    
+    Files whose information is in the cache and that have not changed
+    since it was cached (according to their sizes and modification
+    times) are not parsed. The remaining files are parsed concurrently
+    by a pool of threads, and their information is added to the cache.
+    The cache is not saved by this function.
+    
+    :Parameters:
+        
+        files : sequence of (relative path, absolute path) pairs
+            the files to parse.
+            
+        file_parser : recording file parser
+            the parser with which to parse files.
+            
+        parser_key : str
+            the key of the parser configuration, as returned by
+            `get_recording_file_parser_key`.
+            
+        cache : `RecordingFileCache` or `None`
+            the cache in which to look up and store file information,
+            or `None` to parse all files.
+            
+        num_threads : int or `None`
+            the number of threads with which to parse files, or `None`
+            for the default number.
+            
+        logger : `logging.Logger` or `None`
+            the logger to which to log progress, or `None` for no
+            progress logging.
+            
+    :Returns:
+        a list with one element per file, in the order of `files`.
+        
+        Each element is either a recording file `Bunch` as returned
+        by the parser's `parse_file` method or the exception raised
+        by an attempt to get information for the file.
+    """
+    
+    def get_file_info(file, use_cache=True):
+        
+        rel_path, abs_path = file
+        
+        try:
+            
+            stat = os.stat(abs_path)
+            
+            if cache is not None and use_cache:
+                info = cache.get(
+                    parser_key, rel_path, stat.st_size, stat.st_mtime_ns)
+                if info is not None:
+                    return info, True
+                    
+            file = file_parser.parse_file(str(abs_path))
+            
+            if cache is not None:
+                cache.put(
+                    parser_key, rel_path, stat.st_size, stat.st_mtime_ns,
+                    _get_cached_file_info(file))
+                    
+            return file, False
+            
+        except Exception as e:
+            return e, False
+            
+    if num_threads is None:
+        num_threads = _DEFAULT_NUM_PARSER_THREADS
+        
+    num_files = len(files)
+    num_cache_hits = 0
+    results = []
+    
+    start_time = time.time()
+    
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        
+        for i, (result, cached) in enumerate(
+                executor.map(get_file_info, files)):
+                    
+            results.append(result)
+            
+            if cached:
+                num_cache_hits += 1
+                
+            num_done = i + 1
+            
+            if logger is not None and (
+                    num_done % _PARSE_PROGRESS_LOG_PERIOD == 0 or
+                    num_done == num_files):
+                        
+                _log_parse_progress(
+                    logger, num_done, num_files, num_cache_hits, start_time)
+                    
+    def parse_file(file):
+        result, _ = get_file_info(file, use_cache=False)
+        return result
+        
+    return _create_cached_files(files, results, parse_file)
+
+
+def _get_cached_file_info(file):
+    
+    nums = file.recorder_channel_nums
+    
+    return {
+        'station_id': file.station.id,
+        'recorder_id': None if file.recorder is None else file.recorder.id,
+        'recorder_channel_nums': None if nums is None else list(nums),
+        'num_channels': file.num_channels,
+        'length': file.length,
+        'sample_rate': file.sample_rate,
+        'start_time': file.start_time.isoformat()
+    }
+
+
+def _log_parse_progress(
+        logger, num_done, num_files, num_cache_hits, start_time):
+            
+    elapsed_time = time.time() - start_time
+    rate = num_done / elapsed_time if elapsed_time != 0 else 0
+    
+    logger.info(
+        f'Got information for {num_done} of {num_files} recording files '
+        f'({num_cache_hits} from cache) in {elapsed_time:.1f} seconds, '
+        f'a rate of {rate:.1f} files per second.')
+
+
+def _create_cached_files(files, results, parse_file):
+    
+    """
+    Replaces cached file information dictionaries in `results` with
+    recording file `Bunch` objects like those created by file parsers.
+    
+    Cached information that refers to a station or recorder that no
+    longer exists is treated as a cache miss, and the file is parsed
+    again with `parse_file`.
+    """
+    
+    if not any(isinstance(r, dict) for r in results):
+        return results
+        
+    stations = Station.objects.in_bulk()
+    
+    recorder_ids = set(
+        r['recorder_id'] for r in results
+        if isinstance(r, dict) and r['recorder_id'] is not None)
+    recorders = Device.objects.in_bulk(recorder_ids)
+        
+    def create_file(file, info):
+        
+        recorder_id = info['recorder_id']
+        
+        if info['station_id'] not in stations or \
+                recorder_id is not None and recorder_id not in recorders:
+            # station or recorder was deleted after we got the parser
+            # key, which includes the archive's stations and devices
+            
+            return parse_file(file)
+        
+        _, abs_path = file
+        nums = info['recorder_channel_nums']
+        start_time = datetime.datetime.fromisoformat(info['start_time'])
+        return Bunch(
+            station=stations[info['station_id']],
+            recorder=None if recorder_id is None else recorders[recorder_id],
+            recorder_channel_nums=None if nums is None else tuple(nums),
+            num_channels=info['num_channels'],
+            length=info['length'],
+            sample_rate=info['sample_rate'],
+            start_time=start_time.astimezone(pytz.utc),
+            path=str(abs_path))
+            
+    return [
+        create_file(f, r) if isinstance(r, dict) else r
+        for f, r in zip(files, results)]
+
+
 def group_recording_files(files, tolerance=1):
     
     """
@@ -1,7 +1,7 @@
 """Module containing class `RefreshRecordingAudioFilePathsCommand`."""
 
 
-from pathlib import Path, PureWindowsPath
+from pathlib import PurePosixPath, PureWindowsPath
 import logging
 import time
 
@@ -43,60 +43,37 @@ class RefreshRecordingAudioFilePathsCommand(Command):
         for path in recording_dir_paths:
             self._logger.info('    {}'.format(path))
         
-        self._logger.info(
-            'Building mapping from recording directory file names to '
-            'relative file paths...')
+        self._logger.info('Refreshing recording path index...')
         
-        # Reverse directory paths so that if a file name occurs in multiple
-        # directories we will wind up mapping the file name to the path of
-        # the first recording directory in which it occurs.
-        recording_dir_paths = reversed(recording_dir_paths)
-        
-        recording_file_paths = {}
+        start_time = time.time()
+        num_listed_dirs = rm.refresh_index()
+        elapsed_time = time.time() - start_time
         
-        for dir_path in recording_dir_paths:
-            dir_path = Path(dir_path)
-            if dir_path.exists():
-                self._get_recording_file_paths_aux(
-                    dir_path, dir_path, recording_file_paths)
-                
-        return recording_file_paths
-            
+        self._logger.info(
+            'Listed {} new or changed recording directories in {:.1f} '
+            'seconds.'.format(num_listed_dirs, elapsed_time))
             
-    def _get_recording_file_paths_aux(
-            self, dir_path, recording_dir_path, recording_file_paths):
-        
-        # Visit directories before files, depth-first. This gives
-        # shallower files precedence over deeper, identically-named
-        # files, in the sense that their paths will wind up in the
-        # `recording_file_paths` mapping.
-        
-        children = list(dir_path.iterdir())
-        
-        for child in children:
-            if child.is_dir():
-                self._get_recording_file_paths_aux(
-                    child, recording_dir_path, recording_file_paths)
-                
-                
-        # Visit files.
+        self._logger.info(
+            'Building mapping from recording directory file names to '
+            'relative file paths...')
         
-        for child in children:
-            
-            if not child.is_dir():
-                
-                try:
-                    rel_path = child.relative_to(recording_dir_path)
-                except ValueError:
-                    self._logger.error(
-                        ('    Could not get path "{}" relative to directory '
-                         '"{}".').format(child, recording_dir_path))
-                    
-                # We store all paths in the archive database as POSIX
-                # paths, even on Windows, for portability, since Python's
-                # `pathlib` module recognizes the slash as a path separator
-                # on all platforms, but not the backslash.
-                recording_file_paths[child.name] = rel_path.as_posix()
+        dir_nums = dict((p, i) for i, p in enumerate(recording_dir_paths))
+        
+        # Sort indexed files so that if a file name occurs more than
+        # once, the file in the first recording directory in which it
+        # occurs and, within that directory, the shallowest file comes
+        # last, and its path thus winds up in the mapping.
+        files = sorted(
+            rm.get_indexed_file_paths(),
+            key=lambda f: (dir_nums[f[0]], f[1].count('/')),
+            reverse=True)
+        
+        # We store all paths in the archive database as POSIX paths,
+        # even on Windows, for portability, since Python's `pathlib`
+        # module recognizes the slash as a path separator on all
+        # platforms, but not the backslash. The paths of the recording
+        # path index are POSIX paths.
+        return dict((PurePosixPath(p).name, p) for _, p in files)
                 
     
     
@@ -0,0 +1,179 @@
+import datetime
+import os
+import tempfile
+
+from django.test import TestCase
+import pytz
+
+from vesper.command.adjust_clips_command import AdjustClipsCommand
+from vesper.django.app.models import AnnotationInfo, Clip
+from vesper.singletons import archive, clip_image_manager
+from vesper.util.bunch import Bunch
+from vesper.util.clip_image_manager import ClipImageManager
+import vesper.command.adjust_clips_command as adjust_clips_command
+import vesper.django.app.tests.archive_test_utils as archive_test_utils
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 1000
+_FILE_LENGTH = 10000
+_CENTER_INDEX_ANNOTATION_NAME = 'Call Center Index'
+
+
+class AdjustClipsCommandTests(TestCase):
+    
+    
+    def setUp(self):
+        
+        archive_test_utils.import_metadata()
+        
+        AnnotationInfo.objects.create(
+            name=_CENTER_INDEX_ANNOTATION_NAME, type='String',
+            creation_time=time_utils.get_utc_now())
+            
+        archive.instance.refresh_string_annotation_values_cache()
+        
+        start_time = datetime.datetime(2020, 5, 1, 2, tzinfo=pytz.utc)
+        
+        self.recording = archive_test_utils.create_recording(
+            'Station 0', 'Recorder 0', ['Mic 0 Output', 'Mic 1 Output'],
+            start_time, _SAMPLE_RATE, [_FILE_LENGTH, _FILE_LENGTH])
+            
+        # Use a temporary clip image directory, so that we can check
+        # that cached clip images are deleted without touching those
+        # of an actual archive.
+        self._image_dir = tempfile.TemporaryDirectory()
+        self._image_manager = clip_image_manager._instance
+        clip_image_manager._instance = \
+            ClipImageManager(self._image_dir.name)
+            
+        self._chunk_size = adjust_clips_command._UPDATE_CHUNK_SIZE
+        
+        
+    def tearDown(self):
+        clip_image_manager._instance = self._image_manager
+        self._image_dir.cleanup()
+        adjust_clips_command._UPDATE_CHUNK_SIZE = self._chunk_size
+        
+        
+    def _create_clip(self, channel_num, start_index, length, **kwargs):
+        return archive_test_utils.create_clip(
+            self.recording, channel_num, start_index, length, 'Detector 0',
+            **kwargs)
+            
+            
+    def _adjust_clips(self, classification=None, duration=.2):
+        
+        if classification is None:
+            classification = \
+                archive.instance.STRING_ANNOTATION_VALUE_ANY_OR_NONE
+        
+        args = {
+            'detectors': ['Detector 0'],
+            'station_mics': ['Station 0 / Mic 0', 'Station 0 / Mic 1'],
+            'classification': classification,
+            'start_date': datetime.date(2020, 4, 1),
+            'end_date': datetime.date(2020, 5, 31),
+            'duration': duration,
+            'annotation_name': _CENTER_INDEX_ANNOTATION_NAME
+        }
+        
+        command = AdjustClipsCommand(args)
+        command.execute(Bunch(job_id=None))
+        
+        
+    def _assert_clip(self, clip, start_index, length):
+        clip = Clip.objects.get(id=clip.id)
+        self.assertEqual(clip.start_index, start_index)
+        self.assertEqual(clip.length, length)
+        
+        
+    def test_adjust_clips(self):
+        
+        # Clips on both channels and in both recording files.
+        clips = [
+            self._create_clip(0, 1000, 100),
+            self._create_clip(1, 2000, 300),
+            self._create_clip(0, 12000, 100),
+        ]
+        
+        # Clip that already has the new length and the same center.
+        unchanged_clip = self._create_clip(0, 3000, 200)
+        
+        # Clip whose adjusted bounds would cross recording file boundary.
+        boundary_clip = self._create_clip(0, _FILE_LENGTH - 60, 50)
+        
+        # Clip with center index annotation.
+        centered_clip = self._create_clip(
+            1, 5000, 100,
+            annotations={_CENTER_INDEX_ANNOTATION_NAME: '5500'})
+            
+        # Adjust clips in chunks of two, so that some clips are adjusted
+        # in different transactions.
+        adjust_clips_command._UPDATE_CHUNK_SIZE = 2
+        
+        self._adjust_clips()
+        
+        self._assert_clip(clips[0], 950, 200)
+        self._assert_clip(clips[1], 2050, 200)
+        self._assert_clip(clips[2], 11950, 200)
+        self._assert_clip(unchanged_clip, 3000, 200)
+        self._assert_clip(boundary_clip, _FILE_LENGTH - 60, 50)
+        self._assert_clip(centered_clip, 5400, 200)
+        
+        
+    def test_adjust_clips_without_duration(self):
+        
+        clip = self._create_clip(0, 1000, 100)
+        centered_clip = self._create_clip(
+            0, 2000, 100,
+            annotations={_CENTER_INDEX_ANNOTATION_NAME: '2100'})
+            
+        self._adjust_clips(duration=None)
+        
+        self._assert_clip(clip, 1000, 100)
+        self._assert_clip(centered_clip, 2050, 100)
+        
+        
+    def test_adjust_clips_by_classification(self):
+        
+        call_clip = self._create_clip(
+            0, 1000, 100, annotations={'Classification': 'Call'})
+        noise_clip = self._create_clip(
+            0, 2000, 100, annotations={'Classification': 'Noise'})
+            
+        self._adjust_clips(classification='Call')
+        
+        self._assert_clip(call_clip, 950, 200)
+        self._assert_clip(noise_clip, 2000, 100)
+        
+        
+    def test_adjust_clips_without_start_indices(self):
+        
+        clip = self._create_clip(0, 1000, 100)
+        Clip.objects.filter(id=clip.id).update(start_index=None)
+        
+        self._adjust_clips()
+        
+        self._assert_clip(clip, None, 100)
+        
+        
+    def test_delete_images(self):
+        
+        adjusted_clip = self._create_clip(0, 1000, 100)
+        unchanged_clip = self._create_clip(0, 3000, 200)
+        
+        # Create fake cached images for both clips.
+        manager = clip_image_manager.instance
+        dir_paths = [
+            manager._get_clip_dir_path(c.id)
+            for c in (adjusted_clip, unchanged_clip)]
+        for dir_path in dir_paths:
+            os.makedirs(dir_path)
+            
+        self._adjust_clips()
+        
+        # The adjusted clip's images should have been deleted, but
+        # not those of the unchanged clip.
+        self.assertFalse(os.path.exists(dir_paths[0]))
+        self.assertTrue(os.path.exists(dir_paths[1]))
@@ -0,0 +1,212 @@
+import os
+
+from django.test import TestCase
+
+from vesper.command.command import CommandSyntaxError
+from vesper.command.metadata_importer import MetadataImporter
+from vesper.django.app.models import (
+    AnnotationConstraint, AnnotationInfo, Device, DeviceConnection,
+    DeviceInput, DeviceModel, DeviceModelInput, DeviceModelOutput,
+    DeviceOutput, Processor, Station, StationDevice)
+from vesper.util.bunch import Bunch
+import vesper.django.app.tests.archive_test_utils as archive_test_utils
+import vesper.tests.test_utils as test_utils
+import vesper.util.job_metrics as job_metrics
+import vesper.util.time_utils as time_utils
+import vesper.util.yaml_utils as yaml_utils
+
+
+_DATA_DIR_PATH = test_utils.get_test_data_dir_path(__file__)
+
+_MODEL_CLASSES = (
+    Station, DeviceModel, DeviceModelInput, DeviceModelOutput, Device,
+    DeviceInput, DeviceOutput, StationDevice, DeviceConnection, Processor,
+    AnnotationConstraint, AnnotationInfo)
+
+
+class MetadataImporterTests(TestCase):
+    
+    
+    def _import(self, file_name, dry_run=False):
+        
+        file_path = os.path.join(_DATA_DIR_PATH, file_name)
+        
+        with open(file_path) as file_:
+            metadata = yaml_utils.load(file_)
+            
+        job = archive_test_utils.create_job()
+        
+        importer = MetadataImporter({'metadata': metadata, 'dry_run': dry_run})
+        importer.execute(Bunch(job_id=job.id))
+        
+        return job
+        
+        
+    def _get_counts(self):
+        return dict((cls, cls.objects.count()) for cls in _MODEL_CLASSES)
+        
+        
+    def _assert_names(self, objects, expected):
+        self.assertEqual(sorted(o.name for o in objects), expected)
+        
+        
+    def test_import(self):
+        
+        job = self._import('Metadata.yaml')
+        
+        self._assert_names(Station.objects.all(), ['Ithaca', 'Missoula'])
+        
+        station = Station.objects.get(name='Ithaca')
+        self.assertEqual(
+            station.description,
+            'Imaginary recording station in Ithaca, NY, USA.')
+        self.assertEqual(station.time_zone, 'US/Eastern')
+        self.assertEqual(station.latitude, 42.473168)
+        self.assertEqual(station.longitude, -76.516825)
+        self.assertEqual(station.elevation, 120)
+        
+        self._assert_names(
+            DeviceModel.objects.all(), ['21c', 'Recorder', 'Swift'])
+        self._assert_names(
+            DeviceModelInput.objects.all(),
+            ['Recorder Left', 'Recorder Right', 'Swift Input'])
+        self._assert_names(DeviceModelOutput.objects.all(), ['21c Output'])
+        
+        right = DeviceModelInput.objects.get(local_name='Right')
+        self.assertEqual(right.channel_num, 1)
+        
+        self._assert_names(
+            Device.objects.all(), ['21c 0', '21c 1', 'Recorder', 'Swift'])
+            
+        # YAML parses serial number as integer, but archive should
+        # store it as string.
+        device = Device.objects.get(name='Recorder')
+        self.assertEqual(device.serial_number, '1')
+        self.assertEqual(device.model.name, 'Recorder')
+        
+        self._assert_names(
+            DeviceInput.objects.all(),
+            ['Recorder Left', 'Recorder Right', 'Swift Input'])
+        self._assert_names(
+            DeviceOutput.objects.all(), ['21c 0 Output', '21c 1 Output'])
+            
+        # Station device times are local midnights.
+        self._assert_names(StationDevice.objects.all(), [
+            'Ithaca / 21c 0 / start 2020-01-01 05:00:00+00:00 / '
+            'end 2021-01-01 05:00:00+00:00',
+            'Ithaca / 21c 1 / start 2020-01-01 05:00:00+00:00 / '
+            'end 2021-01-01 05:00:00+00:00',
+            'Ithaca / Recorder / start 2020-01-01 05:00:00+00:00 / '
+            'end 2021-01-01 05:00:00+00:00',
+            'Missoula / 21c 1 / start 2020-06-01 06:00:00+00:00 / '
+            'end 2020-07-01 06:00:00+00:00',
+            'Missoula / Swift / start 2020-06-01 06:00:00+00:00 / '
+            'end 2020-07-01 06:00:00+00:00',
+        ])
+        
+        # The Missoula connection is specified with shorthand port
+        # names.
+        self._assert_names(DeviceConnection.objects.all(), [
+            '21c 0 Output / Recorder Left / '
+            'start 2020-01-01 05:00:00+00:00 / '
+            'end 2021-01-01 05:00:00+00:00',
+            '21c 1 Output / Recorder Right / '
+            'start 2020-01-01 05:00:00+00:00 / '
+            'end 2021-01-01 05:00:00+00:00',
+            '21c 1 Output / Swift Input / '
+            'start 2020-06-01 06:00:00+00:00 / '
+            'end 2020-07-01 06:00:00+00:00',
+        ])
+        
+        processors = Processor.objects.order_by('name')
+        self.assertEqual(
+            [(p.name, p.type, p.description) for p in processors], [
+                ('Call Classifier', 'Classifier', ''),
+                ('Tseep Detector', 'Detector', 'Detects tseep calls.'),
+            ])
+            
+        constraint = AnnotationConstraint.objects.get()
+        self.assertEqual(constraint.name, 'Call Types')
+        self.assertEqual(
+            yaml_utils.load(constraint.text)['values'], ['Call', 'Noise'])
+        self.assertEqual(constraint.creating_job, job)
+        
+        info = AnnotationInfo.objects.get()
+        self.assertEqual(info.name, 'Classification')
+        self.assertEqual(info.type, 'String')
+        self.assertEqual(info.constraint, constraint)
+        self.assertEqual(info.creating_job, job)
+        
+        
+    def test_reimport(self):
+        
+        self._import('Metadata.yaml')
+        expected = self._get_counts()
+        
+        # Reimporting the same metadata should fail before modifying
+        # the archive, since the metadata's stations, devices, etc.
+        # already exist.
+        with self.assertRaises(CommandSyntaxError):
+            self._import('Metadata.yaml')
+            
+        self.assertEqual(self._get_counts(), expected)
+        
+        
+    def test_import_with_archived_references(self):
+        
+        self._import('Metadata.yaml')
+        
+        # Import metadata that refer to an archived station, device
+        # model, and device.
+        self._import('Additional Metadata.yaml')
+        
+        device = Device.objects.get(name='21c 2')
+        self.assertEqual(device.model.name, '21c')
+        self.assertEqual(
+            [o.name for o in device.outputs.all()], ['21c 2 Output'])
+            
+        station_devices = StationDevice.objects.filter(
+            station__name='Missoula', start_time__year=2021)
+        self._assert_names(station_devices, [
+            'Missoula / 21c 2 / start 2021-06-01 06:00:00+00:00 / '
+            'end 2021-07-01 06:00:00+00:00',
+            'Missoula / Swift / start 2021-06-01 06:00:00+00:00 / '
+            'end 2021-07-01 06:00:00+00:00',
+        ])
+        
+        connection = DeviceConnection.objects.get(output__device=device)
+        self.assertEqual(connection.input.name, 'Swift Input')
+        self.assertEqual(
+            connection.start_time,
+            time_utils.create_utc_datetime(2021, 6, 1, 6))
+            
+            
+    def test_job_metrics(self):
+        
+        job_metrics.reset()
+        
+        self._import('Metadata.yaml')
+        
+        # The import should read from and write to the database once.
+        timers = job_metrics.get_metrics().get_data()['timers']
+        self.assertEqual(timers[job_metrics.DATABASE_READ]['count'], 1)
+        self.assertEqual(timers[job_metrics.DATABASE_WRITE]['count'], 1)
+        
+        
+    def test_dry_run(self):
+        
+        expected = self._get_counts()
+        
+        self._import('Metadata.yaml', dry_run=True)
+        
+        self.assertEqual(self._get_counts(), expected)
+        
+        
+    def test_unrecognized_reference(self):
+        
+        # The additional metadata refer to a station, device model, and
+        # device that are not in the archive.
+        with self.assertRaises(CommandSyntaxError):
+            self._import('Additional Metadata.yaml')
+            
+        self.assertTrue(all(c == 0 for c in self._get_counts().values()))
@@ -121,27 +121,21 @@ class TransferCallClassificationsCommand(Command):
         return True
     
     
-    def _create_clip_query_values_iterator(self):
-        
-        try:
-            return model_utils.create_clip_query_values_iterator(
-                [self._source_detector_name], self._sm_pair_ui_names,
-                self._start_date, self._end_date)
-            
-        except Exception as e:
-            command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
-                'The archive was not modified.')
-
-
     def _get_reference_time(self):
         d = self._start_date
         return time_utils.create_utc_datetime(d.year, d.month, d.day)
     
     
     def _transfer_classifications(self):
-        value_tuples = self._create_clip_query_values_iterator()
-        for _, station, mic_output, date in value_tuples:
+        
+        # We visit only the clip groups that have source call clips,
+        # since no target clips can be classified for other groups.
+        groups = command_utils.get_clip_query_groups(
+            [self._source_detector_name], self._sm_pair_ui_names,
+            self._start_date, self._end_date, self._annotation_name,
+            self._annotation_value, 'The archive was not modified.')
+        
+        for _, station, mic_output, date, _ in groups:
             self._transfer_classifications_aux(station, mic_output, date)
             
             
@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
+import vesper.django.app.archive_database as archive_database
 import vesper.util.archive_lock as archive_lock
 
 
@@ -16,3 +18,6 @@ class VesperConfig(AppConfig):
         
         # Create the one and only archive lock.
         archive_lock.create_lock()
+        
+        # Configure archive database connections as they are created.
+        connection_created.connect(archive_database.configure_connection)
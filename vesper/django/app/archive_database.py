@@ -0,0 +1,148 @@
+"""
+Module containing Vesper archive database connection setup.
+
+For SQLite archives, this module configures each new database connection
+with SQLite pragmas that improve concurrency, and routes database reads
+to a separate, read-only database connection.
+
+By default, SQLite archive databases use write-ahead logging (WAL)
+journaling. With WAL journaling, readers do not block writers and a
+writer does not block readers, so the archive lock (see the
+`vesper.util.archive_lock` module) serializes only writes. The default
+pragmas also reduce the number of disk syncs per transaction (with
+WAL journaling, `synchronous=NORMAL` is safe from corruption, though
+the most recent transactions may be rolled back after a power
+failure), enlarge the page cache, and have connections wait for the
+database to become available rather than fail immediately with
+"database is locked" errors.
+
+The pragmas can be modified with a `sqlite_pragmas` item of the
+`database` archive setting, for example:
+    
+    database:
+        engine: SQLite
+        sqlite_pragmas:
+            journal_mode: DELETE
+            synchronous: FULL
+
+Pragmas not specified in the archive settings have the default values
+of `_DEFAULT_SQLITE_PRAGMAS`.
+
+Reads that are not part of a transaction on the default database
+connection are performed by the read-only connection whose alias is
+`READER_DATABASE_ALIAS`. Such reads never write to the archive and so
+never need the archive lock. Reads that are part of a transaction on
+the default connection are performed by that connection, so that they
+see the transaction's own writes.
+"""
+
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from vesper.archive_settings import archive_settings
+
+
+READER_DATABASE_ALIAS = 'archive_reader'
+"""Alias of the read-only connection of SQLite archive databases."""
+
+
+_DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 30000,      # milliseconds
+    'cache_size': -65536,       # kibibytes when negative
+}
+"""Default pragmas for SQLite archive database connections."""
+
+_WRITER_ONLY_SQLITE_PRAGMAS = frozenset(['journal_mode'])
+"""
+Pragmas that only connections that can write to a database can set.
+
+The journal mode of a database is a persistent property of the
+database, so it is set by the first connection that can write to the
+database, and reader connections need not set it.
+"""
+
+
+def get_sqlite_pragmas():
+    
+    """
+    Gets the SQLite pragmas of this archive.
+    
+    Returns
+    -------
+    dict
+        mapping from pragma names to values.
+    """
+    
+    pragmas = dict(_DEFAULT_SQLITE_PRAGMAS)
+    
+    archive_pragmas = archive_settings.database.get('sqlite_pragmas')
+    if archive_pragmas is not None:
+        pragmas.update(archive_pragmas.__dict__)
+        
+    return pragmas
+
+
+def configure_connection(sender, connection, **kwargs):
+    
+    """
+    Configures a new archive database connection.
+    
+    This function is a handler for Django's `connection_created`
+    signal. It sets SQLite pragmas for SQLite connections, and does
+    nothing for other connections.
+    """
+    
+    if connection.vendor != 'sqlite':
+        return
+        
+    is_reader = connection.alias == READER_DATABASE_ALIAS
+    
+    cursor = connection.cursor()
+    
+    for name, value in get_sqlite_pragmas().items():
+        if not (is_reader and name in _WRITER_ONLY_SQLITE_PRAGMAS):
+            cursor.execute(f'PRAGMA {name} = {value}')
+            
+    if is_reader:
+        cursor.execute('PRAGMA query_only = ON')
+        
+    cursor.close()
+
+
+class ArchiveDatabaseRouter:
+    
+    """
+    Django database router that routes archive database reads.
+    
+    Reads that are not part of a transaction on the default database
+    connection are routed to the read-only connection whose alias is
+    `READER_DATABASE_ALIAS`, if that connection is configured. All
+    other reads and all writes are routed to the default connection.
+    """
+    
+    
+    def db_for_read(self, model, **hints):
+        
+        if READER_DATABASE_ALIAS not in settings.DATABASES or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+            
+        else:
+            return READER_DATABASE_ALIAS
+            
+            
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+        
+        
+    def allow_relation(self, obj1, obj2, **hints):
+        
+        # Both connections are to the same database.
+        return True
+        
+        
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
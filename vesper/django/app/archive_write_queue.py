@@ -0,0 +1,164 @@
+"""Module containing class `ArchiveWriteQueue`."""
+
+
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+
+from django.db import close_old_connections, transaction
+
+import vesper.util.archive_lock as archive_lock
+
+
+_DEFAULT_MAX_BATCH_SIZE = 100
+"""Default maximum number of writes performed in one transaction."""
+
+
+class ArchiveWriteQueue:
+    
+    """
+    Queue of archive database writes that coalesces concurrent writes.
+    
+    A thread that wants to write to the archive database submits a
+    write function to the queue via the `write` method. A single
+    writer thread performs the writes, obtaining the archive lock and
+    starting a database transaction once for all of the writes that
+    are waiting when it finishes a previous batch. Each write is
+    performed in its own savepoint, so that a write that fails does not
+    affect others in the same transaction.
+    
+    When many threads write to the archive concurrently (for example,
+    when several users annotate clips while a detection job is
+    running), this greatly reduces the number of times the archive lock
+    must be obtained and the number of transactions that must be
+    committed, each of which typically requires at least one disk sync.
+    """
+    
+    
+    def __init__(self, max_batch_size=_DEFAULT_MAX_BATCH_SIZE):
+        self._max_batch_size = max_batch_size
+        self._queue = Queue()
+        self._thread = None
+        self._thread_lock = Lock()
+        
+        
+    def write(self, function, *args, **kwargs):
+        
+        """
+        Performs an archive database write.
+        
+        This method submits a write to the queue and waits for it to
+        be performed.
+        
+        Parameters
+        ----------
+        function : callable
+            the function that performs the write. The function is
+            invoked in the queue's writer thread, in a database
+            transaction and with the archive lock held.
+            
+        args, kwargs
+            arguments with which to invoke the function.
+            
+        Returns
+        -------
+        object
+            the return value of the function.
+            
+        Raises
+        ------
+        Exception
+            any exception raised by the function, by the acquisition of
+            the archive lock or the start of the transaction in which
+            the function was to be invoked, or by the commit of that
+            transaction.
+        """
+        
+        self._start_thread_if_needed()
+        
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        
+        return future.result()
+        
+        
+    def _start_thread_if_needed(self):
+        
+        with self._thread_lock:
+            
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name='Archive Writer', daemon=True)
+                self._thread.start()
+                
+                
+    def _run(self):
+        
+        while True:
+            
+            writes = self._get_writes()
+            
+            # Close the writer thread's database connection if it has
+            # become unusable or outlived its maximum age while the
+            # thread was waiting for writes, as Django does for each
+            # request.
+            close_old_connections()
+            
+            try:
+                self._perform_writes(writes)
+            finally:
+                close_old_connections()
+            
+            
+    def _get_writes(self):
+        
+        # Wait for a write.
+        writes = [self._queue.get()]
+        
+        # Get any other waiting writes.
+        while len(writes) < self._max_batch_size:
+            try:
+                writes.append(self._queue.get_nowait())
+            except Empty:
+                break
+                
+        return writes
+        
+        
+    def _perform_writes(self, writes):
+        
+        results = []
+        
+        try:
+            
+            with archive_lock.atomic(), transaction.atomic():
+                
+                for future, function, args, kwargs in writes:
+                    
+                    try:
+                        with transaction.atomic():
+                            result = function(*args, **kwargs)
+                            
+                    except BaseException as e:
+                        future.set_exception(e)
+                        
+                    else:
+                        results.append((future, result))
+                        
+        except BaseException as e:
+            # archive lock acquisition, transaction start, or
+            # transaction commit failed
+            
+            # Report the failure to every writer whose write has not
+            # already failed, including writers whose writes were never
+            # attempted and writers whose writes were rolled back.
+            for future, _, _, _ in writes:
+                if not future.done():
+                    future.set_exception(e)
+                
+        else:
+            
+            # Report results only after commit, so that writers never
+            # see results of writes that are subsequently rolled back.
+            for future, result in results:
+                future.set_result(result)
@@ -4,6 +4,14 @@ import vesper.django.app.form_utils as form_utils
 import vesper.django.app.model_utils as model_utils
 
 
+# We don't get these from `vesper.util.clips_hdf5_file` since that
+# module requires `h5py`, which is an optional dependency.
+_LAYOUT_CHOICES = (
+    ('Datasets', 'One dataset per clip'),
+    ('Arrays', 'Clip arrays')
+)
+
+
 class ExportClipsToHdf5FileForm(forms.Form):
     
 
@@ -17,6 +25,10 @@ class ExportClipsToHdf5FileForm(forms.Form):
         label='Output file', max_length=255,
         widget=forms.TextInput(attrs={'class': 'command-form-wide-input'}))
     
+    layout = forms.ChoiceField(
+        label='File layout', choices=_LAYOUT_CHOICES,
+        initial='Datasets')
+    
     
     def __init__(self, *args, **kwargs):
         
@@ -20,6 +20,12 @@ class ImportMetadataForm(forms.Form):
         )
     )
 
+    dry_run = forms.BooleanField(
+        label='Dry run',
+        label_suffix='',
+        initial=False,
+        required=False)
+
 
     def clean_metadata(self):
         try:
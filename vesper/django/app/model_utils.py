@@ -426,6 +426,17 @@ def get_clips(
         creating_processor=detector,
         **kwargs)
     
+    clips = _filter_clips_by_annotation(
+        clips, annotation_name, annotation_value)
+    
+    if order:
+        clips = clips.order_by('start_time')
+        
+    return clips
+
+
+def _filter_clips_by_annotation(clips, annotation_name, annotation_value):
+    
     if annotation_name is not None:
         # whether or not clips are annotated will matter
         
@@ -457,9 +468,6 @@ def get_clips(
                 clips = clips.filter(
                     string_annotation__value__startswith=prefix)
                 
-    if order:
-        clips = clips.order_by('start_time')
-        
     return clips
 
 
@@ -471,6 +479,20 @@ def create_clip_query_values_iterator(
     # to a bad detector name, station/mic output pair, or date
     # range we do so before we start yielding query values.
     
+    detectors, sm_pairs = \
+        _get_clip_query_detectors_and_sm_pairs(
+            detector_names, sm_pair_ui_names)
+    
+    dates = list(create_date_iterator(start_date, end_date))
+    
+    for detector in detectors:
+        for station, mic_output in sm_pairs:
+            for date in dates:
+                yield (detector, station, mic_output, date)
+           
+         
+def _get_clip_query_detectors_and_sm_pairs(detector_names, sm_pair_ui_names):
+    
     archive_ = archive.instance
     
     detectors = [archive_.get_processor(name) for name in detector_names]
@@ -478,12 +500,94 @@ def create_clip_query_values_iterator(
     sm_pairs_dict = get_station_mic_output_pairs_dict()
     sm_pairs = [sm_pairs_dict[name] for name in sm_pair_ui_names]
     
-    dates = list(create_date_iterator(start_date, end_date))
+    return detectors, sm_pairs
+
+
+def get_clip_query_groups(
+        detector_names, sm_pair_ui_names, start_date, end_date,
+        annotation_name=None, annotation_value=None):
+    
+    """
+    Gets the nonempty clip groups of a clip query.
+    
+    The clip groups of a query are the (detector, station, mic output,
+    date) combinations yielded by `create_clip_query_values_iterator`
+    for the query's detectors, station/mic output pairs, and dates.
+    For large queries most groups are often empty, for example when
+    a query's date range includes many dates on which some stations
+    did not record. Rather than query every group, this function
+    finds the nonempty groups and their clip counts with a single
+    grouped query.
+    
+    Parameters
+    ----------
+    detector_names : list of str
+        the names of the query's detectors.
+        
+    sm_pair_ui_names : list of str
+        the UI names of the query's station/mic output pairs.
+        
+    start_date : date
+        the query's start date.
+        
+    end_date : date
+        the query's end date.
+        
+    annotation_name : str or None
+        the query's annotation name, as for `get_clips`.
+        
+    annotation_value : str or None
+        the query's annotation value, as for `get_clips`.
+        
+    Returns
+    -------
+    list of tuples
+        (detector, station, mic output, date, clip count) tuples, one
+        for each nonempty clip group, in the order in which
+        `create_clip_query_values_iterator` yields the groups.
+    """
+    
+    detectors, sm_pairs = \
+        _get_clip_query_detectors_and_sm_pairs(
+            detector_names, sm_pair_ui_names)
+    
+    clips = Clip.objects.filter(
+        creating_processor__in=detectors,
+        station__in=set(station for station, _ in sm_pairs),
+        mic_output__in=set(mic_output for _, mic_output in sm_pairs),
+        date__range=(start_date, end_date))
+    
+    clips = _filter_clips_by_annotation(
+        clips, annotation_name, annotation_value)
+    
+    rows = clips.values(
+        'creating_processor_id', 'station_id', 'mic_output_id', 'date'
+    ).annotate(count=Count('id')).order_by()
+    
+    # Get mapping from (detector ID, station ID, mic output ID) triples
+    # to mappings from dates to clip counts. The mapping includes clip
+    # counts for station/mic output combinations that were not queried,
+    # since we filter stations and mic outputs separately above, but
+    # we ignore those below.
+    counts = defaultdict(dict)
+    for r in rows:
+        key = (r['creating_processor_id'], r['station_id'], r['mic_output_id'])
+        counts[key][r['date']] = r['count']
+        
+    groups = []
     
     for detector in detectors:
         for station, mic_output in sm_pairs:
-            for date in dates:
-                yield (detector, station, mic_output, date)
+            
+            date_counts = counts.get((detector.id, station.id, mic_output.id))
+            
+            if date_counts is not None:
+                for date in sorted(date_counts.keys()):
+                    groups.append(
+                        (detector, station, mic_output, date,
+                         date_counts[date]))
+                    
+    return groups
            
          
 _ONE_DAY = datetime.timedelta(days=1)
@@ -561,6 +665,170 @@ def annotate_clip(
             **kwargs)
     
     
+_BULK_QUERY_SIZE = 500
+"""
+Maximum number of clips per bulk annotation query.
+
+We limit the number of clip IDs per query since SQLite limits the
+number of variables in a query.
+"""
+
+
+def get_clip_annotation_values(clips, annotation_info):
+    
+    """
+    Gets the values of one annotation for a sequence of clips.
+    
+    Returns
+    -------
+    dict
+        a mapping from the IDs of the clips that have the annotation
+        to their annotation values.
+    """
+    
+    clip_ids = [clip.id for clip in clips]
+    
+    values = {}
+    
+    for ids in _get_chunks(clip_ids, _BULK_QUERY_SIZE):
+        values.update(StringAnnotation.objects.filter(
+            clip_id__in=ids,
+            info=annotation_info
+        ).values_list('clip_id', 'value'))
+        
+    return values
+
+
+def _get_chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+@archive_lock.atomic
+@transaction.atomic
+def annotate_clips(
+        clip_values, annotation_info, creation_time=None, creating_user=None,
+        creating_job=None, creating_processor=None):
+    
+    """
+    Annotates clips in bulk.
+    
+    This function has the same effect as calling `annotate_clip` for
+    each of the specified clips, but performs a few database queries
+    for every `_BULK_QUERY_SIZE` clips rather than several queries
+    per clip.
+    
+    Parameters
+    ----------
+    clip_values : iterable of (clip, value) pairs
+        the clips to annotate and their annotation values.
+        
+    The remaining parameters are as for `annotate_clip`.
+    """
+    
+    # Get mapping from clip IDs to annotation values.
+    values = dict((clip.id, value) for clip, value in clip_values)
+    
+    if creation_time is None:
+        creation_time = time_utils.get_utc_now()
+    
+    kwargs = {
+        'creation_time': creation_time,
+        'creating_user': creating_user,
+        'creating_job': creating_job,
+        'creating_processor': creating_processor
+    }
+    
+    for clip_ids in _get_chunks(list(values.keys()), _BULK_QUERY_SIZE):
+        _annotate_clips(clip_ids, values, annotation_info, kwargs)
+        
+        
+def _annotate_clips(clip_ids, values, annotation_info, kwargs):
+    
+    old_values = dict(StringAnnotation.objects.filter(
+        clip_id__in=clip_ids,
+        info=annotation_info
+    ).values_list('clip_id', 'value'))
+    
+    new_annotations = []
+    changed_clip_ids = defaultdict(list)
+    edits = []
+    
+    for clip_id in clip_ids:
+        
+        value = values[clip_id]
+        old_value = old_values.get(clip_id)
+        
+        if old_value is None:
+            # annotation does not exist
+            
+            new_annotations.append(StringAnnotation(
+                clip_id=clip_id, info=annotation_info, value=value,
+                **kwargs))
+            
+        elif old_value != value:
+            # annotation exists but value differs from specified value
+            
+            changed_clip_ids[value].append(clip_id)
+            
+        else:
+            # annotation exists and has specified value
+            
+            continue
+        
+        edits.append(StringAnnotationEdit(
+            clip_id=clip_id, info=annotation_info,
+            action=StringAnnotationEdit.ACTION_SET, value=value, **kwargs))
+        
+    StringAnnotation.objects.bulk_create(new_annotations)
+    
+    for value, ids in changed_clip_ids.items():
+        StringAnnotation.objects.filter(
+            clip_id__in=ids,
+            info=annotation_info
+        ).update(value=value, **kwargs)
+        
+    StringAnnotationEdit.objects.bulk_create(edits)
+    
+    
+@archive_lock.atomic
+@transaction.atomic
+def delete_clips(clip_ids):
+    
+    """
+    Deletes clips in bulk.
+    
+    This function deletes the specified clips, along with the
+    annotations, tags, and annotation and tag edits that refer to
+    them, with one `DELETE` statement per table for every
+    `_BULK_QUERY_SIZE` clips. `QuerySet.delete`, in contrast, loads
+    the clips into memory before deleting them. This function does
+    not delete clip audio files.
+    
+    Parameters
+    ----------
+    clip_ids : iterable of int
+        the IDs of the clips to delete.
+    """
+    
+    db = Clip.objects.db
+    
+    for ids in _get_chunks(list(clip_ids), _BULK_QUERY_SIZE):
+        
+        # Delete rows that refer to the clips. All such rows are of
+        # models that have no dependents of their own, so Django
+        # deletes them with a single query per model.
+        for relation in Clip._meta.related_objects:
+            field_name = relation.field.attname
+            relation.related_model.objects.filter(
+                **{field_name + '__in': ids}).delete()
+            
+        # Delete the clips themselves. Since there are no longer any
+        # rows that refer to them, we bypass Django's collection of
+        # related objects.
+        Clip.objects.filter(id__in=ids)._raw_delete(db)
+        
+        
 @archive_lock.atomic
 @transaction.atomic
 def delete_clip_annotation(
@@ -592,6 +860,59 @@ def delete_clip_annotation(
             creating_processor=creating_processor)
 
 
+@archive_lock.atomic
+@transaction.atomic
+def delete_clip_annotations(
+        clips, annotation_info, creation_time=None, creating_user=None,
+        creating_job=None, creating_processor=None):
+    
+    """
+    Deletes an annotation of clips in bulk.
+    
+    This function has the same effect as calling `delete_clip_annotation`
+    for each of the specified clips, but performs a few database queries
+    for every `_BULK_QUERY_SIZE` clips rather than several queries
+    per clip.
+    
+    Parameters
+    ----------
+    clips : iterable of clips
+        the clips whose annotations to delete.
+        
+    The remaining parameters are as for `delete_clip_annotation`.
+    """
+    
+    # Get clip IDs without duplicates, in clip order.
+    clip_ids = list(dict.fromkeys(clip.id for clip in clips))
+    
+    if creation_time is None:
+        creation_time = time_utils.get_utc_now()
+        
+    kwargs = {
+        'creation_time': creation_time,
+        'creating_user': creating_user,
+        'creating_job': creating_job,
+        'creating_processor': creating_processor
+    }
+    
+    for ids in _get_chunks(clip_ids, _BULK_QUERY_SIZE):
+        
+        annotations = StringAnnotation.objects.filter(
+            clip_id__in=ids,
+            info=annotation_info)
+        
+        annotated_ids = frozenset(
+            annotations.values_list('clip_id', flat=True))
+        
+        annotations.delete()
+        
+        StringAnnotationEdit.objects.bulk_create([
+            StringAnnotationEdit(
+                clip_id=clip_id, info=annotation_info,
+                action=StringAnnotationEdit.ACTION_DELETE, **kwargs)
+            for clip_id in ids if clip_id in annotated_ids])
+
+
 def get_clip_type(clip):
     
     processor = clip.creating_processor
@@ -13,6 +13,7 @@ from django.db.models import (
 import pytz
 
 from vesper.archive_paths import archive_paths
+import vesper.util.job_metrics as job_metrics
 import vesper.util.os_utils as os_utils
 import vesper.util.time_utils as time_utils
 import vesper.util.signal_utils as signal_utils
@@ -507,6 +508,21 @@ class Job(Model):
         else:
             return os_utils.read_file(self.log_file_path)            
         
+    @property
+    def metrics_file_path(self):
+        file_name = 'Job {} Metrics.json'.format(self.id)
+        return str(archive_paths.job_log_dir_path / file_name)
+    
+    @property
+    def metrics(self):
+        
+        """
+        The performance metrics of this job, or `None` if the job has
+        none. See the `vesper.util.job_metrics` module for details.
+        """
+        
+        return job_metrics.read_metrics(self.metrics_file_path)
+        
 
 # We use separate `station` and `recorder` fields rather than one
 # `station_recorder` field (which would contain a `StationDevice`
@@ -519,9 +519,17 @@ export class ClipAlbum {
             
             const rugPlotDiv = document.getElementById('rug-plot');
             
+            // Get clip query parameters with which rug plot can get
+            // clip densities from server.
+            const albumParams = new URL(window.location.href).searchParams;
+            const clipQueryParams = {};
+            for (const name of
+                    ['station_mic', 'detector', 'classification', 'date'])
+                clipQueryParams[name] = albumParams.get(name);
+            
             return new NightRugPlot(
                 this, rugPlotDiv, this.clips, state.recordings,
-                state.solarEventTimes);
+                state.solarEventTimes, clipQueryParams);
                 
         } else {
             
@@ -50,6 +50,26 @@ const _MAX_CLIP_SAMPLES_BATCH_SIZE = 200;
 // album page in batches of this size, except possibly for the last batch.
 const _MAX_CLIP_ANNOTATIONS_BATCH_SIZE = 200;
 
+// Maximum clip images batch size, in clips. When batch loads are enabled,
+// the clip loader loads server-rendered images of the clips of a clip
+// album page in batches of this size, except possibly for the last batch.
+// The server renders the images of a batch before responding, so we use
+// smaller batches than for samples and annotations to get the first
+// images on the page sooner.
+const _MAX_CLIP_IMAGES_BATCH_SIZE = 50;
+
+// Size in bytes of the image size that precedes each image of a batch
+// clip images response. See `_ClipLoader._readClipBatchImages`.
+const _CLIP_IMAGE_SIZE_SIZE = 4;
+
+// Size in bytes of the header of a clip samples frame of a batch clip
+// samples response. See `_ClipLoader._readClipBatchSamples`.
+const _CLIP_SAMPLES_HEADER_SIZE = 16;
+
+// Clip length of a clip samples frame for a clip whose samples the
+// server could not read. A frame with this length has no samples.
+const _CLIP_SAMPLES_ERROR_LENGTH = 2 ** 32 - 1;
+
 // Set this `true` to randomly simulate load errors for both clip batches
 // and individual clips.
 //
@@ -519,6 +539,11 @@ class _ClipLoader {
         // in a `Map` from sample rates to contexts.
         this._audioContexts = new Map();
 
+        // Whether or not a batch clip images load has failed. After one
+        // has, we stop requesting images from the server and clip views
+        // compute their images from clip samples instead.
+        this._clipImageLoadsFailed = false;
+
     }
 
 
@@ -533,6 +558,7 @@ class _ClipLoader {
             // load clips in batches
 
             return Promise.all([
+                this._batchLoadClipImages(clips, start, end),
                 this._batchLoadClipSamples(clips, start, end),
                 this._batchLoadClipAnnotations(clips, start, end)
             ]);
@@ -600,9 +626,8 @@ class _ClipLoader {
 
             try {
 
-                const result = await this._fetchClipBatchAudios(clips);
-                const arrayBuffer = await result.arrayBuffer();
-                return this._decodeClipBatchAudios(clips, arrayBuffer);
+                const response = await this._fetchClipBatchSamples(clips);
+                await this._readClipBatchSamples(clips, response);
 
             } catch (error) {
 
@@ -647,13 +672,13 @@ class _ClipLoader {
     }
 
 
-    async _fetchClipBatchAudios(clips) {
+    async _fetchClipBatchSamples(clips) {
 
         const clipIds = clips.map(clip => clip.id);
 
-        return fetch('/batch/read/clip-audios/', {
+        const response = await fetch('/batch/read/clip-samples/', {
             headers: {
-                'Accept': 'application/json',
+                'Accept': 'application/octet-stream',
                 'Content-Type': 'application/json'
             },
             method: 'POST',
@@ -662,50 +687,123 @@ class _ClipLoader {
             })
         });
 
+        if (!response.ok)
+            throw new Error(
+                `Server responded with status ${response.status}.`);
+
+        return response;
+
     }
 
 
-    async _decodeClipBatchAudios(clips, arrayBuffer) {
+    async _readClipBatchSamples(clips, response) {
 
+        // The response body is a stream of clip samples frames, one
+        // per clip, in clip order. Each frame comprises a 16-byte
+        // little-endian header containing the clip's ID (a 32-bit
+        // unsigned integer), sample rate (a 64-bit float), and length
+        // (a 32-bit unsigned integer), followed by the clip's samples
+        // as 16-bit little-endian integers. We set the samples of each
+        // clip as soon as its frame arrives, so that clip views can
+        // start drawing before the whole batch has been received.
 
-        // Get array of clip audios from buffer. Audios are stored one
-        // after the other, with each prefixed with its size in bytes
-        // in a 32-bit little-endian integer.
+        const clipsById = new Map(clips.map(clip => [clip.id, clip]));
 
-        const audios = [];
-        const dataView = new DataView(arrayBuffer);
-        let offset = 0;
+        const reader = response.body.getReader();
 
-        while (offset < arrayBuffer.byteLength) {
+        // Bytes received but not yet parsed.
+        let pending = new Uint8Array(0);
 
-            // Get audio size, a 32-bit little-endian integer.
-            const size = dataView.getUint32(offset, true);
-            offset += 4;
-
-            // Get audio.
-            //
-            // Note that the ArrayBuffer.prototype.slice method
-            // copies a specified portion of an existing ArrayBuffer
-            // into a new ArrayBuffer. There does not appear to be
-            // a way to create a new ArrayBuffer that is just a view
-            // of a portion of an existing ArrayBuffer, i.e. without
-            // copying the contents of the new ArrayBuffer.
-            const audio = arrayBuffer.slice(offset, offset + size);
-            offset += size;
+        while (true) {
 
-            audios.push(audio);
+            const {done, value} = await reader.read();
 
-        }
+            if (done)
+                break;
+
+            pending = _concatenateBytes(pending, value);
+
+            let offset = 0;
+
+            while (pending.length - offset >= _CLIP_SAMPLES_HEADER_SIZE) {
+
+                const dataView = new DataView(
+                    pending.buffer, pending.byteOffset + offset,
+                    _CLIP_SAMPLES_HEADER_SIZE);
+
+                const clipId = dataView.getUint32(0, true);
+                const sampleRate = dataView.getFloat64(4, true);
+                const length = dataView.getUint32(12, true);
+
+                const clip = clipsById.get(clipId);
+
+                if (length === _CLIP_SAMPLES_ERROR_LENGTH) {
+                    // server could not read clip samples
+
+                    offset += _CLIP_SAMPLES_HEADER_SIZE;
+
+                    if (clip !== undefined)
+                        this._onClipSamplesLoadError(
+                            clip, 'Server could not read clip samples.');
 
+                    continue;
+
+                }
+
+                const frameSize = _CLIP_SAMPLES_HEADER_SIZE + 2 * length;
+
+                if (pending.length - offset < frameSize)
+                    // frame incomplete
+
+                    break;
+
+                if (clip !== undefined) {
+
+                    const sampleBytes = pending.slice(
+                        offset + _CLIP_SAMPLES_HEADER_SIZE,
+                        offset + frameSize);
+
+                    this._setClipSamplesFromBytes(
+                        clip, sampleRate, length, sampleBytes);
+
+                }
+
+                offset += frameSize;
+
+            }
+
+            pending = pending.slice(offset);
 
-        // Get promises for individual clip audio decodes.
-        const promises = [];
-        for (let i = 0; i < audios.length; i++) {
-            const promise = this._decodeClipAudio(clips[i], audios[i]);
-            promises.push(promise);
         }
 
-        return Promise.all(promises);
+        if (pending.length !== 0)
+            throw new Error('Clip samples response ended mid-frame.');
+
+    }
+
+
+    _setClipSamplesFromBytes(clip, sampleRate, length, bytes) {
+
+        try {
+
+            if (length === 0)
+                throw new Error('Clip has no samples.');
+
+            const context = this._getAudioContext(sampleRate);
+            const audioBuffer = context.createBuffer(1, length, sampleRate);
+            const samples = audioBuffer.getChannelData(0);
+
+            const dataView = new DataView(bytes.buffer, bytes.byteOffset);
+            for (let i = 0; i < length; i++)
+                samples[i] = dataView.getInt16(2 * i, true) / 32768;
+
+            this._setClipSamples(clip, audioBuffer);
+
+        } catch (error) {
+
+            this._onClipSamplesLoadError(clip, error);
+
+        }
 
     }
 
@@ -817,8 +915,16 @@ class _ClipLoader {
 
 
     _onClipBatchSamplesLoadError(clips, error) {
+
         this._handleError('Load of clip batch samples failed.', error);
+
+        // Unload only clips that were still loading when the error
+        // occurred, since the samples of a batch are set clip by clip
+        // as they arrive.
+        clips = clips.filter(
+            clip => clip.samplesStatus === CLIP_LOAD_STATUS.LOADING);
         this._setClipBatchSamplesStatuses(clips, CLIP_LOAD_STATUS.UNLOADED);
+
     }
 
 
@@ -953,6 +1059,211 @@ class _ClipLoader {
     }
 
 
+    async _batchLoadClipImages(clips, start, end) {
+
+        if (this._clipImageLoadsFailed)
+            return;
+
+        const batches = this._getClipBatches(
+            clips, start, end, _MAX_CLIP_IMAGES_BATCH_SIZE);
+
+        return Promise.all(
+            batches.map(b => this._loadClipBatchImages(b)));
+
+    }
+
+
+    async _loadClipBatchImages(clips) {
+
+        // Work only with clips whose views display server-rendered
+        // images and for which images are unloaded.
+        clips = clips.filter(
+            clip => clip.view.imageSettings !== null &&
+                clip.imageStatus === CLIP_LOAD_STATUS.UNLOADED);
+
+        if (clips.length > 0) {
+            // some clips need loading
+
+            // Update clip load statuses.
+            this._setClipBatchImagesStatuses(clips, CLIP_LOAD_STATUS.LOADING);
+
+            try {
+
+                const response = await this._fetchClipBatchImages(clips);
+                const images =
+                    await this._readClipBatchImages(clips, response);
+                this._setClipBatchImages(clips, images);
+
+            } catch (error) {
+
+                this._onClipBatchImagesLoadError(clips, error);
+
+            }
+
+        }
+
+    }
+
+
+    _setClipBatchImagesStatuses(clips, status) {
+        for (const clip of clips)
+            this._setClipImageStatus(clip, status);
+    }
+
+
+    _setClipImageStatus(clip, status) {
+
+        if (status !== clip.imageStatus) {
+            // status will change
+
+            clip.imageStatus = status;
+
+            if (status === CLIP_LOAD_STATUS.LOADED) {
+
+                clip.view.onClipImageChanged();
+
+            } else if (status === CLIP_LOAD_STATUS.UNLOADED) {
+
+                // Release image so we won't prevent garbage collection.
+                if (clip.image !== null) {
+                    clip.image.close();
+                    clip.image = null;
+                }
+
+                clip.view.onClipImageChanged();
+
+            }
+
+        }
+
+    }
+
+
+    async _fetchClipBatchImages(clips) {
+
+        const clipIds = clips.map(clip => clip.id);
+
+        // All of the clips of an album have the same view settings.
+        const settings = clips[0].view.imageSettings;
+
+        const response = await fetch('/batch/read/clip-spectrograms/', {
+            headers: {
+                'Accept': 'application/octet-stream',
+                'Content-Type': 'application/json'
+            },
+            method: 'POST',
+            body: JSON.stringify({
+                'clip_ids': clipIds,
+                'settings': settings
+            })
+        });
+
+        if (!response.ok)
+            throw new Error(
+                `Server responded with status ${response.status}.`);
+
+        return response;
+
+    }
+
+
+    async _readClipBatchImages(clips, response) {
+
+        // The response body comprises one image per clip, in clip
+        // order. Each image is preceded by its size in bytes, a 32-bit
+        // little-endian unsigned integer. An image is a PNG file,
+        // or empty if the server could not render an image for the
+        // clip, for example because the clip is too short.
+
+        const bytes = new Uint8Array(await response.arrayBuffer());
+        const dataView = new DataView(bytes.buffer);
+
+        const images = [];
+        let offset = 0;
+
+        while (offset < bytes.length) {
+
+            if (bytes.length - offset < _CLIP_IMAGE_SIZE_SIZE)
+                throw new Error('Clip images response ended mid-size.');
+
+            const size = dataView.getUint32(offset, true);
+            offset += _CLIP_IMAGE_SIZE_SIZE;
+
+            if (bytes.length - offset < size)
+                throw new Error('Clip images response ended mid-image.');
+
+            if (size === 0)
+                images.push(null);
+
+            else {
+                const blob = new Blob(
+                    [bytes.subarray(offset, offset + size)],
+                    {type: 'image/png'});
+                images.push(await createImageBitmap(blob));
+            }
+
+            offset += size;
+
+        }
+
+        if (images.length !== clips.length)
+            throw new Error(
+                `Server sent ${images.length} clip images instead ` +
+                `of ${clips.length}.`);
+
+        return images;
+
+    }
+
+
+    _setClipBatchImages(clips, images) {
+        for (const [i, clip] of clips.entries())
+            this._setClipImage(clip, images[i]);
+    }
+
+
+    _setClipImage(clip, image) {
+
+        // An image load operation can be canceled while in progress
+        // by changing `clip.imageStatus` from `CLIP_LOAD_STATUS.LOADING`
+        // to `CLIP_LOAD_STATUS_UNLOADED`. In this case we ignore the
+        // results of the operation.
+
+        if (clip.imageStatus === CLIP_LOAD_STATUS.LOADING) {
+
+            // An image of `null` tells the clip view that the server
+            // could not render an image, so that it will compute one
+            // from the clip's samples.
+            clip.image = image;
+
+            this._setClipImageStatus(clip, CLIP_LOAD_STATUS.LOADED);
+
+        } else if (image !== null) {
+
+            image.close();
+
+        }
+
+    }
+
+
+    _onClipBatchImagesLoadError(clips, error) {
+
+        this._handleError(
+            'Batch load of clip images failed. Clip images will be ' +
+            'computed from clip samples instead.', error);
+
+        this._clipImageLoadsFailed = true;
+
+        // Unloading the images of the clips that are still loading
+        // causes their views to compute images from clip samples.
+        clips = clips.filter(
+            clip => clip.imageStatus === CLIP_LOAD_STATUS.LOADING);
+        this._setClipBatchImagesStatuses(clips, CLIP_LOAD_STATUS.UNLOADED);
+
+    }
+
+
     async _loadClipSamples(clips, start, end) {
 
         clips = clips.slice(start, end);
@@ -1052,7 +1363,21 @@ class _ClipLoader {
         const status = CLIP_LOAD_STATUS.UNLOADED
         this._setClipBatchSamplesStatuses(clips, status);
         this._setClipBatchAnnotationsStatuses(clips, status);
+        this._setClipBatchImagesStatuses(clips, status);
     }
 
 
 }
+
+
+function _concatenateBytes(a, b) {
+
+    if (a.length === 0)
+        return b;
+
+    const result = new Uint8Array(a.length + b.length);
+    result.set(a);
+    result.set(b, a.length);
+    return result;
+
+}
@@ -482,6 +482,29 @@ export class ClipView {
     }
 
 
+    /**
+     * Gets the settings with which the server should render the image
+     * of the clip of this view, or `null` if the view does not display
+     * a server-rendered image.
+     */
+    get imageSettings() {
+        return null;
+    }
+
+
+    /**
+     * Responds to a change in the server-rendered image of the clip
+     * of this view.
+     *
+     * This method is called whenever the image of a clip view's clip
+     * changes, including when it is loaded from the server, when its
+     * load fails, and when it is unloaded. It is called only for views
+     * whose `imageSettings` are not `null`.
+     */
+    onClipImageChanged() {
+    }
+
+
     onClipAnnotationsChanged() {
         this._resizeOverlayCanvasIfNeeded();
         this._renderOverlays();
@@ -24,6 +24,9 @@ export class Clip {
 		this._annotations = null;
 		this._annotationsStatus = CLIP_LOAD_STATUS.UNLOADED;
 
+		this._image = null;
+		this._imageStatus = CLIP_LOAD_STATUS.UNLOADED;
+
 	}
 
 
@@ -110,6 +113,28 @@ export class Clip {
 	}
 
 
+	// Clip image rendered by the server, for example a spectrogram,
+	// or `null` if the clip has no such image.
+	get image() {
+		return this._image;
+	}
+
+
+	set image(image) {
+		this._image = image;
+	}
+
+
+	get imageStatus() {
+		return this._imageStatus;
+	}
+
+
+	set imageStatus(status) {
+		this._imageStatus = status;
+	}
+
+
 	get url() {
 		return `/clips/${this.id}/`;
 	}
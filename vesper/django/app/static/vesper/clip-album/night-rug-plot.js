@@ -41,7 +41,13 @@ const _UNDERLAY_SPEC = [
 export class NightRugPlot {
 
 
-	constructor(parent, div, clips, recordings, solarEventTimes) {
+	// `clipQueryParams` are the `station_mic`, `detector`,
+	// `classification`, and `date` URL query parameters of the plot's
+	// clips, with which the plot gets clip densities from the server,
+	// or `null` to compute clip densities from `clips`.
+	constructor(
+			parent, div, clips, recordings, solarEventTimes,
+			clipQueryParams = null) {
 
 		this._parent = parent;
 		this._div = div;
@@ -49,6 +55,7 @@ export class NightRugPlot {
 		this._recordings = recordings;
 		this._solarEventTimeStrings = solarEventTimes;
 		// this._solarEventTimeStrings = null;    // for testing
+		this._clipQueryParams = clipQueryParams;
 
 		this._rugCanvas = this._createRugCanvas();
 		this._axisCanvas = this._createAxisCanvas();
@@ -68,6 +75,15 @@ export class NightRugPlot {
 		this._pageClipNumRange = null;
 		this._mousePageClipNumRange = null;
 
+		// Clip density rug from server, an array of per-client-pixel
+		// clip counts, or `null` if we do not have a rug for the
+		// current client width. We do not request rugs from the server
+		// after a request fails, computing clip densities ourselves
+		// instead.
+		this._clipDensities = null;
+		this._clipDensitiesWidth = null;
+		this._clipDensitiesFailed = clipQueryParams === null;
+
 		this._updateIfNeeded();
 
 	}
@@ -142,15 +158,75 @@ export class NightRugPlot {
 		if (clientWidth != this._lastClientWidth) {
 
 			this._resizeCanvases(clientWidth);
+		    this._lastClientWidth = clientWidth
+
+		    if (!this._clipDensitiesFailed && clientWidth > 0)
+		        this._loadClipDensities(clientWidth);
+
 		    this._draw();
 
-		    this._lastClientWidth = clientWidth
+		}
+
+	}
+
+
+	async _loadClipDensities(clientWidth) {
+
+		this._clipDensities = null;
+		this._clipDensitiesWidth = clientWidth;
+
+		try {
+
+			const densities = await this._fetchClipDensities(clientWidth);
+
+			if (clientWidth === this._clipDensitiesWidth) {
+				// plot was not resized while request was in progress
+
+				this._clipDensities = densities;
+				this._draw();
+
+			}
+
+		} catch (error) {
+
+			console.log(
+				`Load of night clip densities failed with message: ` +
+				`${error.message}. Will compute densities in browser.`);
+
+			this._clipDensitiesFailed = true;
+			this._clipDensitiesWidth = null;
+			this._draw();
 
 		}
 
 	}
 
 
+	async _fetchClipDensities(clientWidth) {
+
+		const params = new URLSearchParams(this._clipQueryParams);
+		params.set('start_hour', this._startTime.toString());
+		params.set('end_hour', this._endTime.toString());
+		params.set('width', clientWidth.toString());
+
+		const response = await fetch(`/night/clip-density/?${params}`);
+
+		if (!response.ok)
+			throw new Error(
+				`Server responded with status ${response.status}.`);
+
+		const densities = new Uint8Array(await response.arrayBuffer());
+
+		if (densities.length !== clientWidth)
+			throw new Error(
+				`Server sent ${densities.length} clip densities instead ` +
+				`of ${clientWidth}.`);
+
+		return densities;
+
+	}
+
+
 	_resizeCanvases(clientWidth) {
 
 		// We maintain each canvas at twice its client size to
@@ -282,6 +358,11 @@ export class NightRugPlot {
 
 		const xs = this._getLineXs(startClipNum, endClipNum);
 
+		if (xs === null)
+			// waiting for clip densities from server
+
+			return;
+
 		for (const x of xs) {
 			context.moveTo(x, y0);
 			context.lineTo(x, y1);
@@ -297,6 +378,13 @@ export class NightRugPlot {
 	 */
 	_getLineXs(startClipNum, endClipNum) {
 
+		if (startClipNum === 0 && endClipNum === this._clipTimes.length &&
+		        !this._clipDensitiesFailed)
+			// lines are for all clips, and we get their densities
+			// from server
+
+			return this._getClipDensityLineXs();
+
 		const xs = new Set();
 
 		for (let i = startClipNum; i < endClipNum; i++) {
@@ -392,6 +480,33 @@ export class NightRugPlot {
 	}
 
 
+	/*
+	 * Gets x coordinates of clip lines from server clip densities.
+	 *
+	 * Returns `null` if we do not yet have densities for the current
+	 * client width. Each density is for one client pixel, i.e. for
+	 * `_RES_FACTOR` canvas pixels, and we draw the line for a pixel
+	 * at the odd canvas coordinate in it, as for `_timeToLineX`.
+	 */
+	_getClipDensityLineXs() {
+
+		const densities = this._clipDensities;
+
+		if (densities === null ||
+				this._clipDensitiesWidth !== this._lastClientWidth)
+			return null;
+
+		const xs = new Set();
+
+		for (let i = 0; i < densities.length; i++)
+			if (densities[i] !== 0)
+				xs.add(_RES_FACTOR * i + 1);
+
+		return xs;
+
+	}
+
+
 	_timeToLineX(time) {
 		const x = _getNearestOddInt(this._timeToX(time))
 		return (x < 0 || x >= this._canvasWidth) ? null : x;
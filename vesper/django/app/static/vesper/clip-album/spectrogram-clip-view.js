@@ -1,3 +1,4 @@
+import { CLIP_LOAD_STATUS } from '/static/vesper/clip-album/clip.js';
 import { ClipView }
     from '/static/vesper/clip-album/clip-view.js';
 import { CallsCleanupOverlay }
@@ -91,6 +92,15 @@ export class SpectrogramClipView extends ClipView {
 	}
 
 
+    get imageSettings() {
+        const settings = this.settings.spectrogram;
+        return {
+            'computation': settings.computation,
+            'display': settings.display
+        };
+    }
+
+
     onClipSamplesChanged() {
 
         const clip = this.clip;
@@ -98,35 +108,12 @@ export class SpectrogramClipView extends ClipView {
         if (clip.samples !== null) {
             // have clip samples
 
-//            console.log(
-//                `computing and drawing spectrogram for clip ${clip.num}...`);
-
-            const settings = {};
-            settings.high = this.settings.spectrogram.computation;
-			settings.low = _getLowLevelSpectrogramSettings(
-				settings.high, clip.sampleRate);
-			settings.display = this.settings.spectrogram.display;
-
-			// Compute spectrogram, offscreen spectrogram canvas, and
-			// spectrogram image data and put image data to canvas. The
-			// spectrogram canvas and the spectrogram image data have the
-			// same size as the spectrogram.
-			this._spectrogram = _computeSpectrogram(clip.samples, settings);
-            // _showSpectrogramStats(this._spectrogram, settings);
-            // this._spectrogram =
-            //     _normalizeSpectrogramBackground(this._spectrogram, settings);
-			this._spectrogramCanvas =
-				_createSpectrogramCanvas(this._spectrogram, settings);
-			this._spectrogramImageData =
-				_createSpectrogramImageData(this._spectrogramCanvas);
-			_computeSpectrogramImage(
-				this._spectrogram, this._spectrogramCanvas,
-				this._spectrogramImageData, settings);
-
-			// Draw spectrogram image.
-			const canvas = this.canvas;
-			_drawSpectrogramImage(
-				clip, this._spectrogramCanvas, canvas, settings);
+            // We compute the spectrogram from the clip samples only
+            // if the server has not rendered it for us and is not
+            // in the process of doing so.
+            if (clip.image === null &&
+                    clip.imageStatus !== CLIP_LOAD_STATUS.LOADING)
+                this._computeAndDrawSpectrogram();
 
         } else {
             // do not have clip samples
@@ -143,6 +130,71 @@ export class SpectrogramClipView extends ClipView {
     }
 
 
+    onClipImageChanged() {
+
+        const clip = this.clip;
+
+        if (clip.image !== null) {
+            // have spectrogram image rendered by server
+
+            const settings = this._getSpectrogramSettings();
+            _drawSpectrogramImage(clip, clip.image, this.canvas, settings);
+
+        } else if (clip.samples !== null &&
+                clip.imageStatus !== CLIP_LOAD_STATUS.LOADING) {
+            // server did not render spectrogram image, but we have
+            // clip samples
+
+            this._computeAndDrawSpectrogram();
+
+        }
+
+    }
+
+
+    _getSpectrogramSettings() {
+        const settings = {};
+        settings.high = this.settings.spectrogram.computation;
+        settings.low = _getLowLevelSpectrogramSettings(
+            settings.high, this.clip.sampleRate);
+        settings.display = this.settings.spectrogram.display;
+        return settings;
+    }
+
+
+    _computeAndDrawSpectrogram() {
+
+        const clip = this.clip;
+
+//        console.log(
+//            `computing and drawing spectrogram for clip ${clip.num}...`);
+
+        const settings = this._getSpectrogramSettings();
+
+		// Compute spectrogram, offscreen spectrogram canvas, and
+		// spectrogram image data and put image data to canvas. The
+		// spectrogram canvas and the spectrogram image data have the
+		// same size as the spectrogram.
+		this._spectrogram = _computeSpectrogram(clip.samples, settings);
+        // _showSpectrogramStats(this._spectrogram, settings);
+        // this._spectrogram =
+        //     _normalizeSpectrogramBackground(this._spectrogram, settings);
+		this._spectrogramCanvas =
+			_createSpectrogramCanvas(this._spectrogram, settings);
+		this._spectrogramImageData =
+			_createSpectrogramImageData(this._spectrogramCanvas);
+		_computeSpectrogramImage(
+			this._spectrogram, this._spectrogramCanvas,
+			this._spectrogramImageData, settings);
+
+		// Draw spectrogram image.
+		const canvas = this.canvas;
+		_drawSpectrogramImage(
+			clip, this._spectrogramCanvas, canvas, settings);
+
+    }
+
+
     _render() {
 
         // TODO: Don't we need to re-render in case canvas size has changed?
@@ -0,0 +1,287 @@
+"""
+Utility functions for tests that populate a Vesper archive database.
+
+The functions of this module are for Django tests (see the
+`django_test_*` modules), which run with a temporary test database.
+"""
+
+
+import datetime
+
+from vesper.command.metadata_importer import MetadataImporter
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, DeviceOutput, Job, Processor, Recording,
+    RecordingChannel, RecordingFile, Station)
+from vesper.singletons import archive
+from vesper.util.bunch import Bunch
+import vesper.django.app.model_utils as model_utils
+import vesper.util.time_utils as time_utils
+import vesper.util.yaml_utils as yaml_utils
+
+
+METADATA_YAML = '''
+
+stations:
+    
+    - name: Station 0
+      time_zone: US/Eastern
+      latitude: 42.5
+      longitude: -76.5
+      elevation: 100
+      
+    - name: Station 1
+      time_zone: US/Mountain
+      latitude: 46.7
+      longitude: -114
+      elevation: 1000
+
+device_models:
+    
+    - name: Recorder
+      type: Audio Recorder
+      manufacturer: Vesper
+      model: Recorder
+      num_inputs: 2
+      
+    - name: Mic
+      type: Microphone
+      manufacturer: Vesper
+      model: Mic
+      num_outputs: 1
+
+devices:
+    
+    - name: Recorder 0
+      model: Recorder
+      serial_number: 0
+      
+    - name: Recorder 1
+      model: Recorder
+      serial_number: 1
+      
+    - name: Mic 0
+      model: Mic
+      serial_number: 0
+      
+    - name: Mic 1
+      model: Mic
+      serial_number: 1
+      
+    - name: Mic 2
+      model: Mic
+      serial_number: 2
+
+station_devices:
+    
+    - station: Station 0
+      start_time: 2020-01-01
+      end_time: 2021-01-01
+      devices: [Recorder 0, Mic 0, Mic 1]
+      connections:
+          - output: Mic 0 Output
+            input: Recorder 0 Input 0
+          - output: Mic 1 Output
+            input: Recorder 0 Input 1
+            
+    - station: Station 1
+      start_time: 2020-01-01
+      end_time: 2021-01-01
+      devices: [Recorder 1, Mic 2]
+      connections:
+          - output: Mic Output
+            input: Recorder Input 0
+
+detectors:
+    - name: Detector 0
+    - name: Detector 1
+
+annotations:
+    - name: Classification
+      type: String
+
+'''
+"""
+Metadata YAML for a small test archive.
+
+The archive has two stations. Station 0 has one two-channel recorder
+and two microphones, and Station 1 has one recorder and one microphone.
+The archive also has two detectors and a "Classification" annotation.
+"""
+
+
+def create_job():
+    return Job.objects.create(
+        command='{}', status='Running',
+        creation_time=time_utils.get_utc_now())
+
+
+def import_metadata(metadata_yaml=METADATA_YAML):
+    
+    """
+    Imports archive metadata with the metadata importer.
+    
+    Parameters
+    ----------
+    metadata_yaml : str
+        the metadata to import, in the format of a metadata YAML file.
+    """
+    
+    metadata = yaml_utils.load(metadata_yaml)
+    job = create_job()
+    importer = MetadataImporter({'metadata': metadata})
+    importer.execute(Bunch(job_id=job.id))
+    
+    # Archive caches processors, so we must refresh its cache after
+    # adding processors.
+    archive.instance.refresh_processor_cache()
+
+
+def create_recording(
+        station_name, recorder_name, mic_output_names, start_time,
+        sample_rate, file_lengths, file_paths=None):
+            
+    """
+    Creates a recording with its channels and files.
+    
+    Parameters
+    ----------
+    station_name : str
+        the name of the recording's station.
+        
+    recorder_name : str
+        the name of the recording's recorder.
+        
+    mic_output_names : list of str
+        the names of the microphone outputs of the recording's
+        channels, e.g. `['Mic 0 Output', 'Mic 1 Output']`.
+        
+    start_time : datetime
+        the UTC start time of the recording.
+        
+    sample_rate : int or float
+        the sample rate of the recording.
+        
+    file_lengths : list of int
+        the lengths of the recording's files, in sample frames.
+        
+    file_paths : list of str or None
+        the paths of the recording's files, relative to a recording
+        directory, or `None` for files without paths.
+        
+    Returns
+    -------
+    Recording
+        the new recording.
+    """
+    
+    station = Station.objects.get(name=station_name)
+    recorder = station.devices.get(name=recorder_name)
+    
+    length = sum(file_lengths)
+    
+    recording = Recording.objects.create(
+        station=station,
+        recorder=recorder,
+        num_channels=len(mic_output_names),
+        length=length,
+        sample_rate=sample_rate,
+        start_time=start_time,
+        end_time=_get_time(start_time, length - 1, sample_rate),
+        creation_time=time_utils.get_utc_now())
+        
+    for channel_num, name in enumerate(mic_output_names):
+        RecordingChannel.objects.create(
+            recording=recording,
+            channel_num=channel_num,
+            recorder_channel_num=channel_num,
+            mic_output=_get_device_output(name))
+            
+    if file_paths is None:
+        file_paths = [None] * len(file_lengths)
+        
+    start_index = 0
+    
+    for file_num, (file_length, path) in \
+            enumerate(zip(file_lengths, file_paths)):
+                
+        RecordingFile.objects.create(
+            recording=recording,
+            file_num=file_num,
+            start_index=start_index,
+            length=file_length,
+            path=path)
+            
+        start_index += file_length
+        
+    return recording
+
+
+def _get_time(start_time, index, sample_rate):
+    return start_time + datetime.timedelta(seconds=index / sample_rate)
+
+
+def _get_device_output(name):
+    for output in DeviceOutput.objects.all():
+        if output.name == name:
+            return output
+    raise ValueError(f'Unrecognized device output "{name}".')
+
+
+def create_clip(
+        recording, channel_num, start_index, length, detector_name,
+        annotations=None):
+            
+    """
+    Creates a clip of a recording.
+    
+    Parameters
+    ----------
+    recording : Recording
+        the recording of the clip.
+        
+    channel_num : int
+        the recording channel number of the clip.
+        
+    start_index : int
+        the start index of the clip in its recording.
+        
+    length : int
+        the length of the clip in sample frames.
+        
+    detector_name : str
+        the name of the detector that created the clip.
+        
+    annotations : dict or None
+        mapping from annotation names to values.
+        
+    Returns
+    -------
+    Clip
+        the new clip.
+    """
+    
+    channel = recording.channels.get(channel_num=channel_num)
+    station = recording.station
+    sample_rate = recording.sample_rate
+    start_time = _get_time(recording.start_time, start_index, sample_rate)
+    creation_time = time_utils.get_utc_now()
+    
+    clip = Clip.objects.create(
+        station=station,
+        mic_output=channel.mic_output,
+        recording_channel=channel,
+        start_index=start_index,
+        length=length,
+        sample_rate=sample_rate,
+        start_time=start_time,
+        end_time=_get_time(start_time, length - 1, sample_rate),
+        date=station.get_night(start_time),
+        creation_time=creation_time,
+        creating_processor=Processor.objects.get(name=detector_name))
+        
+    if annotations is not None:
+        for name, value in annotations.items():
+            info = AnnotationInfo.objects.get(name=name)
+            model_utils.annotate_clip(clip, info, value, creation_time)
+            
+    return clip
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TransactionTestCase
+
+from vesper.django.app.archive_database import (
+    ArchiveDatabaseRouter, READER_DATABASE_ALIAS)
+from vesper.django.app.models import Station
+
+
+class ArchiveDatabaseRouterTests(TransactionTestCase):
+    
+    
+    # We use a `TransactionTestCase` rather than a `TestCase` since
+    # the router routes reads differently inside and outside of
+    # transactions, and a `TestCase` runs each test in a transaction.
+    
+    
+    databases = {DEFAULT_DB_ALIAS, READER_DATABASE_ALIAS}
+    
+    
+    def setUp(self):
+        self.router = ArchiveDatabaseRouter()
+        
+        
+    def test_db_for_read(self):
+        
+        self.assertIn(READER_DATABASE_ALIAS, settings.DATABASES)
+        
+        # Outside of transaction.
+        self.assertEqual(
+            self.router.db_for_read(Station), READER_DATABASE_ALIAS)
+        self.assertEqual(Station.objects.all().db, READER_DATABASE_ALIAS)
+        
+        # Inside of transaction.
+        with transaction.atomic():
+            self.assertEqual(
+                self.router.db_for_read(Station), DEFAULT_DB_ALIAS)
+            self.assertEqual(Station.objects.all().db, DEFAULT_DB_ALIAS)
+            
+            
+    def test_db_for_read_without_reader(self):
+        
+        databases = dict(settings.DATABASES)
+        del databases[READER_DATABASE_ALIAS]
+        
+        with self.settings(DATABASES=databases):
+            self.assertEqual(
+                self.router.db_for_read(Station), DEFAULT_DB_ALIAS)
+                
+                
+    def test_db_for_write(self):
+        
+        self.assertEqual(self.router.db_for_write(Station), DEFAULT_DB_ALIAS)
+        
+        with transaction.atomic():
+            self.assertEqual(
+                self.router.db_for_write(Station), DEFAULT_DB_ALIAS)
+                
+                
+    def test_write_then_read(self):
+        
+        # A read in a transaction should see the transaction's writes.
+        with transaction.atomic():
+            Station.objects.create(name='Test', time_zone='UTC')
+            self.assertEqual(Station.objects.count(), 1)
+            
+        # A read outside of a transaction should see committed writes.
+        self.assertEqual(Station.objects.count(), 1)
+        
+        
+    def test_allow_migrate(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'vesper'))
+        self.assertFalse(
+            self.router.allow_migrate(READER_DATABASE_ALIAS, 'vesper'))
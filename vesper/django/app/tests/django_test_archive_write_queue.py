@@ -0,0 +1,166 @@
+from threading import Event, Thread
+import time
+
+from django.db import connection, DEFAULT_DB_ALIAS
+from django.test import TransactionTestCase
+
+from vesper.django.app.archive_database import READER_DATABASE_ALIAS
+from vesper.django.app.archive_write_queue import ArchiveWriteQueue
+from vesper.django.app.models import Station
+import vesper.util.archive_lock as archive_lock
+
+
+class ArchiveWriteQueueTests(TransactionTestCase):
+    
+    
+    # We use a `TransactionTestCase` rather than a `TestCase` since
+    # writes are performed and committed by the queue's writer thread,
+    # on that thread's own database connection.
+    
+    
+    databases = {DEFAULT_DB_ALIAS, READER_DATABASE_ALIAS}
+    
+    
+    def setUp(self):
+        self.queue = ArchiveWriteQueue()
+        
+        
+    def test_write(self):
+        
+        def create_station(name):
+            return Station.objects.create(name=name, time_zone='UTC').id
+            
+        station_id = self.queue.write(create_station, 'Test')
+        
+        station = Station.objects.get(id=station_id)
+        self.assertEqual(station.name, 'Test')
+        
+        
+    def test_write_order(self):
+        
+        # Block the writer thread in a first write while other writes
+        # are submitted, so that the other writes are performed
+        # together in a second batch.
+        
+        started_event = Event()
+        release_event = Event()
+        write_nums = []
+        in_atomic_block = []
+        
+        def write(num):
+            if num == 0:
+                started_event.set()
+                release_event.wait()
+            write_nums.append(num)
+            in_atomic_block.append(connection.in_atomic_block)
+            return num * 10
+            
+        num_writes = 6
+        results = [None] * num_writes
+        
+        def submit(num):
+            results[num] = self.queue.write(write, num)
+            
+        threads = []
+        
+        for num in range(num_writes):
+            
+            thread = Thread(target=submit, args=(num,))
+            thread.start()
+            threads.append(thread)
+            
+            # Wait for write to start (for the first write) or to be
+            # queued (for other writes), so that writes are queued in
+            # order.
+            if num == 0:
+                started_event.wait()
+            else:
+                while self.queue._queue.qsize() != num:
+                    time.sleep(.001)
+                    
+        release_event.set()
+        
+        for thread in threads:
+            thread.join()
+            
+        self.assertEqual(write_nums, list(range(num_writes)))
+        self.assertEqual(results, [n * 10 for n in range(num_writes)])
+        self.assertTrue(all(in_atomic_block))
+        
+        
+    def test_write_error(self):
+        
+        # Block the writer thread in a first write while other writes
+        # are submitted, so that a failing write is in the same batch
+        # as successful writes.
+        
+        started_event = Event()
+        release_event = Event()
+        
+        def create_station(name):
+            if name == 'Block':
+                started_event.set()
+                release_event.wait()
+            Station.objects.create(name=name, time_zone='UTC')
+            if name == 'Bad':
+                raise ValueError('Bad station.')
+            return name
+            
+        names = ('Block', 'One', 'Bad', 'Two')
+        results = {}
+        
+        def submit(name):
+            try:
+                results[name] = self.queue.write(create_station, name)
+            except Exception as e:
+                results[name] = e
+                
+        threads = []
+        
+        for num, name in enumerate(names):
+            thread = Thread(target=submit, args=(name,))
+            thread.start()
+            threads.append(thread)
+            if num == 0:
+                started_event.wait()
+            else:
+                while self.queue._queue.qsize() != num:
+                    time.sleep(.001)
+                    
+        release_event.set()
+        
+        for thread in threads:
+            thread.join()
+            
+        for name in ('Block', 'One', 'Two'):
+            self.assertEqual(results[name], name)
+            
+        self.assertIsInstance(results['Bad'], ValueError)
+        
+        # Only the failed write should have been rolled back.
+        actual = sorted(Station.objects.values_list('name', flat=True))
+        self.assertEqual(actual, ['Block', 'One', 'Two'])
+        
+        
+    def test_archive_lock_error(self):
+        
+        # Without an archive lock, `archive_lock.atomic` raises an
+        # exception before any write of a batch is attempted.
+        
+        lock = archive_lock.get_lock()
+        archive_lock.set_lock(None)
+        
+        def create_station():
+            Station.objects.create(name='Test', time_zone='UTC')
+            
+        try:
+            with self.assertRaises(ValueError):
+                self.queue.write(create_station)
+        finally:
+            archive_lock.set_lock(lock)
+            
+        self.assertEqual(Station.objects.count(), 0)
+        
+        # The queue should still work.
+        self.queue.write(create_station)
+        self.assertEqual(Station.objects.count(), 1)
@@ -0,0 +1,338 @@
+from pathlib import Path
+import datetime
+import os
+import tempfile
+
+from django.test import TestCase
+import numpy as np
+import pytz
+
+from vesper.django.app.models import Clip
+from vesper.singletons import clip_image_manager
+from vesper.util.clip_image_manager import ClipImageManager
+from vesper.util.clip_manager import (
+    _coalesce_recording_segments, ClipManager, ClipManagerError)
+from vesper.util.recording_manager import RecordingManager
+import vesper.django.app.tests.archive_test_utils as archive_test_utils
+import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.clip_manager as clip_manager
+
+
+_SAMPLE_RATE = 1000
+_FILE_LENGTH = 1000
+_NUM_FILES = 2
+_NUM_CHANNELS = 2
+_CHANNEL_OFFSET = 10000
+
+_GAP = clip_manager._MAX_COALESCED_READ_GAP
+_LENGTH = clip_manager._MAX_COALESCED_READ_LENGTH
+
+
+class _ClipManager(ClipManager):
+    
+    """Clip manager that puts clip audio files in a specified directory."""
+    
+    
+    def __init__(self, recording_manager, clip_dir_path):
+        super().__init__()
+        self._rm = recording_manager
+        self._clip_dir_path = clip_dir_path
+        
+        
+    def get_audio_file_path(self, clip):
+        return os.path.join(self._clip_dir_path, f'Clip {clip.id}.wav')
+
+
+class CoalesceRecordingSegmentsTests(TestCase):
+    
+    
+    def _assert_reads(self, segments, expected):
+        
+        # Give segments file numbers and files.
+        segments = [
+            (file_num, f'File {file_num}', start_index, end_index, 0, None)
+            for file_num, start_index, end_index in segments]
+            
+        reads = list(_coalesce_recording_segments(segments))
+        
+        expected = [
+            (f'File {segments[i][0]}', start_index, end_index,
+             segments[i:j])
+            for i, j, start_index, end_index in expected]
+            
+        self.assertEqual(reads, expected)
+        
+        
+    def test_empty(self):
+        self._assert_reads([], [])
+        
+        
+    def test_adjacent_segments(self):
+        self._assert_reads(
+            [(0, 0, 10), (0, 10, 20), (0, 20, 30)],
+            [(0, 3, 0, 30)])
+            
+            
+    def test_overlapping_segments(self):
+        
+        # The second segment is inside the first, so the read ends at
+        # the end of the first segment rather than of the second.
+        self._assert_reads(
+            [(0, 0, 20), (0, 5, 15), (0, 10, 30)],
+            [(0, 3, 0, 30)])
+            
+            
+    def test_gaps(self):
+        
+        # Gaps of at most the maximum coalesced read gap are read.
+        self._assert_reads(
+            [(0, 0, 10), (0, 10 + _GAP, 20 + _GAP),
+             (0, 21 + 2 * _GAP, 30 + 2 * _GAP)],
+            [(0, 2, 0, 20 + _GAP), (2, 3, 21 + 2 * _GAP, 30 + 2 * _GAP)])
+            
+            
+    def test_maximum_read_length(self):
+        self._assert_reads(
+            [(0, 0, 10), (0, 10, _LENGTH), (0, _LENGTH, _LENGTH + 1)],
+            [(0, 2, 0, _LENGTH), (2, 3, _LENGTH, _LENGTH + 1)])
+            
+            
+    def test_different_files(self):
+        self._assert_reads(
+            [(0, 0, 10), (0, 10, 20), (1, 20, 30), (2, 30, 40)],
+            [(0, 2, 0, 20), (2, 3, 20, 30), (3, 4, 30, 40)])
+
+
+class ClipManagerTests(TestCase):
+    
+    
+    def setUp(self):
+        
+        self._temp_dir = tempfile.TemporaryDirectory()
+        dir_path = Path(self._temp_dir.name)
+        
+        # Create recording files.
+        recording_dir_path = dir_path / 'Recordings'
+        recording_dir_path.mkdir()
+        file_paths = []
+        for file_num in range(_NUM_FILES):
+            file_path = f'Recording_{file_num}.wav'
+            start_index = file_num * _FILE_LENGTH
+            samples = _get_recording_samples(
+                np.arange(_NUM_CHANNELS), start_index,
+                start_index + _FILE_LENGTH)
+            audio_file_utils.write_wave_file(
+                str(recording_dir_path / file_path), samples, _SAMPLE_RATE)
+            file_paths.append(file_path)
+            
+        archive_test_utils.import_metadata()
+        
+        self.recording = archive_test_utils.create_recording(
+            'Station 0', 'Recorder 0', ['Mic 0 Output', 'Mic 1 Output'],
+            datetime.datetime(2020, 5, 1, 2, tzinfo=pytz.utc), _SAMPLE_RATE,
+            [_FILE_LENGTH] * _NUM_FILES, file_paths)
+            
+        recording_manager = RecordingManager(dir_path, [recording_dir_path])
+        
+        self._clip_dir_path = dir_path / 'Clips'
+        
+        self.manager = _ClipManager(recording_manager, self._clip_dir_path)
+        
+        # Use a temporary clip image directory, since creating clip
+        # audio files deletes cached clip images.
+        self._image_manager = clip_image_manager._instance
+        clip_image_manager._instance = \
+            ClipImageManager(dir_path / 'Clip Images')
+            
+            
+    def tearDown(self):
+        clip_image_manager._instance = self._image_manager
+        self._temp_dir.cleanup()
+        
+        
+    def _create_clips(self, clip_specs):
+        
+        clips = [
+            archive_test_utils.create_clip(
+                self.recording, channel_num, start_index, length,
+                'Detector 0')
+            for channel_num, start_index, length in clip_specs]
+            
+        # Get clips with a query like those of clip commands.
+        clips = Clip.objects.filter(id__in=[c.id for c in clips]) \
+            .select_related('recording_channel__recording').in_bulk()
+            
+        return [clips[c_id] for c_id in sorted(clips.keys())]
+        
+        
+    def _create_test_clips(self):
+        
+        # Clips are not in order of start index, and include adjacent
+        # and overlapping clips, clips in both recording files, and
+        # clips on both channels.
+        return self._create_clips((
+            (0, 1500, 100),
+            (0, 100, 50),
+            (1, 100, 50),
+            (0, 150, 100),
+            (0, 120, 60),
+            (0, _FILE_LENGTH - 10, 10),
+            (1, _FILE_LENGTH, 10),
+            (0, 0, 50),
+        ))
+        
+        
+    def _assert_samples(self, clip, samples):
+        expected = _get_clip_samples(clip)
+        np.testing.assert_array_equal(samples, expected)
+        
+        
+    def _assert_audio_file(self, clip, path):
+        samples, sample_rate = audio_file_utils.read_wave_file(str(path))
+        self.assertEqual(samples.shape[0], 1)
+        self._assert_samples(clip, samples[0])
+        self.assertEqual(sample_rate, _SAMPLE_RATE)
+        
+        
+    def test_get_recording_samples(self):
+        
+        clips = self._create_test_clips()
+        
+        pairs = list(self.manager.get_recording_samples(clips))
+        
+        # Samples should be yielded in order of recording file and
+        # start index.
+        actual = [c.id for c, _ in pairs]
+        expected = [
+            c.id for c in
+            sorted(clips, key=lambda c: (c.start_index, c.length))]
+        self.assertEqual(actual, expected)
+        
+        for clip, samples in pairs:
+            self._assert_samples(clip, samples)
+            
+            
+    def test_get_recording_samples_errors(self):
+        
+        def assert_raises(clip_specs):
+            clips = self._create_clips(clip_specs)
+            samples = self.manager.get_recording_samples(clips)
+            with self.assertRaises(ClipManagerError):
+                next(samples)
+                
+        # Clip that crosses a recording file boundary. The error should
+        # be raised before the samples of the other clip are yielded.
+        assert_raises(((0, 0, 10), (0, _FILE_LENGTH - 10, 20)))
+        
+        # Clip that extends past the end of its recording.
+        assert_raises(((0, _NUM_FILES * _FILE_LENGTH - 10, 20),))
+        
+        # Clip with no start index.
+        clip, = self._create_clips(((1, 0, 10),))
+        clip.start_index = None
+        with self.assertRaises(ClipManagerError):
+            list(self.manager.get_recording_samples([clip]))
+            
+            
+    def test_get_samples(self):
+        
+        # Clips in both recording files, including one that ends at
+        # the end of a file.
+        clips = self._create_clips((
+            (0, 100, 50),
+            (0, _FILE_LENGTH - 10, 10),
+            (1, _FILE_LENGTH, 10),
+        ))
+        
+        for clip in clips:
+            self._assert_samples(clip, self.manager.get_samples(clip))
+            
+        # Clip that crosses a recording file boundary.
+        clip, = self._create_clips(((1, _FILE_LENGTH - 10, 20),))
+        with self.assertRaises(ClipManagerError):
+            self.manager.get_samples(clip)
+            
+            
+    def test_create_audio_files(self):
+        
+        for num_threads in (1, 3):
+            
+            clips = self._create_test_clips()
+            
+            # Create fake cached clip images, which should be deleted.
+            image_manager = clip_image_manager.instance
+            image_dir_paths = [
+                image_manager._get_clip_dir_path(c.id) for c in clips]
+            for path in image_dir_paths:
+                os.makedirs(path)
+                
+            self.manager.create_audio_files(clips, num_threads)
+            
+            for clip, image_dir_path in zip(clips, image_dir_paths):
+                self.assertTrue(self.manager.has_audio_file(clip))
+                self._assert_audio_file(
+                    clip, self.manager.get_audio_file_path(clip))
+                self.assertFalse(os.path.exists(image_dir_path))
+                
+            _delete_clips(clips)
+            
+            
+    def test_create_audio_files_error(self):
+        
+        clips = self._create_clips(((0, 0, 10), (0, _FILE_LENGTH - 10, 20)))
+        
+        with self.assertRaises(ClipManagerError):
+            self.manager.create_audio_files(clips)
+            
+        self.assertFalse(any(self.manager.has_audio_file(c) for c in clips))
+        
+        
+    def test_export_audio_files(self):
+        
+        for num_threads in (1, 3):
+            
+            clips = self._create_test_clips()
+            
+            # Create audio files for some clips, from which their
+            # samples should be exported.
+            for clip in clips[::2]:
+                self.manager.create_audio_file(clip)
+                
+            with tempfile.TemporaryDirectory() as dir_path:
+                
+                paths = [
+                    os.path.join(dir_path, f'{i}.wav')
+                    for i in range(len(clips))]
+                    
+                self.manager.export_audio_files(clips, paths, num_threads)
+                
+                # Each exported file should have the samples of the
+                # clip at the same position as its path.
+                for clip, path in zip(clips, paths):
+                    self._assert_audio_file(clip, path)
+                    
+            _delete_clips(clips)
+
+
+def _delete_clips(clips):
+    Clip.objects.filter(id__in=[c.id for c in clips]).delete()
+
+
+def _get_recording_samples(channel_nums, start_index, end_index):
+    
+    """
+    Gets recording samples.
+    
+    Each recording sample encodes its channel number and index.
+    """
+    
+    indices = np.arange(start_index, end_index)
+    channel_offsets = (_CHANNEL_OFFSET * channel_nums)[:, np.newaxis]
+    return (channel_offsets + indices).astype('<i2')
+
+
+def _get_clip_samples(clip):
+    start_index = clip.start_index
+    end_index = start_index + clip.length
+    return _get_recording_samples(
+        np.array([clip.channel_num]), start_index, end_index)[0]
@@ -0,0 +1,303 @@
+import datetime
+
+from django.test import TestCase
+import pytz
+
+from vesper.django.app.models import (
+    AnnotationInfo, StringAnnotation, StringAnnotationEdit)
+import vesper.django.app.model_utils as model_utils
+import vesper.django.app.tests.archive_test_utils as archive_test_utils
+
+
+def _dt(*args):
+    return datetime.datetime(*args, tzinfo=pytz.utc)
+
+
+_DETECTOR_NAMES = ['Detector 0', 'Detector 1']
+
+_SM_PAIR_UI_NAMES = [
+    'Station 0 / Mic 0', 'Station 0 / Mic 1', 'Station 1 / Mic 2']
+
+_START_DATE = datetime.date(2020, 4, 1)
+_END_DATE = datetime.date(2020, 5, 31)
+
+_SAMPLE_RATE = 1000
+_CLIP_LENGTH = 100
+
+_CLIPS = (
+
+    # (recording number, channel number, detector name, classification)
+    
+    # Station 0, night of 2020-04-30
+    (0, 0, 'Detector 0', 'Call.AMRE'),
+    (0, 0, 'Detector 0', 'Call.WIWA'),
+    (0, 0, 'Detector 0', None),
+    (0, 1, 'Detector 0', 'Noise'),
+    (0, 0, 'Detector 1', None),
+    (0, 0, 'Detector 1', None),
+    
+    # Station 0, night of 2020-05-02
+    (1, 0, 'Detector 0', 'Call.AMRE'),
+    
+    # Station 1, night of 2020-04-30
+    (2, 0, 'Detector 0', 'Noise'),
+    (2, 0, 'Detector 0', None),
+    (2, 0, 'Detector 1', 'Call.WIWA'),
+
+)
+
+
+class GetClipQueryGroupsTests(TestCase):
+    
+    
+    def setUp(self):
+        
+        archive_test_utils.import_metadata()
+        
+        recordings = [
+            self._create_recording(
+                'Station 0', 'Recorder 0', ['Mic 0 Output', 'Mic 1 Output'],
+                _dt(2020, 5, 1, 2)),
+            self._create_recording(
+                'Station 0', 'Recorder 0', ['Mic 0 Output', 'Mic 1 Output'],
+                _dt(2020, 5, 3, 2)),
+            self._create_recording(
+                'Station 1', 'Recorder 1', ['Mic 2 Output'],
+                _dt(2020, 5, 1, 4)),
+        ]
+        
+        for i, (recording_num, channel_num, detector_name, classification) \
+                in enumerate(_CLIPS):
+                    
+            if classification is None:
+                annotations = None
+            else:
+                annotations = {'Classification': classification}
+                
+            archive_test_utils.create_clip(
+                recordings[recording_num], channel_num, i * _CLIP_LENGTH,
+                _CLIP_LENGTH, detector_name, annotations)
+                
+                
+    def _create_recording(
+            self, station_name, recorder_name, mic_output_names, start_time):
+                
+        return archive_test_utils.create_recording(
+            station_name, recorder_name, mic_output_names, start_time,
+            _SAMPLE_RATE, [3600 * _SAMPLE_RATE])
+            
+            
+    def _assert_groups(
+            self, expected, detector_names=_DETECTOR_NAMES,
+            sm_pair_ui_names=_SM_PAIR_UI_NAMES, start_date=_START_DATE,
+            end_date=_END_DATE, annotation_name=None, annotation_value=None):
+                
+        groups = model_utils.get_clip_query_groups(
+            detector_names, sm_pair_ui_names, start_date, end_date,
+            annotation_name, annotation_value)
+            
+        groups = [
+            (d.name, s.name, m.name, str(date), count)
+            for d, s, m, date, count in groups]
+            
+        self.assertEqual(groups, expected)
+        
+        # Check groups against clip counts of individual groups,
+        # including empty ones.
+        values = model_utils.create_clip_query_values_iterator(
+            detector_names, sm_pair_ui_names, start_date, end_date)
+        expected = []
+        for detector, station, mic_output, date in values:
+            count = model_utils.get_clips(
+                station, mic_output, detector, date, annotation_name,
+                annotation_value, order=False).count()
+            if count != 0:
+                expected.append(
+                    (detector.name, station.name, mic_output.name,
+                     str(date), count))
+                     
+        self.assertEqual(groups, expected)
+        
+        
+    def test_get_clip_query_groups(self):
+        
+        # The query includes many dates, most of them without clips.
+        # Only nonempty groups should be included in the result.
+        self._assert_groups([
+            ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 3),
+            ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+            ('Detector 0', 'Station 0', 'Mic 1 Output', '2020-04-30', 1),
+            ('Detector 0', 'Station 1', 'Mic 2 Output', '2020-04-30', 2),
+            ('Detector 1', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+            ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+        ])
+        
+        
+    def test_get_clip_query_groups_order(self):
+        
+        # Groups should be in the order of the query's detectors and
+        # station/mic output pairs rather than sorted by name.
+        self._assert_groups(
+            [
+                ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+                ('Detector 1', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+                ('Detector 0', 'Station 1', 'Mic 2 Output', '2020-04-30', 2),
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 3),
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+            ],
+            detector_names=['Detector 1', 'Detector 0'],
+            sm_pair_ui_names=['Station 1 / Mic 2', 'Station 0 / Mic 0'])
+            
+            
+    def test_get_clip_query_groups_by_detector(self):
+        self._assert_groups(
+            [
+                ('Detector 1', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+                ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+            ],
+            detector_names=['Detector 1'])
+            
+            
+    def test_get_clip_query_groups_by_station_mic_output(self):
+        
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 1 Output', '2020-04-30', 1),
+            ],
+            sm_pair_ui_names=['Station 0 / Mic 1'])
+            
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 1', 'Mic 2 Output', '2020-04-30', 2),
+                ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+            ],
+            sm_pair_ui_names=['Station 1 / Mic 2'])
+            
+            
+    def test_get_clip_query_groups_by_date(self):
+        
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+            ],
+            start_date=datetime.date(2020, 5, 1))
+            
+        # Query with no nonempty groups.
+        self._assert_groups([], end_date=datetime.date(2020, 4, 29))
+        
+        
+    def test_get_clip_query_groups_by_annotation(self):
+        
+        name = 'Classification'
+        
+        # Particular value.
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 1),
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+            ],
+            annotation_name=name, annotation_value='Call.AMRE')
+            
+        # Value prefix.
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+                ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+            ],
+            annotation_name=name, annotation_value='Call*')
+            
+        # Any value.
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-05-02', 1),
+                ('Detector 0', 'Station 0', 'Mic 1 Output', '2020-04-30', 1),
+                ('Detector 0', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+                ('Detector 1', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+            ],
+            annotation_name=name, annotation_value='*')
+            
+        # No value.
+        self._assert_groups(
+            [
+                ('Detector 0', 'Station 0', 'Mic 0 Output', '2020-04-30', 1),
+                ('Detector 0', 'Station 1', 'Mic 2 Output', '2020-04-30', 1),
+                ('Detector 1', 'Station 0', 'Mic 0 Output', '2020-04-30', 2),
+            ],
+            annotation_name=name, annotation_value=None)
+
+
+class BulkAnnotationTests(TestCase):
+    
+    
+    def setUp(self):
+        
+        archive_test_utils.import_metadata()
+        
+        recording = archive_test_utils.create_recording(
+            'Station 0', 'Recorder 0', ['Mic 0 Output'], _dt(2020, 5, 1, 2),
+            _SAMPLE_RATE, [3600 * _SAMPLE_RATE])
+            
+        self.clips = [
+            archive_test_utils.create_clip(
+                recording, 0, i * _CLIP_LENGTH, _CLIP_LENGTH, 'Detector 0')
+            for i in range(4)]
+            
+        self.info = AnnotationInfo.objects.get(name='Classification')
+        
+        
+    def _assert_values(self, expected):
+        values = model_utils.get_clip_annotation_values(self.clips, self.info)
+        self.assertEqual([values.get(c.id) for c in self.clips], expected)
+        
+        
+    def _get_edit_actions(self):
+        edits = StringAnnotationEdit.objects.order_by('id')
+        return [(e.clip_id, e.action, e.value) for e in edits]
+        
+        
+    def test_annotate_clips(self):
+        
+        c = self.clips
+        
+        model_utils.annotate_clips(
+            [(c[0], 'Call'), (c[1], 'Noise'), (c[2], 'Call')], self.info)
+        self._assert_values(['Call', 'Noise', 'Call', None])
+        
+        # Only annotations whose values change should be edited.
+        model_utils.annotate_clips(
+            [(c[0], 'Call'), (c[1], 'Call'), (c[3], 'Noise')], self.info)
+        self._assert_values(['Call', 'Call', 'Call', 'Noise'])
+        
+        SET = StringAnnotationEdit.ACTION_SET
+        self.assertEqual(self._get_edit_actions(), [
+            (c[0].id, SET, 'Call'),
+            (c[1].id, SET, 'Noise'),
+            (c[2].id, SET, 'Call'),
+            (c[1].id, SET, 'Call'),
+            (c[3].id, SET, 'Noise'),
+        ])
+        
+        
+    def test_delete_clip_annotations(self):
+        
+        c = self.clips
+        
+        model_utils.annotate_clips(
+            [(c[0], 'Call'), (c[1], 'Noise'), (c[2], 'Call')], self.info)
+        StringAnnotationEdit.objects.all().delete()
+        
+        # Clip 3 is not annotated, and clip 0 is specified twice.
+        model_utils.delete_clip_annotations(
+            [c[0], c[1], c[3], c[0]], self.info)
+            
+        self._assert_values([None, None, 'Call', None])
+        self.assertEqual(StringAnnotation.objects.count(), 1)
+        
+        # There should be one edit per deleted annotation.
+        DELETE = StringAnnotationEdit.ACTION_DELETE
+        self.assertEqual(self._get_edit_actions(), [
+            (c[0].id, DELETE, None),
+            (c[1].id, DELETE, None),
+        ])
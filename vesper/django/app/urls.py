@@ -14,15 +14,25 @@ urlpatterns = [
     path('clip-calendar/', views.clip_calendar, name='clip-calendar'),
     path('clip-album/', views.clip_album, name='clip-album'),
     path('night/', views.night, name='night'),
+    path('night/clip-density/', views.night_clip_density,
+         name='night-clip-density'),
     
     path('batch/read/clip-audios/',
          views.batch_read_clip_audios,
          name='batch-read-clip-audios'),
         
+    path('batch/read/clip-samples/',
+         views.batch_read_clip_samples,
+         name='batch-read-clip-samples'),
+        
     path('batch/read/clip-annotations/',
          views.batch_read_clip_annotations,
          name='batch-read-clip-annotations'),
         
+    path('batch/read/clip-spectrograms/',
+         views.batch_read_clip_spectrograms,
+         name='batch-read-clip-spectrograms'),
+        
     path('clips/<int:clip_id>/wav/', views.clip_wav, name='clip-wav'),
     path('clips/<int:clip_id>/annotations/json/', views.annotations_json,
          name='annotations'),
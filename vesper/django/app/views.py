@@ -4,15 +4,16 @@ import datetime
 import itertools
 import json
 import logging
+import struct
 
 from django import forms, urls
-from django.db import transaction
 from django.db.models import F, Max, Min
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.http import (
     Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden,
-    HttpResponseNotAllowed, HttpResponseRedirect, HttpResponseServerError)
+    HttpResponseNotAllowed, HttpResponseRedirect, HttpResponseServerError,
+    StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
@@ -49,19 +50,20 @@ from vesper.old_bird.export_clip_counts_csv_file_form import \
     ExportClipCountsCsvFileForm as OldBirdExportClipCountsCsvFileForm
 from vesper.old_bird.import_clips_form import ImportClipsForm
 from vesper.singletons import (
-    archive, clip_manager, job_manager, preference_manager, preset_manager)
+    archive, archive_write_queue, clip_image_manager, clip_manager,
+    ephem_cache, job_manager, preference_manager, preset_manager)
 from vesper.util.bunch import Bunch
 from vesper.util.byte_buffer import ByteBuffer
 import vesper.django.app.model_utils as model_utils
-import vesper.ephem.ephem_utils as ephem_utils
 import vesper.external_urls as external_urls
 from vesper.old_bird.add_old_bird_clip_start_indices_form import \
     AddOldBirdClipStartIndicesForm
 import vesper.old_bird.export_clip_counts_csv_file_utils as \
     old_bird_export_clip_counts_csv_file_utils
-import vesper.util.archive_lock as archive_lock
 import vesper.util.audio_file_utils as audio_file_utils
 import vesper.util.calendar_utils as calendar_utils
+import vesper.util.clip_image_utils as clip_image_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.time_utils as time_utils
 import vesper.util.yaml_utils as yaml_utils
 import vesper.version as version
@@ -630,6 +632,7 @@ def _create_export_clips_to_hdf5_file_command_spec(form):
                 'name': 'Clips HDF5 File Exporter',
                 'arguments': {
                     'output_file_path': data['output_file_path'],
+                    'layout': data['layout'],
                 }
             },
             'detectors': data['detectors'],
@@ -1043,30 +1046,8 @@ def annotations_json(request, clip_id):
 
             # TODO: Typecheck JSON?
 
-            with archive_lock.atomic():
-                with transaction.atomic():
-
-                    clip = get_object_or_404(Clip, pk=clip_id)
-
-                    for name, value in content.items():
-
-                        # We respond with a 404 (Not Found) client error if
-                        # the named `AnnotationInfo` does not already exist.
-                        # This assumes that an `AnnotationInfo` is created
-                        # explicitly by a request at some other URL, not
-                        # implicitly by naming a nonexistent `AnnotationInfo`
-                        # at this URL.
-                        info = get_object_or_404(AnnotationInfo, name=name)
-
-                        user = request.user
-
-                        if value is None:
-                            model_utils.delete_clip_annotation(
-                                clip, info, creating_user=user)
-
-                        else:
-                            model_utils.annotate_clip(
-                                clip, info, value, creating_user=user)
+            archive_write_queue.instance.write(
+                _set_clip_annotations, clip_id, content, request.user)
 
             return HttpResponse()
 
@@ -1079,6 +1060,28 @@ def annotations_json(request, clip_id):
         return HttpResponseNotAllowed(('GET', 'HEAD', 'POST'))
 
 
+def _set_clip_annotations(clip_id, annotations, user):
+
+    clip = get_object_or_404(Clip, pk=clip_id)
+
+    for name, value in annotations.items():
+
+        # We respond with a 404 (Not Found) client error if the named
+        # `AnnotationInfo` does not already exist. This assumes that an
+        # `AnnotationInfo` is created explicitly by a request at some
+        # other URL, not implicitly by naming a nonexistent
+        # `AnnotationInfo` at this URL.
+        info = get_object_or_404(AnnotationInfo, name=name)
+
+        if value is None:
+            model_utils.delete_clip_annotation(
+                clip, info, creating_user=user)
+
+        else:
+            model_utils.annotate_clip(
+                clip, info, value, creating_user=user)
+
+
 def _parse_json_request_body(request):
     return {}
 
@@ -1260,6 +1263,176 @@ def _get_uint32_bytes(i):
     return np.array([i], dtype=np.dtype('<u4')).tobytes()
 
 
+_CLIP_SAMPLES_HEADER = struct.Struct('<IdI')
+"""
+Header of a clip samples frame of a `batch_read_clip_samples` response.
+
+The header comprises a clip ID (a 32-bit unsigned integer), a clip
+sample rate (a 64-bit float), and a clip length in samples (a 32-bit
+unsigned integer), all little-endian. The header is followed by the
+clip's samples, as little-endian 16-bit integers.
+"""
+
+_CLIP_SAMPLES_ERROR_LENGTH = 2 ** 32 - 1
+"""
+Clip length of a clip samples frame for a clip whose samples could
+not be read.
+
+A frame with this length has no samples.
+"""
+
+
+@csrf_exempt
+def batch_read_clip_samples(request):
+
+    '''
+    This view expects a request body that is UTF-8 encoded JSON like:
+
+        { "clip_ids": [1, 2, 3, 4, 5] }
+
+    The response content is a sequence of clip samples frames, one per
+    clip, in the order of the clip IDs. Each frame comprises a header
+    (see `_CLIP_SAMPLES_HEADER`) followed by raw clip samples. The
+    response is streamed, with each frame sent as soon as its clip's
+    samples are read, so clients can process the first clips of a batch
+    while later ones are still being read, and server memory use does
+    not grow with batch size.
+
+    Since the response status is sent before the first frame, a clip
+    whose samples cannot be read is reported with an error frame (see
+    `_CLIP_SAMPLES_ERROR_LENGTH`) rather than an error response.
+    '''
+
+    if request.method == 'POST':
+
+        try:
+            content = _get_request_body_as_json(request)
+        except HttpError as e:
+            return e.http_response
+
+        try:
+            content = json.loads(content)
+        except json.JSONDecodeError as e:
+            return HttpResponseBadRequest(
+                reason='Could not decode request JSON')
+
+        clip_ids = content['clip_ids']
+
+        # Get all clips before we start streaming so we can respond
+        # with a 404 if any are missing.
+        clips = Clip.objects.in_bulk(clip_ids)
+        missing_ids = [i for i in clip_ids if i not in clips]
+        if len(missing_ids) != 0:
+            raise Http404(f'Unrecognized clip IDs {missing_ids}.')
+
+        frames = _generate_clip_samples_frames(clips[i] for i in clip_ids)
+
+        return StreamingHttpResponse(
+            frames, content_type='application/octet-stream')
+
+    else:
+        return HttpResponseNotAllowed(['POST'])
+
+
+def _generate_clip_samples_frames(clips):
+
+    for clip in clips:
+
+        try:
+            samples = clip_manager.instance.get_samples(clip)
+
+        except Exception as e:
+            logger = logging.getLogger('django.server')
+            logger.error((
+                'Attempt to get samples for clip "{}" failed with {} '
+                'exception. Exception message was: {}').format(
+                    str(clip), e.__class__.__name__, str(e)))
+            yield _CLIP_SAMPLES_HEADER.pack(
+                clip.id, clip.sample_rate, _CLIP_SAMPLES_ERROR_LENGTH)
+            continue
+
+        samples = np.asarray(samples, dtype='<i2')
+
+        yield _CLIP_SAMPLES_HEADER.pack(
+            clip.id, clip.sample_rate, len(samples)) + samples.tobytes()
+
+
+@csrf_exempt
+def batch_read_clip_spectrograms(request):
+
+    '''
+    This view expects a request body that is UTF-8 encoded JSON like:
+
+        { "clip_ids": [1, 2, 3], "settings": {...} }
+
+    where the settings are clip album spectrogram settings, including
+    `computation` and `display` items. The response content comprises
+    alternating binary image sizes and PNG images, as for the
+    `batch_read_clip_audios` view. The image for a clip that is too
+    short to have a spectrogram is empty.
+    '''
+
+    if request.method == 'POST':
+
+
+        # Parse request content JSON.
+
+        try:
+            content = _get_request_body_as_json(request)
+        except HttpError as e:
+            return e.http_response
+
+        try:
+            content = json.loads(content)
+        except json.JSONDecodeError:
+            return HttpResponseBadRequest(
+                reason='Could not decode request JSON')
+
+
+        # Get requested clip spectrogram images.
+
+        clip_ids = content['clip_ids']
+        spectrogram_settings = content['settings']
+
+        clips = [get_object_or_404(Clip, pk=i) for i in clip_ids]
+
+        images = []
+
+        for clip in clips:
+
+            try:
+                image = clip_image_manager.instance.get_spectrogram_image(
+                    clip, spectrogram_settings,
+                    cache_result=not settings.ARCHIVE_READ_ONLY)
+
+            except (KeyError, ValueError) as e:
+                return HttpResponseBadRequest(
+                    reason=f'Bad spectrogram settings: {str(e)}')
+
+            except Exception as e:
+                logger = logging.getLogger('django.server')
+                logger.error((
+                    'Attempt to get spectrogram image for clip "{}" failed '
+                    'with {} exception. Exception message was: {}').format(
+                        str(clip), e.__class__.__name__, str(e)))
+                return HttpResponseServerError()
+
+            images.append(image)
+
+
+        # Concatenate alternating binary image sizes and images to make
+        # response content.
+        image_sizes = [_get_uint32_bytes(len(i)) for i in images]
+        pairs = zip(image_sizes, images)
+        parts = itertools.chain.from_iterable(pairs)
+        content = b''.join(parts)
+
+        return HttpResponse(content, content_type='application/octet-stream')
+
+    else:
+        return HttpResponseNotAllowed(['POST'])
+
+
 @csrf_exempt
 def batch_read_clip_annotations(request):
     
@@ -1313,48 +1486,41 @@ def annotations(request, annotation_name):
             value = content['value']
             clip_ids = content['clip_ids']
 
-            # We lock the archive just once for all of the clips that
-            # we process, rather than once for each clip. This means
-            # that we may hold the lock for several seconds, during
-            # which no other threads or processes can hold it. This
-            # method is several times faster this way, and since it
-            # is typically invoked interactively, the improved
+            # We write all of the annotations in a single write (and
+            # thus a single transaction), rather than in one write per
+            # clip. This method is several times faster this way, and
+            # since it is typically invoked interactively, the improved
             # performance is especially important.
-            with archive_lock.atomic():
-                with transaction.atomic():
+            archive_write_queue.instance.write(
+                _annotate_clips, annotation_name, value, clip_ids,
+                request.user)
 
-                    info = get_object_or_404(
-                        AnnotationInfo, name=annotation_name)
+            return HttpResponse()
 
-                    # TODO: Try to speed up the following, which currently
-                    # takes several seconds per thousand clips. Perhaps we
-                    # don't need for Django to create Clip instances for us,
-                    # but instead can use raw SQL to query the
-                    # vesper_string_annotation table just once to get the
-                    # information we need to decide what updates are needed,
-                    # and then a second time to perform the updates.
+        else:
 
-                    for clip_id in clip_ids:
+            return HttpResponseForbidden()
 
-                        clip = get_object_or_404(Clip, pk=clip_id)
-                        user = request.user
+    else:
+        return HttpResponseNotAllowed(['POST'])
 
-                        if value is None:
-                            model_utils.delete_clip_annotation(
-                                clip, info, creating_user=user)
 
-                        else:
-                            model_utils.annotate_clip(
-                                clip, info, value, creating_user=user)
+def _annotate_clips(annotation_name, value, clip_ids, user):
 
-            return HttpResponse()
+    info = get_object_or_404(AnnotationInfo, name=annotation_name)
 
-        else:
+    clips = Clip.objects.in_bulk(clip_ids)
+    missing_ids = [i for i in clip_ids if i not in clips]
+    if len(missing_ids) != 0:
+        raise Http404(f'Unrecognized clip IDs {missing_ids}.')
 
-            return HttpResponseForbidden()
+    if value is None:
+        model_utils.delete_clip_annotations(
+            [clips[i] for i in clip_ids], info, creating_user=user)
 
     else:
-        return HttpResponseNotAllowed(['POST'])
+        model_utils.annotate_clips(
+            [(clips[i], value) for i in clip_ids], info, creating_user=user)
 
 
 def _get_request_body_as_json(request):
@@ -1641,10 +1807,10 @@ def night(request):
     # TODO: Should this be more like the analogous code in `clip_album`?
     annotation_name = 'Classification'
     annotation_value_spec = params['classification']
-    annotation_name, annotation_value = \
-        _get_string_annotation_info(annotation_name, annotation_value_spec)
     annotation_ui_value_specs = \
         archive_.get_visible_string_annotation_ui_value_specs(annotation_name)
+    annotation_name, annotation_value = \
+        _get_string_annotation_info(annotation_name, annotation_value_spec)
 
     date_string = params['date']
     date = time_utils.parse_date(*date_string.split('-'))
@@ -1688,6 +1854,79 @@ def night(request):
     return render(request, 'vesper/night.html', context)
 
 
+_MAX_CLIP_DENSITY_WIDTH = 4096
+"""
+Maximum number of columns of a `night_clip_density` rug.
+
+The limit keeps a single request from allocating a very large rug.
+"""
+
+
+def night_clip_density(request):
+
+    '''
+    Gets a clip density rug for a night.
+
+    The `station_mic`, `detector`, `classification`, and `date` query
+    parameters specify clips as for the `night` view. The `start_hour`
+    and `end_hour` parameters specify the time range of the rug, in
+    hours after the start of the night's date (e.g. 18 for 6 PM and
+    30 for 6 AM the next morning), and the `width` parameter specifies
+    the number of rug columns, at most `_MAX_CLIP_DENSITY_WIDTH`. The
+    response content is an array of `width` unsigned bytes, the numbers
+    of clips in the columns.
+    '''
+
+    params = request.GET
+
+    try:
+        sm_pair_ui_name = params['station_mic']
+        detector_name = params['detector']
+        annotation_value_spec = params['classification']
+        date = time_utils.parse_date(*params['date'].split('-'))
+        start_hour = float(params['start_hour'])
+        end_hour = float(params['end_hour'])
+        width = int(params['width'])
+    except (KeyError, ValueError) as e:
+        return HttpResponseBadRequest(
+            reason=f'Bad query parameter: {str(e)}')
+
+    if width <= 0 or width > _MAX_CLIP_DENSITY_WIDTH or \
+            end_hour <= start_hour:
+        return HttpResponseBadRequest(reason='Bad rug dimensions.')
+
+    sm_pairs = model_utils.get_station_mic_output_pairs_dict()
+
+    try:
+        station, mic_output = sm_pairs[sm_pair_ui_name]
+    except KeyError:
+        raise Http404(f'Unrecognized station/mic "{sm_pair_ui_name}".')
+
+    try:
+        detector = archive.instance.get_processor(detector_name)
+    except ValueError:
+        raise Http404(f'Unrecognized detector "{detector_name}".')
+
+    annotation_name, annotation_value = _get_string_annotation_info(
+        'Classification', annotation_value_spec)
+
+    clips = model_utils.get_clips(
+        station, mic_output, detector, date, annotation_name,
+        annotation_value)
+
+    # See note about UTC and local times near the top of this file.
+    utc_to_local = station.utc_to_local
+    start_times = clips.values_list('start_time', flat=True)
+    clip_hours = [
+        clip_image_utils.get_night_hours(utc_to_local(t))
+        for t in start_times]
+
+    rug = clip_image_utils.compute_clip_density(
+        clip_hours, start_hour, end_hour, width)
+
+    return HttpResponse(rug.tobytes(), content_type='application/octet-stream')
+
+
 def _get_solar_event_times_json(station, night):
 
     lat = station.latitude
@@ -1731,7 +1970,7 @@ def _get_solar_event_times_json(station, night):
 
 def _get_solar_event_time(event, lat, lon, date, utc_to_local):
 
-    utc_time = ephem_utils.get_event_time(event, lat, lon, date)
+    utc_time = ephem_cache.instance.get_event_time(event, lat, lon, date)
 
     if utc_time is None:
         # event does not exist for specified date (e.g. at high latitude)
@@ -1957,7 +2196,8 @@ def _create_import_metadata_command_spec(form):
             'importer': {
                 'name': 'Metadata Importer',
                 'arguments': {
-                    'metadata': data['metadata']
+                    'metadata': data['metadata'],
+                    'dry_run': data['dry_run']
                 }
             }
         }
@@ -2139,10 +2379,38 @@ def job(request, job_id):
     job = get_object_or_404(Job, pk=job_id)
     command_spec = json.loads(job.command)
     context = _create_template_context(
-        request, job=job, command_name=command_spec['name'])
+        request, job=job, command_name=command_spec['name'],
+        metrics=_get_job_metrics_context(job.metrics))
     return render(request, 'vesper/job.html', context)
 
 
+def _get_job_metrics_context(metrics):
+
+    if metrics is None:
+        return None
+
+    timers = [
+        {
+            'name': s['name'],
+            'count': s['count'],
+            'total_time': f'{s["total_time"]:.3f}',
+            'mean_time': f'{1000 * s["mean_time"]:.3f}',
+            'max_time': f'{1000 * s["max_time"]:.3f}',
+            'percent': f'{100 * s["fraction"]:.1f}',
+        }
+        for s in job_metrics.get_timer_summaries(metrics)]
+
+    counters = [
+        {'name': name, 'count': count}
+        for name, count in metrics['counters'].items()]
+
+    return {
+        'elapsed_time': f'{metrics["elapsed_time"]:.3f}',
+        'timers': timers,
+        'counters': counters,
+    }
+
+
 @csrf_exempt
 def about_vesper(request):
 
@@ -110,6 +110,13 @@ def _create_databases_setting_value():
             'NAME': str(archive_paths.sqlite_database_file_path)
         }
         
+        # Connection for reads, which is read-only and has the same
+        # test database as the default connection. See the
+        # `vesper.django.app.archive_database` module for details.
+        reader_value = dict(value, TEST={'MIRROR': 'default'})
+        
+        return {'default': value, 'archive_reader': reader_value}
+        
     elif db.engine == 'PostgreSQL':
         
         value = {
@@ -130,6 +137,8 @@ def _create_databases_setting_value():
 
 DATABASES = _create_databases_setting_value()
 
+DATABASE_ROUTERS = ['vesper.django.app.archive_database.ArchiveDatabaseRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -0,0 +1,475 @@
+"""
+Module containing class `EphemCache`.
+
+An `EphemCache` caches sun and moon ephemeris data computed by the
+`ephem_utils` module, so that they are computed at most once for each
+location and date or time. It is much faster than calling `ephem_utils`
+functions directly when the same data are needed many times, for
+example when exporting clip metadata or compiling a daily schedule
+for many stations and dates.
+
+The cache stores:
+
+- solar event times, computed together for all solar events of a
+  (latitude, longitude, date) triple the first time any of them is
+  requested. Solar event times can optionally be persisted to a file,
+  so that they are shared by the processes that use the same file
+  and need not be recomputed when a process restarts. When a cache
+  is saved, times that other processes have saved to the file are
+  merged into it rather than overwritten.
+
+- sun and moon altitudes, azimuths, and illuminations at the points
+  of a regular time grid. Values for arbitrary times are interpolated
+  linearly from the grid values. Grid values are computed only as
+  needed, and the values for many times can be obtained with a single
+  vectorized call. The grid values of each body and location are
+  held in a least recently used cache of bounded size.
+"""
+
+
+from collections import OrderedDict
+from threading import Lock
+import datetime
+import json
+import logging
+
+import numpy as np
+import pytz
+
+from vesper.util.bunch import Bunch
+import vesper.ephem.ephem_utils as ephem_utils
+import vesper.util.os_utils as os_utils
+
+
+SOLAR_DUSK_EVENTS = (
+    'Sunset', 'Civil Dusk', 'Nautical Dusk', 'Astronomical Dusk')
+SOLAR_DAWN_EVENTS = (
+    'Astronomical Dawn', 'Nautical Dawn', 'Civil Dawn', 'Sunrise')
+SOLAR_EVENTS = SOLAR_DUSK_EVENTS + SOLAR_DAWN_EVENTS
+
+_LUNAR_EVENTS = ('Moonrise', 'Moonset')
+
+_FILE_FORMAT_VERSION = 1
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Spacing of grid for body position and illumination interpolation.
+# The maximum error of linear interpolation of sun and moon altitudes
+# on this grid is about .001 degrees.
+_DEFAULT_GRID_SPACING = 120     # seconds
+
+# Maximum number of grid values cached for each body and location. At
+# the default grid spacing this is about 139 days of values, or about
+# 10 MB per body and location.
+_DEFAULT_MAX_GRID_VALUE_COUNT = 100000
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+_logger = logging.getLogger()
+
+
+class EphemCache:
+    
+    
+    def __init__(
+            self, file_path=None, grid_spacing=_DEFAULT_GRID_SPACING,
+            max_grid_value_count=_DEFAULT_MAX_GRID_VALUE_COUNT):
+        
+        """
+        Initializes this cache.
+        
+        Parameters
+        ----------
+        file_path : str or Path or None
+            the path of the file in which to persist solar event times,
+            or `None` if the times should not be persisted. If the file
+            exists, the times it contains are loaded into this cache.
+            
+        grid_spacing : int or float
+            the spacing in seconds of the time grid at which body
+            positions and illuminations are computed for interpolation.
+            
+        max_grid_value_count : int
+            the maximum number of grid values to cache for each body
+            and location. When the limit is exceeded the least recently
+            used values are discarded.
+        """
+        
+        self._file_path = file_path
+        self._grid_spacing = grid_spacing
+        self._max_grid_value_count = max_grid_value_count
+        
+        self._lock = Lock()
+        
+        # Mapping from (lat, lon, date) triples to dictionaries that
+        # map event names to UTC times.
+        self._event_times = {}
+        
+        # Mapping from (body, lat, lon) triples to ordered dictionaries
+        # that map time grid indices to (altitude, azimuth, illumination)
+        # triples. Each ordered dictionary is in order of increasing
+        # time of last use.
+        self._grid_values = {}
+        
+        self._dirty = False
+        
+        if file_path is not None:
+            self._load()
+            
+            
+    @property
+    def file_path(self):
+        return self._file_path
+        
+        
+    @property
+    def grid_spacing(self):
+        return self._grid_spacing
+        
+        
+    def _load(self):
+        event_times = self._read_file()
+        if event_times is not None:
+            self._event_times = event_times
+            
+            
+    def _read_file(self):
+        
+        """
+        Reads the event times of this cache's file.
+        
+        Returns `None` if the file does not exist or cannot be read
+        or parsed.
+        """
+        
+        try:
+            contents = os_utils.read_file(self._file_path)
+            
+        except OSError:
+            # file does not exist or cannot be read
+            
+            return None
+            
+        try:
+            data = json.loads(contents)
+            if data['version'] != _FILE_FORMAT_VERSION:
+                raise ValueError(
+                    f'Unsupported file format version {data["version"]}.')
+            return dict(
+                (_parse_key(k), _parse_event_times(v))
+                for k, v in data['event_times'].items())
+                
+        except Exception as e:
+            _logger.warning(
+                f'Could not load ephemeris cache file "{self._file_path}". '
+                f'Error message was: {e}')
+            return None
+            
+            
+    def save(self):
+        
+        """
+        Saves this cache's solar event times to its file.
+        
+        Event times that other processes have saved to the file since
+        this cache loaded it are merged into this cache before saving,
+        so that they are not lost.
+        
+        If this cache has no file or no new event times have been
+        computed since the cache was loaded or last saved, this method
+        does nothing.
+        """
+        
+        if self._file_path is None:
+            return
+            
+        with self._lock:
+            
+            if not self._dirty:
+                return
+                
+            saved_times = self._read_file()
+            if saved_times is not None:
+                _merge_event_times(self._event_times, saved_times)
+                
+            data = {
+                'version': _FILE_FORMAT_VERSION,
+                'event_times': dict(
+                    (_format_key(k), _format_event_times(v))
+                    for k, v in self._event_times.items())
+            }
+            
+            self._dirty = False
+            
+        try:
+            os_utils.write_file_atomically(self._file_path, json.dumps(data))
+            
+        except Exception as e:
+            _logger.warning(
+                f'Could not save ephemeris cache file "{self._file_path}". '
+                f'Error message was: {e}')
+                
+                
+    def get_event_time(self, event, lat, lon, date):
+        
+        """
+        Gets the UTC time of a solar or lunar event.
+        
+        This method has the same semantics as the
+        `ephem_utils.get_event_time` function, but caches its results.
+        The first time the time of a solar event is requested for a
+        particular latitude, longitude, and date, the times of all
+        solar events for that latitude, longitude, and date are
+        computed and cached.
+        """
+        
+        key = (lat, lon, date)
+        
+        with self._lock:
+            times = self._event_times.get(key)
+            if times is not None and event in times:
+                return times[event]
+                
+        if event in SOLAR_EVENTS:
+            events = SOLAR_EVENTS
+        elif event in _LUNAR_EVENTS:
+            events = (event,)
+        else:
+            raise ValueError('Unrecognized event "{}".'.format(event))
+            
+        # We compute event times without holding the lock since the
+        # computation is comparatively slow, and it is harmless if two
+        # threads compute the same times.
+        new_times = dict(
+            (e, ephem_utils.get_event_time(e, lat, lon, date))
+            for e in events)
+            
+        with self._lock:
+            self._event_times.setdefault(key, {}).update(new_times)
+            self._dirty = True
+            
+        return new_times[event]
+        
+        
+    def get_night_solar_event_times(self, lat, lon, night):
+        
+        """
+        Gets the UTC times of the solar events of the specified night.
+        
+        The dusk events of a night are on the night's date, and the
+        dawn events are on the following date.
+        
+        Returns
+        -------
+        dict
+            mapping from solar event names to UTC times. The time of
+            an event that does not occur on the night (for example at
+            a high latitude) is `None`.
+        """
+        
+        get = self.get_event_time
+        next_day = night + _ONE_DAY
+        
+        times = dict((e, get(e, lat, lon, night)) for e in SOLAR_DUSK_EVENTS)
+        times.update(
+            (e, get(e, lat, lon, next_day)) for e in SOLAR_DAWN_EVENTS)
+            
+        return times
+        
+        
+    def get_body_data(self, body, lat, lon, times):
+        
+        """
+        Gets the position and illumination of a body at the specified
+        times.
+        
+        The values are linearly interpolated from values computed on a
+        regular time grid.
+        
+        Parameters
+        ----------
+        body : str
+            `'Sun'` or `'Moon'`.
+            
+        lat : float
+            latitude in degrees.
+            
+        lon : float
+            longitude in degrees.
+            
+        times : sequence of datetimes
+            the times at which to get body data. The times must be
+            time zone aware.
+            
+        Returns
+        -------
+        Bunch
+            bunch with `altitude`, `azimuth`, and `illumination`
+            attributes, each a NumPy array of values in degrees
+            (altitude and azimuth) or percent (illumination).
+        """
+        
+        if body not in ephem_utils.BODIES:
+            raise ValueError('Unrecognized body "{}".'.format(body))
+            
+        times = np.array([t.timestamp() for t in times], dtype=np.float64)
+        
+        grid_times = times / self._grid_spacing
+        indices = np.floor(grid_times).astype(np.int64)
+        fractions = grid_times - indices
+        
+        values = self._get_grid_values(body, lat, lon, indices)
+        
+        v0 = values[indices]
+        v1 = values[indices + 1]
+        
+        altitudes = v0[:, 0] + fractions * (v1[:, 0] - v0[:, 0])
+        illuminations = v0[:, 2] + fractions * (v1[:, 2] - v0[:, 2])
+        
+        # Interpolate azimuth along shorter arc between grid values.
+        azimuth_deltas = (v1[:, 1] - v0[:, 1] + 180) % 360 - 180
+        azimuths = (v0[:, 1] + fractions * azimuth_deltas) % 360
+        
+        return Bunch(
+            altitude=altitudes, azimuth=azimuths, illumination=illuminations)
+            
+            
+    def _get_grid_values(self, body, lat, lon, indices):
+        
+        """
+        Gets grid values for the specified indices and the indices that
+        follow them.
+        
+        Returns a `_GridValues` object that can be indexed by arrays of
+        grid indices.
+        """
+        
+        key = (body, lat, lon)
+        
+        needed_indices = np.union1d(indices, indices + 1)
+        
+        values = {}
+        
+        with self._lock:
+            
+            cache = self._grid_values.setdefault(key, OrderedDict())
+            
+            for i in needed_indices:
+                value = cache.get(i)
+                if value is not None:
+                    cache.move_to_end(i)
+                    values[i] = value
+                    
+        missing_indices = [i for i in needed_indices if i not in values]
+        
+        new_values = dict(
+            (i, self._compute_grid_value(body, lat, lon, i))
+            for i in missing_indices)
+            
+        values.update(new_values)
+        
+        with self._lock:
+            
+            cache.update(new_values)
+            
+            # Discard least recently used values.
+            for _ in range(len(cache) - self._max_grid_value_count):
+                cache.popitem(last=False)
+                
+        values = np.array([values[i] for i in needed_indices])
+        
+        return _GridValues(needed_indices, values)
+        
+        
+    def _compute_grid_value(self, body, lat, lon, index):
+        time = datetime.datetime.fromtimestamp(
+            int(index) * self._grid_spacing, pytz.utc)
+        return ephem_utils.get_body_data(body, lat, lon, time)
+        
+        
+    def get_altitude(self, body, lat, lon, time):
+        return self.get_body_data(body, lat, lon, [time]).altitude[0]
+        
+        
+    def get_azimuth(self, body, lat, lon, time):
+        return self.get_body_data(body, lat, lon, [time]).azimuth[0]
+        
+        
+    def get_illumination(self, body, lat, lon, time):
+        return self.get_body_data(body, lat, lon, [time]).illumination[0]
+
+
+class _GridValues:
+    
+    """Grid values indexed by sorted grid indices."""
+    
+    
+    def __init__(self, indices, values):
+        self._indices = indices
+        self._values = values
+        
+        
+    def __getitem__(self, indices):
+        return self._values[np.searchsorted(self._indices, indices)]
+
+
+def _merge_event_times(times, saved_times):
+    
+    """
+    Merges saved event times into event times.
+    
+    Times that are in both `times` and `saved_times` are taken from
+    `times`.
+    """
+    
+    for key, saved in saved_times.items():
+        key_times = times.setdefault(key, {})
+        for event, time in saved.items():
+            key_times.setdefault(event, time)
+
+
+def _format_key(key):
+    lat, lon, date = key
+    return f'{lat!r},{lon!r},{date.isoformat()}'
+
+
+def _parse_key(key):
+    lat, lon, date = key.split(',')
+    return (
+        float(lat), float(lon),
+        datetime.datetime.strptime(date, '%Y-%m-%d').date())
+
+
+def _format_event_times(times):
+    return dict(
+        (e, None if t is None else t.strftime(_TIME_FORMAT))
+        for e, t in times.items())
+
+
+def _parse_event_times(times):
+    return dict((e, _parse_time(t)) for e, t in times.items())
+
+
+def _parse_time(time):
+    if time is None:
+        return None
+    else:
+        dt = datetime.datetime.strptime(time, _TIME_FORMAT)
+        return pytz.utc.localize(dt)
+
+
+_default_cache = EphemCache()
+
+
+def get_default_cache():
+    
+    """
+    Gets this module's default cache.
+    
+    The default cache is a process-wide cache that is not persisted.
+    It is used by code (for example the `Schedule` class) that is not
+    given another cache to use.
+    """
+    
+    return _default_cache
@@ -65,6 +65,8 @@ _BODY_FACTORIES = {
     'Moon': ephem.Moon
 }
 
+BODIES = tuple(_BODY_FACTORIES.keys())
+
 # `ephem.Observer` horizons. These were chosen to make sunrise, sunset,
 # and the various dusk and dawn times computed with the
 # `ephem.Observer.next_rising` and `ephem.Observer.next_setting` methods
@@ -216,6 +218,28 @@ def get_illumination(body, lat, lon, time):
     return body.phase
 
 
+def get_body_data(body, lat, lon, time):
+    
+    """
+    Gets the altitude, azimuth, and illumination of a body.
+    
+    This is faster than calling `get_altitude`, `get_azimuth`, and
+    `get_illumination` separately since it computes the position of
+    the body only once.
+    
+    Returns
+    -------
+    tuple
+        (altitude, azimuth, illumination) triple. The altitude and
+        azimuth are in degrees, and the illumination is in percent.
+    """
+    
+    body = _create_body(body, lat, lon, time)
+    return (
+        math.degrees(float(body.alt)), math.degrees(float(body.az)),
+        body.phase)
+
+
 # The following was part of an interrupted effort to add new twilight
 # period measurements to the `vesper.mpg_ranch.clip_metadata_csv_file_exporter`
 # module. It is not complete, and should be replaced by new code when
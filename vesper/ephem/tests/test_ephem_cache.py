@@ -0,0 +1,154 @@
+from pathlib import Path
+import datetime
+import tempfile
+
+import numpy as np
+
+from vesper.ephem.ephem_cache import EphemCache
+from vesper.tests.test_case import TestCase
+import vesper.ephem.ephem_cache as ephem_cache
+import vesper.ephem.ephem_utils as ephem_utils
+import vesper.util.time_utils as time_utils
+
+
+_LAT = 42.45
+_LON = -76.3
+_DATE = datetime.date(2020, 5, 15)
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+class EphemCacheTests(TestCase):
+    
+    
+    def test_get_event_time(self):
+        
+        cache = EphemCache()
+        
+        events = ephem_cache.SOLAR_EVENTS + ('Moonrise', 'Moonset')
+        
+        for event in events:
+            expected = ephem_utils.get_event_time(event, _LAT, _LON, _DATE)
+            actual = cache.get_event_time(event, _LAT, _LON, _DATE)
+            self.assertEqual(actual, expected)
+            
+        self._assert_raises(
+            ValueError, cache.get_event_time, 'Bobo', _LAT, _LON, _DATE)
+            
+            
+    def test_get_night_solar_event_times(self):
+        
+        cache = EphemCache()
+        
+        times = cache.get_night_solar_event_times(_LAT, _LON, _DATE)
+        
+        self.assertEqual(
+            times['Sunset'],
+            ephem_utils.get_event_time('Sunset', _LAT, _LON, _DATE))
+        self.assertEqual(
+            times['Sunrise'],
+            ephem_utils.get_event_time(
+                'Sunrise', _LAT, _LON, _DATE + _ONE_DAY))
+                
+        for event in ephem_cache.SOLAR_EVENTS:
+            self.assertIn(event, times)
+            
+            
+    def test_persistence(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Ephemeris Cache.json'
+            
+            cache = EphemCache(file_path)
+            expected = cache.get_night_solar_event_times(_LAT, _LON, _DATE)
+            cache.save()
+            
+            self.assertTrue(file_path.exists())
+            
+            cache = EphemCache(file_path)
+            self.assertEqual(
+                cache._event_times[(_LAT, _LON, _DATE)]['Sunset'],
+                expected['Sunset'])
+            actual = cache.get_night_solar_event_times(_LAT, _LON, _DATE)
+            self.assertEqual(actual, expected)
+            
+            
+    def test_save_merges_file_times(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Ephemeris Cache.json'
+            
+            # Two caches that share a file, as for two processes, each
+            # compute times for a different date and save them.
+            dates = (_DATE, _DATE + 10 * _ONE_DAY)
+            caches = [EphemCache(file_path) for _ in dates]
+            expected = [
+                cache.get_event_time('Sunset', _LAT, _LON, date)
+                for cache, date in zip(caches, dates)]
+            for cache in caches:
+                cache.save()
+                
+            # The file should contain the times of both caches.
+            cache = EphemCache(file_path)
+            for date, time in zip(dates, expected):
+                self.assertEqual(
+                    cache._event_times[(_LAT, _LON, date)]['Sunset'], time)
+                    
+                    
+    def test_get_body_data(self):
+        
+        cache = EphemCache()
+        
+        start_time = time_utils.create_utc_datetime(2020, 5, 16, 1)
+        times = [
+            start_time + datetime.timedelta(seconds=s)
+            for s in np.arange(0, 8 * 3600, 317.3)]
+            
+        for body in ephem_utils.BODIES:
+            
+            data = cache.get_body_data(body, _LAT, _LON, times)
+            
+            self.assertEqual(len(data.altitude), len(times))
+            
+            for i, time in enumerate(times):
+                
+                altitude, azimuth, illumination = \
+                    ephem_utils.get_body_data(body, _LAT, _LON, time)
+                    
+                self.assertAlmostEqual(data.altitude[i], altitude, places=2)
+                self.assertAlmostEqual(
+                    data.illumination[i], illumination, places=2)
+                    
+                azimuth_diff = abs(data.azimuth[i] - azimuth) % 360
+                azimuth_diff = min(azimuth_diff, 360 - azimuth_diff)
+                self.assertLess(azimuth_diff, .05)
+                
+            # Check single-time methods.
+            self.assertEqual(
+                cache.get_altitude(body, _LAT, _LON, times[3]),
+                data.altitude[3])
+                
+        self._assert_raises(
+            ValueError, cache.get_body_data, 'Bobo', _LAT, _LON, times)
+            
+            
+    def test_grid_value_count_limit(self):
+        
+        cache = EphemCache(max_grid_value_count=10)
+        
+        start_time = time_utils.create_utc_datetime(2020, 5, 16, 1)
+        
+        # Get data for more grid points than the cache holds. The data
+        # should be correct even though some of the grid values needed
+        # to compute them are discarded.
+        times = [
+            start_time + datetime.timedelta(seconds=s)
+            for s in np.arange(0, 3600, 317.3)]
+        data = cache.get_body_data('Sun', _LAT, _LON, times)
+        
+        self.assertEqual(len(cache._grid_values[('Sun', _LAT, _LON)]), 10)
+        
+        for i, time in enumerate(times):
+            altitude, _, _ = ephem_utils.get_body_data('Sun', _LAT, _LON, time)
+            self.assertAlmostEqual(data.altitude[i], altitude, places=2)
@@ -2,17 +2,17 @@
 
 
 import datetime
+import functools
 import os.path
 
 import pytz
 
 from vesper.command.command import CommandExecutionError
 from vesper.django.app.models import AnnotationInfo, StringAnnotation
-from vesper.singletons import clip_manager
+from vesper.singletons import clip_manager, ephem_cache
 from vesper.util.bunch import Bunch
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
-import vesper.ephem.ephem_utils as ephem_utils
 import vesper.util.os_utils as os_utils
 import vesper.util.yaml_utils as yaml_utils
 
@@ -267,12 +267,29 @@ class ClipMetadataCsvFileExporter(object):
         return True
         
         
+    def export_clips(self, clips):
+        
+        # Measure clips one column at a time, so that measurements
+        # that support it can measure all of the clips at once.
+        columns = [_get_column_values(c, clips) for c in self._columns]
+        
+        for values in zip(*columns):
+            self._lines.append(','.join(values))
+            
+        return len(clips)
+    
+    
     def end_exports(self):
+        
         table = '\n'.join(self._lines) + '\n'
         try:
             os_utils.write_file(self._output_file_path, table)
         except OSError as e:
             raise CommandExecutionError(str(e))
+            
+        # Persist any solar event times computed during the export
+        # so later exports need not compute them again.
+        ephem_cache.instance.save()
         
         
 def _create_table_columns(table_format):
@@ -342,8 +359,23 @@ def _get_column_format(column):
     
     
 def _get_column_value(column, clip):
-    
     value = column.measurement.measure(clip)
+    return _format_column_value(column, value)
+    
+
+def _get_column_values(column, clips):
+    
+    measurement = column.measurement
+    
+    if hasattr(measurement, 'measure_clips'):
+        values = measurement.measure_clips(clips)
+    else:
+        values = [measurement.measure(clip) for clip in clips]
+        
+    return [_format_column_value(column, value) for value in values]
+
+
+def _format_column_value(column, value):
     
     format_ = column.format
     
@@ -386,7 +418,7 @@ def _get_time(clip, event, increment_date=False):
         return None
     
     try:
-        time = ephem_utils.get_event_time(event, lat, lon, date)
+        time = ephem_cache.instance.get_event_time(event, lat, lon, date)
     except ValueError:
         return None
     
@@ -396,6 +428,7 @@ def _get_time(clip, event, increment_date=False):
     return time
 
     
+@functools.lru_cache(maxsize=None)
 def _get_time_zone(name):
     return pytz.timezone(name)
 
@@ -560,40 +593,67 @@ class FileNameMeasurement(object):
             return os.path.basename(audio_file_path)
     
     
-class MoonAltitudeMeasurement(object):
+class _EphemMeasurement(object):
     
-    name = 'Moon Altitude'
     
-    def measure(self, clip):
-        return _get_ephem(ephem_utils.get_altitude, 'Moon', clip)
+    # Subclasses set the `name`, `body`, and `quantity` class
+    # attributes, where `quantity` is the name of an attribute of
+    # the value of `EphemCache.get_body_data`.
     
     
-def _get_ephem(function, body, clip):
+    def measure(self, clip):
+        return self.measure_clips([clip])[0]
+    
+    
+    def measure_clips(self, clips):
+        
+        # Group clips by station location, so we can get ephemeris
+        # data for all of the clips at a location with one call.
+        # The clips of an export batch typically all have the same
+        # station and night.
+        locations = {}
+        for i, clip in enumerate(clips):
+            station = clip.station
+            lat = station.latitude
+            lon = station.longitude
+            if lat is not None and lon is not None:
+                locations.setdefault((lat, lon), []).append(i)
+                
+        values = [None] * len(clips)
+        
+        cache = ephem_cache.instance
+        
+        for (lat, lon), indices in locations.items():
+            
+            times = [clips[i].start_time for i in indices]
+            data = cache.get_body_data(self.body, lat, lon, times)
+            
+            # Convert NumPy values to `float` for formatting.
+            for i, value in zip(indices, getattr(data, self.quantity)):
+                values[i] = float(value)
+                
+        return values
     
-    station = clip.station
-    lat = station.latitude
-    lon = station.longitude
     
-    if lat is None or lon is None:
-        return None
-    else:
-        return function(body, lat, lon, clip.start_time)
+class MoonAltitudeMeasurement(_EphemMeasurement):
     
+    name = 'Moon Altitude'
+    body = 'Moon'
+    quantity = 'altitude'
     
-class MoonAzimuthMeasurement(object):
     
-    name = 'Moon Azimuth'
+class MoonAzimuthMeasurement(_EphemMeasurement):
     
-    def measure(self, clip):
-        return _get_ephem(ephem_utils.get_azimuth, 'Moon', clip)
+    name = 'Moon Azimuth'
+    body = 'Moon'
+    quantity = 'azimuth'
     
     
-class MoonIlluminationMeasurement(object):
+class MoonIlluminationMeasurement(_EphemMeasurement):
     
     name = 'Moon Illumination'
-    
-    def measure(self, clip):
-        return _get_ephem(ephem_utils.get_illumination, 'Moon', clip)
+    body = 'Moon'
+    quantity = 'illumination'
     
     
 class NauticalDawnMeasurement(object):
@@ -683,20 +743,18 @@ class StationMeasurement(object):
         return clip.station.name
     
     
-class SunAltitudeMeasurement(object):
+class SunAltitudeMeasurement(_EphemMeasurement):
     
     name = 'Sun Altitude'
-    
-    def measure(self, clip):
-        return _get_ephem(ephem_utils.get_altitude, 'Sun', clip)
+    body = 'Sun'
+    quantity = 'altitude'
     
     
-class SunAzimuthMeasurement(object):
+class SunAzimuthMeasurement(_EphemMeasurement):
     
     name = 'Sun Azimuth'
-    
-    def measure(self, clip):
-        return _get_ephem(ephem_utils.get_azimuth, 'Sun', clip)
+    body = 'Sun'
+    quantity = 'azimuth'
     
     
 class SunriseTimeMeasurement(object):
@@ -5,6 +5,7 @@ import logging
 import tensorflow as tf
 
 from vesper.util.settings import Settings
+import vesper.mpg_ranch.tensorflow_predictor as tensorflow_predictor
 import vesper.util.yaml_utils as yaml_utils 
 
 
@@ -91,6 +92,17 @@ def load_model(training_name, epoch_num):
     return tf.keras.models.load_model(dir_path)
 
 
+def get_model_predictor_and_settings(training_name, epoch_num):
+    predictor = get_model_predictor(training_name, epoch_num)
+    settings = load_training_settings(training_name)
+    return predictor, settings
+
+
+def get_model_predictor(training_name, epoch_num):
+    dir_path = get_tensorflow_saved_model_dir_path(training_name, epoch_num)
+    return tensorflow_predictor.get_keras_model_predictor(dir_path)
+
+
 def load_training_settings(training_name):
     file_path = get_training_settings_file_path(training_name)
     logging.info(f'Loading annotator settings from "{file_path}"...')
@@ -12,14 +12,16 @@ class Inferrer:
     def __init__(self, start_model_info, end_model_info=None):
         
         self._start_model, self._start_settings = \
-            annotator_utils.load_model_and_settings(*start_model_info)
+            annotator_utils.get_model_predictor_and_settings(
+                *start_model_info)
         
         if end_model_info is None:
             self._end_model = self._start_model
             self._end_settings = self._start_settings
         else:
             self._end_model, self._end_settings = \
-                annotator_utils.load_model_and_settings(*end_model_info)
+                annotator_utils.get_model_predictor_and_settings(
+                    *end_model_info)
     
     
     @property
@@ -63,7 +65,7 @@ class Inferrer:
     
     def _get_call_bound_index(self, model, settings, gram_slices):
         
-        scores = model.predict(gram_slices).flatten()
+        scores = model.predict(gram_slices)
         
         if settings.bound_type == 'Start':
             offset = settings.call_start_index_offset
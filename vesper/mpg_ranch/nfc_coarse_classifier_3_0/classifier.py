@@ -28,6 +28,7 @@ import vesper.mpg_ranch.nfc_coarse_classifier_3_0.classifier_utils as \
     classifier_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_3_0.dataset_utils as \
     dataset_utils
+import vesper.mpg_ranch.tensorflow_predictor as tensorflow_predictor
 import vesper.util.open_mp_utils as open_mp_utils
 import vesper.util.signal_utils as signal_utils
 import vesper.util.yaml_utils as yaml_utils
@@ -116,10 +117,14 @@ class Classifier(Annotator):
         
         clip_lists = defaultdict(list)
         
+        if _EVALUATION_MODE_ENABLED:
+            annotated_clip_ids = frozenset()
+        else:
+            annotated_clip_ids = self._get_annotation_values(clips).keys()
+            
         for clip in clips:
             
-            if _EVALUATION_MODE_ENABLED or \
-                    self._get_annotation_value(clip) is None:
+            if clip.id not in annotated_clip_ids:
                 # clip should be classified
                 
                 clip_type = model_utils.get_clip_type(clip)
@@ -134,6 +139,9 @@ class Classifier(Annotator):
         
         
         num_clips_classified = 0
+        
+        # Normal mode annotations, which we create in bulk.
+        clip_values = []
             
         triples = classifier.classify_clips(clips)
         
@@ -160,8 +168,11 @@ class Classifier(Annotator):
                 else:
                     # normal mode
                     
-                    self._annotate(clip, auto_classification)
+                    clip_values.append((clip, auto_classification))
                     num_clips_classified += 1
+                    
+        if len(clip_values) != 0:
+            self._annotate_many(clip_values)
                         
         return num_clips_classified
 
@@ -267,8 +278,8 @@ class _Classifier:
         
         self.clip_type = clip_type
         
-        self._estimator = self._create_estimator()
         self._settings = self._load_settings()
+        self._predictor = self._create_predictor()
         
         # Configure waveform slicing.
         s = self._settings
@@ -285,12 +296,13 @@ class _Classifier:
         self._clip_manager = clip_manager.instance
     
     
-    def _create_estimator(self):
+    def _create_predictor(self):
         path = classifier_utils.get_tensorflow_model_dir_path(self.clip_type)
-        logging.info((
-            'Creating TensorFlow estimator from saved model in directory '
-            '"{}"...').format(path))
-        return tf.contrib.estimator.SavedModelEstimator(str(path))
+        s = self._settings
+        return tensorflow_predictor.get_saved_model_predictor(
+            path, s.model_input_name,
+            lambda waveforms: dataset_utils.compute_inference_spectrograms(
+                waveforms, s, s.model_input_name))
 
     
     def _load_settings(self):
@@ -314,12 +326,11 @@ class _Classifier:
             # have at least one waveform slice to classify
         
             # Stack waveform slices to make 2-D NumPy array.
-            self._waveforms = np.stack(waveforms)
+            waveforms = np.stack(waveforms)
         
             # logging.info('Scoring clip waveforms...')
             
-            scores = classifier_utils.score_dataset_examples(
-                self._estimator, self._create_dataset)
+            scores = self._predictor.predict(waveforms)
             
             # logging.info('Classifying clips...')
             
@@ -396,13 +407,6 @@ class _Classifier:
         return samples
 
         
-    def _create_dataset(self):
-        
-        return dataset_utils.create_spectrogram_dataset_from_waveforms_array(
-            self._waveforms, dataset_utils.DATASET_MODE_INFERENCE,
-            self._settings, batch_size=64,
-            feature_name=self._settings.model_input_name)
-    
     
     def _classify_clip(self, index, score, clips):
         
@@ -3,10 +3,13 @@
 
 import functools
 import math
+import time
 
 import numpy as np
 import tensorflow as tf
 
+from vesper.util.clips_hdf5_file import ClipsHdf5File
+from vesper.util.example_cache import ExampleCache
 import vesper.util.signal_utils as signal_utils
 import vesper.util.time_frequency_analysis_utils as tfa_utils
 
@@ -26,6 +29,17 @@ _WAVEFORM_DATASET_FEATURES = {
     'label': tf.FixedLenFeature((), tf.int64, default_value=0)
 }
 
+# Version of the format of cached spectrogram examples. Increment this
+# when the format changes to invalidate existing caches.
+_SPECTROGRAM_CACHE_VERSION = 1
+
+# Names of the arrays of cached spectrogram examples, in the order in
+# which they are passed to `_Preprocessor.process_cached_examples`.
+_SPECTROGRAM_CACHE_ARRAY_NAMES = ('spectrogram', 'label')
+_SPECTROGRAM_CACHE_ARRAY_TYPES = (tf.float32, tf.int64)
+
+_SPECTROGRAM_CACHE_BATCH_SIZE = 100
+
 
 def create_spectrogram_dataset_from_waveforms_array(
         waveforms, mode, settings, num_repeats=1, shuffle=False, batch_size=1,
@@ -36,27 +50,139 @@ def create_spectrogram_dataset_from_waveforms_array(
     return _create_spectrogram_dataset(
         dataset, mode, settings, num_repeats, shuffle, batch_size,
         feature_name)
+
+
+def compute_inference_spectrograms(
+        waveforms, settings, feature_name='spectrogram'):
+    
+    """
+    Builds a TensorFlow graph that computes inference spectrograms.
+    
+    The graph computes the same spectrograms as an inference mode
+    spectrogram dataset, but from a tensor of waveforms (for example
+    a placeholder) rather than a dataset. This allows the graph to be
+    run repeatedly on NumPy arrays of waveforms.
+    
+    Parameters
+    ----------
+    waveforms : TensorFlow tensor
+        a batch of waveforms, of shape (`None`, `None`).
+        
+    settings : Settings
+        classifier settings.
+        
+    feature_name : str
+        the name of the spectrogram feature.
+        
+    Returns
+    -------
+    TensorFlow tensor
+        the batch of spectrograms.
+    """
+    
+    preprocessor = _Preprocessor(
+        DATASET_MODE_INFERENCE, settings, feature_name)
+    
+    waveforms = waveforms[
+        :, preprocessor.time_start_index:preprocessor.time_end_index]
+    
+    features = preprocessor.compute_spectrograms(waveforms)
+    
+    return features[feature_name]
     
     
 def create_spectrogram_dataset_from_waveform_files(
         dir_path, mode, settings, num_repeats=1, shuffle=False, batch_size=1,
-        feature_name='spectrogram'):
+        feature_name='spectrogram', cache_dir_path=None):
+    
+    """
+    Creates a spectrogram dataset from a directory of TFRecord
+    waveform files.
+    
+    If `cache_dir_path` is not `None` and `mode` is not
+    `DATASET_MODE_INFERENCE`, the dataset's spectrograms are read from
+    a spectrogram cache in the specified directory, which is created
+    if needed (see `_create_cached_spectrogram_dataset`).
+    """
     
-    dataset = create_waveform_dataset_from_waveform_files(dir_path)
+    if cache_dir_path is not None and mode != DATASET_MODE_INFERENCE:
+        
+        return _create_cached_spectrogram_dataset(
+            dir_path, mode, settings, num_repeats, shuffle, batch_size,
+            feature_name, cache_dir_path)
+        
+    dataset = create_waveform_dataset_from_waveform_files(
+        dir_path, settings.num_dataset_parallel_calls)
     
     return _create_spectrogram_dataset(
         dataset, mode, settings, num_repeats, shuffle, batch_size,
         feature_name)
 
     
-def create_waveform_dataset_from_waveform_files(dir_path):
+def create_spectrogram_dataset_from_hdf5_file(
+        file_path, get_label, mode, settings, num_repeats=1, shuffle=False,
+        batch_size=1, feature_name='spectrogram', max_num_clips=None):
+    
+    """
+    Creates a spectrogram dataset from a clips HDF5 file.
+    
+    The file must have the arrays layout written by the clips HDF5
+    file exporter. `get_label` is a function that maps a clip
+    classification to an integer label, or to `None` to exclude
+    the clip from the dataset.
+    """
+    
+    dataset = create_waveform_dataset_from_hdf5_file(
+        file_path, get_label, max_num_clips)
+    
+    return _create_spectrogram_dataset(
+        dataset, mode, settings, num_repeats, shuffle, batch_size,
+        feature_name)
+    
+    
+def create_waveform_dataset_from_hdf5_file(
+        file_path, get_label, max_num_clips=None):
+    
+    # Read all clip samples and classifications with a few large
+    # HDF5 reads rather than one read per clip.
+    arrays = ClipsHdf5File(file_path).read_arrays(max_num_clips)
+    
+    labels = [get_label(c) for c in arrays.classification]
+    indices = [i for i, label in enumerate(labels) if label is not None]
+    
+    waveforms = arrays.samples[indices]
+    labels = np.array([labels[i] for i in indices], dtype=np.int64)
+    
+    return tf.data.Dataset.from_tensor_slices((waveforms, labels))
+
+    
+def create_waveform_dataset_from_waveform_files(
+        dir_path, num_parallel_reads=None):
+    
+    """
+    Creates a waveform dataset from a directory of TFRecord waveform
+    files.
+    
+    If `num_parallel_reads` is not `None`, that many files are read in
+    parallel, with their records interleaved in a deterministic order.
+    Otherwise the files are read one after another.
+    """
+    
+    file_paths = _get_waveform_file_paths(dir_path)
+    
+    dataset = tf.data.TFRecordDataset(
+        file_paths, num_parallel_reads=num_parallel_reads)
+    
+    return dataset.map(
+        _parse_example, num_parallel_calls=num_parallel_reads)
+
+
+def _get_waveform_file_paths(dir_path):
     
     file_path_pattern = str(dir_path / '*.tfrecords')
     
     # Get file paths matching pattern. Sort the paths for consistency.
-    file_paths = sorted(tf.gfile.Glob(file_path_pattern))
-    
-    return tf.data.TFRecordDataset(file_paths).map(_parse_example)
+    return sorted(tf.gfile.Glob(file_path_pattern))
 
 
 def _parse_example(example_proto):
@@ -102,6 +228,153 @@ def _create_spectrogram_dataset(
     return dataset
 
 
+def _create_cached_spectrogram_dataset(
+        dir_path, mode, settings, num_repeats, shuffle, batch_size,
+        feature_name, cache_dir_path):
+    
+    """
+    Creates a spectrogram dataset from a spectrogram cache.
+    
+    Spectrogram computation, rather than the neural network, limits
+    the training speed of our classifiers on CPU-only machines, but
+    most of it is the same for every epoch of training and every
+    training run with the same preprocessing settings. So we compute
+    the squared spectrograms of a dataset's waveforms once and store
+    them in an `ExampleCache`, keyed by the dataset files and the
+    preprocessing settings that influence them. The log, clipping,
+    and normalization settings do not influence the cached
+    spectrograms, so for example the pretraining runs that compute
+    clipping and normalization settings and the training run that
+    follows them share a cache.
+    
+    Random waveform time shifting is applied to the cached
+    spectrograms (see `_Preprocessor.process_cached_examples`), with
+    the difference that time shifts are whole numbers of spectrogram
+    hops.
+    """
+    
+    preprocessor = _Preprocessor(mode, settings, feature_name)
+    
+    cache = _get_spectrogram_cache(dir_path, preprocessor, cache_dir_path)
+    
+    if not cache.exists:
+        _write_spectrogram_cache(cache, dir_path, preprocessor)
+        
+    arrays = cache.read()
+    arrays = [arrays[name] for name in _SPECTROGRAM_CACHE_ARRAY_NAMES]
+    num_examples = cache.num_examples
+    
+    def get_examples(indices):
+        return tuple(a[indices] for a in arrays)
+    
+    def read_examples(indices):
+        
+        examples = tf.py_func(
+            get_examples, [indices], _SPECTROGRAM_CACHE_ARRAY_TYPES,
+            stateful=False)
+        
+        for example, array in zip(examples, arrays):
+            example.set_shape((None,) + array.shape[1:])
+            
+        return tuple(examples)
+    
+    # We shuffle and batch example indices rather than examples, so
+    # we can shuffle all of the examples of a dataset rather than
+    # just those in a shuffle buffer, and read the examples of a batch
+    # from the cache with one indexing operation.
+    dataset = tf.data.Dataset.range(num_examples)
+    
+    if shuffle:
+        dataset = dataset.shuffle(max(num_examples, 1))
+        
+    if num_repeats is None:
+        dataset = dataset.repeat()
+    elif num_repeats != 1:
+        dataset = dataset.repeat(num_repeats)
+        
+    dataset = dataset.batch(batch_size)
+    
+    dataset = dataset.map(
+        read_examples,
+        num_parallel_calls=settings.num_dataset_parallel_calls)
+    
+    dataset = dataset.map(
+        preprocessor.process_cached_examples,
+        num_parallel_calls=settings.num_dataset_parallel_calls)
+    
+    return dataset.prefetch(1)
+
+
+def _get_spectrogram_cache(dir_path, preprocessor, cache_dir_path):
+    
+    # Identify dataset files by path, size, and modification time, so
+    # that modifying a dataset invalidates its cache.
+    files = []
+    for file_path in _get_waveform_file_paths(dir_path):
+        stat = tf.gfile.Stat(file_path)
+        files.append([file_path, int(stat.length), int(stat.mtime_nsec)])
+        
+    key = {
+        'module': __name__,
+        'version': _SPECTROGRAM_CACHE_VERSION,
+        'files': files,
+        'preprocessing_settings': preprocessor.cache_settings
+    }
+    
+    return ExampleCache(cache_dir_path, key)
+
+
+def _write_spectrogram_cache(cache, dir_path, preprocessor):
+    
+    num_parallel_calls = preprocessor.settings.num_dataset_parallel_calls
+    
+    print('Caching spectrograms of dataset "{}" in "{}"...'.format(
+        dir_path, cache.dir_path))
+    
+    start_time = time.time()
+    
+    # We compute the spectrograms in a graph of their own, since we
+    # may be called from an estimator input function, in which case
+    # the default graph is the estimator's.
+    with tf.Graph().as_default():
+        
+        dataset = create_waveform_dataset_from_waveform_files(
+            dir_path, num_parallel_calls)
+        
+        dataset = dataset.map(
+            preprocessor.slice_cache_waveform,
+            num_parallel_calls=num_parallel_calls)
+        
+        dataset = dataset.batch(_SPECTROGRAM_CACHE_BATCH_SIZE)
+        
+        dataset = dataset.map(
+            preprocessor.compute_cache_examples,
+            num_parallel_calls=num_parallel_calls)
+        
+        dataset = dataset.prefetch(1)
+        
+        iterator = dataset.make_one_shot_iterator()
+        next_batch = iterator.get_next()
+        
+        with tf.Session() as session:
+            
+            def get_batches():
+                while True:
+                    try:
+                        yield session.run(next_batch)
+                    except tf.errors.OutOfRangeError:
+                        break
+                    
+            num_examples = cache.write(get_batches())
+            
+    elapsed_time = time.time() - start_time
+    rate = num_examples / elapsed_time if elapsed_time != 0 else 0
+    print((
+        'Cached spectrograms of {} examples in {:.1f} seconds, a rate of '
+        '{:.1f} examples per second.').format(
+            num_examples, elapsed_time, rate))
+
+
 class _Preprocessor:
     
     """
@@ -145,6 +418,9 @@ class _Preprocessor:
          
         self.waveform_length = self.time_end_index - self.time_start_index
                 
+        self.num_spectra = tfa_utils.get_num_analysis_records(
+            self.waveform_length, self.window_size, self.hop_size)
+                
         self.window_fn = functools.partial(
             tf.contrib.signal.hann_window, periodic=True)
         
@@ -156,6 +432,16 @@ class _Preprocessor:
         if self.random_waveform_time_shifting_enabled:
             self.max_waveform_time_shift = signal_utils.seconds_to_frames(
                 s.max_waveform_time_shift, s.waveform_sample_rate)
+            
+        # Maximum random time shift of cached spectrograms, in hops.
+        # Shifting a waveform by a whole number of hops shifts its
+        # spectrogram by the same number of spectra, so we can shift
+        # cached spectrograms by such amounts.
+        if self.random_waveform_time_shifting_enabled:
+            self.max_cached_time_shift = \
+                self.max_waveform_time_shift // self.hop_size
+        else:
+            self.max_cached_time_shift = 0
 
         
     def preprocess_waveform(self, waveform, label=None):
@@ -190,10 +476,15 @@ class _Preprocessor:
         
         """Computes spectrograms for a batch of waveforms."""
         
-        s = self.settings
-        
         # Set final dimension of waveforms, which comes to us as `None`.
-        self._set_waveforms_shape(waveforms)
+        self._set_waveforms_shape(waveforms, self.waveform_length)
+        
+        grams = self._compute_squared_spectrograms(waveforms)
+        
+        return self._get_spectrogram_features(grams, labels)
+    
+    
+    def _compute_squared_spectrograms(self, waveforms):
 
         # Compute STFTs.
         waveforms = tf.cast(waveforms, tf.float32)
@@ -208,6 +499,17 @@ class _Preprocessor:
         grams = tf.real(stfts * tf.conj(stfts))
         # gram = tf.abs(stft) ** 2
         
+        return grams
+    
+    
+    def _get_spectrogram_features(self, grams, labels):
+        
+        """
+        Gets features and labels for a batch of squared spectrograms.
+        """
+        
+        s = self.settings
+        
         # Take natural log of squared spectrograms. Adding an epsilon
         # avoids log-of-zero errors.
         grams = tf.log(grams + s.spectrogram_log_epsilon)
@@ -242,7 +544,91 @@ class _Preprocessor:
             return features, labels
     
     
-    def _set_waveforms_shape(self, waveforms):
+    @property
+    def cache_settings(self):
+        
+        """
+        The settings of this preprocessor that influence the examples
+        of a spectrogram cache.
+        """
+        
+        return {
+            'time_start_index': int(self.time_start_index),
+            'time_end_index': int(self.time_end_index),
+            'window_size': int(self.window_size),
+            'hop_size': int(self.hop_size),
+            'dft_size': int(self.dft_size),
+            'freq_start_index': int(self.freq_start_index),
+            'freq_end_index': int(self.freq_end_index),
+            'max_time_shift': int(self.max_cached_time_shift)
+        }
+    
+    
+    def slice_cache_waveform(self, waveform, label):
+        
+        """
+        Slices one input waveform for spectrogram caching.
+        
+        The slice includes the samples of all possible time shifts of
+        cached spectrograms.
+        """
+        
+        n = self.max_cached_time_shift * self.hop_size
+        waveform = waveform[self.time_start_index - n:self.time_end_index + n]
+        return waveform, label
+    
+    
+    def compute_cache_examples(self, waveforms, labels):
+        
+        """
+        Computes spectrogram cache examples for a batch of waveforms
+        sliced by `slice_cache_waveform`.
+        """
+        
+        num_shifts = 2 * self.max_cached_time_shift + 1
+        length = self.waveform_length + (num_shifts - 1) * self.hop_size
+        
+        self._set_waveforms_shape(waveforms, length)
+        
+        grams = self._compute_squared_spectrograms(waveforms)
+        
+        return {'spectrogram': grams, 'label': labels}
+    
+    
+    def process_cached_examples(self, grams, labels):
+        
+        """
+        Computes spectrogram features and labels for a batch of cached
+        examples.
+        
+        This method performs the same processing as `preprocess_waveform`
+        followed by `compute_spectrograms`, except that random time shifts
+        are whole numbers of spectrogram hops.
+        """
+        
+        batch_size = tf.shape(grams)[0]
+        
+        # Get random time shift indices in [0, 2 * max shift], each the
+        # index of the first spectrum of a shifted spectrogram.
+        n = self.max_cached_time_shift
+        if n != 0:
+            shifts = tf.random.uniform(
+                (batch_size,), 0, 2 * n + 1, dtype=tf.int32)
+        else:
+            shifts = tf.zeros((batch_size,), dtype=tf.int32)
+            
+        # Slice spectrograms.
+        m = self.num_spectra
+        spectrum_nums = \
+            tf.expand_dims(shifts, 1) + tf.expand_dims(tf.range(m), 0)
+        example_nums = tf.tile(tf.expand_dims(tf.range(batch_size), 1), (1, m))
+        grams = tf.gather_nd(
+            grams, tf.stack((example_nums, spectrum_nums), axis=2))
+        
+        return self._get_spectrogram_features(grams, labels)
+    
+    
+    def _set_waveforms_shape(self, waveforms, length):
         
         """
         Sets the final dimension of a batch of waveforms.
@@ -255,7 +641,7 @@ class _Preprocessor:
         """
         
         dims = list(waveforms.shape.dims)
-        dims[-1] = tf.Dimension(self.waveform_length)
+        dims[-1] = tf.Dimension(length)
         shape = tf.TensorShape(dims)
         waveforms.set_shape(shape)
         
@@ -51,6 +51,11 @@ DATASETS_DIR_PATH = ML_DIR_PATH / 'Datasets' / CALL_TYPE
 MODELS_DIR_PATH = ML_DIR_PATH / 'Models' / CALL_TYPE
 SAVED_MODELS_DIR_NAME = 'Saved Models'
 
+# Directory of spectrogram caches, which speed up training by letting
+# training runs with the same dataset and spectrogram settings reuse
+# precomputed spectrograms. Set this to `None` to disable caching.
+SPECTROGRAM_CACHE_DIR_PATH = ML_DIR_PATH / 'Spectrogram Caches'
+
 RESULTS_DIR_PATH = BASE_DIR_PATH / 'ML Results'
 PR_PLOT_FILE_NAME_FORMAT = '{} PR.pdf'
 ROC_PLOT_FILE_NAME_FORMAT = '{} ROC.pdf'
@@ -601,7 +606,7 @@ def create_spectrogram_dataset(
     
     return dataset_utils.create_spectrogram_dataset_from_waveform_files(
         dir_path, dataset_mode, settings, num_repeats, shuffle, batch_size,
-        feature_name)
+        feature_name, SPECTROGRAM_CACHE_DIR_PATH)
 
 
 def compute_spectrogram_normalization_settings(settings):
@@ -755,7 +760,9 @@ class Classifier:
         
         if not s.warm_start_enabled:
             rate = s.num_training_steps / elapsed_time
-            rate_text = ', a rate of {:.1f} steps per second'.format(rate)
+            rate_text = (
+                ', a rate of {:.1f} steps, or {:.1f} examples, per '
+                'second').format(rate, rate * s.training_batch_size)
         else:
             rate_text = ''
             
@@ -31,6 +31,7 @@ import vesper.mpg_ranch.nfc_coarse_classifier_3_0.classifier_utils \
     as classifier_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_3_0.dataset_utils \
     as dataset_utils
+import vesper.mpg_ranch.tensorflow_predictor as tensorflow_predictor
 import vesper.util.open_mp_utils as open_mp_utils
 import vesper.util.signal_utils as signal_utils
 
@@ -119,7 +120,7 @@ class _Detector:
         self._input_chunk_start_index = 0
         
         self._classifier_settings = self._load_classifier_settings()
-        self._estimator = self._create_estimator()
+        self._predictor = self._create_predictor()
         
         s = self._classifier_settings
         fs = s.waveform_sample_rate
@@ -170,20 +171,14 @@ class _Detector:
         return Settings.create_from_yaml_file(path)
         
         
-    def _create_estimator(self):
-        s = self._settings
-        path = classifier_utils.get_tensorflow_model_dir_path(s.clip_type)
-        logging.info((
-            'Creating TensorFlow estimator from saved model in directory '
-            '"{}"...').format(path))
-        return tf.contrib.estimator.SavedModelEstimator(str(path))
-
-    
-    def _create_dataset(self):
+    def _create_predictor(self):
+        path = classifier_utils.get_tensorflow_model_dir_path(
+            self._settings.clip_type)
         s = self._classifier_settings
-        return dataset_utils.create_spectrogram_dataset_from_waveforms_array(
-            self._waveforms, dataset_utils.DATASET_MODE_INFERENCE, s,
-            batch_size=64, feature_name=s.model_input_name)
+        return tensorflow_predictor.get_saved_model_predictor(
+            path, s.model_input_name,
+            lambda waveforms: dataset_utils.compute_inference_spectrograms(
+                waveforms, s, s.model_input_name))
     
     
     def detect(self, samples):
@@ -231,17 +226,16 @@ class _Detector:
             #     'or {:.1f} times faster than real time.').format(
             #         input_duration, processing_time, rate))
 
-        self._waveforms = _get_analysis_records(
+        waveforms = _get_analysis_records(
             samples, self._classifier_waveform_length, self._hop_size)
         
 #         print('Scoring chunk waveforms...')
 #         start_time = time.time()
          
-        scores = classifier_utils.score_dataset_examples(
-            self._estimator, self._create_dataset)
+        scores = self._predictor.predict(waveforms)
         
 #         elapsed_time = time.time() - start_time
-#         num_waveforms = self._waveforms.shape[0]
+#         num_waveforms = waveforms.shape[0]
 #         rate = num_waveforms / elapsed_time
 #         print((
 #             'Scored {} waveforms in {:.1f} seconds, a rate of {:.1f} '
@@ -30,7 +30,9 @@ import vesper.mpg_ranch.nfc_coarse_classifier_4_0.classifier_utils \
     as classifier_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_4_0.dataset_utils \
     as dataset_utils
+import vesper.mpg_ranch.tensorflow_predictor as tensorflow_predictor
 import vesper.signal.resampling_utils as resampling_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.open_mp_utils as open_mp_utils
 import vesper.util.signal_utils as signal_utils
 
@@ -122,7 +124,7 @@ class _Detector:
         self._input_chunk_start_index = 0
         
         self._classifier_settings = self._load_classifier_settings()
-        self._estimator = self._create_estimator()
+        self._predictor = self._create_predictor()
         
         s = self._classifier_settings
         
@@ -180,20 +182,14 @@ class _Detector:
         return Settings.create_from_yaml_file(path)
         
         
-    def _create_estimator(self):
-        s = self._settings
-        path = classifier_utils.get_tensorflow_model_dir_path(s.clip_type)
-        logging.info((
-            'Creating TensorFlow estimator from saved model in directory '
-            '"{}"...').format(path))
-        return tf.contrib.estimator.SavedModelEstimator(str(path))
-
-    
-    def _create_dataset(self):
+    def _create_predictor(self):
+        path = classifier_utils.get_tensorflow_model_dir_path(
+            self._settings.clip_type)
         s = self._classifier_settings
-        return dataset_utils.create_spectrogram_dataset_from_waveforms_array(
-            self._waveforms, dataset_utils.DATASET_MODE_INFERENCE, s,
-            batch_size=64, feature_name=s.model_input_name)
+        return tensorflow_predictor.get_saved_model_predictor(
+            path, s.model_input_name,
+            lambda waveforms: dataset_utils.compute_inference_spectrograms(
+                waveforms, s, s.model_input_name))
     
     
     def detect(self, samples):
@@ -254,35 +250,25 @@ class _Detector:
             else:
                 self._purported_input_sample_rate = self._input_sample_rate
              
-            # start_time = time.time()
-            
-            samples = resampling_utils.resample_to_24000_hz(
-                samples, self._purported_input_sample_rate)
-            
-            # processing_time = time.time() - start_time
-            # input_duration = input_length / self._input_sample_rate
-            # rate = input_duration / processing_time
-            # print((
-            #     'Resampled {:.1f} seconds of input in {:.1f} seconds, '
-            #     'or {:.1f} times faster than real time.').format(
-            #         input_duration, processing_time, rate))
+            with job_metrics.timer(job_metrics.RESAMPLING):
+                samples = resampling_utils.resample_to_24000_hz(
+                    samples, self._purported_input_sample_rate)
             
         else:
             # don't need to resample input
             
             self._purported_input_sample_rate = self._input_sample_rate
             
-        self._waveforms = _get_analysis_records(
+        waveforms = _get_analysis_records(
             samples, self._classifier_waveform_length, self._hop_size)
         
 #         print('Scoring chunk waveforms...')
 #         start_time = time.time()
          
-        scores = classifier_utils.score_dataset_examples(
-            self._estimator, self._create_dataset)
+        scores = self._predictor.predict(waveforms)
         
 #         elapsed_time = time.time() - start_time
-#         num_waveforms = self._waveforms.shape[0]
+#         num_waveforms = waveforms.shape[0]
 #         rate = num_waveforms / elapsed_time
 #         print((
 #             'Scored {} waveforms in {:.1f} seconds, a rate of {:.1f} '
@@ -10,7 +10,7 @@ import datetime
 import logging
 
 from vesper.command.annotator import Annotator
-import vesper.ephem.ephem_utils as ephem_utils
+from vesper.singletons import ephem_cache
 
 
 _logger = logging.getLogger()
@@ -47,7 +47,7 @@ class OutsideClassifier(Annotator):
             
         else:
         
-            get_event_time = ephem_utils.get_event_time
+            get_event_time = ephem_cache.instance.get_event_time
         
             night = station.get_night(clip.start_time)
             sunset_time = get_event_time('Sunset', lat, lon, night)
@@ -0,0 +1,227 @@
+"""
+Module containing long-lived TensorFlow model predictors.
+
+Creating a TensorFlow estimator from a SavedModel and calling its
+`predict` method rebuilds the model's graph, restores the model's
+variables, and starts a new TensorFlow session on every call. When
+a classifier or detector scores inputs a few at a time, for example
+when a classify command classifies the clips of thousands of station
+nights one night at a time, that setup can take much longer than the
+inference itself.
+
+The predictors of this module instead load a model once and keep it
+ready for use, scoring NumPy arrays directly without constructing
+`tf.data` datasets. The `get_saved_model_predictor` and
+`get_keras_model_predictor` functions create at most one predictor
+per model per process, so that all of the classifiers, detectors,
+and annotators of a process that use a model share one predictor.
+
+Predictors add the times of their preprocessing and inference to the
+job metrics of their process (see the `vesper.util.job_metrics`
+module).
+"""
+
+
+from threading import Lock
+import logging
+
+import numpy as np
+import tensorflow as tf
+
+import vesper.util.job_metrics as job_metrics
+
+
+_DEFAULT_BATCH_SIZE = 64
+
+
+_predictors = {}
+_predictors_lock = Lock()
+
+
+def get_saved_model_predictor(model_dir_path, input_name, preprocessor=None):
+    
+    """
+    Gets the predictor for a SavedModel exported from an estimator.
+    
+    The predictor is created the first time this function is called
+    for the model. Subsequent calls return the same predictor,
+    regardless of the other arguments.
+    
+    Parameters
+    ----------
+    model_dir_path : str or Path
+        the path of the SavedModel directory.
+        
+    input_name : str
+        the name of the model input.
+        
+    preprocessor : function or None
+        a function that builds the TensorFlow graph that computes
+        model input from predictor input. The function is called once,
+        with a `float32` tensor of shape (`None`, `None`), and must
+        return the model input tensor. If `None`, predictor input is
+        model input.
+    """
+    
+    key = ('SavedModel', str(model_dir_path))
+    
+    return _get_predictor(
+        key, SavedModelPredictor, model_dir_path, input_name, preprocessor)
+
+
+def _get_predictor(key, cls, *args):
+    
+    with _predictors_lock:
+        
+        predictor = _predictors.get(key)
+        
+        if predictor is None:
+            predictor = cls(*args)
+            _predictors[key] = predictor
+            
+        return predictor
+
+
+def get_keras_model_predictor(model_dir_path):
+    
+    """
+    Gets the predictor for a Keras model saved as a SavedModel.
+    
+    The predictor is created the first time this function is called
+    for the model. Subsequent calls return the same predictor.
+    """
+    
+    key = ('Keras', str(model_dir_path))
+    return _get_predictor(key, KerasModelPredictor, model_dir_path)
+
+
+class SavedModelPredictor:
+    
+    """
+    Predictor for a SavedModel exported from a TensorFlow estimator.
+    
+    A predictor loads its model into a TensorFlow session when it is
+    created and keeps the session open for the life of the predictor.
+    If it has a preprocessor, it also keeps open a second session that
+    computes model input from predictor input.
+    
+    The model must have a single output that has one element per input.
+    """
+    
+    
+    def __init__(self, model_dir_path, input_name, preprocessor=None):
+        
+        logging.info((
+            'Creating TensorFlow predictor from saved model in directory '
+            '"{}"...').format(model_dir_path))
+            
+        self._predictor = \
+            tf.contrib.predictor.from_saved_model(str(model_dir_path))
+            
+        self._input_name = input_name
+        
+        if preprocessor is None:
+            self._preprocessing_session = None
+            
+        else:
+            
+            graph = tf.Graph()
+            
+            with graph.as_default():
+                self._preprocessor_input = \
+                    tf.placeholder(tf.float32, shape=(None, None))
+                self._preprocessor_output = \
+                    preprocessor(self._preprocessor_input)
+                    
+            self._preprocessing_session = tf.Session(graph=graph)
+            
+        self._lock = Lock()
+        
+        
+    def predict(self, inputs, batch_size=_DEFAULT_BATCH_SIZE):
+        
+        """
+        Runs this predictor's model on the specified inputs.
+        
+        Parameters
+        ----------
+        inputs : NumPy array
+            the inputs, with the first axis indexing inputs.
+            
+        batch_size : int
+            the number of inputs to process at a time.
+            
+        Returns
+        -------
+        NumPy array
+            the one-dimensional array of model outputs.
+        """
+        
+        inputs = np.asarray(inputs)
+        
+        if len(inputs) == 0:
+            return np.zeros(0)
+            
+        with self._lock:
+            outputs = [
+                self._predict(inputs[i:i + batch_size])
+                for i in range(0, len(inputs), batch_size)]
+                
+        return np.concatenate(outputs)
+        
+        
+    def _predict(self, inputs):
+        
+        if self._preprocessing_session is not None:
+            with job_metrics.timer(job_metrics.SIGNAL_PROCESSING):
+                inputs = self._preprocessing_session.run(
+                    self._preprocessor_output,
+                    feed_dict={self._preprocessor_input: inputs})
+                
+        with job_metrics.timer(job_metrics.INFERENCE):
+            outputs = self._predictor({self._input_name: inputs})
+        
+        # `outputs` is a dictionary that contains a single item whose
+        # value is an array with one element per input.
+        return list(outputs.values())[0].flatten()
+
+
+class KerasModelPredictor:
+    
+    """Predictor for a Keras model saved as a SavedModel."""
+    
+    
+    def __init__(self, model_dir_path):
+        
+        logging.info(
+            f'Creating Keras predictor from saved model in directory '
+            f'"{model_dir_path}"...')
+            
+        self._model = tf.keras.models.load_model(str(model_dir_path))
+        
+        self._lock = Lock()
+        
+        
+    def predict(self, inputs, batch_size=_DEFAULT_BATCH_SIZE):
+        
+        """
+        Runs this predictor's model on the specified inputs.
+        
+        The parameters and return value are as for
+        `SavedModelPredictor.predict`.
+        """
+        
+        inputs = np.asarray(inputs)
+        
+        if len(inputs) == 0:
+            return np.zeros(0)
+            
+        # We use `predict_on_batch` rather than `predict` since the
+        # latter creates a dataset and iterator on every call.
+        with self._lock, job_metrics.timer(job_metrics.INFERENCE):
+            outputs = [
+                np.asarray(self._model.predict_on_batch(
+                    inputs[i:i + batch_size])).flatten()
+                for i in range(0, len(inputs), batch_size)]
+                
+        return np.concatenate(outputs)
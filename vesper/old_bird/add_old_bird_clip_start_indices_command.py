@@ -14,6 +14,7 @@ from vesper.old_bird.recording_reader import RecordingReader
 from vesper.singletons import archive, clip_manager, recording_manager
 from vesper.util.bunch import Bunch
 import vesper.command.command_utils as command_utils
+import vesper.old_bird.clip_aligner as clip_aligner
 import vesper.util.archive_lock as archive_lock
 import vesper.util.signal_utils as signal_utils
 import vesper.util.text_utils as text_utils
@@ -54,6 +55,9 @@ searching for its samples. That would take extra work, however,
 and the current approach has worked alright so far.
 """
 
+_CLIP_UPDATE_BATCH_SIZE = 500
+"""Number of clips per bulk database update."""
+
 _CLIP_SEARCH_TOLERANCE = 1
 """
 Search tolerance for sample value differences.
@@ -255,10 +259,13 @@ class AddOldBirdClipStartIndicesCommand(Command):
             
             with transaction.atomic():
             
+                # We order clips by start time so the clip aligner
+                # can find them in one pass through the recording.
                 clips = Clip.objects.filter(
                     recording_channel=channel,
                     creating_processor=detector,
-                    start_index=None)
+                    start_index=None
+                ).order_by('start_time')
                 
                 num_clips = clips.count()
                 num_clips_found = 0
@@ -271,13 +278,23 @@ class AddOldBirdClipStartIndicesCommand(Command):
                         f'Processing {count_text} for recording channel '
                         f'"{str(channel)}" and detector "{detector.name}...')
                         
-                    for clip in clips:
+                    search_padding = \
+                        int(round(_CLIP_SEARCH_PADDING * self._sample_rate))
+                        
+                    results = clip_aligner.align_clips(
+                        self._recording_reader, self._channel_num,
+                        self._recording_length,
+                        self._generate_clip_searches(clips), search_padding,
+                        _CLIP_SEARCH_TOLERANCE)
                         
-                        result = self._find_clip_in_recording_channel(clip)
+                    found_clips = []
+                            
+                    for clip, indices in results:
                         
-                        if result is not None:
+                        start_index = self._get_clip_start_index(
+                            clip, indices)
                             
-                            start_index = result[1]
+                        if start_index is not None:
                             
                             start_seconds = start_index / self._sample_rate
                             delta = datetime.timedelta(seconds=start_seconds)
@@ -300,10 +317,15 @@ class AddOldBirdClipStartIndicesCommand(Command):
                             clip.start_time = start_time
                             clip.end_time = end_time
                                 
-                            if not self._dry_run:
-                                clip.save()
+                            found_clips.append(clip)
                             
-                            num_clips_found += 1
+                    num_clips_found = len(found_clips)
+                    
+                    if not self._dry_run:
+                        Clip.objects.bulk_update(
+                            found_clips,
+                            ('start_index', 'start_time', 'end_time'),
+                            batch_size=_CLIP_UPDATE_BATCH_SIZE)
                             
                     if num_clips_found != num_clips:
                         self._log_clips_not_found(num_clips - num_clips_found)
@@ -317,7 +339,28 @@ class AddOldBirdClipStartIndicesCommand(Command):
         return self._recording_start_time + delta
 
 
-    def _find_clip_in_recording_channel(self, clip):
+    def _generate_clip_searches(self, clips):
+        
+        """
+        Generates (clip, approximate start index, clip samples) triples
+        for the clip aligner, skipping clips whose samples cannot be
+        obtained.
+        """
+        
+        for clip in clips:
+            
+            clip_samples = self._get_clip_samples(clip)
+            
+            if clip_samples is not None:
+                
+                start_delta = clip.start_time - self._recording_start_time
+                start_index = int(round(
+                    start_delta.total_seconds() * self._sample_rate))
+                    
+                yield clip, start_index, clip_samples
+                
+                
+    def _get_clip_samples(self, clip):
         
         if not clip_manager.instance.has_audio_file(clip):
             self._logger.warning(
@@ -339,37 +382,18 @@ class AddOldBirdClipStartIndicesCommand(Command):
                 f'    Audio file for clip "{str(clip)}" has zero length.')
             return None
         
-        start_delta = clip.start_time - self._recording_start_time
-        start_seconds = start_delta.total_seconds() - _CLIP_SEARCH_PADDING
-        start_index = int(round(start_seconds * self._sample_rate))
-        
-        padding_length = int(round(_CLIP_SEARCH_PADDING * self._sample_rate))
-        length = len(clip_samples) + 2 * padding_length
-        
-        # Adjust start index and length if search interval would extend
-        # past start of file.
-        if start_index < 0:
-            length += start_index
-            start_index = 0
-        
-        # Adjust length if search interval would extend past end of recording.
-        end_index = start_index + length
-        if end_index > self._recording_length:
-            length -= end_index - self._recording_length
-
-        # Read recording samples from file.
-        recording_samples = self._recording_reader.read_samples(
-            self._channel_num, start_index, length)
-        
-        # Find clip in recording samples. Note that we cannot just search
-        # for an exact copy of the clip samples in the recording samples,
-        # since the clip samples may differ slightly from the recording
-        # samples, presumably because of some scaling that happens inside
-        # the Old Bird detectors. So we allow each clip sample to differ
-        # from the corresponding recording sample by a magnitude of up to
-        # one.
-        indices = signal_utils.find_samples(
-            clip_samples, recording_samples, tolerance=_CLIP_SEARCH_TOLERANCE)
+        return clip_samples
+        
+        
+    def _get_clip_start_index(self, clip, indices):
+        
+        # Note that the clip aligner does not just search for an exact
+        # copy of the clip samples in the recording samples, since the
+        # clip samples may differ slightly from the recording samples,
+        # presumably because of some scaling that happens inside the
+        # Old Bird detectors. So we allow each clip sample to differ
+        # from the corresponding recording sample by a magnitude of up
+        # to one.
         
         if len(indices) == 0:
             self._logger.warning(
@@ -391,18 +415,7 @@ class AddOldBirdClipStartIndicesCommand(Command):
                     f'{clip.length} clip "{str(clip)}".')
                 return None
                 
-            # Get start index of clip in the whole recording.
-            clip_start_index = start_index + indices[0]
-                
-            # Extract clip samples from portion of recording in which
-            # they were found. We return these instead of the clip file
-            # samples since as explained above the recording samples
-            # may differ slightly from the clip file samples.
-            start_index = indices[0]
-            end_index = start_index + len(clip_samples)
-            clip_samples = recording_samples[start_index:end_index]
-            
-            return (clip_samples, clip_start_index)
+            return int(indices[0])
         
         
     def _log_clips_not_found(self, num_clips):
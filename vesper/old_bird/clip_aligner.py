@@ -0,0 +1,240 @@
+"""
+Module containing functions that locate clips in recordings.
+
+The original Old Bird detectors provide only approximate clip start
+times, so to find the exact start index of a clip in its recording we
+must search for the clip's samples in the recording. The `align_clips`
+function of this module does this for many clips of one recording
+channel in a single sequential pass through the channel, reading each
+recording sample at most once. The `find_clip` function, which
+`align_clips` uses to search for one clip, finds clip samples in
+recording samples up to a sample value tolerance.
+"""
+
+
+import numpy as np
+import scipy.signal as signal
+
+
+_DEFAULT_READ_SIZE = 2 ** 22
+"""Default recording read size, in sample frames."""
+
+_MAX_ANCHORS = 16
+"""Maximum number of anchor samples used to find clip match candidates."""
+
+_MAX_VERIFICATION_CANDIDATES = 64
+"""
+Maximum number of clip match candidates to verify directly.
+
+When anchor samples leave more than this many candidates, we narrow
+the candidates further by computing sums of squared differences
+between the clip and the recording via FFT cross-correlation.
+"""
+
+
+def align_clips(
+        reader, channel_num, recording_length, clips, search_padding,
+        tolerance=0, read_size=_DEFAULT_READ_SIZE):
+            
+    """
+    Finds clips in a recording channel.
+    
+    Parameters
+    ----------
+    reader : object
+        a recording reader, with a method `read_samples(channel_num,
+        start_index, length)` that returns a one-dimensional NumPy
+        array of recording samples.
+        
+    channel_num : int
+        the number of the recording channel in which to find clips.
+        
+    recording_length : int
+        the length of the recording in sample frames.
+        
+    clips : iterable of (object, int, NumPy array) triples
+        the clips to find. Each triple comprises an arbitrary clip
+        object, which this function returns with the clip's search
+        result, the approximate start index of the clip in the
+        recording, and the clip's samples. This function reads each
+        recording sample only once if the clips are in order of
+        increasing approximate start index.
+        
+    search_padding : int
+        the number of sample frames on either side of a clip's
+        approximate location in the recording in which to search
+        for the clip.
+        
+    tolerance : int or float
+        the maximum absolute difference between a clip sample and the
+        corresponding recording sample for the two to be considered
+        the same.
+        
+    read_size : int
+        the minimum number of sample frames to read from the recording
+        at a time.
+        
+    Yields
+    ------
+    (object, NumPy array) pairs
+        one pair per clip, comprising the clip's object and the start
+        indices in the recording of the matches found for the clip.
+    """
+    
+    # Recording samples read so far that might be needed to find
+    # remaining clips, and the index in the recording of the first
+    # of them.
+    buffer = np.zeros(0, dtype='int16')
+    buffer_start_index = 0
+    
+    for clip, approximate_start_index, clip_samples in clips:
+        
+        # Get search interval, clipped to recording.
+        start_index = max(approximate_start_index - search_padding, 0)
+        end_index = min(
+            approximate_start_index + len(clip_samples) + search_padding,
+            recording_length)
+            
+        if end_index <= start_index:
+            # search interval does not intersect recording
+            
+            yield clip, np.zeros(0, dtype='int64')
+            continue
+            
+        if start_index < buffer_start_index:
+            # clips not in order of increasing start index
+            
+            # Read search interval separately without disturbing buffer.
+            samples = reader.read_samples(
+                channel_num, start_index, end_index - start_index)
+                
+        else:
+            
+            # Discard buffered samples before search interval.
+            buffer = buffer[start_index - buffer_start_index:]
+            buffer_start_index = start_index
+            
+            # Read more samples if needed.
+            buffer_end_index = buffer_start_index + len(buffer)
+            if end_index > buffer_end_index:
+                length = min(
+                    max(end_index - buffer_end_index, read_size),
+                    recording_length - buffer_end_index)
+                samples = reader.read_samples(
+                    channel_num, buffer_end_index, length)
+                buffer = np.concatenate((buffer, samples))
+                
+            samples = buffer[:end_index - start_index]
+            
+        indices = find_clip(clip_samples, samples, tolerance)
+        
+        yield clip, indices + start_index
+
+
+def find_clip(clip_samples, samples, tolerance=0):
+    
+    """
+    Finds all occurrences of clip samples in recording samples.
+    
+    A clip occurs at an index of the recording samples if the absolute
+    differences between the clip samples and the recording samples
+    starting at that index are all at most the tolerance.
+    
+    This function does the same thing as `signal_utils.find_samples`,
+    but more efficiently when small prefixes of the clip samples occur
+    often in the recording samples, for example when a clip starts with
+    quiet or silent samples. It first narrows the set of indices at
+    which the clip might occur using *anchor samples*, the clip samples
+    with the largest magnitudes, which are typically rare in recording
+    samples. If many candidate indices remain, it narrows them further
+    by computing the sum of squared differences between the clip
+    samples and the recording samples at each index via FFT
+    cross-correlation. Finally, it verifies the remaining candidates
+    sample by sample.
+    
+    Parameters
+    ----------
+    clip_samples : one-dimensional NumPy array
+        the samples to be searched for.
+    samples : one-dimensional NumPy array
+        the samples to be searched in.
+    tolerance : int or float
+        the maximum allowed absolute sample difference.
+        
+    Returns
+    -------
+    NumPy array
+        the start indices of all occurrences of the clip samples in
+        the recording samples, in increasing order.
+    """
+    
+    m = len(clip_samples)
+    n = len(samples)
+    
+    if m == 0:
+        return np.arange(n)
+        
+    if m > n:
+        return np.zeros(0, dtype='int64')
+        
+    x = np.asarray(clip_samples, dtype='float64')
+    y = np.asarray(samples, dtype='float64')
+    
+    num_candidates = n - m + 1
+    
+    # Get anchor sample indices, in order of decreasing magnitude.
+    num_anchors = min(_MAX_ANCHORS, m)
+    anchors = np.argsort(-np.abs(x), kind='stable')[:num_anchors]
+    
+    # Find candidates using first anchor.
+    a = anchors[0]
+    diffs = np.abs(y[a:a + num_candidates] - x[a])
+    candidates = np.nonzero(diffs <= tolerance)[0]
+    
+    # Narrow candidates using remaining anchors.
+    for a in anchors[1:]:
+        
+        if len(candidates) <= 1:
+            break
+            
+        diffs = np.abs(y[candidates + a] - x[a])
+        candidates = candidates[diffs <= tolerance]
+        
+    if len(candidates) > _MAX_VERIFICATION_CANDIDATES:
+        candidates = _narrow_candidates(x, y, candidates, tolerance)
+        
+    return _verify_candidates(x, y, candidates, tolerance)
+
+
+def _narrow_candidates(x, y, candidates, tolerance):
+    
+    m = len(x)
+    
+    # Compute sums of squared differences between `x` and every
+    # length-`m` window of `y` from the cross-correlation of `x`
+    # and `y` and the energies of `x` and the windows of `y`.
+    correlation = signal.fftconvolve(y, x[::-1], mode='valid')
+    x_energy = np.dot(x, x)
+    cumulative_y_energy = np.concatenate(([0], np.cumsum(y * y)))
+    y_energies = cumulative_y_energy[m:] - cumulative_y_energy[:-m]
+    ssds = x_energy - 2 * correlation + y_energies
+    
+    # If all of the absolute differences between `x` and a window of
+    # `y` are at most `tolerance`, the sum of their squares is at most
+    # `m * tolerance ** 2`. We allow for round-off error in the sums,
+    # which is proportional to the energies involved.
+    slack = .5 + 1e-9 * (x_energy + y_energies[candidates])
+    max_ssd = m * tolerance ** 2 + slack
+    
+    return candidates[ssds[candidates] <= max_ssd]
+
+
+def _verify_candidates(x, y, candidates, tolerance):
+    
+    m = len(x)
+    
+    matches = [
+        i for i in candidates
+        if np.max(np.abs(y[i:i + m] - x)) <= tolerance]
+        
+    return np.array(matches, dtype='int64')
@@ -12,7 +12,7 @@ classification otherwise.
 import datetime
 
 from vesper.command.annotator import Annotator
-import vesper.ephem.ephem_utils as ephem_utils
+from vesper.singletons import ephem_cache
 
 
 _ONE_DAY = datetime.timedelta(days=1)
@@ -36,7 +36,7 @@ class LighthouseOutsideClassifier(Annotator):
         else:
             # clip is unclassified
         
-            get_event_time = ephem_utils.get_event_time
+            get_event_time = ephem_cache.instance.get_event_time
     
             station = clip.station
             lat = station.latitude
@@ -0,0 +1,132 @@
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+import vesper.old_bird.clip_aligner as clip_aligner
+import vesper.util.signal_utils as signal_utils
+
+
+class _Reader:
+    
+    
+    def __init__(self, samples):
+        self._samples = samples
+        self.num_samples_read = 0
+        
+        
+    def read_samples(self, channel_num, start_index, length):
+        self.num_samples_read += length
+        return self._samples[channel_num, start_index:start_index + length]
+
+
+class ClipAlignerTests(TestCase):
+    
+    
+    def test_find_clip(self):
+        
+        cases = [
+            
+            ([], [1, 2], 0, [0, 1]),
+            ([1, 2, 3], [1, 2], 0, []),
+            ([1], [1, 2, 1], 0, [0, 2]),
+            ([1, 2], [0, 1, 2, 1, 2], 0, [1, 3]),
+            ([1, 2], [0, 1, 3, 1, 2], 0, [3]),
+            ([1, 2], [0, 1, 3, 1, 2], 1, [0, 1, 3]),
+            ([0, 0, 5], [0, 0, 0, 0, 5, 0], 0, [2]),
+            ([0, 0, 5], [0, 0, 0, 0, 6, 0], 1, [2]),
+            ([0, 0, 5], [0, 0, 0, 0, 7, 0], 1, []),
+            
+        ]
+        
+        for clip_samples, samples, tolerance, expected in cases:
+            clip_samples = np.array(clip_samples, dtype='int16')
+            samples = np.array(samples, dtype='int16')
+            actual = clip_aligner.find_clip(clip_samples, samples, tolerance)
+            self._assert_arrays_equal(actual, np.array(expected))
+            
+            
+    def test_find_clip_against_find_samples(self):
+        
+        # Clips with many small samples leave many anchor candidates,
+        # exercising FFT candidate narrowing.
+        rng = np.random.default_rng(0)
+        
+        for _ in range(20):
+            
+            samples = rng.integers(-3, 4, 2000).astype('int16')
+            
+            start_index = int(rng.integers(0, 1900))
+            length = int(rng.integers(1, 100))
+            clip_samples = samples[start_index:start_index + length].copy()
+            clip_samples += rng.integers(-1, 2, length).astype('int16')
+            
+            for tolerance in (0, 1, 2):
+                expected = signal_utils.find_samples(
+                    clip_samples, samples, tolerance)
+                actual = clip_aligner.find_clip(
+                    clip_samples, samples, tolerance)
+                self._assert_arrays_equal(actual, expected)
+            
+            
+    def test_align_clips(self):
+        
+        rng = np.random.default_rng(1)
+        
+        num_channels = 2
+        recording_length = 100000
+        samples = rng.integers(
+            -10000, 10000, (num_channels, recording_length)).astype('int16')
+        
+        channel_num = 1
+        clip_length = 100
+        start_indices = list(range(10, recording_length - clip_length, 997))
+        
+        def get_clips(start_indices):
+            for i, start_index in enumerate(start_indices):
+                end_index = start_index + clip_length
+                clip_samples = samples[channel_num, start_index:end_index]
+                approximate_start_index = start_index + 50 - (i % 3) * 50
+                yield i, approximate_start_index, clip_samples + (i % 2)
+        
+        reader = _Reader(samples)
+        
+        results = list(clip_aligner.align_clips(
+            reader, channel_num, recording_length, get_clips(start_indices),
+            search_padding=60, tolerance=1, read_size=1000))
+        
+        self.assertEqual(len(results), len(start_indices))
+        
+        for (clip, indices), start_index in zip(results, start_indices):
+            self._assert_arrays_equal(indices, np.array([start_index]))
+            
+        # Each recording sample should be read at most once.
+        self.assertLessEqual(reader.num_samples_read, recording_length)
+        
+        # Clips out of order should also be found.
+        reversed_start_indices = start_indices[::-1]
+        results = list(clip_aligner.align_clips(
+            _Reader(samples), channel_num, recording_length,
+            get_clips(reversed_start_indices), search_padding=60,
+            tolerance=1, read_size=1000))
+        
+        for (clip, indices), start_index in \
+                zip(results, reversed_start_indices):
+            self._assert_arrays_equal(indices, np.array([start_index]))
+            
+            
+    def test_align_clips_outside_recording(self):
+        
+        samples = np.arange(20, dtype='int16').reshape((1, 20))
+        
+        clips = [
+            ('a', -10, np.array([0, 1], dtype='int16')),
+            ('b', 30, np.array([5, 6], dtype='int16')),
+            ('c', 17, np.array([18, 19], dtype='int16')),
+        ]
+        
+        results = list(clip_aligner.align_clips(
+            _Reader(samples), 0, 20, clips, search_padding=3))
+        
+        self.assertEqual([r[0] for r in results], ['a', 'b', 'c'])
+        self._assert_arrays_equal(results[0][1], np.array([], dtype='int64'))
+        self._assert_arrays_equal(results[1][1], np.array([], dtype='int64'))
+        self._assert_arrays_equal(results[2][1], np.array([18]))
@@ -234,23 +234,32 @@ class Detector:
     `ThrushDetector` classes of this module subclass the `Detector`
     class with fixed settings, namely `_TSEEP_SETTINGS` AND
     `_THRUSH_SETTINGS`, respectively.
+    
+    The detector's signal processors are streaming processors: each
+    processor buffers the few inputs of one call to its `process`
+    method that it will need again in the next call, and processes
+    each of its inputs only once. By default the processors compute
+    in double precision. The optional `dtype` initializer argument
+    can be `'float32'` to have them compute in single precision
+    instead, which is faster but yields slightly different
+    detection ratios.
     """
     
     
     def __init__(
             self, settings, input_sample_rate, listener,
-            debugging_listener=None):
+            debugging_listener=None, dtype='float64'):
         
         self._settings = settings
         self._input_sample_rate = input_sample_rate
         self._listener = listener
         self._debugging_listener = debugging_listener
+        self._dtype = np.dtype(dtype)
         
         self._signal_processor = self._create_signal_processor()
         self._series_processors = self._create_series_processors()
         
         self._num_samples_processed = 0
-        self._unprocessed_samples = np.array([], dtype='float')
         self._num_samples_generated = 0
         
 #         self._ratio_file_writer = RatioFileWriter(
@@ -266,17 +275,11 @@ class Detector:
         window_size = _seconds_to_samples(s.window_size, fs)
         hop_size = _seconds_to_samples(s.window_size * s.hop_size / 100, fs)
         dft_size = tfa_utils.get_dft_size(window_size)
-        spectrograph = _Spectrograph(
-            'Spectrograph', s.window_type, window_size, hop_size, dft_size, fs)
-        
-        bin_size = spectrograph.bin_size
-        start_bin_num = _get_start_bin_num(s.start_frequency, bin_size)
-        end_bin_num = _get_end_bin_num(s.end_frequency, bin_size)
-        frequency_integrator = _FrequencyIntegrator(
-            'Frequency Integrator', start_bin_num, end_bin_num,
-            spectrograph.output_sample_rate)
+        band_integrator = _BandEnergyIntegrator(
+            'Band Energy Integrator', s.window_type, window_size, hop_size,
+            dft_size, s.start_frequency, s.end_frequency, fs)
         
-        fs = frequency_integrator.output_sample_rate
+        fs = band_integrator.output_sample_rate
         power_filter = self._create_power_filter(fs)
         
         fs = power_filter.output_sample_rate
@@ -284,8 +287,7 @@ class Detector:
         divider = _Divider('Divider', delay, fs)
         
         processors = [
-            spectrograph,
-            frequency_integrator,
+            band_integrator,
             power_filter,
             divider
         ]
@@ -341,22 +343,11 @@ class Detector:
     
     def detect(self, samples):
         
-        # TODO: Consider having each signal processor keep track of which
-        # of its input samples it has processed, saving unprocessed samples
-        # for future calls to the `process` function, and remove such
-        # functionality from this class. This would reduce redundant
-        # computation and simplify this class, but require more storage
-        # (each processor would have to concatenate unprocessed samples
-        # to new samples in its `detect` method) and complicate the
-        # processor classes. A third alternative would be to move this
-        # functionality from this class to the `_SignalProcessorChain`
-        # class, but not to the other signal processor classes.
-        
-        # Concatenate unprocessed samples received in previous calls to
-        # this method with new samples.
-        samples = np.concatenate((self._unprocessed_samples, samples))
-        
-        # Run signal processors on samples.
+        samples = np.asarray(samples, dtype=self._dtype)
+        
+        # Run signal processors on samples. The processors buffer any
+        # samples of this and previous calls to this method that they
+        # need to compute future ratios, so we provide only new samples.
         ratios = self._signal_processor.process(samples)
            
         # self._ratio_file_writer.write(samples, ratios)
@@ -370,7 +361,6 @@ class Detector:
         num_samples_processed = \
             num_samples_generated * self._signal_processor.hop_size
         self._num_samples_processed += num_samples_processed
-        self._unprocessed_samples = samples[num_samples_processed:]
         self._num_samples_generated += num_samples_generated
             
             
@@ -506,15 +496,130 @@ class _SignalProcessor:
     
     
     def process(self, x):
+        
+        """
+        Processes the next inputs of this processor.
+        
+        The inputs are the ones that follow the inputs of the previous
+        call to this method, if any. The method returns the outputs
+        that can be computed from all of the inputs received so far
+        that it did not return in previous calls.
+        """
+        
         raise NotImplementedError()
     
+    
+class _BufferedSignalProcessor(_SignalProcessor):
+    
+    """
+    Signal processor that buffers inputs from one call to `process`
+    to the next.
+    
+    A buffered processor computes each of its outputs from a record
+    of `record_size` consecutive inputs, with the records of
+    consecutive outputs `hop_size` inputs apart. Since the records
+    overlap, some of the inputs of one call to `process` are also
+    needed to compute the outputs of the next call. The processor
+    keeps these inputs in a buffer that it reuses from call to call,
+    enlarging it only when necessary, so that it needn't reprocess
+    inputs of previous calls or concatenate arrays.
+    
+    Subclasses implement the `_process_records` method.
+    """
+    
+    
+    def __init__(self, name, record_size, hop_size, input_sample_rate):
+        super().__init__(name, record_size, hop_size, input_sample_rate)
+        self._buffer = None
+        self._buffer_length = 0
+        
+        
+    def process(self, x):
+        
+        x = self._append_to_buffer(x)
+        
+        num_outputs = tfa_utils.get_num_analysis_records(
+            len(x), self.record_size, self.hop_size)
+        
+        y = self._process_records(x, num_outputs)
         
-class _Spectrograph(_SignalProcessor):
+        # Keep only inputs needed for future outputs.
+        self._discard_from_buffer(num_outputs * self.hop_size)
+        
+        return y
+    
+    
+    def _append_to_buffer(self, x):
+        
+        start = self._buffer_length
+        end = start + len(x)
+        
+        if self._buffer is None or end > len(self._buffer):
+            # buffer too small for new inputs
+            
+            # Allocate a larger buffer and copy buffered inputs to it.
+            # The buffer is allocated with the type of the first input,
+            # and later inputs are converted to that type.
+            dtype = x.dtype if self._buffer is None else self._buffer.dtype
+            buffer = np.empty(max(end, 2 * self.record_size), dtype=dtype)
+            if start != 0:
+                buffer[:start] = self._buffer[:start]
+            self._buffer = buffer
+            
+        self._buffer[start:end] = x
+        self._buffer_length = end
+        
+        return self._buffer[:end]
+    
+    
+    def _discard_from_buffer(self, num_inputs):
+        
+        start = num_inputs
+        end = self._buffer_length
+        
+        if start != 0:
+            self._buffer[:end - start] = self._buffer[start:end]
+            self._buffer_length = end - start
+            
+            
+    def _process_records(self, x, num_outputs):
+        
+        """
+        Computes outputs from the specified buffered inputs.
+        
+        Parameters
+        ----------
+        x : NumPy array
+            the buffered inputs. The array is a view of the buffer,
+            so the returned outputs must not be views of it.
+            
+        num_outputs : int
+            the number of outputs to compute, one for each of the
+            first `num_outputs` records of `x`.
+            
+        Returns
+        -------
+        NumPy array
+            the outputs.
+        """
+        
+        raise NotImplementedError()
+    
+        
+class _BandEnergyIntegrator(_BufferedSignalProcessor):
+    
+    """
+    Computes the energies of hopped, windowed records in a frequency band.
+    
+    The integrator computes the same outputs as a spectrograph followed
+    by a summation over the spectrogram bins of the band, but computes
+    the spectral values of only those bins.
+    """
     
     
     def __init__(
             self, name, window_type, window_size, hop_size, dft_size,
-            input_sample_rate):
+            start_frequency, end_frequency, input_sample_rate):
         
         super().__init__(name, window_size, hop_size, input_sample_rate)
         
@@ -522,40 +627,103 @@ class _Spectrograph(_SignalProcessor):
         # self.window = HannWindow(window_size).samples
         self.dft_size = dft_size
         
+        bin_size = self.bin_size
+        self.start_bin_num = _get_start_bin_num(start_frequency, bin_size)
+        self.end_bin_num = _get_end_bin_num(end_frequency, bin_size)
+        
+        self._analyzer = tfa_utils.BandEnergyAnalyzer(
+            self.window, hop_size, [(self.start_bin_num, self.end_bin_num)],
+            dft_size)
+        
         
     @property
     def bin_size(self):
         return self.input_sample_rate / self.dft_size
     
     
-    def process(self, x):
-        return tfa_utils.compute_spectrogram(
-            x, self.window, self.hop_size, self.dft_size)
+    def _process_records(self, x, num_outputs):
+        return self._analyzer.compute_energies(x)[:, 0]
 
-
-class _FrequencyIntegrator(_SignalProcessor):
-    
-    
-    def __init__(self, name, start_bin_num, end_bin_num, input_sample_rate):
-        super().__init__(name, 1, 1, input_sample_rate)
-        self.start_bin_num = start_bin_num
-        self.end_bin_num = end_bin_num
         
-        
-    def process(self, x):
-        return x[:, self.start_bin_num:self.end_bin_num].sum(axis=1)
+_FIR_BLOCK_SIZE_FACTOR = 8
+"""
+Ratio of minimum overlap-save FIR filter block size to filter length.
 
-        
-class _FirFilter(_SignalProcessor):
+The block size of an FIR filter is the smallest power of two that is
+at least this factor times the filter length. Larger blocks compute
+more outputs per FFT, but are wasteful when each call to the filter's
+`process` method has only a few inputs.
+"""
+
+
+class _FirFilter(_BufferedSignalProcessor):
      
+    """
+    FIR filter.
+    
+    The filter uses the overlap-save method, filtering its input in
+    overlapping blocks of a fixed size with one FFT and one inverse
+    FFT per block. Since all of the FFTs are of the same size, the
+    FFT plans and the DFT of the filter coefficients are computed
+    once and then reused.
+    """
+    
      
     def __init__(self, name, coefficients, input_sample_rate):
+        
         super().__init__(name, len(coefficients), 1, input_sample_rate)
+        
         self.coefficients = coefficients
+        
+        self._block_size = tfa_utils.get_dft_size(
+            _FIR_BLOCK_SIZE_FACTOR * len(coefficients))
+        
+        # Mapping from NumPy dtypes to DFTs of filter coefficients.
+        self._coefficients_dfts = {}
          
          
-    def process(self, x):
-        return signal.fftconvolve(x, self.coefficients, mode='valid')
+    def _process_records(self, x, num_outputs):
+        
+        if num_outputs == 0:
+            return np.zeros(0, dtype=x.dtype)
+        
+        block_size = self._block_size
+        overlap = self.record_size - 1
+        block_hop_size = block_size - overlap
+        
+        num_blocks = -(-num_outputs // block_hop_size)
+        
+        # Copy inputs to zero-padded array that holds `num_blocks`
+        # overlapping blocks.
+        padded_size = (num_blocks - 1) * block_hop_size + block_size
+        padded = np.zeros(padded_size, dtype=x.dtype)
+        padded[:len(x)] = x
+        
+        # Get blocks as a view of the zero-padded array.
+        stride = padded.strides[0]
+        blocks = np.lib.stride_tricks.as_strided(
+            padded, (num_blocks, block_size),
+            (block_hop_size * stride, stride))
+        
+        # Filter blocks, discarding the first `overlap` outputs of each
+        # block, which are corrupted by circular convolution.
+        dfts = np.fft.rfft(blocks) * self._get_coefficients_dft(x.dtype)
+        y = np.fft.irfft(dfts, block_size)[:, overlap:]
+        
+        return y.reshape(-1)[:num_outputs]
+    
+    
+    def _get_coefficients_dft(self, dtype):
+        
+        try:
+            return self._coefficients_dfts[dtype]
+        
+        except KeyError:
+            
+            coefficients = self.coefficients.astype(dtype, copy=False)
+            dft = np.fft.rfft(coefficients, self._block_size)
+            self._coefficients_dfts[dtype] = dft
+            return dft
      
      
 class _FirPowerFilter(_FirFilter):
@@ -607,7 +775,7 @@ class _IirPowerFilter(_SignalProcessor):
         return y
 
 
-class _Divider(_SignalProcessor):
+class _Divider(_BufferedSignalProcessor):
      
      
     def __init__(self, name, delay, input_sample_rate):
@@ -615,13 +783,13 @@ class _Divider(_SignalProcessor):
         self.delay = delay
          
          
-    def process(self, x):
+    def _process_records(self, x, num_outputs):
         
         # Avoid potential divide-by-zero issues by replacing zero values
         # with very small ones.
         x[np.where(x == 0)] = 1e-20
          
-        return x[self.delay:] / x[:-self.delay]
+        return x[self.delay:self.delay + num_outputs] / x[:num_outputs]
              
     
 class _SignalProcessorChain(_SignalProcessor):
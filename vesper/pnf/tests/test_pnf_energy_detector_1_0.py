@@ -0,0 +1,126 @@
+import numpy as np
+
+from vesper.pnf.pnf_energy_detector_1_0 import (
+    _Divider, _FirFilter, _TSEEP_SETTINGS, Detector)
+from vesper.tests.test_case import TestCase
+
+
+_SAMPLE_RATE = 24000
+
+
+class _Listener:
+    
+    
+    def __init__(self):
+        self.clips = []
+        
+        
+    def process_clip(self, start_index, length, threshold):
+        self.clips.append((start_index, length, threshold))
+        
+        
+class _DebuggingListener:
+    
+    
+    def __init__(self):
+        self.samples = {}
+        
+        
+    def handle_samples(self, name, samples, sample_rate):
+        self.samples.setdefault(name, []).append(samples)
+        
+        
+    def get_samples(self, name):
+        return np.concatenate(self.samples[name])
+
+
+class PnfEnergyDetectorTests(TestCase):
+    
+    
+    def test_fir_filter(self):
+        
+        rng = np.random.default_rng(0)
+        coefficients = rng.normal(size=31)
+        x = rng.normal(size=5000)
+        expected = np.convolve(x, coefficients, mode='valid')
+        
+        for chunk_size in (1, 7, 30, 31, 100, 1000, 5000):
+            fir_filter = _FirFilter('Filter', coefficients, 400)
+            y = _process_in_chunks(fir_filter, x, chunk_size)
+            self._assert_arrays_close(y, expected)
+            
+            
+    def test_divider(self):
+        
+        x = np.arange(1, 101, dtype='float64')
+        expected = x[10:] / x[:-10]
+        
+        for chunk_size in (1, 3, 10, 11, 100):
+            divider = _Divider('Divider', 10, 400)
+            y = _process_in_chunks(divider, x.copy(), chunk_size)
+            self._assert_arrays_equal(y, expected)
+            
+            
+    def test_detect(self):
+        
+        samples = _create_test_signal()
+        
+        expected_ratios, expected_clips = _detect(samples, len(samples))
+        
+        self.assertGreater(len(expected_clips), 0)
+        
+        # Detection ratios should not depend on how samples are
+        # divided among calls to the `detect` method.
+        for chunk_size in (100, 1000, 24000):
+            ratios, _ = _detect(samples, chunk_size)
+            self._assert_arrays_close(ratios, expected_ratios)
+            
+        # Single precision computation should yield nearly the same
+        # ratios and the same clips.
+        ratios, clips = _detect(samples, len(samples), 'float32')
+        self.assertEqual(ratios.dtype, np.float32)
+        self.assertTrue(np.allclose(ratios, expected_ratios, rtol=1e-3))
+        self.assertEqual(clips, expected_clips)
+            
+            
+def _process_in_chunks(processor, x, chunk_size):
+    chunks = [
+        processor.process(x[i:i + chunk_size])
+        for i in range(0, len(x), chunk_size)]
+    return np.concatenate(chunks)
+
+
+def _create_test_signal():
+    
+    rng = np.random.default_rng(0)
+    
+    duration = 10
+    num_samples = duration * _SAMPLE_RATE
+    samples = rng.normal(0, 100, num_samples)
+    
+    # Add a tone burst every second.
+    times = np.arange(_SAMPLE_RATE // 10) / _SAMPLE_RATE
+    tone = 2000 * np.sin(2 * np.pi * 7000 * times)
+    for i in range(duration):
+        start_index = i * _SAMPLE_RATE + _SAMPLE_RATE // 2
+        samples[start_index:start_index + len(tone)] += tone
+        
+    return samples
+
+
+def _detect(samples, chunk_size, dtype='float64'):
+    
+    listener = _Listener()
+    debugging_listener = _DebuggingListener()
+    
+    detector = Detector(
+        _TSEEP_SETTINGS, _SAMPLE_RATE, listener, debugging_listener, dtype)
+    
+    for i in range(0, len(samples), chunk_size):
+        detector.detect(samples[i:i + chunk_size])
+        
+    detector.complete_detection()
+    
+    ratios = debugging_listener.get_samples('Divider')
+    
+    return ratios, listener.clips
@@ -0,0 +1,393 @@
+"""
+Script that benchmarks concurrent archive database access.
+
+The script simulates a detection job writing clips to a SQLite archive
+database while several users annotate clips in the clip album, and
+reports percentiles of annotation write and clip read latencies. It
+runs the simulation twice, each time in a new, temporary archive:
+
+    Before - rollback journaling with full disk syncs, one archive
+        lock acquisition and transaction per annotation request, and
+        clips annotated one at a time, as before the introduction of
+        the `vesper.django.app.archive_database` and
+        `vesper.django.app.archive_write_queue` modules.
+
+    After - the default archive database pragmas, including WAL
+        journaling, annotation requests coalesced by an
+        `ArchiveWriteQueue`, and clips annotated in bulk, as by the
+        server's clip annotation views.
+
+As in the Vesper server, the detection job runs in its own process
+and shares the archive lock with the annotators, which run in threads
+of the main process.
+
+The script takes no command line arguments.
+"""
+
+
+from multiprocessing import Event
+from pathlib import Path
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+DURATION = 30                       # seconds
+NUM_ANNOTATORS = 8
+NUM_ANNOTATION_CLIPS = 2000
+ANNOTATION_BATCH_SIZE = 20          # clips per annotation request
+ANNOTATOR_THINK_TIME = 2            # seconds
+DETECTOR_CLIP_BATCH_SIZE = 10       # as in `detect_command`
+DETECTOR_BATCH_INTERVAL = .005      # seconds
+PERCENTILES = (50, 90, 99, 100)
+
+CONFIGURATIONS = {
+
+    'Before': '''
+database:
+    engine: SQLite
+    sqlite_pragmas:
+        journal_mode: DELETE
+        synchronous: FULL
+        busy_timeout: 5000
+        cache_size: -2000
+''',
+
+    'After': '''
+database:
+    engine: SQLite
+''',
+
+}
+
+_ARCHIVE_SETTINGS_FILE_NAME = 'Archive Settings.yaml'
+
+_START_TIME = datetime.datetime(2020, 5, 1, 2, tzinfo=datetime.timezone.utc)
+
+
+def main():
+
+    if len(sys.argv) == 3:
+        # running simulation in archive directory
+
+        _, config_name, result_file_path = sys.argv
+        results = run_simulation(config_name)
+        with open(result_file_path, 'w') as file_:
+            json.dump(results, file_)
+
+    else:
+        run_simulations()
+
+
+def run_simulations():
+
+    all_results = {}
+
+    for config_name, settings in CONFIGURATIONS.items():
+
+        show_message(f'Running "{config_name}" simulation...')
+
+        with tempfile.TemporaryDirectory() as archive_dir_path:
+
+            archive_dir_path = Path(archive_dir_path)
+            settings_file_path = archive_dir_path / _ARCHIVE_SETTINGS_FILE_NAME
+            settings_file_path.write_text(settings.lstrip())
+            result_file_path = archive_dir_path / 'Results.json'
+
+            # Run simulation in a new process whose current directory
+            # is the archive directory, since the archive settings are
+            # initialized from the current directory at import.
+            subprocess.run(
+                [sys.executable, __file__, config_name,
+                 str(result_file_path)],
+                cwd=archive_dir_path, check=True)
+
+            with open(result_file_path) as file_:
+                all_results[config_name] = json.load(file_)
+
+    show_results(all_results)
+
+
+def run_simulation(config_name):
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+
+    call_command('migrate', verbosity=0)
+
+    objects = create_archive_objects()
+    clip_ids = create_annotation_clips(objects)
+
+    # Close database connections before forking the detector process,
+    # so that the two processes do not share them.
+    connections.close_all()
+
+    stop_event = Event()
+    detector_process = multiprocessing.get_context('fork').Process(
+        target=run_detector, args=(objects, stop_event))
+    detector_process.start()
+
+    if config_name == 'Before':
+        write = write_directly
+        annotate = annotate_clips_individually
+    else:
+        from vesper.django.app.archive_write_queue import ArchiveWriteQueue
+        write = ArchiveWriteQueue().write
+        annotate = annotate_clips_in_bulk
+
+    results = [
+        {'write_latencies': [], 'read_latencies': [], 'errors': 0}
+        for _ in range(NUM_ANNOTATORS)]
+
+    end_time = time.time() + DURATION
+
+    threads = [
+        threading.Thread(
+            target=run_annotator,
+            args=(write, annotate, objects, clip_ids, end_time, r))
+        for r in results]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    stop_event.set()
+    detector_process.join()
+
+    from vesper.django.app.models import Clip
+    num_detected_clips = Clip.objects.count() - len(clip_ids)
+
+    def merge(name):
+        return [x for r in results for x in r[name]]
+
+    return {
+        'write_latencies': merge('write_latencies'),
+        'read_latencies': merge('read_latencies'),
+        'errors': sum(r['errors'] for r in results),
+        'detected_clips': num_detected_clips,
+    }
+
+
+def create_archive_objects():
+
+    from vesper.django.app.models import (
+        AnnotationInfo, Device, DeviceModel, DeviceModelOutput,
+        DeviceOutput, Processor, Recording, RecordingChannel, Station)
+    import vesper.util.archive_lock as archive_lock
+
+    with archive_lock.atomic():
+
+        station = Station.objects.create(name='Station', time_zone='UTC')
+
+        device_model = DeviceModel.objects.create(
+            name='Model', type='Recorder', manufacturer='Maker',
+            model='Model')
+        model_output = DeviceModelOutput.objects.create(
+            model=device_model, local_name='Output 0', channel_num=0)
+        device = Device.objects.create(
+            name='Device', model=device_model, serial_number='0')
+        mic_output = DeviceOutput.objects.create(
+            device=device, model_output=model_output)
+
+        recording = Recording.objects.create(
+            station=station, recorder=device, num_channels=1,
+            length=3600 * 24000, sample_rate=24000, start_time=_START_TIME,
+            end_time=_START_TIME + datetime.timedelta(hours=1),
+            creation_time=_START_TIME)
+        channel = RecordingChannel.objects.create(
+            recording=recording, channel_num=0, recorder_channel_num=0,
+            mic_output=mic_output)
+
+        detector = Processor.objects.create(name='Detector', type='Detector')
+
+        info = AnnotationInfo.objects.create(
+            name='Classification', type='String', creation_time=_START_TIME)
+
+    return {
+        'station': station,
+        'mic_output': mic_output,
+        'channel': channel,
+        'detector': detector,
+        'info': info,
+    }
+
+
+def create_annotation_clips(objects):
+
+    from vesper.django.app.models import Clip
+    import vesper.util.archive_lock as archive_lock
+
+    clips = [
+        create_clip(objects, i * 24000, i)
+        for i in range(NUM_ANNOTATION_CLIPS)]
+
+    with archive_lock.atomic():
+        clips = Clip.objects.bulk_create(clips)
+
+    return list(Clip.objects.values_list('id', flat=True))
+
+
+def create_clip(objects, start_index, microseconds):
+
+    from vesper.django.app.models import Clip
+
+    start_time = _START_TIME + datetime.timedelta(
+        seconds=start_index / 24000, microseconds=microseconds)
+
+    return Clip(
+        station=objects['station'], mic_output=objects['mic_output'],
+        recording_channel=objects['channel'], start_index=start_index,
+        length=12000, sample_rate=24000, start_time=start_time,
+        end_time=start_time + datetime.timedelta(seconds=.5),
+        date=start_time.date(), creation_time=_START_TIME,
+        creating_processor=objects['detector'])
+
+
+def run_detector(objects, stop_event):
+
+    """Writes clips to the archive as the detect command does."""
+
+    from django.db import transaction
+    import vesper.django.app.model_utils as model_utils
+    import vesper.util.archive_lock as archive_lock
+
+    start_index = NUM_ANNOTATION_CLIPS * 24000
+    clip_num = 0
+
+    while not stop_event.is_set():
+
+        # Simulate detection.
+        time.sleep(DETECTOR_BATCH_INTERVAL)
+
+        with archive_lock.atomic(), transaction.atomic():
+
+            for _ in range(DETECTOR_CLIP_BATCH_SIZE):
+
+                clip = create_clip(objects, start_index, clip_num)
+                clip.save()
+
+                model_utils.annotate_clip(
+                    clip, objects['info'], 'Call',
+                    creating_processor=objects['detector'])
+
+                start_index += 1
+                clip_num += 1
+
+
+def run_annotator(write, annotate, objects, clip_ids, end_time, results):
+
+    """Annotates clips as a clip album user does."""
+
+    from django.db import connection
+    from vesper.django.app.models import Clip
+
+    rng = random.Random()
+
+    while time.time() < end_time:
+
+        time.sleep(ANNOTATOR_THINK_TIME * rng.random())
+
+        # Read a page of clips.
+        start = rng.randrange(len(clip_ids) - ANNOTATION_BATCH_SIZE)
+        page_ids = clip_ids[start:start + ANNOTATION_BATCH_SIZE]
+        start_time = time.time()
+        try:
+            list(Clip.objects.filter(id__in=page_ids))
+        except Exception:
+            results['errors'] += 1
+            continue
+        results['read_latencies'].append(time.time() - start_time)
+
+        # Annotate the page's clips.
+        value = rng.choice(['Call', 'Noise', None])
+        start_time = time.time()
+        try:
+            write(annotate, page_ids, objects['info'], value)
+        except Exception:
+            results['errors'] += 1
+            continue
+        results['write_latencies'].append(time.time() - start_time)
+
+    connection.close()
+
+
+def write_directly(function, *args):
+
+    from django.db import transaction
+    import vesper.util.archive_lock as archive_lock
+
+    with archive_lock.atomic(), transaction.atomic():
+        return function(*args)
+
+
+def annotate_clips_individually(clip_ids, info, value):
+
+    from vesper.django.app.models import Clip
+    import vesper.django.app.model_utils as model_utils
+
+    for clip in Clip.objects.filter(id__in=clip_ids):
+        if value is None:
+            model_utils.delete_clip_annotation(clip, info)
+        else:
+            model_utils.annotate_clip(clip, info, value)
+
+
+def annotate_clips_in_bulk(clip_ids, info, value):
+
+    from vesper.django.app.models import Clip
+    import vesper.django.app.model_utils as model_utils
+
+    if value is None:
+        annotate_clips_individually(clip_ids, info, value)
+    else:
+        clips = Clip.objects.filter(id__in=clip_ids)
+        model_utils.annotate_clips([(c, value) for c in clips], info)
+
+
+def show_results(all_results):
+
+    header = ''.join(f'{f"p{p}":>9}' for p in PERCENTILES)
+
+    for name in ('write', 'read'):
+
+        show_message()
+        show_message(f'Annotation {name} latencies (ms):')
+        show_message(f'{"":>10}{header}')
+
+        for config_name, results in all_results.items():
+            latencies = 1000 * np.array(results[f'{name}_latencies'])
+            values = np.percentile(latencies, PERCENTILES)
+            text = ''.join(f'{v:9.1f}' for v in values)
+            show_message(f'{config_name:>10}{text}')
+
+    show_message()
+
+    for config_name, results in all_results.items():
+        show_message(
+            f'{config_name}: {len(results["write_latencies"])} annotation '
+            f'writes, {results["errors"]} errors, '
+            f'{results["detected_clips"]} detected clips.')
+
+
+def show_message(message=''):
+    print(message, flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""
+Script that benchmarks Vesper server views against an archive.
+
+The script sends requests to several server views with Django's test
+client and reports percentiles of the request latencies and the
+numbers of database queries per request. It must be run in the
+directory of an archive, typically a large synthetic archive created
+by the `create_synthetic_archive` script, for example:
+
+    cd "/Users/Harold/Synthetic Archive"
+    python -m vesper.scripts.benchmark_archive_views --requests 50
+
+The benchmarked views are:
+
+    clip_calendar - the clip calendar page.
+
+    night - the night page.
+
+    clip_album - the clip album page.
+
+    batch_read_clip_audios - batch reads of the audio of a page of
+        clips. This view is benchmarked only if the archive has
+        recording audio files.
+
+    annotations - classification of a page of clips. This view is
+        benchmarked only if the `--no-writes` option is not specified.
+        Note that it modifies the classifications of the archive's
+        clips, and that its query counts do not include the queries
+        of the annotation writes, which the server performs in its
+        archive writer thread.
+
+Each request is for a station/mic, detector, classification, night,
+or page of clips chosen at random, and all choices are determined by
+the random number generator seed, so repeated runs against the same
+archive send the same requests. The results can optionally be written
+to a JSON file with the `--output` option.
+
+Run the script with the `--help` option for a list of all options.
+"""
+
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+
+VIEW_NAMES = (
+    'clip_calendar',
+    'night',
+    'clip_album',
+    'batch_read_clip_audios',
+    'annotations',
+)
+
+PERCENTILES = (50, 95, 99)
+CLASSIFICATION_ANNOTATION_NAME = 'Classification'
+USER_NAME = 'benchmark'
+
+
+def main():
+
+    args = parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+
+    import django
+    django.setup()
+
+    rng = random.Random(args.seed)
+
+    benchmark = ViewBenchmark(args, rng)
+
+    results = {}
+
+    for view_name in args.views:
+
+        if not benchmark.is_runnable(view_name):
+            show_message(f'Skipping {view_name} view.')
+            continue
+
+        show_message(f'Benchmarking {view_name} view...')
+        results[view_name] = benchmark.run(view_name)
+
+    show_results(results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as file_:
+            json.dump(results, file_, indent=4)
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Benchmarks Vesper server views against an archive.')
+
+    parser.add_argument(
+        '--views', nargs='+', choices=VIEW_NAMES, default=VIEW_NAMES,
+        help='the views to benchmark (default: all)')
+
+    parser.add_argument(
+        '--requests', type=int, default=20,
+        help='the number of timed requests per view (default: %(default)s)')
+
+    parser.add_argument(
+        '--warmup-requests', type=int, default=2,
+        help=(
+            'the number of untimed requests per view before the timed '
+            'ones (default: %(default)s)'))
+
+    parser.add_argument(
+        '--page-size', type=int, default=50,
+        help=(
+            'the number of clips per batch read or annotation request '
+            '(default: %(default)s)'))
+
+    parser.add_argument(
+        '--no-writes', dest='writes', action='store_false',
+        help='do not benchmark views that modify the archive')
+
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='the random number generator seed (default: %(default)s)')
+
+    parser.add_argument(
+        '--output', metavar='PATH',
+        help='the path of a JSON file to which to write results')
+
+    return parser.parse_args()
+
+
+class ViewBenchmark:
+
+
+    def __init__(self, args, rng):
+
+        from django.test import Client
+        from vesper.django.app.models import Clip, RecordingFile
+        from vesper.singletons import archive
+        import vesper.django.app.model_utils as model_utils
+
+        self._args = args
+        self._rng = rng
+
+        archive_ = archive.instance
+
+        pairs = model_utils.get_station_mic_output_pairs_list()
+        self._station_mics = [
+            (model_utils.get_station_mic_output_pair_ui_name(p),
+             [str(d) for d in model_utils.get_recording_dates(*p)])
+            for p in pairs]
+
+        self._detector_names = [
+            archive_.get_processor_ui_name(p)
+            for p in archive_.get_visible_processors_of_type('Detector')]
+
+        self._classification_specs = \
+            archive_.get_visible_string_annotation_ui_value_specs(
+                CLASSIFICATION_ANNOTATION_NAME)
+
+        self._classifications = \
+            archive_.get_visible_string_annotation_ui_values(
+                CLASSIFICATION_ANNOTATION_NAME)
+
+        self._clip_ids = list(
+            Clip.objects.order_by('id').values_list('id', flat=True))
+
+        self._has_recording_files = \
+            RecordingFile.objects.filter(path__isnull=False).exists()
+
+        self._client = Client()
+        self._client.force_login(_get_user())
+
+
+    def is_runnable(self, view_name):
+
+        if view_name in ('clip_calendar', 'night', 'clip_album'):
+            return len(self._station_mics) != 0 and \
+                len(self._detector_names) != 0
+
+        elif view_name == 'batch_read_clip_audios':
+            return self._has_recording_files and len(self._clip_ids) != 0
+
+        else:
+            return self._args.writes and len(self._clip_ids) != 0 and \
+                len(self._classifications) != 0
+
+
+    def run(self, view_name):
+
+        send_request = getattr(self, '_send_' + view_name + '_request')
+
+        for _ in range(self._args.warmup_requests):
+            send_request()
+
+        latencies = []
+        query_counts = []
+        errors = 0
+
+        for _ in range(self._args.requests):
+
+            with _capture_queries() as queries:
+                start_time = time.time()
+                response = send_request()
+                latencies.append(time.time() - start_time)
+
+            query_counts.append(len(queries))
+
+            if response.status_code != 200:
+                errors += 1
+
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'latencies': latencies,
+            'query_counts': query_counts,
+        }
+
+
+    def _send_clip_calendar_request(self):
+        return self._client.get(
+            '/clip-calendar/', self._get_clip_query_params())
+
+
+    def _send_night_request(self):
+        station_mic, dates = self._rng.choice(self._station_mics)
+        params = self._get_clip_query_params(station_mic)
+        params['date'] = self._rng.choice(dates)
+        return self._client.get('/night/', params)
+
+
+    def _send_clip_album_request(self):
+        return self._client.get(
+            '/clip-album/', self._get_clip_query_params())
+
+
+    def _get_clip_query_params(self, station_mic=None):
+
+        if station_mic is None:
+            station_mic, _ = self._rng.choice(self._station_mics)
+
+        return {
+            'station_mic': station_mic,
+            'detector': self._rng.choice(self._detector_names),
+            'classification': self._rng.choice(self._classification_specs),
+        }
+
+
+    def _send_batch_read_clip_audios_request(self):
+        content = {'clip_ids': self._get_clip_page()}
+        return self._post('/batch/read/clip-audios/', content)
+
+
+    def _send_annotations_request(self):
+        content = {
+            'value': self._rng.choice(self._classifications),
+            'clip_ids': self._get_clip_page()
+        }
+        return self._post(
+            f'/annotations/{CLASSIFICATION_ANNOTATION_NAME}/', content)
+
+
+    def _get_clip_page(self):
+        page_size = min(self._args.page_size, len(self._clip_ids))
+        start = self._rng.randrange(len(self._clip_ids) - page_size + 1)
+        return self._clip_ids[start:start + page_size]
+
+
+    def _post(self, path, content):
+        return self._client.post(
+            path, json.dumps(content), content_type='application/json')
+
+
+def _get_user():
+
+    from django.contrib.auth.models import User
+
+    try:
+        return User.objects.get(username=USER_NAME)
+    except User.DoesNotExist:
+        return User.objects.create_user(USER_NAME)
+
+
+@contextlib.contextmanager
+def _capture_queries():
+
+    """
+    Captures the database queries of all archive database connections.
+
+    SQLite archives have a read-only database connection in addition
+    to the default one (see the `vesper.django.app.archive_database`
+    module), so we capture the queries of every connection.
+    """
+
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    queries = []
+
+    with contextlib.ExitStack() as stack:
+
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections]
+
+        yield queries
+
+    for context in contexts:
+        queries.extend(context.captured_queries)
+
+
+def show_results(results):
+
+    show_message()
+
+    header = ''.join(f'{f"p{p}":>9}' for p in PERCENTILES)
+    show_message(
+        f'{"View":<24}{"Requests":>9}{"Errors":>7}{header}'
+        f'{"Queries":>9}{"Max":>6}')
+
+    for view_name, r in results.items():
+
+        latencies = 1000 * np.array(r['latencies'])
+        values = np.percentile(latencies, PERCENTILES)
+        text = ''.join(f'{v:9.1f}' for v in values)
+
+        query_counts = r['query_counts']
+        mean_queries = np.mean(query_counts)
+        max_queries = np.max(query_counts)
+
+        show_message(
+            f'{view_name:<24}{r["requests"]:>9}{r["errors"]:>7}{text}'
+            f'{mean_queries:9.1f}{max_queries:6d}')
+
+    show_message()
+    show_message('Latencies are in milliseconds. Query counts are per request.')
+
+
+def show_message(message=''):
+    print(message, flush=True)
+
+
+if __name__ == '__main__':
+    main()
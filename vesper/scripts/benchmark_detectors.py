@@ -0,0 +1,491 @@
+"""
+Script that benchmarks the detectors of the extension manager.
+
+The script runs every `Detector` extension of the extension manager on
+deterministic synthetic audio at each of the sample rates at which we
+record, and writes the results to a JSON file. For each detector and
+sample rate the results include:
+
+    real_time_factor - audio duration divided by detection time, i.e.
+        the number of times faster than real time that the detector
+        ran.
+
+    peak_rss - peak resident set size of the process that ran the
+        detector, in mebibytes. Each detector runs in its own process.
+
+    clips - the number of clips the detector detected.
+
+    chirps_detected - the number of the synthetic audio's chirps that
+        overlap at least one detected clip.
+
+The synthetic audio is Gaussian noise with embedded tseep-like and
+thrush-like chirps, created with the `vesper.util.signal_generation_utils`
+module. The audio is generated a block at a time from a fixed random seed,
+so it is the same for every run of the script and needn't be held in
+memory in its entirety. The audio is fed to detectors as 16-bit samples in
+chunks of the size that the detect command uses.
+
+If a detector fails, the error is recorded in its results in place of
+the above items. Usage:
+
+    python -m vesper.scripts.benchmark_detectors run <results file>
+        [--duration <hours>] [--sample-rates <rate> ...]
+        [--detectors <name> ...]
+
+    python -m vesper.scripts.benchmark_detectors compare
+        <old results file> <new results file> [--tolerance <fraction>]
+
+The compare mode reports the results of two runs side by side, and flags
+as regressions decreases in real-time factor or increases in peak RSS of
+more than the tolerance (default .1), and any change in the numbers of
+clips detected or decrease in the number of chirps detected. It exits
+with status one if it finds any regressions.
+"""
+
+
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+import vesper.util.signal_generation_utils as signal_generation_utils
+
+
+DEFAULT_DURATION = 2                                # hours
+DEFAULT_SAMPLE_RATES = (22050, 24000, 32000, 44100, 48000)
+DEFAULT_TOLERANCE = .1
+
+SEED = 0
+BLOCK_DURATION = 60                                 # seconds
+SLOT_DURATION = 10                                  # seconds
+NOISE_STANDARD_DEVIATION = 100
+CHIRP_AMPLITUDE_RANGE = (100, 3000)
+CHIRP_TAPER_DURATION = .005                         # seconds
+
+# Chirp types, each with ranges of durations and start and end
+# frequencies.
+CHIRP_TYPES = (
+
+    # tseep-like
+    Bunch(
+        duration=(.05, .15),                        # seconds
+        start_frequency=(7000, 9000),               # hertz
+        end_frequency=(5000, 7000)),                # hertz
+
+    # thrush-like
+    Bunch(
+        duration=(.1, .25),                         # seconds
+        start_frequency=(3000, 4500),               # hertz
+        end_frequency=(2500, 3500)),                # hertz
+
+)
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def main():
+
+    args = parse_args()
+
+    if args.mode == 'run':
+        run_benchmarks(args)
+    else:
+        sys.exit(compare_results(args))
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Benchmarks Vesper detectors.')
+
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help='run detectors and write results to a JSON file.')
+    run_parser.add_argument('results_file_path', type=Path)
+    run_parser.add_argument(
+        '--duration', type=float, default=DEFAULT_DURATION,
+        help='synthetic audio duration in hours.')
+    run_parser.add_argument(
+        '--sample-rates', type=int, nargs='+',
+        default=DEFAULT_SAMPLE_RATES,
+        help='sample rates at which to run detectors, in hertz.')
+    run_parser.add_argument(
+        '--detectors', nargs='+',
+        help='names of detectors to run, by default all detectors.')
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare the results of two runs.')
+    compare_parser.add_argument('old_results_file_path', type=Path)
+    compare_parser.add_argument('new_results_file_path', type=Path)
+    compare_parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help='fractional change tolerated before a change is flagged.')
+
+    return parser.parse_args()
+
+
+def run_benchmarks(args):
+
+    detector_names = get_detector_names(args.detectors)
+
+    duration = int(round(args.duration * 3600))
+
+    # Run each detector in a new process, so that the peak RSS of
+    # each process is that of one detector.
+    context = multiprocessing.get_context('spawn')
+
+    results = []
+
+    for sample_rate in args.sample_rates:
+
+        for detector_name in detector_names:
+
+            show_message(
+                f'Running "{detector_name}" at {sample_rate} hertz...')
+
+            try:
+                with context.Pool(1) as pool:
+                    result = pool.apply(
+                        run_benchmark,
+                        (detector_name, sample_rate, duration))
+                    pool.close()
+                    pool.join()
+
+            except Exception as e:
+                result = {
+                    'detector': detector_name,
+                    'sample_rate': sample_rate,
+                    'error': f'{e.__class__.__name__}: {e}',
+                }
+
+            show_result(result)
+            results.append(result)
+
+    results = {
+        'version': RESULTS_FORMAT_VERSION,
+        'settings': {
+            'duration': duration,
+            'sample_rates': list(args.sample_rates),
+            'seed': SEED,
+        },
+        'platform': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+        },
+        'results': results,
+    }
+
+    with open(args.results_file_path, 'w') as file_:
+        json.dump(results, file_, indent=4)
+
+
+def get_detector_names(names):
+
+    setup_django()
+
+    from vesper.singletons import extension_manager
+
+    detector_classes = extension_manager.instance.get_extensions('Detector')
+
+    if names is None:
+        return sorted(detector_classes.keys())
+
+    else:
+
+        for name in names:
+            if name not in detector_classes:
+                raise ValueError(f'Unrecognized detector "{name}".')
+
+        return names
+
+
+def setup_django():
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'vesper.django.project.settings')
+    import django
+    django.setup()
+
+
+def run_benchmark(detector_name, sample_rate, duration):
+
+    setup_django()
+
+    from vesper.command.detect_command import _DETECTION_CHUNK_SIZE
+    from vesper.singletons import extension_manager
+
+    detector_classes = extension_manager.instance.get_extensions('Detector')
+    cls = detector_classes[detector_name]
+
+    listener = Listener()
+    detector = cls(sample_rate, listener)
+
+    chirps = []
+    detection_time = 0
+
+    for samples, block_chirps in generate_audio(sample_rate, duration):
+
+        chirps += block_chirps
+
+        for i in range(0, len(samples), _DETECTION_CHUNK_SIZE):
+            chunk = samples[i:i + _DETECTION_CHUNK_SIZE]
+            start_time = time.perf_counter()
+            detector.detect(chunk)
+            detection_time += time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    detector.complete_detection()
+    detection_time += time.perf_counter() - start_time
+
+    return {
+        'detector': detector_name,
+        'sample_rate': sample_rate,
+        'duration': duration,
+        'detection_time': detection_time,
+        'real_time_factor': duration / detection_time,
+        'peak_rss': get_peak_rss(),
+        'clips': len(listener.clips),
+        'chirps': len(chirps),
+        'chirps_detected': count_detected_chirps(chirps, listener.clips),
+    }
+
+
+def generate_audio(sample_rate, duration):
+
+    """
+    Generates synthetic audio a block at a time.
+
+    Each block of audio is generated with a random number generator
+    seeded with `SEED`, the sample rate, and the block number, so that
+    the audio does not depend on the order in which blocks are
+    generated. Each block is divided into slots that each contain one
+    chirp, so that no chirp spans two blocks.
+
+    Yields
+    ------
+    (samples, chirps) pairs
+        the samples of each block, as a 1-D NumPy array of 16-bit
+        integers, and the chirps of the block, a list of
+        (start index, end index) pairs.
+    """
+
+    num_blocks = -(-duration // BLOCK_DURATION)
+
+    for block_num in range(num_blocks):
+
+        rng = np.random.default_rng([SEED, sample_rate, block_num])
+
+        block_duration = \
+            min(BLOCK_DURATION, duration - block_num * BLOCK_DURATION)
+        block_start_index = block_num * BLOCK_DURATION * sample_rate
+
+        audio = signal_generation_utils.create_silence(
+            block_duration, sample_rate)
+
+        signal_generation_utils.add_noise(
+            audio, NOISE_STANDARD_DEVIATION, rng)
+
+        chirps = []
+
+        for slot_num in range(block_duration // SLOT_DURATION):
+
+            chirp_type = CHIRP_TYPES[rng.integers(len(CHIRP_TYPES))]
+            chirp_duration = rng.uniform(*chirp_type.duration)
+
+            # Put chirp at random time in slot, at least a second from
+            # slot start and end.
+            slot_start_time = slot_num * SLOT_DURATION
+            start_time = slot_start_time + \
+                rng.uniform(1, SLOT_DURATION - 1 - chirp_duration)
+
+            # Draw amplitude log-uniformly, so that the chirps include
+            # many that are difficult to detect.
+            amplitude = np.exp(rng.uniform(*np.log(CHIRP_AMPLITUDE_RANGE)))
+
+            signal_generation_utils.add_chirp(
+                audio, start_time, chirp_duration, amplitude,
+                rng.uniform(*chirp_type.start_frequency),
+                rng.uniform(*chirp_type.end_frequency),
+                taper_duration=CHIRP_TAPER_DURATION)
+
+            start_index = \
+                block_start_index + int(round(start_time * sample_rate))
+            length = int(round(chirp_duration * sample_rate))
+            chirps.append((start_index, start_index + length))
+
+        samples = np.round(audio.samples[0])
+        samples = np.clip(samples, -32768, 32767).astype('int16')
+
+        yield samples, chirps
+
+
+class Listener:
+
+
+    def __init__(self):
+        self.clips = []
+
+
+    def process_clip(
+            self, start_index, length, threshold=None, annotations=None):
+        self.clips.append((start_index, length))
+
+
+def count_detected_chirps(chirps, clips):
+
+    """Counts the chirps that overlap at least one clip."""
+
+    if len(chirps) == 0 or len(clips) == 0:
+        return 0
+
+    chirp_starts, chirp_ends = np.array(chirps).T
+    clips = np.array(clips)
+    clip_starts = clips[:, 0]
+    clip_ends = clip_starts + clips[:, 1]
+
+    # Chirps are sorted and do not overlap, so the chirps that overlap
+    # a clip are the ones that end after it starts and start before
+    # it ends.
+    first_chirp_nums = np.searchsorted(chirp_ends, clip_starts, 'right')
+    end_chirp_nums = np.searchsorted(chirp_starts, clip_ends, 'left')
+
+    detected = np.zeros(len(chirps), dtype='bool')
+    for start, end in zip(first_chirp_nums, end_chirp_nums):
+        detected[start:end] = True
+
+    return int(detected.sum())
+
+
+def get_peak_rss():
+
+    """Gets the peak resident set size of this process, in mebibytes."""
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The units of `ru_maxrss` are bytes on macOS and kibibytes on Linux.
+    if sys.platform == 'darwin':
+        return peak_rss / 2 ** 20
+    else:
+        return peak_rss / 2 ** 10
+
+
+def show_result(result):
+
+    if 'error' in result:
+        show_message(f'    Detection failed with error: {result["error"]}')
+        return
+
+    show_message(
+        f'    {result["real_time_factor"]:.1f} times faster than real time, '
+        f'peak RSS {result["peak_rss"]:.0f} MiB, {result["clips"]} clips, '
+        f'{result["chirps_detected"]} of {result["chirps"]} chirps '
+        f'detected.')
+
+
+def compare_results(args):
+
+    old_results = load_results(args.old_results_file_path)
+    new_results = load_results(args.new_results_file_path)
+
+    if old_results['settings'] != new_results['settings']:
+        show_message(
+            'Warning: runs have different settings, so their results '
+            'may not be comparable.')
+
+    tolerance = args.tolerance
+    num_regressions = 0
+
+    header = (
+        f'{"Detector":<45}{"Rate":>7}{"Old xRT":>10}{"New xRT":>10}'
+        f'{"Old RSS":>9}{"New RSS":>9}{"Old Clips":>11}{"New Clips":>11}'
+        f'  Regressions')
+    show_message(header)
+
+    for key, new in new_results['results'].items():
+
+        old = old_results['results'].get(key)
+
+        if old is None:
+            continue
+
+        detector_name, sample_rate = key
+
+        if 'error' in new or 'error' in old:
+
+            if 'error' in new:
+                num_regressions += 1
+                show_message(
+                    f'{detector_name:<45}{sample_rate:>7}  error: '
+                    f'{new["error"]}')
+
+            continue
+
+        regressions = []
+
+        if new['real_time_factor'] < \
+                (1 - tolerance) * old['real_time_factor']:
+            regressions.append('speed')
+
+        if new['peak_rss'] > (1 + tolerance) * old['peak_rss']:
+            regressions.append('memory')
+
+        if new['clips'] != old['clips']:
+            regressions.append('clips')
+
+        if new['chirps_detected'] < old['chirps_detected']:
+            regressions.append('chirps')
+
+        num_regressions += len(regressions)
+
+        show_message(
+            f'{detector_name:<45}{sample_rate:>7}'
+            f'{old["real_time_factor"]:>10.1f}'
+            f'{new["real_time_factor"]:>10.1f}'
+            f'{old["peak_rss"]:>9.0f}{new["peak_rss"]:>9.0f}'
+            f'{old["clips"]:>11}{new["clips"]:>11}'
+            f'  {", ".join(regressions)}')
+
+    missing_keys = \
+        set(old_results['results'].keys()) - set(new_results['results'])
+    for detector_name, sample_rate in sorted(missing_keys):
+        show_message(
+            f'Detector "{detector_name}" at {sample_rate} hertz is '
+            f'missing from new results.')
+
+    show_message()
+    show_message(f'Found {num_regressions} regressions.')
+
+    return 1 if num_regressions != 0 else 0
+
+
+def load_results(file_path):
+
+    with open(file_path) as file_:
+        results = json.load(file_)
+
+    if results.get('version') != RESULTS_FORMAT_VERSION:
+        raise ValueError(
+            f'Results file "{file_path}" has unrecognized format version.')
+
+    # Index results by detector name and sample rate.
+    results['results'] = dict(
+        ((r['detector'], r['sample_rate']), r) for r in results['results'])
+
+    return results
+
+
+def show_message(message=''):
+    print(message, flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Script that benchmarks Old Bird clip alignment.
+
+The script creates a synthetic recording with thousands of embedded
+clips, perturbing each clip sample by up to one as the Old Bird
+detectors sometimes do, and then finds the clips in the recording
+both with the clip aligner of the `vesper.old_bird.clip_aligner`
+module and with the per-clip search that the add Old Bird clip start
+indices command used previously. It reports the time taken by each
+method and checks that both find every clip at its true location.
+
+The script takes no command line arguments.
+"""
+
+
+import time
+
+import numpy as np
+
+import vesper.old_bird.clip_aligner as clip_aligner
+import vesper.util.signal_utils as signal_utils
+
+
+SAMPLE_RATE = 22050
+RECORDING_DURATION = 3600               # seconds
+NUM_CLIPS = 5000
+CLIP_DURATION = .6                      # seconds
+SILENT_PREFIX_DURATION = .05            # seconds
+SEARCH_PADDING = 5                      # seconds
+START_TIME_ERROR = 1                    # seconds
+TOLERANCE = 1
+
+
+def main():
+
+    show_message('Creating synthetic recording...')
+    recording, clips = create_recording()
+
+    reader = Reader(recording)
+    search_padding = int(round(SEARCH_PADDING * SAMPLE_RATE))
+
+    show_message(
+        f'Finding {len(clips)} clips in {RECORDING_DURATION}-second '
+        f'recording with clip aligner...')
+    start_time = time.time()
+    results = list(clip_aligner.align_clips(
+        reader, 0, recording.shape[1], clips, search_padding, TOLERANCE))
+    aligner_time = time.time() - start_time
+    check_results(results)
+    show_message(
+        f'Clip aligner took {aligner_time:.1f} seconds and read '
+        f'{reader.num_samples_read} samples.')
+
+    reader = Reader(recording)
+    show_message('Finding clips with per-clip search...')
+    start_time = time.time()
+    results = [
+        find_clip(reader, recording.shape[1], clip, search_padding)
+        for clip in clips]
+    search_time = time.time() - start_time
+    check_results(results)
+    show_message(
+        f'Per-clip search took {search_time:.1f} seconds and read '
+        f'{reader.num_samples_read} samples.')
+
+    show_message(f'Speedup was {search_time / aligner_time:.1f}.')
+
+
+def create_recording():
+
+    rng = np.random.default_rng(0)
+
+    length = RECORDING_DURATION * SAMPLE_RATE
+    recording = rng.normal(scale=1000, size=length).astype('int16')
+
+    clip_length = int(round(CLIP_DURATION * SAMPLE_RATE))
+    prefix_length = int(round(SILENT_PREFIX_DURATION * SAMPLE_RATE))
+    start_time_error = int(round(START_TIME_ERROR * SAMPLE_RATE))
+
+    # Space clips evenly so they do not overlap.
+    spacing = length // NUM_CLIPS
+    start_indices = \
+        np.arange(NUM_CLIPS) * spacing + (spacing - clip_length) // 2
+
+    clips = []
+
+    for start_index in start_indices:
+
+        end_index = start_index + clip_length
+
+        # Silence start of clip, as detectors often do with clip
+        # initial samples.
+        recording[start_index:start_index + prefix_length] = 0
+
+        samples = recording[start_index:end_index].copy()
+        samples += rng.integers(-1, 2, clip_length).astype('int16')
+
+        approximate_start_index = \
+            start_index + rng.integers(-start_time_error, start_time_error)
+
+        clips.append((start_index, approximate_start_index, samples))
+        
+    # Sort clips by approximate start index, as the add Old Bird clip
+    # start indices command does.
+    clips.sort(key=lambda c: c[1])
+    
+    return recording.reshape((1, length)), clips
+
+
+class Reader:
+
+
+    def __init__(self, samples):
+        self._samples = samples
+        self.num_samples_read = 0
+
+
+    def read_samples(self, channel_num, start_index, length):
+        self.num_samples_read += length
+        return self._samples[
+            channel_num, start_index:start_index + length].copy()
+
+
+def find_clip(reader, recording_length, clip, search_padding):
+
+    true_start_index, approximate_start_index, clip_samples = clip
+
+    start_index = max(approximate_start_index - search_padding, 0)
+    end_index = min(
+        approximate_start_index + len(clip_samples) + search_padding,
+        recording_length)
+    samples = reader.read_samples(0, start_index, end_index - start_index)
+
+    indices = signal_utils.find_samples(clip_samples, samples, TOLERANCE)
+
+    return true_start_index, indices + start_index
+
+
+def check_results(results):
+
+    for true_start_index, indices in results:
+        if len(indices) != 1 or indices[0] != true_start_index:
+            show_message(
+                f'Found clip with true start index {true_start_index} at '
+                f'indices {list(indices)}.')
+
+
+def show_message(message):
+    print(message)
+
+
+if __name__ == '__main__':
+    main()
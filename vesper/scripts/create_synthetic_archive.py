@@ -0,0 +1,713 @@
+"""
+Script that creates a synthetic Vesper archive of a specified size.
+
+The script populates a new archive with synthetic stations, recordings,
+clips, and clip classifications, for benchmarking archive database
+queries and server views against archives much larger than the ones
+at hand. It must be run in the directory of a new archive, for
+example:
+
+    vesper_admin createarchive "Synthetic Archive"
+    cd "Synthetic Archive"
+    python -m vesper.scripts.create_synthetic_archive --stations 20 \
+        --nights 90 --detectors 2 --clips-per-night 1000
+
+The archive has one recording per station per night, starting at 8 PM
+station time, with one channel recorded from the station's single
+microphone. Each detector has the specified number of clips per
+recording, spread throughout the recording, and each clip is
+classified according to the specified classification mix. A
+classification mix comprises comma-separated `value=weight` items,
+for example `Call.AMRE=1,Call=2,Noise=6,None=3`, in which the value
+`None` stands for unclassified clips. Each clip's classification is
+chosen at random with probability proportional to its weight.
+
+By default, the recordings have no audio files, and the server
+cannot display clips of the archive. Use the `--recording-files`
+option to create recording audio files in the archive's "Recordings"
+directory, either silent ones, which are written as sparse files and
+take very little time to create or disk space, or noise ones. Note
+that noise recording files require two bytes of disk space per sample.
+
+Recordings, clips, and annotations are inserted in bulk with
+explicitly assigned IDs, and without the annotation edit history
+that detectors and classifiers normally create, so the script
+creates an archive with millions of clips in minutes. Stations,
+devices, detectors, and annotations are created by the metadata
+importer, as by the "Import Metadata" command.
+
+Run the script with the `--help` option for a list of all options.
+"""
+
+
+from pathlib import Path
+import argparse
+import datetime
+import itertools
+import os
+import struct
+import time
+
+import numpy as np
+
+
+DETECTOR_NAMES = (
+    'Old Bird Thrush Detector Redux 1.1',
+    'Old Bird Tseep Detector Redux 1.1',
+    'MPG Ranch Thrush Detector 1.0 70',
+    'MPG Ranch Tseep Detector 1.0 60',
+    'BirdVoxDetect 0.2.5 AT 50',
+    'BirdVoxDetect 0.2.5 FT 50',
+)
+
+CLASSIFICATION_ANNOTATION_NAME = 'Classification'
+UNCLASSIFIED_VALUE = 'None'
+
+TIME_ZONE = 'US/Eastern'
+START_DATE = datetime.date(2020, 8, 1)
+RECORDING_START_HOUR = 20                   # station time
+CLIP_DURATION = .6                          # seconds
+BATCH_SIZE = 10000                          # objects per bulk insert
+NOISE_STANDARD_DEVIATION = 1000             # 16-bit sample units
+NOISE_BLOCK_DURATION = 60                   # seconds
+
+_WAVE_HEADER_SIZE = 44
+
+
+def main():
+
+    args = parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from vesper.django.app.models import Station
+
+    call_command('migrate', verbosity=0)
+
+    if Station.objects.exists():
+        raise SystemExit(
+            'Archive already has stations. Please run this script in '
+            'the directory of a new archive.')
+
+    start_time = time.time()
+
+    show_message('Importing metadata...')
+    import_metadata(args)
+
+    show_message('Creating recordings, clips, and annotations...')
+    counts = create_recordings(args)
+
+    elapsed_time = time.time() - start_time
+
+    show_message(
+        f'Created {counts["recordings"]} recordings, {counts["files"]} '
+        f'recording files, {counts["clips"]} clips, and '
+        f'{counts["annotations"]} annotations in {elapsed_time:.1f} '
+        f'seconds.')
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Creates a synthetic Vesper archive.')
+
+    parser.add_argument(
+        '--stations', type=int, default=10,
+        help='the number of stations (default: %(default)s)')
+
+    parser.add_argument(
+        '--nights', type=int, default=30,
+        help='the number of nights per station (default: %(default)s)')
+
+    parser.add_argument(
+        '--detectors', type=int, default=2,
+        choices=range(1, len(DETECTOR_NAMES) + 1),
+        help='the number of detectors (default: %(default)s)')
+
+    parser.add_argument(
+        '--clips-per-night', type=int, default=500,
+        help=(
+            'the number of clips per detector per station per night '
+            '(default: %(default)s)'))
+
+    parser.add_argument(
+        '--classification-mix', type=parse_classification_mix,
+        default='Call.AMRE=1,Call.WTSP=1,Call=2,Noise=6,None=3',
+        help=(
+            'the relative frequencies of clip classifications '
+            '(default: %(default)s)'))
+
+    parser.add_argument(
+        '--recording-duration', type=float, default=10,
+        help='the recording duration in hours (default: %(default)s)')
+
+    parser.add_argument(
+        '--sample-rate', type=int, default=22050,
+        help='the recording sample rate in hertz (default: %(default)s)')
+
+    parser.add_argument(
+        '--recording-files', choices=('none', 'silence', 'noise'),
+        default='none',
+        help='the recording audio file contents (default: %(default)s)')
+
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='the random number generator seed (default: %(default)s)')
+
+    return parser.parse_args()
+
+
+def parse_classification_mix(text):
+
+    mix = {}
+
+    for item in text.split(','):
+
+        try:
+            value, weight = item.split('=')
+            weight = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f'Bad classification mix item "{item}".')
+
+        if weight < 0:
+            raise argparse.ArgumentTypeError(
+                f'Classification mix weight {weight} is negative.')
+
+        mix[value.strip()] = weight
+
+    if sum(mix.values()) == 0:
+        raise argparse.ArgumentTypeError(
+            'Classification mix weights must not all be zero.')
+
+    return mix
+
+
+def import_metadata(args):
+
+    from vesper.command.metadata_importer import MetadataImporter
+    from vesper.django.app.models import Job
+    from vesper.util.bunch import Bunch
+    import vesper.util.time_utils as time_utils
+
+    job = Job.objects.create(
+        command='{"name": "create_synthetic_archive"}',
+        creation_time=time_utils.get_utc_now(), status='Complete')
+
+    importer = MetadataImporter({'metadata': create_metadata(args)})
+    importer.execute(Bunch(job_id=job.id))
+
+
+def create_metadata(args):
+
+    station_names = get_station_names(args)
+
+    start_date = START_DATE - datetime.timedelta(days=1)
+    end_date = START_DATE + datetime.timedelta(days=args.nights + 1)
+
+    classifications = sorted(
+        v for v in args.classification_mix if v != UNCLASSIFIED_VALUE)
+
+    return {
+
+        'stations': [
+            {
+                'name': name,
+                'description': 'Synthetic station.',
+                'time_zone': TIME_ZONE,
+                'latitude': 42 + i / 100,
+                'longitude': -76 - i / 100,
+                'elevation': 0,
+            }
+            for i, name in enumerate(station_names)],
+
+        'device_models': [
+            {
+                'name': 'Recorder',
+                'type': 'Audio Recorder',
+                'manufacturer': 'Vesper',
+                'model': 'Recorder',
+                'num_inputs': 1,
+            },
+            {
+                'name': 'Microphone',
+                'type': 'Microphone',
+                'manufacturer': 'Vesper',
+                'model': 'Microphone',
+                'num_outputs': 1,
+            }],
+
+        'devices': list(itertools.chain.from_iterable(
+            [
+                {
+                    'name': f'Recorder {i}',
+                    'model': 'Recorder',
+                    'serial_number': str(i),
+                },
+                {
+                    'name': f'Microphone {i}',
+                    'model': 'Microphone',
+                    'serial_number': str(i),
+                }]
+            for i in range(len(station_names)))),
+
+        'station_devices': [
+            {
+                'station': name,
+                'start_time': start_date,
+                'end_time': end_date,
+                'devices': [f'Recorder {i}', f'Microphone {i}'],
+                'connections': [{
+                    'output': f'Microphone {i} Output',
+                    'input': f'Recorder {i} Input'
+                }]
+            }
+            for i, name in enumerate(station_names)],
+
+        'detectors': [
+            {'name': name} for name in DETECTOR_NAMES[:args.detectors]],
+
+        'annotation_constraints': [
+            {
+                'name': CLASSIFICATION_ANNOTATION_NAME,
+                'type': 'Hierarchical Values',
+                'values': get_hierarchical_values(classifications),
+            }],
+
+        'annotations': [
+            {
+                'name': 'Detector Score',
+                'type': 'String',
+            },
+            {
+                'name': CLASSIFICATION_ANNOTATION_NAME,
+                'type': 'String',
+                'constraint': CLASSIFICATION_ANNOTATION_NAME,
+            }],
+
+    }
+
+
+def get_station_names(args):
+    return [f'Station {i:02d}' for i in range(args.stations)]
+
+
+def get_hierarchical_values(values):
+
+    """
+    Gets a hierarchical annotation constraint value list.
+
+    For example, for the values `['Call', 'Call.AMRE', 'Noise']` this
+    function returns `[{'Call': ['AMRE']}, 'Noise']`.
+    """
+
+    children = {}
+
+    for value in values:
+        parent, _, child = value.partition('.')
+        child_values = children.setdefault(parent, [])
+        if child:
+            child_values.append(child)
+
+    return [
+        {name: get_hierarchical_values(child_values)}
+        if child_values else name
+        for name, child_values in children.items()]
+
+
+def create_recordings(args):
+
+    from django.db import transaction
+    from vesper.archive_paths import archive_paths
+    from vesper.django.app.models import (
+        AnnotationInfo, Processor, Station, StationDevice)
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    rng = np.random.default_rng(args.seed)
+
+    info = AnnotationInfo.objects.get(name=CLASSIFICATION_ANNOTATION_NAME)
+    detectors = list(Processor.objects.filter(type='Detector').order_by('id'))
+
+    values, probabilities = get_classification_probabilities(args)
+
+    recording_dir_path = archive_paths.recording_dir_paths[0]
+
+    recording_length = int(round(args.recording_duration * 3600 *
+                                 args.sample_rate))
+    clip_length = int(round(CLIP_DURATION * args.sample_rate))
+    clip_duration = datetime.timedelta(
+        seconds=(clip_length - 1) / args.sample_rate)
+
+    creation_time = time_utils.get_utc_now()
+
+    ids = IdAllocator()
+    counts = dict(recordings=0, files=0, clips=0, annotations=0)
+
+    for station in Station.objects.order_by('name'):
+
+        station_start_time = time.time()
+
+        devices = dict(
+            (sd.device.model.type, sd.device)
+            for sd in StationDevice.objects.filter(station=station))
+        recorder = devices['Audio Recorder']
+        mic_output = devices['Microphone'].outputs.get()
+
+        rows = Rows()
+
+        for night_num in range(args.nights):
+
+            date = START_DATE + datetime.timedelta(days=night_num)
+
+            start_time = station.local_to_utc(datetime.datetime.combine(
+                date, datetime.time(RECORDING_START_HOUR)))
+            end_time = start_time + datetime.timedelta(
+                seconds=(recording_length - 1) / args.sample_rate)
+
+            recording_id = rows.add(
+                'Recording', id=ids.get('Recording'), station_id=station.id,
+                recorder_id=recorder.id, num_channels=1,
+                length=recording_length, sample_rate=args.sample_rate,
+                start_time=start_time, end_time=end_time,
+                creation_time=creation_time)
+
+            channel_id = rows.add(
+                'RecordingChannel', id=ids.get('RecordingChannel'),
+                recording_id=recording_id, channel_num=0,
+                recorder_channel_num=0, mic_output_id=mic_output.id)
+
+            if args.recording_files != 'none':
+
+                path = Path(
+                    station.name, f'{station.name}_{date.isoformat()}.wav')
+
+                rows.add(
+                    'RecordingFile', id=ids.get('RecordingFile'),
+                    recording_id=recording_id, file_num=0, start_index=0,
+                    length=recording_length, path=str(path))
+
+                create_recording_file(
+                    recording_dir_path / path, recording_length,
+                    args.sample_rate, args.recording_files, rng)
+
+            for detector in detectors:
+
+                start_indices = get_clip_start_indices(
+                    args.clips_per_night, recording_length - clip_length,
+                    rng)
+
+                classifications = rng.choice(
+                    len(values), size=len(start_indices), p=probabilities)
+
+                for start_index, value_num in \
+                        zip(start_indices, classifications):
+
+                    clip_start_time = start_time + datetime.timedelta(
+                        seconds=start_index / args.sample_rate)
+
+                    clip_id = rows.add(
+                        'Clip', id=ids.get('Clip'), station_id=station.id,
+                        mic_output_id=mic_output.id,
+                        recording_channel_id=channel_id,
+                        start_index=start_index, length=clip_length,
+                        sample_rate=args.sample_rate,
+                        start_time=clip_start_time,
+                        end_time=clip_start_time + clip_duration,
+                        date=date, creation_time=creation_time,
+                        creating_processor_id=detector.id)
+
+                    value = values[value_num]
+
+                    if value is not None:
+                        rows.add(
+                            'StringAnnotation',
+                            id=ids.get('StringAnnotation'),
+                            clip_id=clip_id, info_id=info.id, value=value,
+                            creation_time=creation_time)
+
+        with archive_lock.atomic(), transaction.atomic():
+            rows.insert()
+
+        for name, count in rows.counts.items():
+            counts[name] += count
+
+        elapsed_time = time.time() - station_start_time
+
+        show_message(
+            f'    {station.name}: {rows.counts["clips"]} clips in '
+            f'{elapsed_time:.1f} seconds')
+
+    ids.reset_sequences()
+
+    return counts
+
+
+def get_classification_probabilities(args):
+
+    mix = args.classification_mix
+
+    values = [None if v == UNCLASSIFIED_VALUE else v for v in mix]
+
+    weights = np.array(list(mix.values()))
+    probabilities = weights / weights.sum()
+
+    return values, probabilities
+
+
+def get_clip_start_indices(count, max_start_index, rng):
+
+    """
+    Gets distinct, sorted, random clip start indices.
+
+    Each index is in a different one of `count` equal intervals of
+    [0, `max_start_index`], so the indices are spread throughout the
+    recording.
+    """
+
+    spacing = max_start_index / count
+    offsets = rng.uniform(0, 1, count)
+    indices = np.floor((np.arange(count) + offsets) * spacing)
+
+    # Remove any duplicate indices, which can occur only for clip
+    # spacings of less than one sample.
+    return np.unique(indices.astype('int64')).tolist()
+
+
+def create_recording_file(path, length, sample_rate, contents, rng):
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    data_size = 2 * length
+
+    with open(path, 'wb') as file_:
+
+        file_.write(create_wave_file_header(sample_rate, data_size))
+
+        if contents == 'silence':
+            # Extend file with zeros without writing them, creating a
+            # sparse file on most file systems.
+            file_.truncate(_WAVE_HEADER_SIZE + data_size)
+
+        else:
+
+            # Write one block of noise repeatedly rather than generating
+            # noise for the entire recording, which takes much longer.
+            block_length = min(NOISE_BLOCK_DURATION * sample_rate, length)
+            block = rng.normal(0, NOISE_STANDARD_DEVIATION, block_length)
+            block = np.clip(np.round(block), -32768, 32767).astype('<i2')
+
+            remaining = length
+            while remaining != 0:
+                n = min(remaining, block_length)
+                file_.write(block[:n].tobytes())
+                remaining -= n
+
+
+def create_wave_file_header(sample_rate, data_size):
+
+    """Creates a header for a mono, 16-bit WAVE file."""
+
+    return b''.join((
+        b'RIFF', struct.pack('<I', _WAVE_HEADER_SIZE - 8 + data_size),
+        b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHH', 16, 1, 1, sample_rate,
+                             2 * sample_rate, 2, 16),
+        b'data', struct.pack('<I', data_size)))
+
+
+class IdAllocator:
+
+    """
+    Allocator of archive object IDs.
+
+    We assign IDs to objects explicitly rather than letting the
+    database do it since Django does not get the IDs of bulk-inserted
+    objects from some database back ends, including SQLite.
+    """
+
+
+    def __init__(self):
+        self._next_ids = {}
+
+
+    def get(self, model_name):
+
+        next_id = self._next_ids.get(model_name)
+
+        if next_id is None:
+            next_id = _get_max_id(model_name) + 1
+
+        self._next_ids[model_name] = next_id + 1
+
+        return next_id
+
+
+    def reset_sequences(self):
+
+        """
+        Resets database ID sequences after explicit ID assignment.
+
+        For database back ends like PostgreSQL that generate IDs from
+        sequences, the sequences must be advanced past explicitly
+        assigned IDs. For other back ends this method does nothing.
+        """
+
+        from django.apps import apps
+        from django.core.management.color import no_style
+        from django.db import connection
+
+        models = [apps.get_model('vesper', n) for n in self._next_ids]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+
+def _get_max_id(model_name):
+
+    from django.apps import apps
+    from django.db.models import Max
+
+    model = apps.get_model('vesper', model_name)
+    max_id = model.objects.aggregate(Max('id'))['id__max']
+    return 0 if max_id is None else max_id
+
+
+class Rows:
+
+    """
+    Archive database table rows to be inserted in bulk.
+
+    We insert rows with `executemany` rather than inserting model
+    instances with `bulk_create`, since for large numbers of rows
+    creating the instances and compiling `bulk_create` SQL takes
+    several times longer than the inserts themselves.
+    """
+
+
+    def __init__(self):
+        self._rows = {}
+
+
+    def add(self, model_name, **values):
+
+        """
+        Adds a row to be inserted.
+
+        Parameters
+        ----------
+        model_name : str
+            the name of the model of the table to which to add the row.
+
+        values : dict
+            mapping from model field attribute names (for example,
+            `station_id` for the `station` foreign key field) to
+            Python values.
+
+        Returns
+        -------
+        int
+            the ID of the row.
+        """
+
+        table = self._rows.get(model_name)
+
+        if table is None:
+            table = _Table(model_name, list(values.keys()))
+            self._rows[model_name] = table
+
+        table.rows.append(table.adapt(values))
+
+        return values['id']
+
+
+    @property
+    def counts(self):
+        get = self._get_count
+        return {
+            'recordings': get('Recording'),
+            'files': get('RecordingFile'),
+            'clips': get('Clip'),
+            'annotations': get('StringAnnotation'),
+        }
+
+
+    def _get_count(self, model_name):
+        table = self._rows.get(model_name)
+        return 0 if table is None else len(table.rows)
+
+
+    def insert(self):
+
+        """
+        Inserts rows in bulk.
+
+        Rows are inserted in the order in which their tables were first
+        added to, so rows are inserted after those they refer to.
+        """
+
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            for table in self._rows.values():
+                for i in range(0, len(table.rows), BATCH_SIZE):
+                    cursor.executemany(
+                        table.sql, table.rows[i:i + BATCH_SIZE])
+
+
+class _Table:
+
+
+    def __init__(self, model_name, attnames):
+
+        from django.apps import apps
+        from django.db import connection
+
+        model = apps.get_model('vesper', model_name)
+        fields = [model._meta.get_field(n) for n in attnames]
+
+        self._attnames = attnames
+        self._adapters = [_get_adapter(f, connection) for f in fields]
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(f.column) for f in fields)
+        parameters = ', '.join(['%s'] * len(fields))
+        self.sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+            f'VALUES ({parameters})')
+
+        self.rows = []
+
+
+    def adapt(self, values):
+        return tuple(
+            a(values[n]) for n, a in zip(self._attnames, self._adapters))
+
+
+def _get_adapter(field, connection):
+
+    field_type = field.get_internal_type()
+
+    if field_type == 'DateTimeField':
+        return connection.ops.adapt_datetimefield_value
+
+    elif field_type == 'DateField':
+        return connection.ops.adapt_datefield_value
+
+    else:
+        return lambda value: value
+
+
+def show_message(message=''):
+    print(message, flush=True)
+
+
+if __name__ == '__main__':
+    main()
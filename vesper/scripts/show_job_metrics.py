@@ -0,0 +1,177 @@
+"""
+Script that shows the performance metrics of Vesper jobs.
+
+The script shows one row per job with the job's elapsed time and, for
+each metrics timer, the percentage of the elapsed time spent in the
+timer (see the `vesper.util.job_metrics` module), so that jobs can be
+compared to see, for example, whether a slow detection job was bound
+by audio file reads, computation, or archive lock waits. It must be
+run in the directory of an archive, for example:
+
+    cd "/Users/Harold/My Archive"
+    python -m vesper.scripts.show_job_metrics --command detect
+
+Jobs without metrics, including jobs that ran before Vesper recorded
+job metrics, are omitted. The `--csv` option writes all of the metrics
+of the shown jobs, including timer total times and counters, to a CSV
+file.
+
+Run the script with the `--help` option for a list of all options.
+"""
+
+
+import argparse
+import csv
+import json
+import os
+
+
+def main():
+
+    args = parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+
+    import django
+    django.setup()
+
+    jobs = get_jobs_metrics(args)
+
+    if len(jobs) == 0:
+        show_message('No jobs with metrics found.')
+        return
+
+    show_jobs_metrics(jobs)
+
+    if args.csv is not None:
+        write_csv_file(args.csv, jobs)
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Shows the performance metrics of Vesper jobs.')
+
+    parser.add_argument(
+        '--command', metavar='NAME',
+        help='show only jobs of the named command, for example "detect"')
+
+    parser.add_argument(
+        '--jobs', metavar='ID', type=int, nargs='+',
+        help='show only the jobs with the specified IDs')
+
+    parser.add_argument(
+        '--csv', metavar='PATH',
+        help='the path of a CSV file to which to write metrics')
+
+    return parser.parse_args()
+
+
+def get_jobs_metrics(args):
+
+    """Gets (job, command name, metrics) triples for the specified jobs."""
+
+    from vesper.django.app.models import Job
+
+    jobs = Job.objects.order_by('id')
+
+    if args.jobs is not None:
+        jobs = jobs.filter(id__in=args.jobs)
+
+    triples = []
+
+    for job in jobs:
+
+        command_name = json.loads(job.command).get('name')
+
+        if args.command is not None and command_name != args.command:
+            continue
+
+        metrics = job.metrics
+
+        if metrics is not None:
+            triples.append((job, command_name, metrics))
+
+    return triples
+
+
+def get_names(jobs, key):
+    names = set()
+    for _, _, metrics in jobs:
+        names.update(metrics[key].keys())
+    return sorted(names)
+
+
+def show_jobs_metrics(jobs):
+
+    import vesper.util.job_metrics as job_metrics
+
+    timer_names = get_names(jobs, 'timers')
+
+    # Show table legend, since timer names are too long for column
+    # headers.
+    show_message('Timers:')
+    for i, name in enumerate(timer_names):
+        show_message(f'    T{i}: {name}')
+    show_message()
+
+    header = ''.join(f'{f"T{i} %":>8}' for i in range(len(timer_names)))
+    show_message(
+        f'{"Job":>6}  {"Command":<12}{"Status":<12}{"Elapsed (s)":>12}'
+        f'{header}')
+
+    for job, command_name, metrics in jobs:
+
+        fractions = dict(
+            (s['name'], s['fraction'])
+            for s in job_metrics.get_timer_summaries(metrics))
+
+        percents = ''.join(
+            f'{100 * fractions[name]:8.1f}' if name in fractions
+            else f'{"-":>8}'
+            for name in timer_names)
+
+        show_message(
+            f'{job.id:>6}  {command_name:<12.12}{job.status:<12.12}'
+            f'{metrics["elapsed_time"]:12.1f}{percents}')
+
+
+def write_csv_file(file_path, jobs):
+
+    timer_names = get_names(jobs, 'timers')
+    counter_names = get_names(jobs, 'counters')
+
+    header = \
+        ['Job', 'Command', 'Status', 'Start Time', 'Elapsed Time'] + \
+        [f'{name} Time' for name in timer_names] + \
+        [f'{name} Count' for name in timer_names] + \
+        counter_names
+
+    with open(file_path, 'w', newline='') as file_:
+
+        writer = csv.writer(file_)
+        writer.writerow(header)
+
+        for job, command_name, metrics in jobs:
+
+            timers = metrics['timers']
+            counters = metrics['counters']
+
+            def get_timer_value(name, key):
+                timer = timers.get(name)
+                return '' if timer is None else timer[key]
+
+            writer.writerow(
+                [job.id, command_name, job.status, job.start_time,
+                 metrics['elapsed_time']] +
+                [get_timer_value(name, 'total_time') for name in timer_names] +
+                [get_timer_value(name, 'count') for name in timer_names] +
+                [counters.get(name, '') for name in counter_names])
+
+
+def show_message(message=''):
+    print(message, flush=True)
+
+
+if __name__ == '__main__':
+    main()
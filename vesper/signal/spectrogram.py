@@ -1,6 +1,8 @@
 """Module containing class `Spectrogram`."""
 
 
+from threading import Lock
+
 import numpy as np
 
 from vesper.signal.sample_provider import SampleProvider
@@ -9,19 +11,80 @@ from vesper.signal.time_axis import TimeAxis
 import vesper.util.time_frequency_analysis_utils as tfa_utils
 
 
+_DEFAULT_CACHE_BLOCK_SIZE = 256
+"""Default spectrogram cache block size, in spectrogram frames."""
+
+_MAX_FFT_RECORD_COUNT = 1024
+"""
+Maximum number of waveform records per FFT.
+
+We compute spectrograms this many records at a time to limit the
+size of the temporary arrays used in the computation.
+"""
+
+
 class Spectrogram(Signal):
     
+    """
+    Spectrogram of a waveform signal.
     
-    def __init__(self, waveform, settings, name=None):
+    Spectrogram samples are computed from waveform samples on demand,
+    as they are indexed. The samples of all requested channels are
+    computed together, with one FFT call per group of waveform records
+    across channels, into a single preallocated array.
+    
+    A spectrogram can optionally cache the samples it computes, so that
+    repeated or overlapping indexing (for example by a viewer that
+    scrolls through a long recording) does not recompute them. The
+    cache holds blocks of `cache_block_size` frames for individual
+    channels, evicting the least recently used block when it is full.
+    
+    Parameters
+    ----------
+    waveform : Signal
+        the waveform of which this is the spectrogram.
+        
+    settings : Bunch
+        spectrogram settings, with `window`, `hop_size`, and `dft_size`
+        attributes.
+        
+    name : str or None
+        the name of this spectrogram.
+        
+    dtype : str or NumPy dtype
+        the type of this spectrogram's samples, either `'float64'` or
+        `'float32'`. With `'float32'`, FFTs are computed in single
+        precision where NumPy supports it, roughly halving both time
+        and memory.
+        
+    cache_block_count : int
+        the maximum number of blocks in this spectrogram's cache, or
+        zero for no cache.
+        
+    cache_block_size : int
+        the number of spectrogram frames in a cache block.
+    """
+    
+    
+    def __init__(
+            self, waveform, settings, name=None, dtype='float64',
+            cache_block_count=0, cache_block_size=_DEFAULT_CACHE_BLOCK_SIZE):
         
         if name is None:
             name = 'Spectrogram'
             
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float64, np.float32):
+            raise ValueError(
+                f'Unsupported spectrogram dtype "{dtype}". Dtype must be '
+                f'either "float64" or "float32".')
+                
         time_axis = _create_time_axis(waveform.time_axis, settings)
         channel_count = len(waveform.channels)
         array_shape = _get_array_shape(settings)
-        dtype = 'float64'
-        sample_provider = _SampleProvider(waveform, settings, dtype)
+        sample_provider = _SampleProvider(
+            waveform, settings, dtype, time_axis.length, cache_block_count,
+            cache_block_size)
         
         super().__init__(
             time_axis, channel_count, array_shape, dtype, sample_provider,
@@ -61,11 +124,27 @@ def _get_array_shape(settings):
 class _SampleProvider(SampleProvider):
     
     
-    def __init__(self, waveform, settings, dtype):
+    def __init__(
+            self, waveform, settings, dtype, length, cache_block_count,
+            cache_block_size):
+                
         self._waveform = waveform
         self._settings = settings
         self._dtype = dtype
+        self._length = length
         self._array_shape = (self._settings.dft_size // 2 + 1,)
+        self._window = np.asarray(settings.window, dtype=dtype)
+        
+        self._cache_block_count = cache_block_count
+        self._cache_block_size = cache_block_size
+        
+        # Mapping from (channel number, block number) pairs to cached
+        # blocks. Python dictionaries preserve insertion order, and we
+        # reinsert a block whenever it is used, so the first item of
+        # the dictionary is always the least recently used block.
+        self._cache = {}
+        self._cache_lock = Lock()
+        
         super().__init__(False)
         
         
@@ -77,34 +156,21 @@ class _SampleProvider(SampleProvider):
         start_frame, end_frame = _get_bounds(frame_key)
         frame_count = end_frame - start_frame
         
-        if channel_count == 0 or frame_count == 0:
-            # result will be empty
-            
-            result = np.array([], dtype=self._dtype)
-            
-        elif channel_count == 1:
-            # result will have one channel
+        result = np.empty(
+            (channel_count, frame_count) + self._array_shape,
+            dtype=self._dtype)
             
-            result = self._compute_channel_gram(
-                start_channel, start_frame, end_frame)
+        if channel_count != 0 and frame_count != 0:
             
-        else:
-            # result will have more than one channel
+            if self._cache_block_count == 0:
+                self._compute_gram(
+                    start_channel, end_channel, start_frame, end_frame,
+                    result)
             
-            grams = [
-                self._compute_channel_gram(i, start_frame, end_frame)
-                for i in range(start_channel, end_channel)]
-            
-            # Stacking separate channel spectrograms into a single,
-            # multichannel array doubles the storage we use to compute
-            # spectrograms. It would be preferable to allocate a single
-            # sample array up front and then compute the channel
-            # spectrograms one at a time into that array, obviating the
-            # the separate stacking operation. Unfortunately, however,
-            # the NumPy FFT function (`numpy.fft.rfft`) that we use to
-            # compute the channel spectrograms does not allow
-            # specification of the output array.
-            result = np.stack(grams)
+            else:
+                self._get_cached_gram(
+                    start_channel, end_channel, start_frame, end_frame,
+                    result)
             
         # Set result shape according to channel and frame keys,
         # eliminating dimensions for which the keys are integers.
@@ -113,27 +179,116 @@ class _SampleProvider(SampleProvider):
         return result.reshape(shape)
         
         
-    def _compute_channel_gram(self, channel_num, start_frame, end_frame):
+    def _compute_gram(
+            self, start_channel, end_channel, start_frame, end_frame, out):
+                
+        """
+        Computes the spectrogram of the specified channels and frames
+        into the specified array.
+        """
         
         s = self._settings
         window_size = len(s.window)
         hop_size = s.hop_size
         
-        start = start_frame * hop_size
+        frame_count = end_frame - start_frame
+        
+        for i in range(0, frame_count, _MAX_FFT_RECORD_COUNT):
+        
+            record_count = min(_MAX_FFT_RECORD_COUNT, frame_count - i)
+        
+            start = (start_frame + i) * hop_size
+            waveform_frame_count = _get_waveform_frame_count(
+                record_count, window_size, hop_size)
+            end = start + waveform_frame_count
         
-        gram_frame_count = end_frame - start_frame
-        waveform_frame_count = _get_waveform_frame_count(
-            gram_frame_count, window_size, hop_size)
-        end = start + waveform_frame_count
+            samples = self._waveform.as_channels[
+                start_channel:end_channel, start:end]
+            samples = np.asarray(samples, dtype=self._dtype)
+        
+            # Compute the DFTs of the records of all channels with one
+            # call. The STFT has shape (channel count, record count,
+            # spectrum size).
+            stft = tfa_utils.compute_stft(
+                samples, self._window, hop_size, s.dft_size)
+            
+            gram = out[:, i:i + record_count]
+            np.abs(stft, out=gram, casting='same_kind')
+            np.square(gram, out=gram)
+            
+        tfa_utils.scale_spectrogram(out, out=out)
         
-        samples = self._waveform.channels[channel_num][start:end]
         
-        gram = tfa_utils.compute_spectrogram(
-            samples, s.window, hop_size, s.dft_size)
+    def _get_cached_gram(
+            self, start_channel, end_channel, start_frame, end_frame, out):
+                
+        """
+        Gets the spectrogram of the specified channels and frames from
+        this provider's cache, computing any missing blocks.
+        """
         
-        tfa_utils.scale_spectrogram(gram, out=gram)
+        block_size = self._cache_block_size
+        start_block = start_frame // block_size
+        end_block = (end_frame - 1) // block_size + 1
+        
+        with self._cache_lock:
+            
+            for block_num in range(start_block, end_block):
+                
+                blocks = self._get_cache_blocks(
+                    start_channel, end_channel, block_num)
+                    
+                # Get intersection of block with requested frames.
+                block_start_frame = block_num * block_size
+                start = max(start_frame, block_start_frame)
+                end = min(end_frame, block_start_frame + block_size)
+                
+                for i, block in enumerate(blocks):
+                    out[i, start - start_frame:end - start_frame] = \
+                        block[start - block_start_frame:end - block_start_frame]
+                        
+                        
+    def _get_cache_blocks(self, start_channel, end_channel, block_num):
         
-        return gram
+        cache = self._cache
+        
+        blocks = [
+            cache.pop((channel_num, block_num), None)
+            for channel_num in range(start_channel, end_channel)]
+            
+        missing_channel_nums = [
+            start_channel + i for i, block in enumerate(blocks)
+            if block is None]
+            
+        if len(missing_channel_nums) != 0:
+            
+            # Compute missing blocks of all channels together. Missing
+            # channels need not be contiguous, so we compute the blocks
+            # of the range of channels that spans them.
+            start = missing_channel_nums[0]
+            end = missing_channel_nums[-1] + 1
+            
+            start_frame = block_num * self._cache_block_size
+            end_frame = min(start_frame + self._cache_block_size, self._length)
+            
+            gram = np.empty(
+                (end - start, end_frame - start_frame) + self._array_shape,
+                dtype=self._dtype)
+                
+            self._compute_gram(start, end, start_frame, end_frame, gram)
+            
+            for channel_num in missing_channel_nums:
+                blocks[channel_num - start_channel] = gram[channel_num - start]
+                
+        # Insert blocks at end of cache, which is most recently used.
+        for i, block in enumerate(blocks):
+            cache[(start_channel + i, block_num)] = block
+            
+        # Evict least recently used blocks.
+        while len(cache) > self._cache_block_count:
+            del cache[next(iter(cache))]
+            
+        return blocks
         
 
     def _get_result_shape(self, channel_key, frame_key):
@@ -45,6 +45,69 @@ class SpectrogramTests(TestCase):
         # _show_samples(gram)
 
 
+    def test_cache_and_dtype(self):
+        
+        channel_count = 3
+        waveform_frame_count = 1000
+        window_size = 16
+        hop_size = 8
+        dft_size = 32
+        
+        samples = _get_waveform_samples(
+            channel_count, waveform_frame_count, window_size)
+        waveform = RamSignal(16000, samples, False)
+        
+        window = np.hanning(window_size)
+        settings = Bunch(window=window, hop_size=hop_size, dft_size=dft_size)
+        
+        expected = _get_gram_samples(waveform, window, hop_size, dft_size)
+        
+        keys = [
+            (slice(None), slice(None)),
+            (slice(1, 3), slice(10, 50)),
+            (slice(0, 1), slice(5, 120)),
+            (slice(None), slice(110, 124)),
+            (2, slice(0, 7)),
+            (0, 119),
+            (slice(1, 2), slice(3, 3)),
+        ]
+        
+        cases = [
+            ({}, 'float64'),
+            ({'cache_block_count': 4, 'cache_block_size': 10}, 'float64'),
+            ({'cache_block_count': 100}, 'float64'),
+            ({'dtype': 'float32'}, 'float32'),
+            ({'dtype': 'float32', 'cache_block_count': 4}, 'float32'),
+        ]
+        
+        for kwargs, dtype in cases:
+            
+            gram = Spectrogram(waveform, settings, **kwargs)
+            
+            self.assertEqual(gram.dtype, np.dtype(dtype))
+            
+            # Index each key twice to exercise cache hits.
+            for key in keys + keys:
+                
+                actual = gram.as_channels[key]
+                
+                self.assertEqual(actual.dtype, np.dtype(dtype))
+                
+                if dtype == 'float64':
+                    self._assert_arrays_equal(actual, expected[key])
+                else:
+                    self.assertEqual(actual.shape, expected[key].shape)
+                    self.assertTrue(np.allclose(
+                        actual, expected[key], rtol=1e-4, atol=1e-6))
+                    
+                    
+    def test_unsupported_dtype(self):
+        waveform = RamSignal(16000, np.zeros((1, 100)), False)
+        settings = Bunch(window=np.ones(16), hop_size=8, dft_size=16)
+        self._assert_raises(
+            ValueError, Spectrogram, waveform, settings, dtype='int16')
+
+
 def _get_waveform_samples(channel_count, frame_count, window_size):
     
     channel_samples = [
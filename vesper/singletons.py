@@ -1,13 +1,18 @@
 """Module containing Vesper singleton objects."""
 
 
+import atexit
+
 from vesper.archive_paths import archive_paths
 from vesper.command.job_manager import JobManager
 from vesper.django.app.archive import Archive
+from vesper.ephem.ephem_cache import EphemCache
 from vesper.util.extension_manager import ExtensionManager
 from vesper.util.preference_manager import PreferenceManager
 from vesper.util.preset_manager import PresetManager
+from vesper.util.recording_file_cache import RecordingFileCache
 from vesper.util.recording_manager import RecordingManager
+from vesper.util.schedule_cache import ScheduleCache
 from vesper.util.singleton import Singleton
 import tensorflow as tf
 
@@ -234,16 +239,61 @@ def _create_clip_manager():
 clip_manager = Singleton(_create_clip_manager)
                          
                          
+def _create_clip_image_manager():
+    from vesper.util.clip_image_manager import ClipImageManager
+    return ClipImageManager(archive_paths.clip_image_dir_path)
+
+
+clip_image_manager = Singleton(_create_clip_image_manager)
+
+
 def _create_recording_manager():
-    return RecordingManager(
-        archive_paths.archive_dir_path, archive_paths.recording_dir_paths)
+    manager = RecordingManager(
+        archive_paths.archive_dir_path, archive_paths.recording_dir_paths,
+        archive_paths.recording_path_index_file_path)
+    atexit.register(manager.save_index)
+    return manager
 
 
 recording_manager = Singleton(_create_recording_manager)
 
 
+def _create_recording_file_cache():
+    return RecordingFileCache(archive_paths.recording_file_cache_file_path)
+
+
+recording_file_cache = Singleton(_create_recording_file_cache)
+
+
 def _create_archive():
     return Archive()
 
 
 archive = Singleton(_create_archive)
+
+
+def _create_archive_write_queue():
+    from vesper.django.app.archive_write_queue import ArchiveWriteQueue
+    return ArchiveWriteQueue()
+
+
+archive_write_queue = Singleton(_create_archive_write_queue)
+
+
+def _create_ephem_cache():
+    cache = EphemCache(archive_paths.ephem_cache_file_path)
+    atexit.register(cache.save)
+    return cache
+
+
+ephem_cache = Singleton(_create_ephem_cache)
+
+
+def _create_schedule_cache():
+    cache = ScheduleCache(
+        archive_paths.schedule_cache_file_path, ephem_cache.instance)
+    atexit.register(cache.save)
+    return cache
+
+
+schedule_cache = Singleton(_create_schedule_cache)
@@ -63,6 +63,15 @@ which suggests to me that the problem may not be just that the
 database has limited support for concurrent transactions, but
 rather that for some reason it does not support concurrent
 transactions at all.
+
+SQLite archive databases now use write-ahead logging (WAL) journaling
+by default (see the `vesper.django.app.archive_database` module), with
+which readers and a writer do not block each other. The archive lock
+is thus needed only for writes, and reads are performed by a separate,
+read-only database connection that never obtains it. Writes from the
+server's views go through a single `ArchiveWriteQueue` (see the
+`vesper.django.app.archive_write_queue` module), which obtains the
+lock once for several concurrent writes.
 """
 
 
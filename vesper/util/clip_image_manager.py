@@ -0,0 +1,110 @@
+"""Module containing `ClipImageManager` class."""
+
+
+import os
+import shutil
+
+from vesper.singletons import clip_manager
+from vesper.util.clip_manager import get_clip_path_parts
+import vesper.util.clip_image_utils as clip_image_utils
+import vesper.util.os_utils as os_utils
+
+
+class ClipImageManager:
+    
+    """
+    Gets spectrogram images of the clips of a Vesper archive.
+    
+    Images are cached in files in the archive, by clip ID, clip start
+    index and length, and settings hash, so that an image is computed
+    only once for a given clip extent and set of spectrogram settings.
+    Including the clip extent in the key keeps a clip whose extent
+    changes (as when clips are adjusted) from being served a stale
+    image, whether or not the clip has an audio file. The images of a
+    clip are stored together in a directory of their own, which is
+    deleted when the clip's audio file is deleted or recreated, and
+    when the clip is adjusted or deleted.
+    """
+    
+    
+    def __init__(self, image_dir_path):
+        self._image_dir_path = str(image_dir_path)
+        
+        
+    def get_spectrogram_image(self, clip, settings, cache_result=True):
+        
+        """
+        Gets a spectrogram image of the specified clip.
+        
+        Parameters
+        ----------
+        clip : Clip
+            the clip for which to get a spectrogram image.
+            
+        settings : dict
+            clip album spectrogram settings.
+            
+        cache_result : bool
+            `True` if and only if a newly computed image should be
+            cached.
+            
+        Returns
+        -------
+        bytes
+            the image in PNG format, or an empty `bytes` object if the
+            clip is too short to have a spectrogram.
+        """
+        
+        settings = clip_image_utils.get_spectrogram_settings(
+            settings, clip.sample_rate)
+        settings_hash = clip_image_utils.get_settings_hash(settings)
+        
+        path = self._get_image_file_path(clip, settings_hash)
+        
+        try:
+            with open(path, 'rb') as file_:
+                return file_.read()
+                
+        except FileNotFoundError:
+            # image not cached
+            
+            samples = clip_manager.instance.get_samples(clip)
+            image = clip_image_utils.compute_spectrogram_image(
+                samples, settings)
+                
+            if image.size == 0:
+                return b''
+                
+            content = clip_image_utils.encode_png(image)
+            
+            if cache_result:
+                os_utils.write_file_atomically(path, content, mode='wb')
+                
+            return content
+            
+            
+    def delete_images(self, clip):
+        
+        """
+        Deletes the cached images of the specified clip.
+        
+        If the clip has no cached images, this method does nothing.
+        """
+        
+        dir_path = self._get_clip_dir_path(clip.id)
+        
+        if os.path.isdir(dir_path):
+            shutil.rmtree(dir_path, ignore_errors=True)
+            
+            
+    def _get_clip_dir_path(self, clip_id):
+        id_parts = get_clip_path_parts(clip_id)
+        dir_name = 'Clip {}'.format(' '.join(id_parts))
+        return os.path.join(self._image_dir_path, *id_parts[:-1], dir_name)
+        
+        
+    def _get_image_file_path(self, clip, settings_hash):
+        dir_path = self._get_clip_dir_path(clip.id)
+        file_name = '{} {} {}.png'.format(
+            clip.start_index, clip.length, settings_hash)
+        return os.path.join(dir_path, file_name)
@@ -0,0 +1,356 @@
+"""
+Utility functions pertaining to server-side clip images.
+
+The functions of this module compute clip spectrogram images and night
+clip density rugs like those that the clip album computes in the
+browser, so that the server can compute them once and clients can
+display them without first downloading and analyzing clip audio.
+
+Spectrogram computations mirror those of the clip album's JavaScript
+(see `spectrogram-clip-view.js` and `signal/spectrogram.js`), so that
+a server-rendered spectrogram image is the same as the image the
+client would compute from the same clip and settings.
+"""
+
+
+import hashlib
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+
+
+_DEFAULT_REFERENCE_POWER = 1e-10
+
+_DEFAULT_SPECTRAL_INTERPOLATION_FACTOR = 1
+
+_SAMPLE_SCALE_FACTOR = 1 / 32768
+"""
+Factor by which we scale 16-bit clip samples.
+
+The browser's Web Audio API decodes 16-bit clip samples to floating
+point values in [-1, 1), and we scale samples the same way.
+"""
+
+_MIN_POWER_RATIO = 1e-100
+_MIN_POWER_DB = 10 * np.log10(_MIN_POWER_RATIO)
+
+_WINDOW_WEIGHTS = {
+    'Blackman': (.42, -.5, .08),
+    'Hamming': (.54, -.46),
+    'Hann': (.5, -.5),
+    'Nuttall': (.3635819, -.4891775, .1365995, -.0106411),
+    'Rectangular': (1,),
+}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def get_spectrogram_settings(settings, sample_rate):
+    
+    """
+    Gets low-level spectrogram settings from clip album settings.
+    
+    Parameters
+    ----------
+    settings : dict
+        clip album spectrogram settings, as in the `spectrogram` item
+        of a clip album settings preset. The settings must include
+        `computation` and `display` items.
+        
+    sample_rate : int or float
+        the sample rate of the clip for which to compute a spectrogram.
+        
+    Returns
+    -------
+    Bunch
+        low-level spectrogram settings, with `window_type`,
+        `window_size`, `window`, `hop_size`, `dft_size`,
+        `reference_power`, `power_range`, and `reverse_colormap`
+        attributes.
+    """
+    
+    computation = settings['computation']
+    display = settings['display']
+    
+    window_type = computation['window']['type']
+    float_window_size = computation['window']['size'] * sample_rate
+    window_size = int(round(float_window_size))
+    hop_size = int(round(computation['hopSize'] / 100 * float_window_size))
+    dft_size = _get_dft_size(
+        window_size, computation.get('spectralInterpolationFactor'))
+    reference_power = \
+        computation.get('referencePower') or _DEFAULT_REFERENCE_POWER
+        
+    return Bunch(
+        window_type=window_type,
+        window_size=window_size,
+        window=create_data_window(window_type, window_size),
+        hop_size=hop_size,
+        dft_size=dft_size,
+        reference_power=reference_power,
+        power_range=tuple(display['powerRange']),
+        reverse_colormap=display.get('reverseColormap', True))
+
+
+def _get_dft_size(window_size, interpolation_factor):
+    
+    # We combine the interpolation factor with the default factor
+    # using a bitwise or, as the clip album does.
+    factor = int(interpolation_factor or 0) | \
+        _DEFAULT_SPECTRAL_INTERPOLATION_FACTOR
+        
+    power_of_two_ceil = _get_power_of_two_ceil(window_size)
+    
+    if factor <= 1 or not _is_power_of_two(factor):
+        return power_of_two_ceil
+    else:
+        return power_of_two_ceil * factor
+
+
+def _get_power_of_two_ceil(x):
+    if x <= 0:
+        return 1
+    else:
+        return 2 ** int(np.ceil(np.log2(x)))
+
+
+def _is_power_of_two(n):
+    return n & (n - 1) == 0
+
+
+def create_data_window(window_type, size):
+    
+    """
+    Creates a symmetric data window.
+    
+    The window is the same as the one created by the clip album's
+    `DataWindow.createWindow` JavaScript function.
+    """
+    
+    try:
+        weights = _WINDOW_WEIGHTS[window_type]
+    except KeyError:
+        raise ValueError(f'Unrecognized window type "{window_type}".')
+        
+    window = np.zeros(size)
+    
+    if size == 1:
+        window[0] = sum(weights)
+        
+    elif size > 1:
+        
+        n = np.arange(size)
+        period = size - 1
+        
+        for i, weight in enumerate(weights):
+            window += weight * np.cos(i * 2 * np.pi / period * n)
+            
+    return window
+
+
+def get_settings_hash(settings):
+    
+    """
+    Gets a hash of the specified low-level spectrogram settings.
+    
+    The hash is a hexadecimal string that depends on exactly those
+    settings that affect spectrogram images.
+    """
+    
+    s = settings
+    
+    items = (
+        s.window_type, s.window_size, s.hop_size, s.dft_size,
+        s.reference_power, s.power_range, s.reverse_colormap)
+        
+    text = json.dumps(items)
+    
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def compute_spectrogram_image(samples, settings):
+    
+    """
+    Computes a spectrogram image.
+    
+    Parameters
+    ----------
+    samples : NumPy array
+        16-bit clip samples.
+        
+    settings : Bunch
+        low-level spectrogram settings, as returned by
+        `get_spectrogram_settings`.
+        
+    Returns
+    -------
+    NumPy array
+        spectrogram image, a two-dimensional `uint8` array of gray
+        levels with one column per spectrum and one row per frequency
+        bin. The first row is for the highest frequency.
+    """
+    
+    s = settings
+    
+    samples = np.asarray(samples, dtype='float64') * _SAMPLE_SCALE_FACTOR
+    
+    num_spectra = _get_num_spectra(len(samples), s.window_size, s.hop_size)
+    num_bins = s.dft_size // 2 + 1
+    
+    if num_spectra == 0:
+        return np.zeros((num_bins, 0), dtype='uint8')
+        
+    # Compute spectral powers. Like the clip album, we double the
+    # powers of all bins except the first and the last to account
+    # for negative frequencies, but do not otherwise scale them.
+    records = np.lib.stride_tricks.as_strided(
+        samples, (num_spectra, s.window_size),
+        (s.hop_size * samples.strides[0], samples.strides[0]))
+    stft = np.fft.rfft(s.window * records, n=s.dft_size)
+    powers = stft.real ** 2 + stft.imag ** 2
+    powers[:, 1:-1] *= 2
+    
+    # Convert powers to decibels.
+    ratios = powers / s.reference_power
+    small = ratios < _MIN_POWER_RATIO
+    ratios[small] = 1
+    gram = 10 * np.log10(ratios)
+    gram[small] = _MIN_POWER_DB
+    
+    # Map decibels to gray levels.
+    a, b = _get_color_coefficients(s.power_range, s.reverse_colormap)
+    levels = np.rint(a * gram + b)
+    np.clip(levels, 0, 255, out=levels)
+    
+    # Transpose so that image columns are spectra and flip so that
+    # first row is for highest frequency.
+    return levels.T[::-1].astype('uint8')
+
+
+def _get_num_spectra(num_samples, record_size, hop_size):
+    if num_samples < record_size:
+        return 0
+    else:
+        return 1 + (num_samples - record_size) // hop_size
+
+
+def _get_color_coefficients(power_range, reverse_colormap):
+    
+    start_power, end_power = power_range
+    
+    if reverse_colormap:
+        start_color, end_color = 255, 0
+    else:
+        start_color, end_color = 0, 255
+        
+    a = (end_color - start_color) / (end_power - start_power)
+    b = end_color - a * end_power
+    
+    return a, b
+
+
+def get_night_hours(time):
+    
+    """
+    Gets the hours of a local time relative to the start of its night.
+    
+    As in the clip album's night rug plot, times before noon are
+    considered to be on the night of the previous day, so the hours
+    of a time are in [12, 36).
+    """
+    
+    hour = time.hour if time.hour >= 12 else time.hour + 24
+    
+    seconds = \
+        hour * 3600 + time.minute * 60 + time.second + \
+        time.microsecond / 1e6
+        
+    return seconds / 3600
+
+
+def compute_clip_density(clip_hours, start_hour, end_hour, width):
+    
+    """
+    Computes a night clip density rug.
+    
+    Parameters
+    ----------
+    clip_hours : sequence of float
+        the night hours of clips, as returned by `get_night_hours`.
+        
+    start_hour : float
+        the start hour of the rug.
+        
+    end_hour : float
+        the end hour of the rug.
+        
+    width : int
+        the number of columns of the rug.
+        
+    Returns
+    -------
+    NumPy array
+        the rug, a one-dimensional `uint8` array of per-column clip
+        counts. Counts larger than 255 are reported as 255.
+    """
+    
+    if end_hour <= start_hour:
+        raise ValueError('Rug end hour must follow start hour.')
+        
+    counts, _ = np.histogram(
+        np.asarray(clip_hours, dtype='float64'), bins=width,
+        range=(start_hour, end_hour))
+        
+    return np.minimum(counts, 255).astype('uint8')
+
+
+def encode_png(image):
+    
+    """
+    Encodes a gray level image as PNG.
+    
+    Parameters
+    ----------
+    image : NumPy array
+        two-dimensional `uint8` array of gray levels. The array must
+        not be empty.
+        
+    Returns
+    -------
+    bytes
+        the image in PNG format.
+    """
+    
+    height, width = image.shape
+    
+    if width == 0 or height == 0:
+        raise ValueError('Cannot encode empty image as PNG.')
+        
+    # Apply the PNG "Sub" filter, which encodes each pixel as its
+    # difference from the pixel to its left. Spectrogram images
+    # change slowly from left to right, so this makes them
+    # considerably more compressible.
+    image = image.astype('uint8')
+    filtered = np.empty((height, width + 1), dtype='uint8')
+    filtered[:, 0] = 1
+    filtered[:, 1] = image[:, 0]
+    np.subtract(image[:, 1:], image[:, :-1], out=filtered[:, 2:])
+    
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    data = zlib.compress(filtered.tobytes(), 6)
+    
+    return b''.join((
+        _PNG_SIGNATURE,
+        _create_png_chunk(b'IHDR', header),
+        _create_png_chunk(b'IDAT', data),
+        _create_png_chunk(b'IEND', b'')))
+
+
+def _create_png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + chunk_type + data + \
+        struct.pack('>I', crc)
@@ -1,15 +1,20 @@
 """Module containing `ClipManager` class."""
 
 
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 from threading import Lock
+import bisect
 import os.path
 
 from vesper.archive_paths import archive_paths
 from vesper.signal.wave_audio_file import WaveAudioFileReader
-from vesper.singletons import recording_manager
+from vesper.singletons import clip_image_manager, recording_manager
 from vesper.util.bunch import Bunch
 import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.job_metrics as job_metrics
 import vesper.util.os_utils as os_utils
 
 
@@ -17,6 +22,24 @@ class ClipManagerError(Exception):
     pass
 
 
+_MAX_COALESCED_READ_LENGTH = 2 ** 20
+"""
+Maximum length of a coalesced recording file read, in sample frames.
+
+When we get the samples of many clips from their recordings, we read
+the samples of clips that are near each other in a recording file with
+a single read of at most this length.
+"""
+
+_MAX_COALESCED_READ_GAP = 2 ** 16
+"""
+Maximum gap between clips read with a coalesced read, in sample frames.
+
+It is faster to read and discard the samples of a small gap between
+two clips than to seek past it and perform a separate read.
+"""
+
+
 class ClipManager:
     
     """Gets the audio data of the clips of a Vesper archive."""
@@ -107,7 +130,10 @@ class ClipManager:
        
     def _get_samples_from_audio_file(self, clip, start_index, length):
         path = self.get_audio_file_path(clip)
-        samples, _ = audio_file_utils.read_wave_file(path)
+        with job_metrics.timer(job_metrics.AUDIO_READ):
+            samples, _ = audio_file_utils.read_wave_file(path)
+        job_metrics.increment(
+            job_metrics.AUDIO_SAMPLES_READ, samples.shape[1])
         end_index = start_index + length
         return samples[0, start_index:end_index]
 
@@ -123,41 +149,58 @@ class ClipManager:
             
             self._handle_get_samples_error(clip, 'clip has no start index')
         
-        # TODO: Make search for a file's clip more efficient.
-        # The following code is O(n), where n is the number of
-        # recording files, but we could make it O(log(n)) by
-        # using a more efficient search algorithm. This will
-        # require cacheing lists of recording files for recordings,
-        # which is fine.
-        
         # Get start and end indices of samples in recording.
         start_index = clip.start_index + start_offset
         end_index = start_index + length
         
-        for file_ in clip.recording.files.all():
+        # TODO: Cache sorted lists of recording files for recordings,
+        # so we need not get and sort the files of a recording for
+        # every clip.
+        files = sorted(
+            clip.recording.files.all(), key=lambda f: f.start_index)
+        
+        file_num = self._get_recording_file_num(
+            clip, files, [f.end_index for f in files], start_index,
+            end_index)
+        
+        file_ = files[file_num]
+        
+        return self._get_samples_from_recording_file(
+            file_, clip.channel_num, start_index - file_.start_index, length)
+    
+    
+    def _get_recording_file_num(
+            self, clip, files, file_end_indices, start_index, end_index):
+        
+        """
+        Gets the number of the recording file that contains the
+        specified samples of a clip.
+        
+        `files` are the files of the clip's recording in order of
+        increasing start index, and `file_end_indices` are their end
+        indices. `start_index` and `end_index` are recording indices.
+        The returned number is an index into `files`.
+        
+        Raises
+        ------
+        ClipManagerError
+            if the samples are not all in one recording file.
+        """
+        
+        # Find first file that ends after samples start.
+        i = bisect.bisect_right(file_end_indices, start_index)
+        
+        if i == len(files) or start_index < files[i].start_index:
+            self._handle_get_samples_error(
+                clip, 'clip is outside of recording')
             
-            if start_index >= file_.start_index and \
-                    start_index < file_.end_index:
-                # samples start in this file.
-                
-                if end_index < file_.end_index:
-                    # samples end in this file.
-                
-                    # Get start index of samples in file.
-                    start_index -= file_.start_index
-                    
-                    return self._get_samples_from_recording_file(
-                        file_, clip.channel_num, start_index, length)
-                        
-                else:
-                    # clip extends past end of file
-                    
-                    # TODO: Handle clips that cross file boundaries.
-                    self._handle_get_samples_error(
-                        clip, 'clip crosses a file boundary')
-                
-        # If we get here, the clip was not found in a recording file.
-        self._handle_get_samples_error(clip, 'clip is outside of recording')
+        if end_index > files[i].end_index:
+            
+            # TODO: Handle clips that cross file boundaries.
+            self._handle_get_samples_error(
+                clip, 'clip crosses a file boundary')
+            
+        return i
     
     
     def _handle_get_samples_error(self, clip, reason):
@@ -218,11 +261,145 @@ class ClipManager:
         
         with self._read_lock:
             reader = self._get_audio_file_reader(path)
-            samples = reader.read(start_index, length)
+            samples = self._read(reader, start_index, length)
         
         return samples[channel_num]
     
     
+    def get_recording_samples(self, clips):
+        
+        """
+        Generates the samples of the specified clips from their recordings.
+        
+        Unlike `get_samples`, which reads the samples of one clip at a
+        time, this method sorts the specified clips by recording file
+        and start index and reads their samples sequentially, with
+        a single read for each run of clips that are near each other in
+        a recording file. This is much faster than getting the samples
+        of many clips one at a time in some other order, for example
+        clip query order, for which reads jump around in the recording
+        files.
+        
+        Parameters
+        ----------
+        clips : iterable of Clip
+            the clips whose samples are to be gotten. Any clips with
+            the same recording should also have the same
+            `recording_channel.recording` object, which is true of
+            clips of a query with
+            `select_related('recording_channel__recording')`, so that
+            the files of each recording are gotten only once.
+            
+        Yields
+        ------
+        tuple
+            (clip, samples) pairs, in order of increasing recording
+            file and clip start index.
+            
+        Raises
+        ------
+        ClipManagerError
+            If the samples of a clip cannot be located in a single
+            recording file. The error is raised before any samples
+            are yielded.
+        """
+        
+        segments = self._get_recording_segments(clips)
+        
+        for file_, read_start_index, read_end_index, read_segments in \
+                _coalesce_recording_segments(segments):
+            
+            samples = self._read_recording_file(
+                file_, read_start_index, read_end_index - read_start_index)
+            
+            for _, _, start_index, end_index, channel_num, clip in \
+                    read_segments:
+                
+                start_index -= read_start_index
+                end_index -= read_start_index
+                
+                yield clip, samples[channel_num, start_index:end_index]
+                
+                
+    def _get_recording_segments(self, clips):
+        
+        """
+        Gets the recording file segments of the specified clips.
+        
+        Returns a list of (file number, file, start index, end index,
+        channel number, clip) tuples sorted by file number and start
+        index, in which the file number is a sort key unique to the
+        file and the indices are relative to the start of the file.
+        """
+        
+        # Group clips by recording.
+        recording_clips = defaultdict(list)
+        for clip in clips:
+            recording = clip.recording
+            recording_clips[recording.id].append(clip)
+            
+        segments = []
+        
+        for recording_num, clips in enumerate(recording_clips.values()):
+            
+            files = sorted(
+                clips[0].recording.files.all(), key=lambda f: f.start_index)
+            
+            file_end_indices = [f.end_index for f in files]
+            
+            for clip in clips:
+                
+                if clip.start_index is None:
+                    self._handle_get_samples_error(
+                        clip, 'clip has no start index')
+                    
+                start_index = clip.start_index
+                end_index = start_index + clip.length
+                
+                i = self._get_recording_file_num(
+                    clip, files, file_end_indices, start_index, end_index)
+                
+                file_ = files[i]
+                
+                segments.append((
+                    (recording_num, i), file_,
+                    start_index - file_.start_index,
+                    end_index - file_.start_index, clip.channel_num, clip))
+                
+        segments.sort(key=lambda s: (s[0], s[2], s[3]))
+        
+        return segments
+    
+    
+    def _read_recording_file(self, file_, start_index, length):
+        
+        try:
+            path = self._rm.get_absolute_recording_file_path(file_.path)
+            
+        except ValueError as e:
+            raise ClipManagerError((
+                'Could not read clip samples from recording file. '
+                '{}').format(str(e)))
+        
+        # See comment in `_get_samples_from_recording_file` regarding
+        # the lock.
+        with self._read_lock:
+            reader = self._get_audio_file_reader(path)
+            return self._read(reader, start_index, length)
+    
+    
+    def _read(self, reader, start_index, length):
+        
+        # We time reads inside the read lock so that the audio read
+        # timer of the job metrics excludes lock waits.
+        with job_metrics.timer(job_metrics.AUDIO_READ):
+            samples = reader.read(start_index, length)
+            
+        job_metrics.increment(job_metrics.AUDIO_SAMPLES_READ, length)
+        
+        return samples
+    
+    
     def _get_audio_file_reader(self, path):
         
         try:
@@ -293,6 +470,10 @@ class ClipManager:
         path = self.get_audio_file_path(clip)
         os_utils.delete_file(path)
         
+        # Delete any cached images of the clip, which may no longer
+        # be valid.
+        clip_image_manager.instance.delete_images(clip)
+        
             
     def create_audio_file(self, clip, samples=None):
         
@@ -318,6 +499,10 @@ class ClipManager:
             
         self._create_audio_file(clip, samples)
         
+        # Delete any cached images of the clip, which may no longer
+        # be valid.
+        clip_image_manager.instance.delete_images(clip)
+        
         
     def _create_audio_file(self, clip, samples, path=None):
         
@@ -354,11 +539,100 @@ class ClipManager:
         self._create_audio_file(clip, samples, path)        
         
         
+    def create_audio_files(self, clips, num_threads=1):
+        
+        """
+        Creates audio files for the specified clips.
+        
+        This method is equivalent to calling `create_audio_file` for
+        each of the specified clips, but is much faster for many clips.
+        It gets the clips' samples from their recordings with
+        `get_recording_samples` and writes the audio files on a pool
+        of threads.
+        
+        Parameters
+        ----------
+        clips : iterable of Clip
+            the clips for which to create audio files. See
+            `get_recording_samples` regarding the clips.
+            
+        num_threads : int
+            the number of threads on which to write audio files.
+        """
+        
+        tasks = (
+            partial(self.create_audio_file, clip, samples)
+            for clip, samples in self.get_recording_samples(clips))
+        
+        _run_in_parallel(num_threads, tasks)
+        
+        
+    def export_audio_files(self, clips, paths, num_threads=1):
+        
+        """
+        Exports audio files for the specified clips.
+        
+        This method is equivalent to calling `export_audio_file` for
+        each of the specified clips, but is much faster for many clips.
+        It gets the samples of clips that do not have audio files from
+        their recordings with `get_recording_samples` and writes the
+        exported audio files on a pool of threads.
+        
+        Parameters
+        ----------
+        clips : sequence of Clip
+            the clips to export. See `get_recording_samples` regarding
+            the clips.
+            
+        paths : sequence of str
+            the paths of the audio files to create, one per clip.
+            
+        num_threads : int
+            the number of threads on which to write audio files.
+        """
+        
+        recording_clips = []
+        clip_paths = {}
+        file_clips = []
+        
+        for clip, path in zip(clips, paths):
+            if self.has_audio_file(clip):
+                file_clips.append((clip, path))
+            else:
+                recording_clips.append(clip)
+                clip_paths[clip.id] = path
+                
+        def create_tasks():
+            
+            for clip, path in file_clips:
+                yield partial(self.export_audio_file, clip, path)
+                    
+            for clip, samples in self.get_recording_samples(recording_clips):
+                path = clip_paths[clip.id]
+                yield partial(self._create_audio_file, clip, samples, path)
+                    
+        _run_in_parallel(num_threads, create_tasks())
+        
+        
 _CLIPS_DIR_FORMAT = (3, 3, 3)
 
 
+def get_clip_path_parts(clip_id):
+    
+    """
+    Gets the parts of the path of a clip's audio file.
+    
+    The parts are the names of the nested directories that contain
+    the file and the clip ID digit groups that appear in the file
+    name, in that order. Other per-clip archive files (for example,
+    cached clip images) are organized in the same way.
+    """
+    
+    return _get_clip_id_parts(clip_id, _CLIPS_DIR_FORMAT)
+
+
 def _get_audio_file_path(clip_id):
-    id_parts = _get_clip_id_parts(clip_id, _CLIPS_DIR_FORMAT)
+    id_parts = get_clip_path_parts(clip_id)
     path_parts = id_parts[:-1]
     id_ = ' '.join(id_parts)
     file_name = 'Clip {}.wav'.format(id_)
@@ -383,6 +657,73 @@ def _get_clip_id_parts(num, format_):
     return parts
     
     
+def _coalesce_recording_segments(segments):
+    
+    """
+    Coalesces recording segments into reads.
+    
+    Generates (file, start index, end index, segments) tuples, one for
+    each run of segments in the same recording file that can be read
+    with a single read. The segments must be sorted as by
+    `ClipManager._get_recording_segments`.
+    """
+    
+    read = None
+    
+    for segment in segments:
+        
+        file_num, file_, start_index, end_index, _, _ = segment
+        
+        if read is not None and file_num == read[0] and \
+                start_index - read[3] <= _MAX_COALESCED_READ_GAP and \
+                end_index - read[2] <= _MAX_COALESCED_READ_LENGTH:
+            # segment can be added to current read
+            
+            read[3] = max(read[3], end_index)
+            read[4].append(segment)
+            
+        else:
+            # segment cannot be added to current read
+            
+            if read is not None:
+                yield tuple(read[1:])
+                
+            read = [file_num, file_, start_index, end_index, [segment]]
+            
+    if read is not None:
+        yield tuple(read[1:])
+        
+        
+def _run_in_parallel(num_threads, tasks):
+    
+    """
+    Runs tasks on a pool of threads.
+    
+    `tasks` is an iterable of callables, which may be a generator that
+    performs work to create the tasks (for example, to read the
+    samples that the tasks will write). We limit the number of tasks
+    that are pending at any time to bound the memory used by their
+    arguments. If a task raises an exception, this function waits for
+    any other pending tasks to complete and then reraises the exception.
+    """
+    
+    max_pending_count = 4 * num_threads
+    
+    with ThreadPoolExecutor(num_threads) as executor:
+        
+        futures = deque()
+        
+        for task in tasks:
+            
+            futures.append(executor.submit(task))
+            
+            if len(futures) >= max_pending_count:
+                futures.popleft().result()
+                
+        while len(futures) != 0:
+            futures.popleft().result()
+            
+            
 def _complete_clip_segment_spec(clip, start_offset, length):
     
     if start_offset is None:
@@ -0,0 +1,232 @@
+"""
+Module containing class `ClipSpoolWriter` and function `read_clip_spool`.
+
+A *clip spool* is a directory of clips that were detected in real time,
+for example by a Vesper Recorder that runs detectors on its input while
+it records. The spool holds one audio file per clip, plus a manifest
+file that describes the clips. The manifest allows the clips of a
+spool to be imported into an archive in bulk, without reading the
+audio of the recordings in which they were detected.
+
+The manifest is a JSON Lines file, i.e. a text file with one JSON
+object per line. Each object describes one clip, and has the following
+properties:
+    
+    file_name - name of clip audio file, relative to spool directory
+    station - station name
+    detector - detector name
+    channel_num - recording channel number
+    start_time - clip start time, an ISO 8601 UTC time
+    length - clip length in sample frames
+    sample_rate - clip sample rate in hertz
+    annotations - clip annotations, a mapping from annotation names
+        to values, or `null`
+
+A clip's object is appended to the manifest only after its audio file
+has been written, so every clip in the manifest has an audio file.
+"""
+
+
+from pathlib import Path
+from threading import Lock
+import datetime
+import json
+import logging
+
+import pytz
+
+from vesper.util.bunch import Bunch
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+MANIFEST_FILE_NAME = 'Clips.jsonl'
+
+_FILE_NAME_TIME_FORMAT = '%Y-%m-%d_%H.%M.%S.%f'
+
+
+_logger = logging.getLogger()
+
+
+class ClipSpoolWriter:
+    
+    
+    def __init__(self, dir_path):
+        
+        """
+        Initializes this writer for the specified spool directory.
+        
+        The directory is created if it does not exist. If the directory
+        is an existing spool, clips written by this writer are added to
+        it.
+        """
+        
+        self._dir_path = Path(dir_path)
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        
+        manifest_file_path = self._dir_path / MANIFEST_FILE_NAME
+        self._manifest_file = open(manifest_file_path, 'a')
+        
+        self._lock = Lock()
+        self._num_clips = 0
+        
+        
+    @property
+    def dir_path(self):
+        return self._dir_path
+        
+        
+    @property
+    def num_clips(self):
+        
+        """The number of clips written by this writer."""
+        
+        return self._num_clips
+        
+        
+    def write_clip(
+            self, station_name, detector_name, channel_num, start_time,
+            samples, sample_rate, annotations=None):
+                
+        """
+        Writes a clip to this writer's spool.
+        
+        Parameters
+        ----------
+        station_name : str
+            the name of the clip's station.
+            
+        detector_name : str
+            the name of the detector that detected the clip.
+            
+        channel_num : int
+            the recording channel number of the clip.
+            
+        start_time : datetime
+            the UTC start time of the clip.
+            
+        samples : NumPy array
+            the one-dimensional array of clip samples.
+            
+        sample_rate : int or float
+            the clip sample rate in hertz.
+            
+        annotations : dict or None
+            the clip's annotations, a mapping from annotation names to
+            JSON-serializable values.
+            
+        Returns
+        -------
+        str
+            the name of the clip's audio file.
+        """
+        
+        time = start_time.astimezone(pytz.utc)
+        
+        file_name = '{}_{}_{}_Z_{}.wav'.format(
+            station_name, detector_name, time.strftime(_FILE_NAME_TIME_FORMAT),
+            channel_num)
+            
+        file_path = self._dir_path / file_name
+        audio_file_utils.write_wave_file(str(file_path), samples, sample_rate)
+        
+        clip = {
+            'file_name': file_name,
+            'station': station_name,
+            'detector': detector_name,
+            'channel_num': channel_num,
+            'start_time': time.isoformat(),
+            'length': len(samples),
+            'sample_rate': sample_rate,
+            'annotations': annotations
+        }
+        
+        with self._lock:
+            self._manifest_file.write(json.dumps(clip) + '\n')
+            self._manifest_file.flush()
+            self._num_clips += 1
+            
+        return file_name
+        
+        
+    def close(self):
+        with self._lock:
+            self._manifest_file.close()
+
+
+def read_clip_spool(dir_path, read_samples=True):
+    
+    """
+    Reads the clips of a clip spool.
+    
+    Parameters
+    ----------
+    dir_path : str or Path
+        the path of the spool directory.
+        
+    read_samples : bool
+        `True` if and only if clip samples should be read.
+        
+    Returns
+    -------
+    generator of clip `Bunch` objects
+        a generator of one `Bunch` per clip, in the order in which they
+        were written to the spool. Each `Bunch` has the properties of a
+        manifest object (see the module docstring), except that
+        `start_time` is a `datetime` and `station` and `detector` are
+        named `station_name` and `detector_name`, plus a `file_path`
+        attribute, the absolute path of the clip audio file, and (if
+        `read_samples` is `True`) a `samples` attribute, a NumPy array
+        of clip samples.
+    """
+    
+    dir_path = Path(dir_path)
+    manifest_file_path = dir_path / MANIFEST_FILE_NAME
+    
+    with open(manifest_file_path) as manifest_file:
+        
+        for line_num, line in enumerate(manifest_file, start=1):
+            
+            line = line.strip()
+            
+            if len(line) == 0:
+                continue
+                
+            try:
+                clip = json.loads(line)
+                
+            except ValueError:
+                # A spool writer may have been interrupted while writing
+                # this line.
+                
+                _logger.warning(
+                    f'Could not parse line {line_num} of clip spool '
+                    f'manifest "{manifest_file_path}". Line will be '
+                    f'ignored.')
+                    
+                continue
+                
+            yield _create_clip(dir_path, clip, read_samples)
+
+
+def _create_clip(dir_path, clip, read_samples):
+    
+    file_path = dir_path / clip['file_name']
+    
+    start_time = datetime.datetime.fromisoformat(clip['start_time'])
+    
+    result = Bunch(
+        file_name=clip['file_name'],
+        file_path=file_path,
+        station_name=clip['station'],
+        detector_name=clip['detector'],
+        channel_num=clip['channel_num'],
+        start_time=start_time.astimezone(pytz.utc),
+        length=clip['length'],
+        sample_rate=clip['sample_rate'],
+        annotations=clip['annotations'])
+        
+    if read_samples:
+        samples, _ = audio_file_utils.read_wave_file(str(file_path))
+        result.samples = samples[0]
+        
+    return result
@@ -1,9 +1,38 @@
+"""
+Module containing classes `ClipsHdf5File` and `ClipsHdf5ArraysWriter`.
+
+A clips HDF5 file stores clips in its `/clips` group in one of two
+layouts. In the *datasets* layout, each clip is stored in its own
+dataset, whose attributes hold the clip's metadata. In the *arrays*
+layout, the samples of all clips are stored in a single chunked and
+compressed 2-D array, zero-padded to the length of the longest clip,
+and clip metadata are stored in parallel 1-D column datasets. The
+arrays layout is much faster to write and read for large numbers of
+clips, since it involves only a handful of HDF5 datasets rather than
+one per clip.
+"""
+
+
 import h5py
+import numpy as np
 
 from vesper.util.bunch import Bunch
 import vesper.util.numpy_utils as numpy_utils
 
 
+LAYOUT_DATASETS = 'Datasets'
+LAYOUT_ARRAYS = 'Arrays'
+
+SAMPLES_DATASET_NAME = 'samples'
+LENGTHS_DATASET_NAME = 'length'
+
+_STRING_DTYPE = h5py.string_dtype()
+
+_DEFAULT_CHUNK_CLIP_COUNT = 64
+_COMPRESSION = 'gzip'
+_COMPRESSION_LEVEL = 4
+
+
 class ClipsHdf5File:
     
     
@@ -11,24 +40,40 @@ class ClipsHdf5File:
         self._file_path = file_path
         
         
+    def _open(self):
+        return h5py.File(self._file_path, 'r')
+        
+        
+    def get_layout(self):
+        with self._open() as f:
+            return _get_layout(f['clips'])
+            
+            
     def get_num_clips(self):
-        with h5py.File(self._file_path) as f:
+        with self._open() as f:
             group = f['clips']
-            return len(group)
+            if _get_layout(group) == LAYOUT_ARRAYS:
+                return len(group[LENGTHS_DATASET_NAME])
+            else:
+                return len(group)
         
         
     def get_sample_rate(self):
-        with h5py.File(self._file_path) as f:
+        with self._open() as f:
             return f['clips'].attrs['sample_rate']
  
     
     def read_clips(
             self, max_num_clips=None, notification_period=None, listener=None):
         
-        with h5py.File(self._file_path) as f:
+        with self._open() as f:
             
             group = f['clips']
             
+            if _get_layout(group) == LAYOUT_ARRAYS:
+                return self._read_array_clips(
+                    group, max_num_clips, notification_period, listener)
+            
             total_num_clips = len(group)
             
             if max_num_clips is not None:
@@ -86,3 +131,263 @@ class ClipsHdf5File:
             original_sample_rate=attrs['original_sample_rate'],
             classification=attrs['classification']
         )
+
+        
+    def _read_array_clips(
+            self, group, max_num_clips, notification_period, listener):
+                
+        arrays = _read_arrays(group, max_num_clips)
+        
+        clips = []
+        
+        for i in range(len(arrays.length)):
+            
+            if notification_period is not None and \
+                    i != 0 and i % notification_period == 0:
+                listener(i)
+                
+            clip = Bunch(
+                id=arrays.clip_id[i],
+                waveform=arrays.samples[i, :arrays.length[i]],
+                station=arrays.station[i],
+                microphone=arrays.mic_output[i],
+                detector=arrays.detector[i],
+                night=arrays.date[i],
+                start_time=arrays.clip_start_time[i],
+                original_sample_rate=arrays.sample_rate[i],
+                classification=arrays.classification[i])
+                
+            clips.append(clip)
+            
+        clips.sort(key=lambda c: c.id)
+        
+        return clips
+        
+        
+    def read_arrays(self, max_num_clips=None):
+        
+        """
+        Reads the clips of an arrays layout file as NumPy arrays.
+        
+        This is much faster than `read_clips`, since it reads each
+        column of the file with a single HDF5 read and does not create
+        an object per clip.
+        
+        Parameters
+        ----------
+        max_num_clips : int or None
+            the maximum number of clips to read, or `None` to read all
+            clips. If this is less than the number of clips in the file,
+            a reproducible random subset of the clips is read.
+            
+        Returns
+        -------
+        Bunch
+            bunch with one attribute per column of the file. The
+            `samples` attribute is a 2-D array of zero-padded clip
+            samples with one row per clip, and the `length` attribute
+            holds the unpadded clip lengths. String columns are arrays
+            of Python `str` objects.
+            
+        Raises
+        ------
+        ValueError
+            if the file does not have the arrays layout.
+        """
+        
+        with self._open() as f:
+            
+            group = f['clips']
+            
+            if _get_layout(group) != LAYOUT_ARRAYS:
+                raise ValueError(
+                    f'Clips HDF5 file "{self._file_path}" does not have '
+                    f'the "{LAYOUT_ARRAYS}" layout.')
+                    
+            return _read_arrays(group, max_num_clips)
+
+
+def _get_layout(group):
+    return group.attrs.get('layout', LAYOUT_DATASETS)
+
+
+def _read_arrays(group, max_num_clips):
+    
+    total_num_clips = len(group[LENGTHS_DATASET_NAME])
+    
+    if max_num_clips is not None and max_num_clips < total_num_clips:
+        # not reading all clips
+        
+        # HDF5 fancy indexing requires increasing indices.
+        indices = np.sort(numpy_utils.reproducible_choice(
+            np.arange(total_num_clips), max_num_clips, replace=False))
+            
+    else:
+        indices = slice(None)
+        
+    arrays = {}
+    
+    for name, dataset in group.items():
+        
+        values = dataset[indices]
+        
+        if h5py.check_string_dtype(dataset.dtype) is not None:
+            values = np.array(
+                [_decode(v) for v in values], dtype=object)
+                
+        arrays[name] = values
+        
+    if SAMPLES_DATASET_NAME not in arrays:
+        # file has no clips
+        
+        # A `ClipsHdf5ArraysWriter` creates the samples dataset only
+        # when the first clips are appended, so a file to which no
+        # clips were appended has no samples dataset.
+        arrays[SAMPLES_DATASET_NAME] = np.zeros((0, 0), dtype=np.int16)
+        
+    return Bunch(**arrays)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class ClipsHdf5ArraysWriter:
+    
+    """
+    Writes clips to an HDF5 group in the arrays layout.
+    
+    Clips are appended in batches, each batch with one HDF5 write per
+    column. The samples array and the metadata columns are resizable
+    and grow as clips are appended. Clip samples are zero-padded to
+    the length of the longest clip appended so far.
+    """
+    
+    
+    def __init__(
+            self, group, column_dtypes, sample_dtype=np.int16,
+            chunk_clip_count=_DEFAULT_CHUNK_CLIP_COUNT):
+                
+        """
+        Initializes this writer.
+        
+        Parameters
+        ----------
+        group : h5py.Group
+            the group to which to write clips.
+            
+        column_dtypes : dict
+            mapping from metadata column names to NumPy dtypes. A dtype
+            of `str` indicates a variable-length string column.
+            
+        sample_dtype : NumPy dtype
+            the dtype of the samples array.
+            
+        chunk_clip_count : int
+            the number of clips per samples array chunk.
+        """
+        
+        self._group = group
+        self._sample_dtype = sample_dtype
+        self._chunk_clip_count = chunk_clip_count
+        
+        group.attrs['layout'] = LAYOUT_ARRAYS
+        
+        self._columns = {}
+        
+        for name, dtype in column_dtypes.items():
+            
+            if dtype is str:
+                dtype = _STRING_DTYPE
+                
+            self._columns[name] = group.create_dataset(
+                name, shape=(0,), maxshape=(None,), dtype=dtype,
+                chunks=(max(chunk_clip_count, 1024),))
+                
+        self._lengths = group.create_dataset(
+            LENGTHS_DATASET_NAME, shape=(0,), maxshape=(None,),
+            dtype=np.int64, chunks=(max(chunk_clip_count, 1024),))
+            
+        # We create the samples dataset when the first clips are
+        # appended, since its chunk width depends on the clip length.
+        self._samples = None
+        
+        self._num_clips = 0
+        
+        
+    @property
+    def num_clips(self):
+        return self._num_clips
+        
+        
+    def append(self, samples, columns):
+        
+        """
+        Appends a batch of clips.
+        
+        Parameters
+        ----------
+        samples : list of 1-D NumPy arrays
+            the samples of the clips.
+            
+        columns : dict
+            mapping from metadata column names to sequences of values,
+            one per clip. There must be one item in the mapping for each
+            column named when this writer was constructed.
+        """
+        
+        batch_size = len(samples)
+        
+        if batch_size == 0:
+            return
+            
+        lengths = np.array([len(s) for s in samples], dtype=np.int64)
+        
+        start = self._num_clips
+        end = start + batch_size
+        
+        # Write samples.
+        batch = np.zeros((batch_size, lengths.max()), dtype=self._sample_dtype)
+        for i, s in enumerate(samples):
+            batch[i, :len(s)] = s
+        self._write_samples(batch, start, end)
+        
+        # Write lengths and metadata columns.
+        self._lengths.resize((end,))
+        self._lengths[start:end] = lengths
+        
+        for name, dataset in self._columns.items():
+            dataset.resize((end,))
+            dataset[start:end] = _get_column_array(columns[name], dataset)
+            
+        self._num_clips = end
+        
+        
+    def _write_samples(self, batch, start, end):
+        
+        width = batch.shape[1]
+        
+        if self._samples is None:
+            
+            self._samples = self._group.create_dataset(
+                SAMPLES_DATASET_NAME, shape=(0, width),
+                maxshape=(None, None), dtype=self._sample_dtype,
+                chunks=(self._chunk_clip_count, width),
+                compression=_COMPRESSION,
+                compression_opts=_COMPRESSION_LEVEL, shuffle=True)
+                
+        current_width = self._samples.shape[1]
+        
+        self._samples.resize((end, max(width, current_width)))
+        
+        # Note that the new rows of the resized dataset are zero,
+        # the dataset's fill value, beyond the end of `batch`.
+        self._samples[start:end, :width] = batch
+
+
+def _get_column_array(values, dataset):
+    
+    if h5py.check_string_dtype(dataset.dtype) is not None:
+        return np.array(values, dtype=_STRING_DTYPE)
+    else:
+        return np.array(values, dtype=dataset.dtype)
@@ -0,0 +1,260 @@
+"""
+Module containing class `ExampleCache`.
+
+An `ExampleCache` stores preprocessed machine learning dataset examples
+on disk, so that preprocessing that is the same for every epoch of
+training (for example spectrogram computation) need be performed only
+once, and so that later training runs with the same preprocessing
+settings can reuse the preprocessed examples.
+
+A cache is identified by a *key*, a JSON-serializable object that
+describes the source dataset and the preprocessing settings with which
+the examples were computed. The cache is stored in a directory whose
+name is the SHA-256 hash of the key, so changing a setting that
+influences the cached examples yields a new cache rather than a stale
+one.
+
+Each example comprises one or more named NumPy arrays, for example a
+spectrogram and a label. The arrays of each name are stored in a raw
+binary file, and the array names, data types, and shapes, along with
+the number of examples and the key, are stored in a JSON metadata file.
+A cache is written to a temporary directory that is renamed when the
+cache is complete, so a cache that exists is always complete. The
+arrays of a cache are read as read-only memory maps, so reading a
+cache that is larger than memory is not a problem.
+"""
+
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import vesper.util.os_utils as os_utils
+
+
+_FILE_FORMAT_VERSION = 1
+
+_METADATA_FILE_NAME = 'Metadata.json'
+
+_ARRAY_FILE_NAME_EXTENSION = '.bin'
+
+
+class ExampleCache:
+    
+    
+    def __init__(self, parent_dir_path, key):
+        
+        """
+        Initializes this cache.
+        
+        Parameters
+        ----------
+        parent_dir_path : str or Path
+            the path of the directory in which the cache directory
+            resides.
+            
+        key : JSON-serializable object
+            the cache key.
+        """
+        
+        self._key = key
+        
+        text = json.dumps(key, sort_keys=True)
+        name = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self._dir_path = Path(parent_dir_path) / name
+        
+        self._metadata = None
+        
+        
+    @property
+    def key(self):
+        return self._key
+        
+        
+    @property
+    def dir_path(self):
+        return self._dir_path
+        
+        
+    @property
+    def exists(self):
+        return (self._dir_path / _METADATA_FILE_NAME).exists()
+        
+        
+    @property
+    def num_examples(self):
+        return self._get_metadata()['num_examples']
+        
+        
+    def _get_metadata(self):
+        
+        if self._metadata is None:
+            file_path = self._dir_path / _METADATA_FILE_NAME
+            self._metadata = json.loads(os_utils.read_file(file_path))
+            
+        return self._metadata
+        
+        
+    def write(self, batches):
+        
+        """
+        Writes this cache.
+        
+        Parameters
+        ----------
+        batches : iterable of dicts
+            batches of examples. Each batch is a mapping from array
+            names to NumPy arrays whose first axis is the example axis.
+            All batches must have arrays of the same names, and arrays
+            of the same name must have the same data type and example
+            shape.
+            
+        Returns
+        -------
+        int
+            the number of examples written.
+        """
+        
+        temp_dir_path = Path(f'{self._dir_path}.{os.getpid()}.tmp')
+        
+        if temp_dir_path.exists():
+            shutil.rmtree(temp_dir_path)
+            
+        os_utils.create_directory(str(temp_dir_path))
+        
+        try:
+            metadata = _write_arrays(temp_dir_path, batches)
+            
+        except Exception:
+            shutil.rmtree(temp_dir_path, ignore_errors=True)
+            raise
+            
+        metadata['key'] = self._key
+        
+        file_path = temp_dir_path / _METADATA_FILE_NAME
+        os_utils.write_file(file_path, json.dumps(metadata, indent=4))
+        
+        try:
+            os.replace(temp_dir_path, self._dir_path)
+            
+        except OSError:
+            
+            # We get here if another process completed the same cache
+            # while we were writing ours, in which case we keep theirs.
+            shutil.rmtree(temp_dir_path, ignore_errors=True)
+            
+            if not self.exists:
+                raise
+                
+        self._metadata = None
+        
+        return metadata['num_examples']
+        
+        
+    def read(self):
+        
+        """
+        Reads this cache.
+        
+        Returns
+        -------
+        dict
+            mapping from array names to read-only NumPy arrays whose
+            first axis is the example axis.
+        """
+        
+        metadata = self._get_metadata()
+        num_examples = metadata['num_examples']
+        
+        arrays = {}
+        
+        for name, info in metadata['arrays'].items():
+            
+            dtype = np.dtype(info['dtype'])
+            shape = (num_examples,) + tuple(info['shape'])
+            
+            if num_examples == 0:
+                # cannot memory map empty file
+                
+                arrays[name] = np.zeros(shape, dtype)
+                
+            else:
+                file_path = _get_array_file_path(self._dir_path, name)
+                arrays[name] = np.memmap(
+                    file_path, dtype=dtype, mode='r', shape=shape)
+                    
+        return arrays
+
+
+def _get_array_file_path(dir_path, name):
+    return dir_path / (name + _ARRAY_FILE_NAME_EXTENSION)
+
+
+def _write_arrays(dir_path, batches):
+    
+    files = {}
+    infos = {}
+    num_examples = 0
+    
+    try:
+        
+        for batch in batches:
+            
+            if len(files) == 0:
+                
+                for name, array in batch.items():
+                    
+                    file_path = _get_array_file_path(dir_path, name)
+                    files[name] = open(file_path, 'wb')
+                    
+                    infos[name] = {
+                        'dtype': np.dtype(array.dtype).str,
+                        'shape': list(array.shape[1:])
+                    }
+                    
+            elif set(batch.keys()) != set(files.keys()):
+                raise ValueError(
+                    'Example batch array names differ from those of '
+                    'first batch.')
+                    
+            batch_size = _get_batch_size(batch)
+            
+            for name, array in batch.items():
+                
+                info = infos[name]
+                
+                if np.dtype(array.dtype).str != info['dtype'] or \
+                        list(array.shape[1:]) != info['shape']:
+                            
+                    raise ValueError(
+                        f'Example batch array "{name}" has different data '
+                        f'type or example shape than in first batch.')
+                        
+                np.ascontiguousarray(array).tofile(files[name])
+                
+            num_examples += batch_size
+            
+    finally:
+        for file_ in files.values():
+            file_.close()
+            
+    return {
+        'version': _FILE_FORMAT_VERSION,
+        'num_examples': num_examples,
+        'arrays': infos
+    }
+
+
+def _get_batch_size(batch):
+    
+    sizes = set(len(array) for array in batch.values())
+    
+    if len(sizes) > 1:
+        raise ValueError(
+            'Example batch arrays have different numbers of examples.')
+            
+    return sizes.pop() if len(sizes) != 0 else 0
@@ -0,0 +1,324 @@
+"""
+Module containing Vesper job performance metrics.
+
+Job metrics are named *timers*, which accumulate the time that a job
+spends in stages of its processing like audio file reads, detection,
+neural network inference, and database writes, and named *counters*,
+which count things like audio samples read and clips created. Metrics
+make it possible to tell, for example, whether a slow detection job
+was bound by disk I/O, computation, or waits for the archive lock.
+
+Each job process has one set of metrics, which code anywhere in the
+process can update via the `timer`, `add_time`, and `increment`
+functions of this module:
+    
+    with job_metrics.timer(job_metrics.AUDIO_READ):
+        samples = reader.read(start_index, length)
+        
+    job_metrics.increment(job_metrics.CLIPS_CREATED, len(clips))
+
+Timers may nest. For example, the time of the `DETECTION` timer of a
+detect job includes the times of the `RESAMPLING` and `INFERENCE`
+timers. The main job process resets its metrics when a job starts,
+measures archive lock waits with a `TimedLock`, and writes its metrics
+to a JSON file in the archive's job log directory when the job ends.
+The `vesper.django.app.models.Job.metrics` property reads the file.
+Code that runs outside of jobs can update metrics, too, but they are
+not written anywhere.
+
+The metrics JSON file contains an object like:
+    
+    {
+        "version": 1,
+        "elapsed_time": 1234.5,
+        "timers": {
+            "Audio Read": {"count": 520, "total_time": 31.2,
+                           "max_time": 0.4},
+            ...
+        },
+        "counters": {
+            "Clips Created": 1834,
+            ...
+        }
+    }
+
+in which all times are in seconds and "elapsed_time" is the time from
+the start of the job to when its metrics were written.
+"""
+
+
+from contextlib import contextmanager
+from threading import Lock
+import json
+import time
+
+
+# Timer names.
+AUDIO_READ = 'Audio Read'
+RESAMPLING = 'Resampling'
+SIGNAL_PROCESSING = 'Signal Processing'
+INFERENCE = 'Inference'
+DETECTION = 'Detection'
+CLASSIFICATION = 'Classification'
+DATABASE_READ = 'Database Read'
+DATABASE_WRITE = 'Database Write'
+ARCHIVE_LOCK_WAIT = 'Archive Lock Wait'
+EXPORT = 'Export'
+RECORDING_FILE_PARSING = 'Recording File Parsing'
+
+# Counter names.
+AUDIO_SAMPLES_READ = 'Audio Samples Read'
+CLIPS_CREATED = 'Clips Created'
+CLIPS_VISITED = 'Clips Visited'
+CLIPS_CLASSIFIED = 'Clips Classified'
+CLIPS_EXPORTED = 'Clips Exported'
+RECORDINGS_IMPORTED = 'Recordings Imported'
+RECORDING_FILES_IMPORTED = 'Recording Files Imported'
+
+
+_FILE_FORMAT_VERSION = 1
+
+
+class JobMetrics:
+    
+    """Thread-safe set of named timers and counters."""
+    
+    
+    def __init__(self):
+        self._lock = Lock()
+        self._start_time = time.time()
+        self._timers = {}
+        self._counters = {}
+        
+        
+    @contextmanager
+    def timer(self, name):
+        
+        """
+        Times the execution of a `with` statement body.
+        
+        The time is added to the named timer even if the body raises
+        an exception.
+        """
+        
+        start_time = time.perf_counter()
+        
+        try:
+            yield
+            
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+            
+            
+    def add_time(self, name, duration):
+        
+        """Adds one duration, in seconds, to the named timer."""
+        
+        with self._lock:
+            
+            timer = self._timers.get(name)
+            
+            if timer is None:
+                self._timers[name] = [1, duration, duration]
+                
+            else:
+                timer[0] += 1
+                timer[1] += duration
+                timer[2] = max(timer[2], duration)
+                
+                
+    def increment(self, name, count=1):
+        
+        """Adds a count to the named counter."""
+        
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+            
+            
+    def get_data(self):
+        
+        """
+        Gets this object's metrics as a JSON-serializable dictionary.
+        
+        The dictionary has the form described in this module's
+        docstring.
+        """
+        
+        with self._lock:
+            
+            timers = dict(
+                (name, {
+                    'count': count,
+                    'total_time': total_time,
+                    'max_time': max_time
+                })
+                for name, (count, total_time, max_time)
+                in sorted(self._timers.items()))
+                
+            counters = dict(sorted(self._counters.items()))
+            
+        return {
+            'version': _FILE_FORMAT_VERSION,
+            'elapsed_time': time.time() - self._start_time,
+            'timers': timers,
+            'counters': counters,
+        }
+
+
+class TimedLock:
+    
+    """
+    Lock wrapper that times waits to acquire a lock.
+    
+    A `TimedLock` supports the context manager protocol of the lock
+    that it wraps. It adds the time that each `with` statement waits
+    to acquire the lock to a timer of this process's job metrics.
+    """
+    
+    
+    def __init__(self, lock, timer_name=ARCHIVE_LOCK_WAIT):
+        self._lock = lock
+        self._timer_name = timer_name
+        
+        
+    @property
+    def lock(self):
+        return self._lock
+        
+        
+    def __enter__(self):
+        with timer(self._timer_name):
+            return self._lock.__enter__()
+            
+            
+    def __exit__(self, *args):
+        return self._lock.__exit__(*args)
+
+
+_metrics = JobMetrics()
+
+
+def get_metrics():
+    
+    """Gets the job metrics of this process."""
+    
+    return _metrics
+
+
+def reset():
+    
+    """Resets the job metrics of this process."""
+    
+    global _metrics
+    _metrics = JobMetrics()
+
+
+def timer(name):
+    
+    """
+    Times the execution of a `with` statement body.
+    
+    The time is added to the named timer of this process's job metrics.
+    """
+    
+    return _metrics.timer(name)
+
+
+def add_time(name, duration):
+    
+    """
+    Adds one duration, in seconds, to the named timer of this process's
+    job metrics.
+    """
+    
+    _metrics.add_time(name, duration)
+
+
+def increment(name, count=1):
+    
+    """Adds a count to the named counter of this process's job metrics."""
+    
+    _metrics.increment(name, count)
+
+
+def write_metrics(file_path, metrics=None):
+    
+    """
+    Writes job metrics to a JSON file.
+    
+    Parameters
+    ----------
+    file_path : str or Path
+        the path of the file to write.
+        
+    metrics : JobMetrics or None
+        the metrics to write, or `None` to write the metrics of this
+        process.
+    """
+    
+    if metrics is None:
+        metrics = _metrics
+        
+    with open(file_path, 'w') as file_:
+        json.dump(metrics.get_data(), file_, indent=4)
+
+
+def read_metrics(file_path):
+    
+    """
+    Reads job metrics from a JSON file.
+    
+    Returns
+    -------
+    dict or None
+        the metrics, or `None` if there is no file at the specified path.
+    """
+    
+    try:
+        with open(file_path) as file_:
+            return json.load(file_)
+            
+    except FileNotFoundError:
+        return None
+
+
+def get_timer_summaries(data):
+    
+    """
+    Gets summaries of the timers of job metrics.
+    
+    Parameters
+    ----------
+    data : dict
+        job metrics, as returned by `JobMetrics.get_data` or
+        `read_metrics`.
+        
+    Returns
+    -------
+    list of dicts
+        one summary per timer, in order of decreasing total time. Each
+        summary has the items of the timer in the metrics, plus items
+        "name", "mean_time", and "fraction", the fraction of the job's
+        elapsed time spent in the timer. Since timers may nest, the
+        fractions of a job's timers can sum to more than one.
+    """
+    
+    elapsed_time = data['elapsed_time']
+    
+    summaries = []
+    
+    for name, timer in data['timers'].items():
+        
+        total_time = timer['total_time']
+        
+        summary = dict(timer)
+        summary['name'] = name
+        summary['mean_time'] = total_time / timer['count']
+        summary['fraction'] = \
+            total_time / elapsed_time if elapsed_time != 0 else 0
+            
+        summaries.append(summary)
+        
+    summaries.sort(key=lambda s: s['total_time'], reverse=True)
+    
+    return summaries
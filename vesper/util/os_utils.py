@@ -4,6 +4,7 @@
 import os
 import re
 import shutil
+import tempfile
 
 import vesper.util.yaml_utils as yaml_utils
 
@@ -52,7 +53,11 @@ def create_directory(path):
 
 def create_parent_directory(path):
     dir_path = os.path.dirname(path)
-    create_directory(dir_path)
+    
+    # A relative path with no directory component names a file in the
+    # current directory, which already exists.
+    if dir_path != '':
+        create_directory(dir_path)
     
     
 def clear_directory(path):
@@ -220,6 +225,44 @@ def write_file(path, contents, mode='w'):
                 path, str(e)))
 
 
+def write_file_atomically(path, contents, mode='w'):
+    
+    """
+    Writes a file atomically.
+    
+    The contents are written to a new temporary file in the directory
+    of the file, which then replaces the file. Other threads and
+    processes thus see either the old file or the new one, never a
+    partially written one. Each call writes its own temporary file,
+    so concurrent writes of the same file do not interfere with each
+    other. The file's parent directory is created if needed.
+    """
+    
+    path = str(path)
+    
+    try:
+        
+        create_parent_directory(path)
+        
+        dir_path, file_name = os.path.split(path)
+        fd, temp_file_path = tempfile.mkstemp(
+            suffix='.tmp', prefix=file_name + '.', dir=dir_path or None)
+        
+        try:
+            with os.fdopen(fd, mode) as file_:
+                file_.write(contents)
+            os.replace(temp_file_path, path)
+            
+        except BaseException:
+            os.remove(temp_file_path)
+            raise
+        
+    except Exception as e:
+        raise OSError(
+            'Could not write file "{:s}". Error message was: {:s}'.format(
+                path, str(e)))
+
+
 def read_yaml_file(path):
 
     contents = read_file(path)
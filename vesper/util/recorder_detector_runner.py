@@ -0,0 +1,550 @@
+"""
+Module containing class `RecorderDetectorRunner`.
+
+A `RecorderDetectorRunner` is an audio recorder listener that runs
+detectors on recorder input as it arrives, writing detected clips to
+a clip spool (see the `vesper.util.clip_spool` module). This allows
+a recording station to detect clips in real time, instead of hours
+later when its recordings are imported into an archive and detectors
+are run on them there.
+
+Detection runs in a worker thread, so that it does not delay the
+recorder's other listeners, for example the one that writes input to
+audio files. The runner keeps statistics, including detection lag and
+the fraction of real time that detection consumes, that indicate
+whether or not detection is keeping up with recorder input.
+
+Input waits for detection in a queue of bounded size. If detection
+falls so far behind that the queue fills, the runner drops further
+input until the queue has room again, and then runs its detectors on
+zeros in place of the dropped input, as for recorder input overflows,
+so that clip times remain aligned with recorder input.
+
+The detectors run by a runner must process their input incrementally,
+i.e. they must have `detect` and `complete_detection` methods like
+those of the PNF energy and Old Bird redux detectors.
+"""
+
+
+from collections import deque
+from queue import Full, Queue
+from threading import Lock, Thread
+import datetime
+import importlib
+import logging
+import math
+import time
+
+import numpy as np
+import pytz
+
+from vesper.util.audio_recorder import AudioRecorderListener
+from vesper.util.bunch import Bunch
+from vesper.util.clip_spool import ClipSpoolWriter
+from vesper.util.sample_buffer import SampleBuffer
+
+
+_DETECTOR_CLASS_NAMES = {
+    'Old Bird Thrush Detector Redux 1.1':
+        'vesper.old_bird.old_bird_detector_redux_1_1.ThrushDetector',
+    'Old Bird Tseep Detector Redux 1.1':
+        'vesper.old_bird.old_bird_detector_redux_1_1.TseepDetector',
+    'PNF Thrush Energy Detector 1.0':
+        'vesper.pnf.pnf_energy_detector_1_0.ThrushDetector',
+    'PNF Tseep Energy Detector 1.0':
+        'vesper.pnf.pnf_energy_detector_1_0.TseepDetector',
+}
+"""
+Mapping from names of detectors that can run in real time to the
+module-qualified names of their classes.
+
+We do not get detector classes from the Vesper extension manager since
+the recorder runs outside of Vesper archive servers and their Django
+environment.
+"""
+
+_SAMPLE_HISTORY_DURATION = 10
+"""
+Duration in seconds of input retained for clip extraction.
+
+This must exceed the maximum latency with which a detector reports
+a clip, measured from the start of the clip.
+"""
+
+_MAX_QUEUE_DURATION = 60
+"""
+Maximum duration in seconds of input waiting for detection.
+
+Input that arrives when this much input is already waiting is dropped.
+"""
+
+_STATS_WINDOW_SIZE = 200
+"""Number of input buffers over which recent detection load is computed."""
+
+
+_logger = logging.getLogger(__name__)
+
+
+def get_detector_class(name):
+    
+    """
+    Gets the class of a real-time detector.
+    
+    Parameters
+    ----------
+    name : str
+        either a detector name or the module-qualified name of a
+        detector class.
+        
+    Raises
+    ------
+    ValueError
+        if the detector class could not be found.
+    """
+    
+    class_name = _DETECTOR_CLASS_NAMES.get(name, name)
+    
+    module_name, _, class_name = class_name.rpartition('.')
+    
+    if module_name == '':
+        raise ValueError(f'Unrecognized detector "{name}".')
+        
+    try:
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)
+    except Exception as e:
+        raise ValueError(
+            f'Could not load class for detector "{name}". Error '
+            f'message was: {e}')
+
+
+class RecorderDetectorRunner(AudioRecorderListener):
+    
+    
+    def __init__(self, station_name, detector_names, spool_dir_path):
+        
+        """
+        Initializes this runner.
+        
+        Parameters
+        ----------
+        station_name : str
+            the name of the recorder's station.
+            
+        detector_names : sequence of str
+            the names of the detectors to run. See the
+            `get_detector_class` function for allowed names.
+            
+        spool_dir_path : str or Path
+            the path of the clip spool directory.
+            
+        Raises
+        ------
+        ValueError
+            if a detector class could not be found.
+        """
+        
+        super().__init__()
+        
+        self._station_name = station_name
+        self._detector_names = tuple(detector_names)
+        self._detector_classes = tuple(
+            get_detector_class(n) for n in detector_names)
+        self._spool_writer = ClipSpoolWriter(spool_dir_path)
+        
+        self._lock = Lock()
+        self._queue = None
+        self._thread = None
+        self._stats = _create_stats()
+        
+        
+    @property
+    def detector_names(self):
+        return self._detector_names
+        
+        
+    @property
+    def spool_dir_path(self):
+        return self._spool_writer.dir_path
+        
+        
+    def get_status(self):
+        
+        """
+        Gets the detection status of this runner.
+        
+        Returns
+        -------
+        Bunch
+            status with the following attributes:
+                
+            `running` - `True` if and only if detection is running.
+            `lag` - the time in seconds from the end of the most
+                recently processed input to when its processing
+                completed, or `None` if no input has been processed.
+            `max_lag` - the maximum lag since recording started, or
+                `None` if no input has been processed.
+            `queue_size` - the number of input buffers waiting to be
+                processed.
+            `dropped_duration` - the duration in seconds of input
+                dropped since recording started because too much
+                input was waiting to be processed.
+            `recent_load` - the ratio of detection thread CPU time to
+                input duration for recent input buffers, or `None`
+                if no input has been processed.
+            `load` - the ratio of detection thread CPU time to input
+                duration since recording started, or `None` if no
+                input has been processed.
+            `num_clips` - the number of clips detected since the
+                runner was created.
+        """
+        
+        with self._lock:
+            
+            s = self._stats
+            
+            queue_size = 0 if self._queue is None else self._queue.qsize()
+            
+            return Bunch(
+                running=self._thread is not None,
+                lag=s.lag,
+                max_lag=s.max_lag,
+                queue_size=queue_size,
+                dropped_duration=s.dropped_duration,
+                recent_load=_get_load(
+                    sum(s.recent_cpu_times), sum(s.recent_durations)),
+                load=_get_load(s.cpu_time, s.duration),
+                num_clips=self._spool_writer.num_clips)
+                
+                
+    def recording_starting(self, recorder, time):
+        
+        self._num_channels = recorder.num_channels
+        self._sample_rate = recorder.sample_rate
+        
+        self._history_length = \
+            int(round(_SAMPLE_HISTORY_DURATION * self._sample_rate))
+            
+        self._zeros = np.zeros(
+            (recorder.frames_per_buffer, self._num_channels), dtype='<i2')
+            
+        max_queue_size = math.ceil(
+            _MAX_QUEUE_DURATION * self._sample_rate /
+            recorder.frames_per_buffer)
+            
+        # Start time and number of frames of input dropped since the
+        # queue was last not full.
+        self._dropped_start_time = None
+        self._dropped_frame_count = 0
+        
+        with self._lock:
+            self._stats = _create_stats()
+            self._queue = Queue(max_queue_size)
+            self._thread = Thread(
+                target=self._run, args=(self._queue,), daemon=True)
+                
+        self._thread.start()
+        
+        
+    def input_arrived(
+            self, recorder, time, samples, num_frames, pyaudio_overflow):
+                
+        # The recorder reuses `samples` after this method returns, so
+        # we must copy them before handing them to the worker thread.
+        num_bytes = num_frames * self._num_channels * recorder.sample_size
+        samples = np.frombuffer(
+            bytes(samples[:num_bytes]), dtype='<i2').reshape(
+                (num_frames, self._num_channels))
+                
+        self._put_input(time, samples)
+        
+        
+    def input_overflowed(self, recorder, time, num_frames, pyaudio_overflow):
+        
+        # Detect on zeros, as the recorder writes zeros to its audio
+        # files, so that clip times remain aligned with the files.
+        self._put_input(time, self._zeros[:num_frames])
+        
+        
+    def _put_input(self, time, samples):
+        
+        # We never block here, since that would delay the recorder's
+        # other listeners.
+        
+        try:
+            
+            if self._dropped_frame_count != 0:
+                # input was dropped since queue was last not full
+                
+                self._queue.put_nowait(self._get_dropped_input_zeros())
+                self._dropped_frame_count = 0
+                
+            self._queue.put_nowait((time, samples))
+            
+        except Full:
+            
+            if self._dropped_frame_count == 0:
+                
+                self._dropped_start_time = time
+                
+                _logger.warning(
+                    f'Detector runner input queue is full, since '
+                    f'detection is more than {_MAX_QUEUE_DURATION} '
+                    f'seconds behind recorder input. Input will be '
+                    f'dropped until the queue has room.')
+                    
+            num_frames = len(samples)
+            self._dropped_frame_count += num_frames
+            
+            with self._lock:
+                self._stats.dropped_duration += num_frames / self._sample_rate
+        
+        
+    def _get_dropped_input_zeros(self):
+        
+        """Gets a queue item of zeros in place of dropped input."""
+        
+        zeros = np.zeros(
+            (self._dropped_frame_count, self._num_channels), dtype='<i2')
+            
+        return (self._dropped_start_time, zeros)
+        
+        
+    def recording_stopped(self, recorder, time):
+        
+        # We do block here, since no more input will arrive and we
+        # must not drop any more of it or the end of input marker.
+        
+        if self._dropped_frame_count != 0:
+            # input was dropped since queue was last not full
+            
+            self._queue.put(self._get_dropped_input_zeros())
+            self._dropped_frame_count = 0
+        
+        self._queue.put(None)
+        self._thread.join()
+        
+        with self._lock:
+            self._thread = None
+            
+            
+    def _run(self, queue):
+        
+        detection = _Detection(
+            self._station_name, self._detector_names,
+            self._detector_classes, self._num_channels, self._sample_rate,
+            self._history_length, self._spool_writer)
+            
+        while True:
+            
+            item = queue.get()
+            
+            if item is None:
+                # recording stopped
+                
+                try:
+                    detection.complete()
+                except Exception as e:
+                    _logger.error(
+                        f'Detector runner could not complete detection. '
+                        f'Error message was: {e}')
+                        
+                break
+                
+            start_time, samples = item
+            
+            cpu_start_time = time.thread_time()
+            
+            try:
+                detection.detect(start_time, samples)
+            except Exception as e:
+                _logger.error(
+                    f'Detector runner could not process input. Error '
+                    f'message was: {e}')
+                    
+            cpu_time = time.thread_time() - cpu_start_time
+            
+            self._update_stats(start_time, len(samples), cpu_time)
+            
+            
+    def _update_stats(self, start_time, num_frames, cpu_time):
+        
+        duration = num_frames / self._sample_rate
+        end_time = start_time + datetime.timedelta(seconds=duration)
+        now = datetime.datetime.now(tz=pytz.utc)
+        lag = (now - end_time).total_seconds()
+        
+        with self._lock:
+            
+            s = self._stats
+            
+            s.lag = lag
+            s.max_lag = lag if s.max_lag is None else max(lag, s.max_lag)
+            
+            s.cpu_time += cpu_time
+            s.duration += duration
+            
+            s.recent_cpu_times.append(cpu_time)
+            s.recent_durations.append(duration)
+
+
+def _create_stats():
+    return Bunch(
+        lag=None,
+        max_lag=None,
+        cpu_time=0,
+        duration=0,
+        dropped_duration=0,
+        recent_cpu_times=deque(maxlen=_STATS_WINDOW_SIZE),
+        recent_durations=deque(maxlen=_STATS_WINDOW_SIZE))
+
+
+def _get_load(cpu_time, duration):
+    return None if duration == 0 else cpu_time / duration
+
+
+class _Detection:
+    
+    """
+    Detection of one recording.
+    
+    This class runs detectors on the input of one recording, retaining
+    recent input from which to extract the samples of detected clips.
+    """
+    
+    
+    def __init__(
+            self, station_name, detector_names, detector_classes,
+            num_channels, sample_rate, history_length, spool_writer):
+                
+        self._station_name = station_name
+        self._sample_rate = sample_rate
+        self._history_length = history_length
+        self._spool_writer = spool_writer
+        
+        self._start_time = None
+        
+        # Recent input, as two-dimensional arrays of shape
+        # (number of frames, number of channels).
+        self._history = SampleBuffer('<i2')
+        
+        # Clips that extend past the end of the input received so far.
+        self._pending_clips = []
+        
+        # (channel number, detector) pairs.
+        self._detectors = [
+            (channel_num,
+             cls(sample_rate, _DetectorListener(self, name, channel_num)))
+            for name, cls in zip(detector_names, detector_classes)
+            for channel_num in range(num_channels)]
+            
+            
+    def detect(self, start_time, samples):
+        
+        if self._start_time is None:
+            self._start_time = start_time
+            
+        self._history.write(samples)
+        
+        # Process pending clips first, in case detectors detect more
+        # clips that start before the history's new read index.
+        self._process_pending_clips()
+        
+        for channel_num, detector in self._detectors:
+            detector.detect(samples[:, channel_num].astype(np.float64))
+            
+        self._process_pending_clips()
+        
+        # Discard input that is too old to be needed.
+        excess = len(self._history) - self._history_length
+        if excess > 0:
+            self._history.increment(excess)
+            
+            
+    def complete(self):
+        
+        for _, detector in self._detectors:
+            detector.complete_detection()
+            
+        # Write any remaining pending clips, truncated to the input
+        # received.
+        for clip in self._pending_clips:
+            self._write_clip(*clip, truncate=True)
+            
+        self._pending_clips = []
+        
+        
+    def add_clip(
+            self, detector_name, channel_num, start_index, length,
+            annotations):
+                
+        clip = (detector_name, channel_num, start_index, length, annotations)
+        
+        if start_index + length > self._history.write_index:
+            self._pending_clips.append(clip)
+        else:
+            self._write_clip(*clip)
+            
+            
+    def _process_pending_clips(self):
+        
+        clips = self._pending_clips
+        self._pending_clips = []
+        
+        for clip in clips:
+            self.add_clip(*clip)
+            
+            
+    def _write_clip(
+            self, detector_name, channel_num, start_index, length,
+            annotations, truncate=False):
+                
+        history = self._history
+        
+        if start_index < history.read_index:
+            _logger.warning(
+                f'Detector "{detector_name}" reported a clip that starts '
+                f'more than {_SAMPLE_HISTORY_DURATION} seconds before the '
+                f'end of the input received. The clip will be ignored.')
+            return
+            
+        end_index = start_index + length
+        
+        if truncate:
+            end_index = min(end_index, history.write_index)
+            
+        num_frames = end_index - history.read_index
+        
+        if num_frames <= 0:
+            # clip has no samples
+            
+            return
+            
+        start = start_index - history.read_index
+        samples = history.read(num_frames, increment=0)[start:, channel_num]
+        
+        if len(samples) == 0:
+            return
+            
+        start_time = self._start_time + \
+            datetime.timedelta(seconds=start_index / self._sample_rate)
+            
+        self._spool_writer.write_clip(
+            self._station_name, detector_name, channel_num, start_time,
+            samples, self._sample_rate, annotations)
+
+
+class _DetectorListener:
+    
+    
+    def __init__(self, detection, detector_name, channel_num):
+        self._detection = detection
+        self._detector_name = detector_name
+        self._channel_num = channel_num
+        
+        
+    def process_clip(
+            self, start_index, length, threshold=None, annotations=None):
+        self._detection.add_clip(
+            self._detector_name, self._channel_num, start_index, length,
+            annotations)
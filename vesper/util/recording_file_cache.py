@@ -0,0 +1,201 @@
+"""
+Module containing class `RecordingFileCache`.
+
+A `RecordingFileCache` remembers information obtained by parsing
+recording audio files, so that the files need not be reopened and
+reparsed every time they are imported. This is important for archives
+whose recordings reside on network file systems, where opening and
+reading the header of each of many thousands of recording files can
+take a long time.
+
+Cache entries are keyed by parser key, relative file path, file size,
+and file modification time. The parser key identifies the parser and
+parser configuration (for example, station name aliases) with which
+a file was parsed, so that changing the configuration invalidates
+entries created with the old configuration. If a file's size or
+modification time changes, the file's cache entry is ignored and
+the file is parsed again.
+
+Cached file information is an arbitrary JSON-serializable dictionary.
+The cache is persisted to a JSON file.
+"""
+
+
+from threading import Lock
+import json
+import logging
+
+import vesper.util.os_utils as os_utils
+
+
+_FILE_FORMAT_VERSION = 1
+
+
+_logger = logging.getLogger()
+
+
+class RecordingFileCache:
+    
+    
+    def __init__(self, file_path=None):
+        
+        """
+        Initializes this cache.
+        
+        Parameters
+        ----------
+        file_path : str or Path or None
+            the path of the file in which to persist this cache, or
+            `None` if the cache should not be persisted. If the file
+            exists, its contents are loaded into this cache.
+        """
+        
+        self._file_path = file_path
+        
+        self._lock = Lock()
+        
+        # Mapping from parser keys to mappings from relative file paths
+        # to (size, modification time, file info) triples.
+        self._entries = {}
+        
+        self._dirty = False
+        
+        if file_path is not None:
+            self._load()
+            
+            
+    @property
+    def file_path(self):
+        return self._file_path
+        
+        
+    def _load(self):
+        
+        try:
+            contents = os_utils.read_file(self._file_path)
+            
+        except OSError:
+            # file does not exist or cannot be read
+            
+            return
+            
+        try:
+            data = json.loads(contents)
+            if data['version'] != _FILE_FORMAT_VERSION:
+                raise ValueError(
+                    f'Unsupported file format version {data["version"]}.')
+            self._entries = dict(
+                (parser_key, dict(
+                    (path, tuple(entry)) for path, entry in files.items()))
+                for parser_key, files in data['files'].items())
+                
+        except Exception as e:
+            _logger.warning(
+                f'Could not load recording file cache file '
+                f'"{self._file_path}". Error message was: {e}')
+                
+                
+    def save(self):
+        
+        """
+        Saves this cache to its file.
+        
+        If this cache has no file or has not changed since it was
+        loaded or last saved, this method does nothing.
+        """
+        
+        if self._file_path is None:
+            return
+            
+        with self._lock:
+            
+            if not self._dirty:
+                return
+                
+            contents = json.dumps({
+                'version': _FILE_FORMAT_VERSION,
+                'files': self._entries
+            })
+            
+            self._dirty = False
+            
+        try:
+            os_utils.write_file_atomically(self._file_path, contents)
+            
+        except Exception as e:
+            _logger.warning(
+                f'Could not save recording file cache file '
+                f'"{self._file_path}". Error message was: {e}')
+                
+                
+    def get(self, parser_key, rel_path, size, mtime):
+        
+        """
+        Gets cached information for a recording file.
+        
+        Parameters
+        ----------
+        parser_key : str
+            the key of the parser with which the file was parsed.
+            
+        rel_path : str or Path
+            the path of the file relative to its recording directory.
+            
+        size : int
+            the current size of the file in bytes.
+            
+        mtime : int
+            the current modification time of the file in nanoseconds.
+            
+        Returns
+        -------
+        dict or None
+            the cached file information, or `None` if the cache has
+            no information for the file or the file has changed since
+            its information was cached.
+        """
+        
+        with self._lock:
+            files = self._entries.get(parser_key)
+            if files is None:
+                return None
+            entry = files.get(_get_path_key(rel_path))
+            
+        if entry is None:
+            return None
+            
+        cached_size, cached_mtime, info = entry
+        
+        if cached_size != size or cached_mtime != mtime:
+            # file has changed since its information was cached
+            
+            return None
+            
+        else:
+            return info
+            
+            
+    def put(self, parser_key, rel_path, size, mtime, info):
+        
+        """
+        Caches information for a recording file.
+        
+        The parameters are as for the `get` method, plus `info`, a
+        JSON-serializable dictionary of file information.
+        """
+        
+        with self._lock:
+            files = self._entries.setdefault(parser_key, {})
+            files[_get_path_key(rel_path)] = (size, mtime, info)
+            self._dirty = True
+
+
+def _get_path_key(path):
+    
+    # We use POSIX paths so that cache files are portable across
+    # operating systems.
+    
+    if isinstance(path, str):
+        return path.replace('\\', '/')
+    else:
+        return path.as_posix()
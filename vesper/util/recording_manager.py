@@ -2,7 +2,22 @@
 
 
 from pathlib import Path
+from threading import Lock, RLock
+import json
 import logging
+import os
+import time
+
+import vesper.util.os_utils as os_utils
+
+
+_INDEX_FILE_FORMAT_VERSION = 1
+
+_DEFAULT_NEGATIVE_CACHE_TTL = 60
+"""
+Default time to live of negative recording file path cache entries,
+in seconds.
+"""
 
 
 class RecordingManager:
@@ -29,6 +44,29 @@ class RecordingManager:
     recording file names unique within an archive, a common
     practice.
     
+    To avoid probing the recording directories for every path
+    conversion, which can be slow when the directories are on a
+    network file system, a recording manager maintains a *recording
+    path index* that maps relative recording file paths to recording
+    directories. The index is built by scanning the recording
+    directories when it is first needed, and can be refreshed
+    incrementally with the `refresh_index` method, which relists
+    only directories whose modification times have changed since
+    they were last listed. The index can optionally be persisted to
+    a file. Paths that are not in the index are looked for in the
+    recording directories and added to the index if found. Paths
+    that are not found are remembered for a limited time, so that
+    repeated requests for them do not probe the recording directories
+    every time. When a path is found in the index but its file no
+    longer exists (for example because it was moved or deleted), the
+    index is refreshed and the path is looked up again.
+    
+    The first path conversion that needs the index blocks until the
+    index has been loaded or built. Building the index requires
+    scanning the recording directories, which can take a while for
+    large archives. Other threads that need the index meanwhile wait
+    for the scan to finish, but threads that do not need it do not.
+    
     Parameters
     ----------
     archive_dir_path: str or pathlib.Path object
@@ -45,6 +83,15 @@ class RecordingManager:
         no pair of recording directory paths can differ only by
         alphabetic case, even for a case-sensitive file system.
         
+    index_file_path: str or pathlib.Path object or None
+        The path of the file in which to persist the recording path
+        index, or `None` if the index should not be persisted.
+        
+    negative_cache_ttl: int or float
+        The time in seconds for which a relative recording file path
+        that could not be found in any recording directory is remembered
+        as missing.
+        
     Attributes
     ----------
     archive_dir_path: pathlib.Path object
@@ -60,7 +107,10 @@ class RecordingManager:
     """
     
     
-    def __init__(self, archive_dir_path, recording_dir_paths):
+    def __init__(
+            self, archive_dir_path, recording_dir_paths,
+            index_file_path=None,
+            negative_cache_ttl=_DEFAULT_NEGATIVE_CACHE_TTL):
         
         self._archive_dir_path = _get_path_object(archive_dir_path)
         
@@ -72,7 +122,37 @@ class RecordingManager:
         self._lowered_recording_dir_paths = \
             tuple(Path(str(p).lower()) for p in self._recording_dir_paths)
         
-        self._absolute_file_path_cache = {}
+        self._index_file_path = index_file_path
+        self._negative_cache_ttl = negative_cache_ttl
+        
+        self._lock = RLock()
+        
+        # Lock held while building the index, so that only one thread
+        # scans the recording directories for it. We do not hold
+        # `self._lock` while scanning, since scanning can be slow.
+        self._index_build_lock = Lock()
+        
+        # Mapping from (recording directory number, relative directory
+        # path) pairs to (modification time, file names, subdirectory
+        # names) triples, or `None` if the recording directories have
+        # not yet been scanned. Relative directory paths are POSIX path
+        # strings, with the empty string denoting a recording directory.
+        self._dir_listings = None
+        
+        # Mapping from relative POSIX file path strings to recording
+        # directory numbers for files found by probing the recording
+        # directories rather than by scanning them.
+        self._probed_files = {}
+        
+        # Mapping from relative POSIX file path strings to recording
+        # directory numbers for all indexed files.
+        self._index = {}
+        
+        # Mapping from relative POSIX file path strings to expiration
+        # times of negative cache entries.
+        self._negative_cache = {}
+        
+        self._index_dirty = False
 
         
     def _check_archive_dir_path(self):
@@ -132,6 +212,204 @@ class RecordingManager:
         return self._recording_dir_paths
     
     
+    @property
+    def index_file_path(self):
+        return self._index_file_path
+        
+        
+    def refresh_index(self):
+        
+        """
+        Refreshes the recording path index.
+        
+        This method rescans the recording directories, listing the
+        contents of only those directories that are not in the index
+        or whose modification times have changed since they were last
+        listed. It also clears the negative path cache and saves the
+        index if it has a file.
+        
+        Returns
+        -------
+        int
+            the number of directories that were listed.
+        """
+        
+        with self._lock:
+            
+            if self._dir_listings is None:
+                self._load_index()
+                
+            old_listings = self._dir_listings
+            
+            if old_listings is None:
+                old_listings = {}
+                
+        new_listings = {}
+        num_listed_dirs = 0
+        
+        for dir_num, dir_path in enumerate(self.recording_dir_paths):
+            num_listed_dirs += _scan_recording_dir(
+                dir_num, dir_path, old_listings, new_listings)
+                
+        with self._lock:
+            self._dir_listings = new_listings
+            self._probed_files = {}
+            self._update_index()
+            self._negative_cache.clear()
+            self._index_dirty = True
+            
+        self.save_index()
+        
+        return num_listed_dirs
+        
+        
+    def _update_index(self):
+        
+        index = {}
+        
+        # Dictionary iteration order is insertion order, so listings
+        # are visited in order of increasing recording directory number
+        # and earlier recording directories take precedence over later
+        # ones.
+        for (dir_num, rel_dir_path), (_, file_names, _) in \
+                self._dir_listings.items():
+                    
+            for file_name in file_names:
+                index.setdefault(_join(rel_dir_path, file_name), dir_num)
+                
+        for rel_path, dir_num in self._probed_files.items():
+            index.setdefault(rel_path, dir_num)
+            
+        self._index = index
+        
+        
+    def _ensure_index(self):
+        
+        with self._lock:
+            if self._dir_listings is not None:
+                return
+            
+        with self._index_build_lock:
+            
+            with self._lock:
+                
+                if self._dir_listings is not None:
+                    # another thread built index while we waited
+                    
+                    return
+                    
+                self._load_index()
+                
+                if self._dir_listings is not None:
+                    return
+                    
+            # If we get here, the index could not be loaded, so we
+            # build it by scanning the recording directories.
+            self.refresh_index()
+                
+                
+    def _load_index(self):
+        
+        if self._index_file_path is None:
+            return
+            
+        try:
+            contents = os_utils.read_file(self._index_file_path)
+            
+        except OSError:
+            # file does not exist or cannot be read
+            
+            return
+            
+        try:
+            
+            data = json.loads(contents)
+            
+            if data['version'] != _INDEX_FILE_FORMAT_VERSION:
+                raise ValueError(
+                    f'Unsupported file format version {data["version"]}.')
+                    
+            dir_paths = [str(p) for p in self.recording_dir_paths]
+            if data['recording_dir_paths'] != dir_paths:
+                # recording directories have changed since index was saved
+                
+                return
+                
+            self._dir_listings = dict(
+                ((dir_num, rel_dir_path), (mtime, file_names, subdir_names))
+                for dir_num, rel_dir_path, mtime, file_names, subdir_names
+                in data['dirs'])
+                
+            self._probed_files = data['probed_files']
+            
+            self._update_index()
+            
+        except Exception as e:
+            logging.getLogger().warning(
+                f'Could not load recording path index file '
+                f'"{self._index_file_path}". Error message was: {e}')
+                
+                
+    def save_index(self):
+        
+        """
+        Saves the recording path index to its file.
+        
+        If the index has no file or has not changed since it was
+        loaded or last saved, this method does nothing.
+        """
+        
+        if self._index_file_path is None:
+            return
+            
+        with self._lock:
+            
+            if not self._index_dirty or self._dir_listings is None:
+                return
+                
+            contents = json.dumps({
+                'version': _INDEX_FILE_FORMAT_VERSION,
+                'recording_dir_paths':
+                    [str(p) for p in self.recording_dir_paths],
+                'dirs': [
+                    (dir_num, rel_dir_path) + listing
+                    for (dir_num, rel_dir_path), listing
+                    in self._dir_listings.items()],
+                'probed_files': self._probed_files
+            })
+            
+            self._index_dirty = False
+            
+        try:
+            os_utils.write_file_atomically(self._index_file_path, contents)
+            
+        except Exception as e:
+            logging.getLogger().warning(
+                f'Could not save recording path index file '
+                f'"{self._index_file_path}". Error message was: {e}')
+                
+                
+    def get_indexed_file_paths(self):
+        
+        """
+        Gets the recording file paths of the recording path index.
+        
+        Returns
+        -------
+        list of (pathlib.Path, str) pairs
+            The (recording directory path, relative file path) pairs
+            of the index, ordered by recording directory. Relative file
+            paths are POSIX path strings.
+        """
+        
+        self._ensure_index()
+        
+        with self._lock:
+            items = sorted(self._index.items(), key=lambda i: i[1])
+            
+        return [(self.recording_dir_paths[d], p) for p, d in items]
+        
+        
     def get_absolute_recording_file_path(self, relative_path):
         
         """
@@ -168,48 +446,122 @@ class RecordingManager:
         else:
             # `path` is relative
             
-            try:
-                return self._absolute_file_path_cache[path]
+            abs_path = self._find_absolute_file_path(path)
             
-            except KeyError:
+            if abs_path is not None:
+                return abs_path
                 
-                for dir_path in self.recording_dir_paths:
+            # If we get here, the specified path does not exist in
+            # any recording directory.
                 
-                    abs_path = dir_path / path
+            start = (
+                'Recording file path "{}" could not be made '
+                'absolute since ').format(path)
                     
-                    if abs_path.exists():
-                        self._absolute_file_path_cache[path] = abs_path
-                        return abs_path
+            num_recording_dirs = len(self.recording_dir_paths)
                 
-                # If we get here, the specified path does not exist in
-                # any recording directory.
+            if num_recording_dirs == 0:
+                end = 'there are no recording directories.'
                     
-                start = (
-                    'Recording file path "{}" could not be made '
-                    'absolute since ').format(path)
+            elif num_recording_dirs == 1:
                      
-                num_recording_dirs = len(self.recording_dir_paths)
+                dir_path = self.recording_dir_paths[0]
                  
-                if num_recording_dirs == 0:
-                    end = 'there are no recording directories.'
-                     
-                elif num_recording_dirs == 1:
-                    
-                    if not dir_path.exists():
-                        end = (
-                            'the recording directory "{}" could not be '
-                            'found.').format(self.recording_dir_paths[0])
-                    else:
-                        end = (
-                            'it is not in the recording directory '
-                            '"{}".').format(self.recording_dir_paths[0])
-                         
+                if not dir_path.exists():
+                    end = (
+                        'the recording directory "{}" could not be '
+                        'found.').format(dir_path)
                 else:
                     end = (
-                        'it is not in any of the recording directories '
-                        '{}.').format(self._create_recording_dirs_list())
+                        'it is not in the recording directory '
+                        '"{}".').format(dir_path)
                          
-                raise ValueError(start + end)
+            else:
+                end = (
+                    'it is not in any of the recording directories '
+                    '{}.').format(self._create_recording_dirs_list())
+                    
+            raise ValueError(start + end)
+            
+            
+    def _find_absolute_file_path(self, path):
+        
+        key = path.as_posix()
+        
+        self._ensure_index()
+        
+        # Look for path in index.
+        indexed, abs_path = self._get_indexed_file_path(key, path)
+        if abs_path is not None:
+            return abs_path
+            
+        # Look for path in negative cache.
+        with self._lock:
+            expiration_time = self._negative_cache.get(key)
+            if expiration_time is not None:
+                if time.monotonic() < expiration_time:
+                    return None
+                else:
+                    del self._negative_cache[key]
+                    
+        if indexed:
+            # path is indexed but its file no longer exists
+            
+            # The index is stale, for example because the file was
+            # moved or deleted. Refresh it (which relists only
+            # directories that have changed) and try again.
+            self.refresh_index()
+            _, abs_path = self._get_indexed_file_path(key, path)
+            if abs_path is not None:
+                return abs_path
+                    
+        # If we get here, the path is neither indexed nor known to be
+        # missing, so we look for it in the recording directories.
+        # This can happen if a file was added to a recording directory
+        # after the directory was last scanned.
+        for dir_num, dir_path in enumerate(self.recording_dir_paths):
+            
+            abs_path = dir_path / path
+            
+            if abs_path.exists():
+                
+                with self._lock:
+                    self._probed_files[key] = dir_num
+                    self._index[key] = dir_num
+                    self._index_dirty = True
+                    
+                return abs_path
+                
+        with self._lock:
+            self._negative_cache[key] = \
+                time.monotonic() + self._negative_cache_ttl
+                
+        return None
+        
+    
+    def _get_indexed_file_path(self, key, path):
+        
+        """
+        Looks up a relative file path in the index.
+        
+        Returns a pair (`indexed`, `abs_path`), where `indexed` is
+        `True` if and only if the path is in the index, and `abs_path`
+        is the absolute path of the file, or `None` if the path is not
+        indexed or its file does not exist.
+        """
+        
+        with self._lock:
+            dir_num = self._index.get(key)
+            
+        if dir_num is None:
+            return False, None
+            
+        abs_path = self.recording_dir_paths[dir_num] / path
+        
+        if abs_path.exists():
+            return True, abs_path
+        else:
+            return True, None
         
     
     def _create_recording_dirs_list(self):
@@ -303,3 +655,87 @@ class RecordingManager:
 
 def _get_path_object(p):
     return p if isinstance(p, Path) else Path(p)
+
+
+def _join(rel_dir_path, name):
+    return name if rel_dir_path == '' else rel_dir_path + '/' + name
+
+
+def _scan_recording_dir(dir_num, dir_path, old_listings, new_listings):
+    
+    """
+    Scans a recording directory, adding listings of it and its
+    subdirectories to `new_listings`.
+    
+    The listing of a directory is reused from `old_listings` if the
+    directory's modification time has not changed since it was listed.
+    Otherwise the directory is listed anew.
+    
+    Returns the number of directories listed.
+    """
+    
+    num_listed_dirs = 0
+    
+    rel_dir_paths = ['']
+    
+    while len(rel_dir_paths) != 0:
+        
+        rel_dir_path = rel_dir_paths.pop()
+        abs_dir_path = os.path.join(dir_path, rel_dir_path)
+        
+        try:
+            mtime = os.stat(abs_dir_path).st_mtime_ns
+        except OSError:
+            continue
+        
+        key = (dir_num, rel_dir_path)
+        listing = old_listings.get(key)
+        
+        if listing is None or listing[0] != mtime:
+            # directory not previously listed or changed since listed
+            
+            listing = _list_dir(abs_dir_path, mtime)
+            
+            if listing is None:
+                continue
+            
+            num_listed_dirs += 1
+            
+        new_listings[key] = listing
+        
+        # Push subdirectories in reverse order so they are scanned in
+        # order.
+        rel_dir_paths.extend(
+            _join(rel_dir_path, n) for n in reversed(listing[2]))
+        
+    return num_listed_dirs
+
+
+def _list_dir(dir_path, mtime):
+    
+    file_names = []
+    subdir_names = []
+    
+    try:
+        
+        with os.scandir(dir_path) as entries:
+            
+            for entry in entries:
+                
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                
+                if is_dir:
+                    subdir_names.append(entry.name)
+                else:
+                    file_names.append(entry.name)
+                    
+    except OSError as e:
+        logging.getLogger().warning(
+            f'Could not list recording directory "{dir_path}". '
+            f'Error message was: {e}')
+        return None
+    
+    return (mtime, sorted(file_names), sorted(subdir_names))
@@ -5,13 +5,15 @@ from collections import namedtuple
 from threading import Event, Thread
 import datetime
 import itertools
+import math
 import re
 
 import jsonschema
+import numpy as np
 import pytz
 
 from vesper.util.notifier import Notifier
-import vesper.ephem.ephem_utils as ephem_utils
+import vesper.ephem.ephem_cache as ephem_cache_module
 import vesper.util.time_utils as time_utils
 import vesper.util.yaml_utils as yaml_utils
 
@@ -47,7 +49,9 @@ class Schedule:
     
     
     @staticmethod
-    def compile_yaml(spec, lat=None, lon=None, time_zone=None):
+    def compile_yaml(
+            spec, lat=None, lon=None, time_zone=None, ephem_cache=None,
+            start=None, end=None):
         
         try:
             spec = yaml_utils.load(spec)
@@ -56,17 +60,40 @@ class Schedule:
                 'Could not load schedule YAML. Error message was: {}'.format(
                     e.message))
             
-        return Schedule.compile_dict(spec, lat, lon, time_zone)
+        return Schedule.compile_dict(
+            spec, lat, lon, time_zone, ephem_cache, start, end)
     
         
     @staticmethod
-    def compile_dict(spec, lat=None, lon=None, time_zone=None):
-        context = _Context(lat, lon, time_zone)
+    def compile_dict(
+            spec, lat=None, lon=None, time_zone=None, ephem_cache=None,
+            start=None, end=None):
+        
+        """
+        Compiles a schedule from a dictionary specification.
+        
+        Solar event times are obtained from `ephem_cache`, an
+        `EphemCache`, or from the default cache of the
+        `vesper.ephem.ephem_cache` module if `ephem_cache` is `None`.
+        
+        The optional `start` and `end` arguments specify a compilation
+        window [`start`, `end`]. Within the window, the compiled schedule
+        is the same as the complete schedule, i.e. the intersections of
+        its intervals with the window are the same as those of the
+        complete schedule's intervals. Outside of the window, intervals
+        of daily schedules may be omitted or truncated. Compiling a daily
+        schedule for a window can be much faster than compiling it
+        completely, since solar event times are computed only for dates
+        near the window.
+        """
+        
+        context = _Context(lat, lon, time_zone, ephem_cache, start, end)
         return _compile_schedule(spec, context)
     
     
     def __init__(self, intervals):
         self._intervals = _normalize(intervals)
+        self._interval_times = None
         
         
     def get_intervals(self, start=None, end=None):
@@ -91,6 +118,67 @@ class Schedule:
                 i += 1
             
   
+    def get_interval_intersections(self, intervals):
+        
+        """
+        Gets the intersections of this schedule with query intervals.
+        
+        This method is a vectorized form of `get_intervals` that finds
+        the schedule intervals that intersect many query intervals
+        at once, for example the intervals of the files of a recording.
+        
+        Parameters
+        ----------
+        intervals : sequence of Interval
+            the query intervals.
+            
+        Returns
+        -------
+        list of lists of Interval
+            for each query interval, the intersections of the query
+            interval with the schedule intervals that `get_intervals`
+            returns for it, in order of increasing time.
+        """
+        
+        if len(intervals) == 0:
+            return []
+        
+        starts, ends = self._get_interval_times()
+        
+        query_starts = _get_times([i.start for i in intervals])
+        query_ends = _get_times([i.end for i in intervals])
+        
+        # Get, for each query interval, the index of the first schedule
+        # interval whose end is at least the query interval start and
+        # the index following that of the last schedule interval whose
+        # start is at most the query interval end.
+        first_indices = np.searchsorted(ends, query_starts, side='left')
+        end_indices = np.searchsorted(starts, query_ends, side='right')
+        
+        schedule_intervals = self._intervals
+        
+        return [
+            _get_intersections(schedule_intervals[i:j], query)
+            if query.start <= query.end else []
+            for query, i, j in zip(intervals, first_indices, end_indices)]
+    
+    
+    def _get_interval_times(self):
+        
+        """
+        Gets NumPy arrays of the start and end times of the intervals
+        of this schedule, in microseconds since the epoch.
+        """
+        
+        if self._interval_times is None:
+            intervals = self._intervals
+            self._interval_times = (
+                _get_times([i.start for i in intervals]),
+                _get_times([i.end for i in intervals]))
+            
+        return self._interval_times
+            
+  
     def _find_first_interval_with_end_ge(self, dt):
         
         """
@@ -191,6 +279,29 @@ def _normalize(intervals):
         return tuple(normalized_intervals)
 
 
+_EPOCH = pytz.utc.localize(datetime.datetime(1970, 1, 1))
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _get_times(dts):
+    
+    """
+    Converts datetimes to a NumPy array of microseconds since the epoch.
+    
+    We use integer microseconds rather than floating point seconds so
+    that the conversion is exact.
+    """
+    
+    return np.array(
+        [(dt - _EPOCH) // _ONE_MICROSECOND for dt in dts], dtype=np.int64)
+
+
+def _get_intersections(schedule_intervals, query):
+    return [
+        Interval(max(i.start, query.start), min(i.end, query.end))
+        for i in schedule_intervals]
+
+
 def _complete_query_interval(start, end):
 
     if start is None:
@@ -630,7 +741,7 @@ def _compile_date_time(dt, context, dt_name):
             _check_context_attribute(context.lat, 'latitude', dt_name, dt_text)
             _check_context_attribute(
                 context.lon, 'longitude', dt_name, dt_text)
-            return dt.resolve(context.lat, context.lon)
+            return dt.resolve(context.lat, context.lon, context.ephem_cache)
         
     else:
         raise ValueError(
@@ -691,6 +802,7 @@ def _compile_daily_schedule(spec, context):
         _check_daily_properties(spec)
         dates = _compile_daily_dates(daily)
         time_intervals = _compile_daily_time_intervals(daily)
+        dates = _restrict_daily_dates(dates, time_intervals, context)
         intervals = _compile_daily_intervals(dates, time_intervals, context)
     except ValueError as e:
         raise ValueError('Bad daily schedule: {}'.format(str(e)))
@@ -866,6 +978,57 @@ def _compile_time(time, name):
     return result
 
 
+def _restrict_daily_dates(dates, time_intervals, context):
+    
+    """
+    Restricts the dates of a daily schedule to those whose intervals
+    might intersect the compilation window of the specified context.
+    """
+    
+    if context.start is None and context.end is None:
+        return dates
+    
+    margin = _get_daily_date_margin(time_intervals)
+    
+    if context.start is not None:
+        start_date = context.start.date() - margin
+        dates = [d for d in dates if d >= start_date]
+        
+    if context.end is not None:
+        end_date = context.end.date() + margin
+        dates = [d for d in dates if d <= end_date]
+        
+    return dates
+
+
+def _get_daily_date_margin(time_intervals):
+    
+    """
+    Gets a bound on the difference between the UTC date of any time in
+    a daily interval and the date of the interval.
+    
+    A daily interval starts on its date in local time, which differs
+    from the UTC date by at most one day, and ends on the same date
+    or the next one. Solar event time offsets and interval durations
+    can move interval times by more days.
+    """
+    
+    max_delta = datetime.timedelta()
+    
+    for interval in time_intervals:
+        
+        for name in ('start', 'end'):
+            time = interval.get(name)
+            if isinstance(time, _SolarEventTime):
+                max_delta = max(max_delta, abs(time.offset))
+                
+        duration = interval.get('duration')
+        if duration is not None:
+            max_delta = max(max_delta, abs(duration))
+            
+    return datetime.timedelta(days=3 + math.ceil(max_delta / _ONE_DAY))
+    
+    
 def _compile_daily_intervals(dates, time_intervals, context):
     return tuple(_compile_daily_intervals_aux(dates, time_intervals, context))
 
@@ -906,7 +1069,7 @@ def _combine_date_and_time(date, time, context, name):
         _check_context_attribute(context.lat, 'latitude', name)
         _check_context_attribute(context.lon, 'longitude', name)
         dt = _SolarEventDateTime(date, time.event_name, time.offset)
-        return dt.resolve(context.lat, context.lon)
+        return dt.resolve(context.lat, context.lon, context.ephem_cache)
 
 
 def _get_daily_interval_end(start, end_time, context):
@@ -955,12 +1118,22 @@ _SCHEDULE_COMPILER_FUNCTIONS = (
     
 class _Context:
     
-    def __init__(self, lat=None, lon=None, time_zone=None):
+    def __init__(
+            self, lat=None, lon=None, time_zone=None, ephem_cache=None,
+            start=None, end=None):
         self.lat = lat
         self.lon = lon
         self.time_zone = time_zone
         if isinstance(self.time_zone, str):
             self.time_zone = pytz.timezone(self.time_zone)
+        if ephem_cache is None:
+            ephem_cache = ephem_cache_module.get_default_cache()
+        self.ephem_cache = ephem_cache
+        
+        # The minimum and maximum schedule datetimes are equivalent to
+        # an unbounded compilation window.
+        self.start = None if start == Schedule.MIN_DATETIME else start
+        self.end = None if end == Schedule.MAX_DATETIME else end
             
         
 _HHMMSS = re.compile(r'(\d?\d):(\d\d):(\d\d)')
@@ -1269,8 +1442,9 @@ class _SolarEventTime:
             self.offset = offset
          
          
-    def resolve(self, lat, lon, date):
-        return _resolve(date, self.event_name, lat, lon, self.offset)
+    def resolve(self, lat, lon, date, ephem_cache):
+        return _resolve(
+            date, self.event_name, lat, lon, self.offset, ephem_cache)
          
          
 class _SolarEventDateTime:
@@ -1287,13 +1461,14 @@ class _SolarEventDateTime:
             self.offset = offset
          
          
-    def resolve(self, lat, lon):
-        return _resolve(self.date, self.event_name, lat, lon, self.offset)
+    def resolve(self, lat, lon, ephem_cache):
+        return _resolve(
+            self.date, self.event_name, lat, lon, self.offset, ephem_cache)
  
  
-def _resolve(date, event_name, lat, lon, offset):
+def _resolve(date, event_name, lat, lon, offset, ephem_cache):
      
-    dt = ephem_utils.get_event_time(event_name, lat, lon, date)
+    dt = ephem_cache.get_event_time(event_name, lat, lon, date)
      
     if dt is None:
         return None
@@ -0,0 +1,353 @@
+"""
+Module containing class `ScheduleCache`.
+
+A `ScheduleCache` caches schedules compiled by the `Schedule` class, so
+that a schedule is compiled at most once for each specification,
+location, and time zone. Compiling a daily schedule whose intervals
+are defined in terms of solar events (for example from one hour after
+sunset to 30 minutes before sunrise) requires solar event times for
+every date of the schedule, and can take seconds for a schedule that
+spans years. The detect command, the Vesper recorder, and scripts
+compile the same schedules again and again, and this cache lets them
+share the compiled intervals instead.
+
+The cache compiles schedules only for the time windows for which they
+are requested (see `Schedule.compile_dict`), and extends the window
+of a cached schedule incrementally, compiling only the parts of a
+wider window that are not already cached. Cached schedules can
+optionally be persisted to a file, so that they are shared by the
+processes that use the same file and need not be recompiled when a
+process restarts. When a cache is saved, schedules that other
+processes have saved to the file are merged into it rather than
+overwritten.
+
+Schedules are identified by SHA-256 hashes of their specifications,
+locations, and time zones, so editing a schedule preset or moving a
+station results in a new cache entry rather than a stale schedule.
+"""
+
+
+from threading import Lock
+import datetime
+import hashlib
+import json
+import logging
+
+import pytz
+
+from vesper.util.bunch import Bunch
+from vesper.util.schedule import Interval, Schedule
+import vesper.util.os_utils as os_utils
+
+
+_FILE_FORMAT_VERSION = 1
+
+
+_logger = logging.getLogger()
+
+
+class ScheduleCache:
+    
+    
+    def __init__(self, file_path=None, ephem_cache=None):
+        
+        """
+        Initializes this cache.
+        
+        Parameters
+        ----------
+        file_path : str or Path or None
+            the path of the file in which to persist compiled schedules,
+            or `None` if the schedules should not be persisted. If the
+            file exists, the schedules it contains are loaded into this
+            cache.
+            
+        ephem_cache : EphemCache or None
+            the ephemeris cache from which to obtain solar event times
+            when compiling schedules, or `None` to use the default
+            cache of the `vesper.ephem.ephem_cache` module.
+        """
+        
+        self._file_path = file_path
+        self._ephem_cache = ephem_cache
+        
+        self._lock = Lock()
+        
+        # Mapping from schedule keys to bunches with `start`, `end`,
+        # and `schedule` attributes. The `start` and `end` attributes
+        # delimit the window for which the schedule was compiled,
+        # with `None` indicating that the window is unbounded.
+        self._entries = {}
+        
+        self._dirty = False
+        
+        if file_path is not None:
+            self._load()
+            
+            
+    @property
+    def file_path(self):
+        return self._file_path
+        
+        
+    def _load(self):
+        entries = self._read_file()
+        if entries is not None:
+            self._entries = entries
+            
+            
+    def _read_file(self):
+        
+        """
+        Reads the cache entries of this cache's file.
+        
+        Returns `None` if the file does not exist or cannot be read
+        or parsed.
+        """
+        
+        try:
+            contents = os_utils.read_file(self._file_path)
+            
+        except OSError:
+            # file does not exist or cannot be read
+            
+            return None
+            
+        try:
+            data = json.loads(contents)
+            if data['version'] != _FILE_FORMAT_VERSION:
+                raise ValueError(
+                    f'Unsupported file format version {data["version"]}.')
+            return dict(
+                (k, _parse_entry(v)) for k, v in data['schedules'].items())
+                
+        except Exception as e:
+            _logger.warning(
+                f'Could not load schedule cache file "{self._file_path}". '
+                f'Error message was: {e}')
+            return None
+            
+            
+    def save(self):
+        
+        """
+        Saves this cache's schedules to its file.
+        
+        Schedules that other processes have saved to the file since
+        this cache loaded it are merged into this cache before saving,
+        so that they are not lost.
+        
+        If this cache has no file or no schedules have been compiled
+        since the cache was loaded or last saved, this method does
+        nothing.
+        """
+        
+        if self._file_path is None:
+            return
+            
+        with self._lock:
+            
+            if not self._dirty:
+                return
+                
+            saved_entries = self._read_file()
+            if saved_entries is not None:
+                _merge_entries(self._entries, saved_entries)
+                
+            data = {
+                'version': _FILE_FORMAT_VERSION,
+                'schedules': dict(
+                    (k, _format_entry(v)) for k, v in self._entries.items())
+            }
+            
+            self._dirty = False
+            
+        try:
+            os_utils.write_file_atomically(self._file_path, json.dumps(data))
+            
+        except Exception as e:
+            _logger.warning(
+                f'Could not save schedule cache file "{self._file_path}". '
+                f'Error message was: {e}')
+                
+                
+    def get_schedule(
+            self, spec, lat=None, lon=None, time_zone=None, start=None,
+            end=None):
+                
+        """
+        Gets a compiled schedule.
+        
+        The arguments of this method have the same meanings as the
+        corresponding arguments of `Schedule.compile_dict`. In
+        particular, the returned schedule is the same as the complete
+        schedule within the window [`start`, `end`], but may differ
+        from it outside of the window. A `start` or `end` of `None`
+        indicates that the window is unbounded on that side.
+        
+        Raises
+        ------
+        ValueError
+            if the schedule specification is invalid.
+        """
+        
+        key = _get_key(spec, lat, lon, time_zone)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            
+        if entry is None:
+            # cache miss
+            
+            schedule = self._compile(spec, lat, lon, time_zone, start, end)
+            entry = Bunch(start=start, end=end, schedule=schedule)
+            
+        else:
+            # cache hit
+            
+            windows = _get_missing_windows(entry, start, end)
+            
+            if len(windows) == 0:
+                return entry.schedule
+                
+            # Compile schedule for parts of window that are not already
+            # cached and combine with cached intervals.
+            intervals = list(entry.schedule.get_intervals())
+            for window_start, window_end in windows:
+                schedule = self._compile(
+                    spec, lat, lon, time_zone, window_start, window_end)
+                intervals.extend(schedule.get_intervals())
+                
+            entry = Bunch(
+                start=_min(entry.start, start),
+                end=_max(entry.end, end),
+                schedule=Schedule(intervals))
+                
+        # We compile schedules without holding the lock since
+        # compilation can be slow, and it is harmless if two threads
+        # compile the same schedule. If they compile it for different
+        # windows, though, the last one to finish wins.
+        with self._lock:
+            self._entries[key] = entry
+            self._dirty = True
+            
+        return entry.schedule
+        
+        
+    def _compile(self, spec, lat, lon, time_zone, start, end):
+        return Schedule.compile_dict(
+            spec, lat, lon, time_zone, self._ephem_cache, start, end)
+
+
+def _get_key(spec, lat, lon, time_zone):
+    
+    """
+    Gets the cache key of a schedule.
+    
+    The key is a SHA-256 hash of a canonical JSON representation of
+    the schedule's specification, location, and time zone. We use
+    `default=str` so that dates and times in specifications loaded
+    from YAML and `pytz` time zones are represented by their string
+    forms.
+    """
+    
+    if time_zone is not None and not isinstance(time_zone, str):
+        time_zone = time_zone.zone
+        
+    text = json.dumps(
+        [spec, lat, lon, time_zone], sort_keys=True, default=str)
+        
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _get_missing_windows(entry, start, end):
+    
+    """
+    Gets the parts of a window that are not in the window of a cache
+    entry.
+    
+    When the windows are disjoint, the parts include the gap between
+    them, so that the window of the entry remains a single interval.
+    """
+    
+    windows = []
+    
+    if entry.start is not None and (start is None or start < entry.start):
+        windows.append((start, entry.start))
+        
+    if entry.end is not None and (end is None or end > entry.end):
+        windows.append((entry.end, end))
+        
+    return windows
+
+
+def _merge_entries(entries, saved_entries):
+    
+    """
+    Merges saved cache entries into cache entries.
+    
+    Of two entries for the same schedule, the saved one is kept only
+    if its window contains that of the other.
+    """
+    
+    for key, saved in saved_entries.items():
+        entry = entries.get(key)
+        if entry is None or _window_contains(saved, entry):
+            entries[key] = saved
+
+
+def _window_contains(a, b):
+    
+    """
+    Tests whether the window of cache entry `a` contains that of cache
+    entry `b`.
+    """
+    
+    return \
+        (a.start is None or (b.start is not None and a.start <= b.start)) \
+        and (a.end is None or (b.end is not None and a.end >= b.end))
+
+
+def _min(a, b):
+    return None if a is None or b is None else min(a, b)
+
+
+def _max(a, b):
+    return None if a is None or b is None else max(a, b)
+
+
+def _format_entry(entry):
+    return {
+        'start': _format_time(entry.start),
+        'end': _format_time(entry.end),
+        'intervals': [
+            [_format_time(i.start), _format_time(i.end)]
+            for i in entry.schedule.get_intervals()]
+    }
+
+
+def _parse_entry(entry):
+    intervals = [
+        Interval(_parse_time(start), _parse_time(end))
+        for start, end in entry['intervals']]
+    return Bunch(
+        start=_parse_time(entry['start']),
+        end=_parse_time(entry['end']),
+        schedule=Schedule(intervals))
+
+
+# We format times with `isoformat` rather than `strftime` since the
+# latter does not zero-pad years before 1000 on all platforms, and
+# schedule intervals can start at `Schedule.MIN_DATETIME`.
+def _format_time(time):
+    if time is None:
+        return None
+    else:
+        return time.astimezone(pytz.utc).replace(tzinfo=None).isoformat()
+
+
+def _parse_time(time):
+    if time is None:
+        return None
+    else:
+        return pytz.utc.localize(datetime.datetime.fromisoformat(time))
@@ -24,13 +24,60 @@ def add_tone(
     phases = np.arange(length) * 2 * np.pi * frequency / fs
     tone = amplitude * np.sin(phases)
     
+    _add_signal(audio, tone, start_time, channel_num, taper_duration)
+
+
+def add_chirp(
+        audio, start_time, duration, amplitude, start_frequency,
+        end_frequency, channel_num=0, taper_duration=0):
+    
+    """
+    Adds a linear chirp to audio.
+    
+    The instantaneous frequency of the chirp varies linearly from
+    `start_frequency` at its start to `end_frequency` at its end.
+    """
+    
+    fs = audio.sample_rate
+    
+    # Create chirp.
+    length = signal_utils.seconds_to_frames(duration, fs)
+    times = np.arange(length) / fs
+    rate = (end_frequency - start_frequency) / duration
+    phases = 2 * np.pi * (start_frequency + rate / 2 * times) * times
+    chirp = amplitude * np.sin(phases)
+    
+    _add_signal(audio, chirp, start_time, channel_num, taper_duration)
+
+
+def _add_signal(audio, samples, start_time, channel_num, taper_duration):
+    
+    fs = audio.sample_rate
+    
     # Taper ends if specified.
     if taper_duration != 0:
         n = signal_utils.seconds_to_frames(taper_duration, fs)
         ramp = np.arange(n) / n
-        tone[:n] *= ramp
-        tone[-n:] *= 1 - ramp
+        samples[:n] *= ramp
+        samples[-n:] *= 1 - ramp
     
-    # Add tone to audio.
+    # Add signal to audio.
     start_index = signal_utils.seconds_to_frames(start_time, fs)
-    audio.samples[channel_num, start_index:start_index + length] += tone
+    audio.samples[channel_num, start_index:start_index + len(samples)] += \
+        samples
+
+
+def add_noise(audio, standard_deviation, rng=None, channel_num=0):
+    
+    """
+    Adds Gaussian white noise to audio.
+    
+    The noise is generated with the specified NumPy random number
+    generator, or with a new generator if `rng` is `None`.
+    """
+    
+    if rng is None:
+        rng = np.random.default_rng()
+        
+    samples = audio.samples[channel_num]
+    samples += rng.normal(scale=standard_deviation, size=len(samples))
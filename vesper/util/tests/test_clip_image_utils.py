@@ -0,0 +1,169 @@
+import datetime
+import struct
+import zlib
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+import vesper.util.clip_image_utils as clip_image_utils
+
+
+_SETTINGS = {
+    'computation': {
+        'window': {'type': 'Hann', 'size': .005},
+        'hopSize': 50,
+        'referencePower': 1e-10
+    },
+    'display': {
+        'powerRange': [10, 100],
+        'reverseColormap': True
+    }
+}
+
+
+class ClipImageUtilsTests(TestCase):
+    
+    
+    def test_get_spectrogram_settings(self):
+        
+        s = clip_image_utils.get_spectrogram_settings(_SETTINGS, 24000)
+        
+        self.assertEqual(s.window_type, 'Hann')
+        self.assertEqual(s.window_size, 120)
+        self.assertEqual(len(s.window), 120)
+        self.assertEqual(s.hop_size, 60)
+        self.assertEqual(s.dft_size, 128)
+        self.assertEqual(s.reference_power, 1e-10)
+        self.assertEqual(s.power_range, (10, 100))
+        self.assertTrue(s.reverse_colormap)
+        
+        
+    def test_create_data_window(self):
+        
+        cases = [
+            ('Rectangular', 3, [1, 1, 1]),
+            ('Hann', 1, [0]),
+            ('Hann', 3, [0, 1, 0]),
+            ('Hann', 5, [0, .5, 1, .5, 0]),
+            ('Hamming', 3, [.08, 1, .08]),
+        ]
+        
+        for window_type, size, expected in cases:
+            actual = clip_image_utils.create_data_window(window_type, size)
+            self.assertTrue(np.allclose(actual, expected))
+            
+        self._assert_raises(
+            ValueError, clip_image_utils.create_data_window, 'Bobo', 10)
+        
+        
+    def test_get_settings_hash(self):
+        
+        get = clip_image_utils.get_spectrogram_settings
+        hash_ = clip_image_utils.get_settings_hash
+        
+        a = hash_(get(_SETTINGS, 24000))
+        b = hash_(get(_SETTINGS, 24000))
+        c = hash_(get(_SETTINGS, 22050))
+        
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        
+        
+    def test_compute_spectrogram_image(self):
+        
+        sample_rate = 24000
+        settings = clip_image_utils.get_spectrogram_settings(
+            _SETTINGS, sample_rate)
+        
+        # A sinusoid centered on bin 16 of the 65 DFT bins.
+        freq = 16 * sample_rate / settings.dft_size
+        times = np.arange(2400) / sample_rate
+        samples = np.round(10000 * np.sin(2 * np.pi * freq * times))
+        
+        image = clip_image_utils.compute_spectrogram_image(samples, settings)
+        
+        self.assertEqual(image.dtype, np.dtype('uint8'))
+        self.assertEqual(image.shape, (65, 39))
+        
+        # With a reversed colormap high powers are dark, and the first
+        # image row is for the highest frequency.
+        row = 64 - 16
+        self.assertTrue(np.all(image[row] < image[0]))
+        self.assertTrue(np.all(image[row] == image[row].min()))
+        
+        # Too few samples for a spectrum.
+        image = clip_image_utils.compute_spectrogram_image(
+            samples[:100], settings)
+        self.assertEqual(image.shape, (65, 0))
+        
+        
+    def test_compute_clip_density(self):
+        
+        hours = [18.1, 18.2, 19.9, 23.5, 29.9, 35]
+        
+        rug = clip_image_utils.compute_clip_density(hours, 18, 30, 6)
+        
+        self.assertEqual(rug.dtype, np.dtype('uint8'))
+        self._assert_arrays_equal(rug, np.array([3, 0, 1, 0, 0, 1]))
+        
+        rug = clip_image_utils.compute_clip_density([20] * 300, 18, 30, 2)
+        self._assert_arrays_equal(rug, np.array([255, 0]))
+        
+        self._assert_raises(
+            ValueError, clip_image_utils.compute_clip_density, hours, 30,
+            18, 6)
+        
+        
+    def test_get_night_hours(self):
+        
+        cases = [
+            (datetime.datetime(2020, 5, 1, 12), 12),
+            (datetime.datetime(2020, 5, 1, 21, 30), 21.5),
+            (datetime.datetime(2020, 5, 2, 3, 15), 27.25),
+        ]
+        
+        for time, expected in cases:
+            actual = clip_image_utils.get_night_hours(time)
+            self.assertAlmostEqual(actual, expected)
+            
+            
+    def test_encode_png(self):
+        
+        image = np.array([[0, 10, 255, 7], [200, 100, 50, 3]], dtype='uint8')
+        
+        content = clip_image_utils.encode_png(image)
+        
+        self._assert_arrays_equal(_decode_png(content), image)
+        
+        self._assert_raises(
+            ValueError, clip_image_utils.encode_png,
+            np.zeros((3, 0), dtype='uint8'))
+        
+        
+def _decode_png(content):
+    
+    """Decodes a gray level PNG image that uses only the "Sub" filter."""
+    
+    assert content[:8] == b'\x89PNG\r\n\x1a\n'
+    
+    i = 8
+    chunks = {}
+    
+    while i < len(content):
+        length, = struct.unpack('>I', content[i:i + 4])
+        chunk_type = content[i + 4:i + 8]
+        data = content[i + 8:i + 8 + length]
+        crc, = struct.unpack('>I', content[i + 8 + length:i + 12 + length])
+        assert crc == zlib.crc32(chunk_type + data) & 0xffffffff
+        chunks[chunk_type] = data
+        i += 12 + length
+        
+    width, height, bit_depth, color_type, _, _, _ = \
+        struct.unpack('>IIBBBBB', chunks[b'IHDR'])
+    assert bit_depth == 8 and color_type == 0
+    
+    data = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype='uint8')
+    rows = data.reshape((height, width + 1))
+    assert np.all(rows[:, 0] == 1)
+    
+    return np.cumsum(rows[:, 1:], axis=1, dtype='uint8')
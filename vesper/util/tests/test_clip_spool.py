@@ -0,0 +1,59 @@
+from pathlib import Path
+import datetime
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clip_spool import ClipSpoolWriter
+import vesper.util.clip_spool as clip_spool
+import vesper.util.time_utils as time_utils
+
+
+class ClipSpoolTests(TestCase):
+    
+    
+    def test_write_and_read(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            start_time = time_utils.create_utc_datetime(2020, 5, 1, 3)
+            one_second = datetime.timedelta(seconds=1)
+            
+            clips = [
+                ('Tseep', 0, start_time, np.arange(100), None),
+                ('Thrush', 1, start_time + one_second, np.arange(50),
+                 {'Score': 90})
+            ]
+            
+            writer = ClipSpoolWriter(dir_path)
+            for detector_name, channel_num, time, samples, annotations \
+                    in clips:
+                writer.write_clip(
+                    'Station', detector_name, channel_num, time,
+                    samples.astype(np.int16), 22050, annotations)
+            writer.close()
+            
+            self.assertEqual(writer.num_clips, 2)
+            
+            # Simulate interrupted manifest write.
+            manifest_file_path = Path(dir_path) / clip_spool.MANIFEST_FILE_NAME
+            with open(manifest_file_path, 'a') as file_:
+                file_.write('{"file_name": "Sta')
+                
+            actual = list(clip_spool.read_clip_spool(dir_path))
+            
+            self.assertEqual(len(actual), 2)
+            
+            for clip, (detector_name, channel_num, time, samples,
+                       annotations) in zip(actual, clips):
+                           
+                self.assertEqual(clip.station_name, 'Station')
+                self.assertEqual(clip.detector_name, detector_name)
+                self.assertEqual(clip.channel_num, channel_num)
+                self.assertEqual(clip.start_time, time)
+                self.assertEqual(clip.length, len(samples))
+                self.assertEqual(clip.sample_rate, 22050)
+                self.assertEqual(clip.annotations, annotations)
+                self.assertTrue(clip.file_path.exists())
+                self._assert_arrays_equal(clip.samples, samples)
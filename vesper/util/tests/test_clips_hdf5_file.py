@@ -0,0 +1,157 @@
+from pathlib import Path
+import tempfile
+
+import h5py
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clips_hdf5_file import ClipsHdf5ArraysWriter, ClipsHdf5File
+import vesper.util.clips_hdf5_file as clips_hdf5_file
+
+
+_COLUMN_DTYPES = {
+    'clip_id': np.int64,
+    'station': str,
+    'mic_output': str,
+    'detector': str,
+    'date': str,
+    'sample_rate': np.float64,
+    'clip_start_time': str,
+    'classification': str,
+}
+
+
+class ClipsHdf5FileTests(TestCase):
+    
+    
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._file_path = Path(self._temp_dir.name) / 'clips.h5'
+        
+        
+    def tearDown(self):
+        self._temp_dir.cleanup()
+        
+        
+    def _write_array_clips(self, batches):
+        
+        with h5py.File(self._file_path, 'w') as f:
+            
+            writer = ClipsHdf5ArraysWriter(
+                f.create_group('clips'), _COLUMN_DTYPES, chunk_clip_count=4)
+                
+            for batch in batches:
+                samples = [_create_samples(i, n) for i, n in batch]
+                columns = _create_columns([i for i, _ in batch])
+                writer.append(samples, columns)
+                
+            return writer.num_clips
+            
+            
+    def test_array_clips_round_trip(self):
+        
+        # Second batch has longer clips than the first, so the samples
+        # array must grow in both dimensions.
+        batches = [
+            [(1, 10), (2, 12), (3, 11)],
+            [],
+            [(4, 20), (5, 5)],
+        ]
+        
+        num_clips = self._write_array_clips(batches)
+        self.assertEqual(num_clips, 5)
+        
+        file_ = ClipsHdf5File(self._file_path)
+        self.assertEqual(file_.get_layout(), clips_hdf5_file.LAYOUT_ARRAYS)
+        self.assertEqual(file_.get_num_clips(), 5)
+        
+        arrays = file_.read_arrays()
+        self.assertEqual(arrays.samples.shape, (5, 20))
+        self._assert_arrays_equal(
+            arrays.length, np.array([10, 12, 11, 20, 5]))
+        self._assert_arrays_equal(arrays.clip_id, np.arange(1, 6))
+        self.assertEqual(arrays.station[3], 'Station 4')
+        self.assertEqual(arrays.classification[4], 'Call.5')
+        
+        # Check that padding is zero.
+        self.assertTrue(np.all(arrays.samples[0, 10:] == 0))
+        
+        clips = file_.read_clips()
+        self.assertEqual(len(clips), 5)
+        
+        for clip, (clip_id, length) in zip(clips, sum(batches, [])):
+            self.assertEqual(clip.id, clip_id)
+            self._assert_arrays_equal(
+                clip.waveform, _create_samples(clip_id, length))
+            self.assertEqual(clip.microphone, f'Mic {clip_id}')
+            self.assertEqual(clip.night, '2020-05-01')
+            
+            
+    def test_no_clips(self):
+        
+        # Exporting no clips should produce a file that reads as
+        # empty arrays, including an empty samples array.
+        num_clips = self._write_array_clips([[]])
+        self.assertEqual(num_clips, 0)
+        
+        file_ = ClipsHdf5File(self._file_path)
+        self.assertEqual(file_.get_num_clips(), 0)
+        
+        arrays = file_.read_arrays()
+        self.assertEqual(arrays.samples.shape, (0, 0))
+        self.assertEqual(len(arrays.length), 0)
+        self.assertEqual(len(arrays.clip_id), 0)
+        self.assertEqual(len(arrays.classification), 0)
+        
+        # Indexing the samples as for a training dataset should work.
+        self.assertEqual(arrays.samples[[]].shape, (0, 0))
+        
+        arrays = file_.read_arrays(max_num_clips=10)
+        self.assertEqual(arrays.samples.shape, (0, 0))
+        
+        self.assertEqual(file_.read_clips(), [])
+        
+        
+    def test_read_clip_subset(self):
+        
+        self._write_array_clips([[(i, 8) for i in range(20)]])
+        
+        file_ = ClipsHdf5File(self._file_path)
+        
+        arrays = file_.read_arrays(max_num_clips=6)
+        self.assertEqual(len(arrays.clip_id), 6)
+        self.assertEqual(len(set(arrays.clip_id)), 6)
+        
+        # Subset should be reproducible.
+        other = file_.read_arrays(max_num_clips=6)
+        self._assert_arrays_equal(arrays.clip_id, other.clip_id)
+        
+        for clip_id, samples in zip(arrays.clip_id, arrays.samples):
+            self._assert_arrays_equal(samples, _create_samples(clip_id, 8))
+            
+            
+    def test_read_arrays_error(self):
+        
+        with h5py.File(self._file_path, 'w') as f:
+            f.create_group('clips')
+            
+        file_ = ClipsHdf5File(self._file_path)
+        self.assertEqual(file_.get_layout(), clips_hdf5_file.LAYOUT_DATASETS)
+        self._assert_raises(ValueError, file_.read_arrays)
+
+
+def _create_samples(clip_id, length):
+    return np.arange(length, dtype=np.int16) + 100 * clip_id
+
+
+def _create_columns(clip_ids):
+    return {
+        'clip_id': clip_ids,
+        'station': [f'Station {i}' for i in clip_ids],
+        'mic_output': [f'Mic {i}' for i in clip_ids],
+        'detector': ['Tseep' for _ in clip_ids],
+        'date': ['2020-05-01' for _ in clip_ids],
+        'sample_rate': [24000. for _ in clip_ids],
+        'clip_start_time': ['2020-05-02T01:02:03.000000Z' for _ in clip_ids],
+        'classification': [f'Call.{i}' for i in clip_ids],
+    }
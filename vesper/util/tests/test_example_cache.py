@@ -0,0 +1,104 @@
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.example_cache import ExampleCache
+
+
+def _create_batches(num_batches, batch_size):
+    for i in range(num_batches):
+        start = i * batch_size
+        indices = np.arange(start, start + batch_size)
+        yield {
+            'spectrogram': np.tile(
+                indices.reshape((-1, 1, 1)), (1, 3, 2)).astype('float32'),
+            'label': indices % 2
+        }
+
+
+class ExampleCacheTests(TestCase):
+    
+    
+    def test_write_and_read(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            key = {'dataset': 'Tseep', 'hop_size': 60}
+            cache = ExampleCache(dir_path, key)
+            
+            self.assertFalse(cache.exists)
+            
+            num_examples = cache.write(_create_batches(3, 4))
+            
+            self.assertEqual(num_examples, 12)
+            self.assertTrue(cache.exists)
+            
+            # Read cache via a new object, as in a later process.
+            cache = ExampleCache(dir_path, dict(key))
+            self.assertTrue(cache.exists)
+            self.assertEqual(cache.num_examples, 12)
+            
+            arrays = cache.read()
+            
+            self.assertEqual(set(arrays.keys()), {'spectrogram', 'label'})
+            
+            grams = arrays['spectrogram']
+            self.assertEqual(grams.shape, (12, 3, 2))
+            self.assertEqual(grams.dtype, np.float32)
+            self.assertTrue(np.all(grams[:, 1, 1] == np.arange(12)))
+            
+            labels = arrays['label']
+            self.assertTrue(np.all(labels == np.arange(12) % 2))
+            
+            # Cache arrays should be read-only.
+            with self.assertRaises(ValueError):
+                grams[0, 0, 0] = 1
+                
+            del grams, labels, arrays
+            
+            
+    def test_key(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            a = ExampleCache(dir_path, {'hop_size': 60, 'window_size': 120})
+            b = ExampleCache(dir_path, {'window_size': 120, 'hop_size': 60})
+            c = ExampleCache(dir_path, {'hop_size': 30, 'window_size': 120})
+            
+            self.assertEqual(a.dir_path, b.dir_path)
+            self.assertNotEqual(a.dir_path, c.dir_path)
+            
+            a.write(_create_batches(1, 2))
+            
+            self.assertTrue(b.exists)
+            self.assertFalse(c.exists)
+            
+            
+    def test_empty_cache(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            cache = ExampleCache(dir_path, 'empty')
+            cache.write(_create_batches(1, 0))
+            
+            arrays = cache.read()
+            self.assertEqual(arrays['spectrogram'].shape, (0, 3, 2))
+            
+            
+    def test_write_errors(self):
+        
+        def create_batches():
+            yield {'a': np.zeros((2, 3)), 'b': np.zeros(2)}
+            yield {'a': np.zeros((2, 4)), 'b': np.zeros(2)}
+            
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            cache = ExampleCache(dir_path, 'bad')
+            
+            with self.assertRaises(ValueError):
+                cache.write(create_batches())
+            
+            # Failed write should not leave a cache.
+            self.assertFalse(cache.exists)
+            self.assertFalse(cache.dir_path.exists())
@@ -0,0 +1,128 @@
+from pathlib import Path
+from threading import Lock
+import tempfile
+
+from vesper.tests.test_case import TestCase
+from vesper.util.job_metrics import JobMetrics, TimedLock
+import vesper.util.job_metrics as job_metrics
+
+
+class JobMetricsTests(TestCase):
+    
+    
+    def test_timers(self):
+        
+        metrics = JobMetrics()
+        
+        metrics.add_time('A', 1)
+        metrics.add_time('A', 3)
+        metrics.add_time('B', 2)
+        
+        with metrics.timer('C'):
+            pass
+            
+        try:
+            with metrics.timer('C'):
+                raise ValueError()
+        except ValueError:
+            pass
+            
+        timers = metrics.get_data()['timers']
+        
+        self.assertEqual(list(timers.keys()), ['A', 'B', 'C'])
+        self.assertEqual(
+            timers['A'], {'count': 2, 'total_time': 4, 'max_time': 3})
+        self.assertEqual(
+            timers['B'], {'count': 1, 'total_time': 2, 'max_time': 2})
+        self.assertEqual(timers['C']['count'], 2)
+        self.assertGreaterEqual(timers['C']['total_time'], 0)
+        
+        
+    def test_counters(self):
+        
+        metrics = JobMetrics()
+        
+        metrics.increment('B')
+        metrics.increment('A', 10)
+        metrics.increment('B', 2)
+        
+        data = metrics.get_data()
+        
+        self.assertEqual(data['counters'], {'A': 10, 'B': 3})
+        self.assertEqual(data['version'], 1)
+        self.assertGreaterEqual(data['elapsed_time'], 0)
+        
+        
+    def test_module_functions(self):
+        
+        job_metrics.reset()
+        metrics = job_metrics.get_metrics()
+        
+        job_metrics.add_time(job_metrics.AUDIO_READ, 1)
+        job_metrics.increment(job_metrics.CLIPS_CREATED, 5)
+        
+        data = metrics.get_data()
+        self.assertEqual(data['timers'][job_metrics.AUDIO_READ]['count'], 1)
+        self.assertEqual(data['counters'], {job_metrics.CLIPS_CREATED: 5})
+        
+        job_metrics.reset()
+        self.assertIsNot(job_metrics.get_metrics(), metrics)
+        self.assertEqual(job_metrics.get_metrics().get_data()['timers'], {})
+        
+        
+    def test_timed_lock(self):
+        
+        job_metrics.reset()
+        
+        lock = TimedLock(Lock())
+        
+        with lock:
+            self.assertTrue(lock.lock.locked())
+            
+        self.assertFalse(lock.lock.locked())
+        
+        with lock:
+            pass
+            
+        timers = job_metrics.get_metrics().get_data()['timers']
+        self.assertEqual(timers[job_metrics.ARCHIVE_LOCK_WAIT]['count'], 2)
+        
+        
+    def test_write_and_read_metrics(self):
+        
+        metrics = JobMetrics()
+        metrics.add_time('A', 1)
+        metrics.increment('B')
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Job 1 Metrics.json'
+            
+            self.assertIsNone(job_metrics.read_metrics(file_path))
+            
+            job_metrics.write_metrics(file_path, metrics)
+            data = job_metrics.read_metrics(file_path)
+            
+        self.assertEqual(data['timers'], metrics.get_data()['timers'])
+        self.assertEqual(data['counters'], {'B': 1})
+        
+        
+    def test_get_timer_summaries(self):
+        
+        data = {
+            'elapsed_time': 10,
+            'timers': {
+                'A': {'count': 2, 'total_time': 1, 'max_time': .6},
+                'B': {'count': 4, 'total_time': 8, 'max_time': 3},
+            },
+            'counters': {}
+        }
+        
+        summaries = job_metrics.get_timer_summaries(data)
+        
+        self.assertEqual([s['name'] for s in summaries], ['B', 'A'])
+        self.assertEqual(summaries[0]['mean_time'], 2)
+        self.assertEqual(summaries[0]['fraction'], .8)
+        self.assertEqual(summaries[1]['mean_time'], .5)
+        self.assertEqual(summaries[1]['fraction'], .1)
+        self.assertEqual(summaries[1]['max_time'], .6)
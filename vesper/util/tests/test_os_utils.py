@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import tempfile
+
+from vesper.tests.test_case import TestCase
+import vesper.util.os_utils as os_utils
+
+
+class OsUtilsTests(TestCase):
+    
+    
+    def test_write_file_atomically(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Subdirectory' / 'Test.json'
+            
+            os_utils.write_file_atomically(file_path, 'one')
+            self.assertEqual(file_path.read_text(), 'one')
+            
+            os_utils.write_file_atomically(str(file_path), 'two')
+            self.assertEqual(file_path.read_text(), 'two')
+            
+            os_utils.write_file_atomically(file_path, b'three', 'wb')
+            self.assertEqual(file_path.read_text(), 'three')
+            
+            # No temporary files should remain.
+            self.assertEqual(os.listdir(file_path.parent), ['Test.json'])
+            
+            
+    def test_concurrent_write_file_atomically(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Test.txt'
+            contents = [str(i) * 10000 for i in range(10)]
+            
+            def write(text):
+                for _ in range(10):
+                    os_utils.write_file_atomically(file_path, text)
+                    
+            with ThreadPoolExecutor(10) as executor:
+                list(executor.map(write, contents))
+                    
+            self.assertIn(file_path.read_text(), contents)
+            self.assertEqual(os.listdir(dir_path), ['Test.txt'])
+            
+            
+    def test_write_file_atomically_error(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Test.txt'
+            
+            # Writing bytes to a text file should fail and leave no
+            # temporary file.
+            with self.assertRaises(OSError):
+                os_utils.write_file_atomically(file_path, b'bytes')
+                
+            self.assertEqual(os.listdir(dir_path), [])
@@ -0,0 +1,292 @@
+from threading import Event
+import datetime
+import tempfile
+import time
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clip_spool import ClipSpoolWriter
+from vesper.util.recorder_detector_runner import (
+    _Detection, _DetectorListener, RecorderDetectorRunner)
+import vesper.util.clip_spool as clip_spool
+import vesper.util.recorder_detector_runner as recorder_detector_runner
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 1000
+_START_TIME = time_utils.create_utc_datetime(2020, 5, 1, 3)
+_CLIP_LENGTH = 10
+_DETECTOR_CLASS_NAME = \
+    'vesper.util.tests.test_recorder_detector_runner._TestDetector'
+
+
+class _TestDetector:
+    
+    """
+    Detector that reports a clip starting at each positive sample.
+    
+    The detector reports each clip when it receives the sample at
+    which the clip starts, i.e. before it has received the rest of
+    the clip.
+    """
+    
+    
+    instances = []
+    
+    # Event on which the `detect` method waits before processing its
+    # input, or `None`.
+    release_event = None
+    
+    
+    def __init__(self, sample_rate, listener):
+        self.sample_rate = sample_rate
+        self.listener = listener
+        self.num_frames = 0
+        self.completed = False
+        _TestDetector.instances.append(self)
+        
+        
+    def detect(self, samples):
+        
+        if _TestDetector.release_event is not None:
+            _TestDetector.release_event.wait()
+            
+        for i in np.flatnonzero(samples > 0):
+            self.listener.process_clip(self.num_frames + i, _CLIP_LENGTH)
+            
+        self.num_frames += len(samples)
+        
+        
+    def complete_detection(self):
+        self.completed = True
+
+
+class _Recorder:
+    
+    def __init__(self, num_channels, frames_per_buffer):
+        self.num_channels = num_channels
+        self.sample_rate = _SAMPLE_RATE
+        self.frames_per_buffer = frames_per_buffer
+        self.sample_size = 2
+
+
+class RecorderDetectorRunnerTests(TestCase):
+    
+    
+    def setUp(self):
+        _TestDetector.instances = []
+        _TestDetector.release_event = None
+        
+        
+    def test_detection(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            writer = ClipSpoolWriter(dir_path)
+            detection = _create_detection(writer, 2)
+            
+            # Clips on both channels, with the channel 1 clip extending
+            # past the end of the first buffer.
+            samples = _create_samples(100, 2, ((20, 0), (95, 1)))
+            detection.detect(_START_TIME, samples)
+            
+            # Second buffer, with a clip that extends past the end of
+            # the input.
+            samples = _create_samples(100, 2, ((195, 0),), start_value=100)
+            detection.detect(_get_time(100), samples)
+            
+            detection.complete()
+            writer.close()
+            
+            self.assertTrue(all(d.completed for d in _TestDetector.instances))
+            
+            clips = list(clip_spool.read_clip_spool(dir_path))
+            
+            expected = (
+                (0, 20, 10),
+                (1, 95, 10),
+                (0, 195, 5),
+            )
+            
+            self.assertEqual(len(clips), len(expected))
+            
+            for clip, (channel_num, start_index, length) in \
+                    zip(clips, expected):
+                        
+                self.assertEqual(clip.station_name, 'Station')
+                self.assertEqual(clip.detector_name, 'Test')
+                self.assertEqual(clip.channel_num, channel_num)
+                self.assertEqual(clip.start_time, _get_time(start_index))
+                self.assertEqual(clip.sample_rate, _SAMPLE_RATE)
+                self.assertEqual(clip.length, length)
+                
+                self.assertEqual(clip.samples[0], 1)
+                self._assert_arrays_equal(
+                    clip.samples[1:],
+                    _get_samples(start_index + 1, start_index + length))
+                    
+                    
+    def test_empty_and_old_clips(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            writer = ClipSpoolWriter(dir_path)
+            detection = _create_detection(writer, 1, history_length=100)
+            
+            samples = _create_samples(100, 1, ())
+            detection.detect(_START_TIME, samples)
+            
+            listener = _DetectorListener(detection, 'Test', 0)
+            
+            # Empty clip at start of history.
+            listener.process_clip(0, 0)
+            
+            samples = _create_samples(100, 1, (), start_value=100)
+            detection.detect(_get_time(100), samples)
+            
+            # Clip that starts before start of history.
+            listener.process_clip(50, _CLIP_LENGTH)
+            
+            # Empty clip at end of input.
+            listener.process_clip(200, 0)
+            
+            detection.complete()
+            writer.close()
+            
+            self.assertEqual(writer.num_clips, 0)
+            
+            
+    def test_runner(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            runner = RecorderDetectorRunner(
+                'Station', [_DETECTOR_CLASS_NAME], dir_path)
+                
+            recorder = _Recorder(1, 100)
+            
+            runner.recording_starting(recorder, _START_TIME)
+            self.assertTrue(runner.get_status().running)
+            
+            samples = _create_samples(100, 1, ((10, 0),))
+            _input_arrived(runner, recorder, _START_TIME, samples)
+            
+            runner.input_overflowed(recorder, _get_time(100), 100, False)
+            
+            samples = _create_samples(100, 1, ((250, 0),), start_value=200)
+            _input_arrived(runner, recorder, _get_time(200), samples)
+            
+            runner.recording_stopped(recorder, _get_time(300))
+            
+            status = runner.get_status()
+            self.assertFalse(status.running)
+            self.assertEqual(status.queue_size, 0)
+            self.assertEqual(status.dropped_duration, 0)
+            self.assertEqual(status.num_clips, 2)
+            self.assertIsNotNone(status.lag)
+            self.assertIsNotNone(status.load)
+            
+            detector, = _TestDetector.instances
+            self.assertEqual(detector.num_frames, 300)
+            self.assertTrue(detector.completed)
+            
+            clips = list(clip_spool.read_clip_spool(runner.spool_dir_path))
+            start_times = [c.start_time for c in clips]
+            self.assertEqual(start_times, [_get_time(10), _get_time(250)])
+            
+            
+    def test_runner_queue_overflow(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            runner = RecorderDetectorRunner(
+                'Station', [_DETECTOR_CLASS_NAME], dir_path)
+                
+            frames_per_buffer = _SAMPLE_RATE
+            recorder = _Recorder(1, frames_per_buffer)
+            max_queue_size = recorder_detector_runner._MAX_QUEUE_DURATION
+            
+            # Keep detection from processing input until we release it.
+            _TestDetector.release_event = Event()
+            
+            runner.recording_starting(recorder, _START_TIME)
+            
+            # Send more input than the queue can hold. The detection
+            # thread takes at most one buffer from the queue before
+            # blocking.
+            num_buffers = max_queue_size + 10
+            for i in range(num_buffers):
+                index = i * frames_per_buffer
+                samples = _create_samples(
+                    frames_per_buffer, 1, (), start_value=index)
+                _input_arrived(runner, recorder, _get_time(index), samples)
+                
+            status = runner.get_status()
+            self.assertEqual(status.queue_size, max_queue_size)
+            self.assertIn(status.dropped_duration, (9, 10))
+            
+            _TestDetector.release_event.set()
+            
+            # Wait for room in the queue for both zeros and input.
+            while runner.get_status().queue_size > max_queue_size - 2:
+                time.sleep(.01)
+                
+            # Send one more buffer, after which the runner should queue
+            # zeros for the dropped input.
+            index = num_buffers * frames_per_buffer
+            samples = _create_samples(
+                frames_per_buffer, 1, ((index, 0),), start_value=index)
+            _input_arrived(runner, recorder, _get_time(index), samples)
+            
+            runner.recording_stopped(recorder, _get_time(index))
+            
+            # The detector should have processed input (either received
+            # or zeros) for all of the input sent to the runner, so that
+            # the clip in the last buffer has the correct time.
+            detector, = _TestDetector.instances
+            self.assertEqual(
+                detector.num_frames, (num_buffers + 1) * frames_per_buffer)
+                
+            clips = list(clip_spool.read_clip_spool(runner.spool_dir_path))
+            last_clip = clips[-1]
+            self.assertEqual(last_clip.start_time, _get_time(index))
+
+
+def _create_detection(spool_writer, num_channels, history_length=1000):
+    return _Detection(
+        'Station', ('Test',), (_TestDetector,), num_channels, _SAMPLE_RATE,
+        history_length, spool_writer)
+
+
+def _create_samples(num_frames, num_channels, clip_starts, start_value=0):
+    
+    """
+    Creates input samples.
+    
+    The samples are negative, and encode their indices in the input,
+    except that the sample at the start of each clip is one, so that
+    the test detector reports clips where we want them.
+    """
+    
+    samples = _get_samples(start_value, start_value + num_frames)
+    samples = np.stack([samples] * num_channels, axis=1)
+    
+    for index, channel_num in clip_starts:
+        samples[index - start_value, channel_num] = 1
+        
+    return samples
+
+
+def _get_samples(start_index, end_index):
+    indices = np.arange(start_index, end_index)
+    return (-(indices % 10000) - 1).astype('<i2')
+
+
+def _get_time(index):
+    return _START_TIME + datetime.timedelta(seconds=index / _SAMPLE_RATE)
+
+
+def _input_arrived(runner, recorder, time, samples):
+    runner.input_arrived(
+        recorder, time, samples.tobytes(), len(samples), False)
@@ -0,0 +1,73 @@
+from pathlib import Path, PurePosixPath
+import tempfile
+
+from vesper.tests.test_case import TestCase
+from vesper.util.recording_file_cache import RecordingFileCache
+
+
+_INFO = {
+    'station_id': 1,
+    'recorder_id': None,
+    'recorder_channel_nums': [0, 1],
+    'num_channels': 2,
+    'length': 86400000,
+    'sample_rate': 24000,
+    'start_time': '2020-05-15T01:00:00+00:00'
+}
+
+
+class RecordingFileCacheTests(TestCase):
+    
+    
+    def test_get_and_put(self):
+        
+        cache = RecordingFileCache()
+        
+        path = PurePosixPath('Station 1/Station 1_20200515_010000.wav')
+        
+        self.assertIsNone(cache.get('key', path, 100, 200))
+        
+        cache.put('key', path, 100, 200, _INFO)
+        
+        self.assertEqual(cache.get('key', path, 100, 200), _INFO)
+        
+        # String paths with either separator are equivalent to `Path`s.
+        self.assertEqual(cache.get('key', str(path), 100, 200), _INFO)
+        self.assertEqual(
+            cache.get('key', str(path).replace('/', '\\'), 100, 200), _INFO)
+            
+        # Changed size or modification time.
+        self.assertIsNone(cache.get('key', path, 101, 200))
+        self.assertIsNone(cache.get('key', path, 100, 201))
+        
+        # Different parser key.
+        self.assertIsNone(cache.get('other key', path, 100, 200))
+        
+        
+    def test_persistence(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Recording File Cache.json'
+            
+            cache = RecordingFileCache(file_path)
+            cache.put('key', 'a.wav', 100, 200, _INFO)
+            cache.save()
+            
+            self.assertTrue(file_path.exists())
+            
+            cache = RecordingFileCache(file_path)
+            self.assertEqual(cache.get('key', 'a.wav', 100, 200), _INFO)
+            self.assertIsNone(cache.get('key', 'b.wav', 100, 200))
+            
+            
+    def test_bad_file(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Recording File Cache.json'
+            file_path.write_text('bobo')
+            
+            # Cache should ignore unreadable file.
+            cache = RecordingFileCache(file_path)
+            self.assertIsNone(cache.get('key', 'a.wav', 100, 200))
@@ -1,4 +1,5 @@
 from pathlib import Path
+import tempfile
 
 from vesper.tests.test_case import TestCase
 from vesper.util.recording_manager import RecordingManager
@@ -122,6 +123,111 @@ class RecordingManagerTests(TestCase):
         self._test_conversion_errors(manager)
          
 
+    def test_index(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            dir_path = Path(dir_path)
+            _create_files(dir_path, ['1.wav', 'A/2.wav', 'A/B/3.wav'])
+            
+            manager = RecordingManager(
+                _ARCHIVE_DIR_PATH, [dir_path], negative_cache_ttl=1000)
+            
+            self.assertEqual(
+                manager.get_indexed_file_paths(),
+                [(dir_path, p) for p in ['1.wav', 'A/2.wav', 'A/B/3.wav']])
+            
+            # Missing file.
+            get = manager.get_absolute_recording_file_path
+            self._assert_raises(ValueError, get, 'A/4.wav')
+            
+            # File added after negative cache entry was created should
+            # remain missing until index is refreshed.
+            _create_files(dir_path, ['A/4.wav'])
+            self._assert_raises(ValueError, get, 'A/4.wav')
+            
+            # Only directory "A" should be relisted on refresh.
+            self.assertEqual(manager.refresh_index(), 1)
+            self.assertEqual(get('A/4.wav'), dir_path / 'A/4.wav')
+            self.assertEqual(manager.refresh_index(), 0)
+            
+            # File added after index was built should be found by probing.
+            _create_files(dir_path, ['A/B/5.wav'])
+            self.assertEqual(get('A/B/5.wav'), dir_path / 'A/B/5.wav')
+            
+            
+    def test_index_persistence(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            dir_path = Path(dir_path)
+            recording_dir_path = dir_path / 'Recordings'
+            index_file_path = dir_path / 'Recording Path Index.json'
+            
+            _create_files(recording_dir_path, ['1.wav', 'A/2.wav'])
+            
+            def create_manager():
+                return RecordingManager(
+                    _ARCHIVE_DIR_PATH, [recording_dir_path], index_file_path)
+            
+            manager = create_manager()
+            manager.get_absolute_recording_file_path('1.wav')
+            self.assertTrue(index_file_path.exists())
+            
+            _create_files(recording_dir_path, ['A/3.wav'])
+            manager.get_absolute_recording_file_path('A/3.wav')
+            manager.save_index()
+            
+            manager = create_manager()
+            self.assertEqual(
+                manager.get_absolute_recording_file_path('1.wav'),
+                recording_dir_path / '1.wav')
+            self.assertEqual(
+                [p for _, p in manager.get_indexed_file_paths()],
+                ['1.wav', 'A/2.wav', 'A/3.wav'])
+            
+            # Since the new manager loaded the index file rather than
+            # scanning the recording directories, refreshing its index
+            # should relist directory "A", which changed after the
+            # index was built.
+            self.assertEqual(manager.refresh_index(), 1)
+            
+            # Looking up a removed file should refresh the index.
+            (recording_dir_path / '1.wav').unlink()
+            get = manager.get_absolute_recording_file_path
+            self._assert_raises(ValueError, get, '1.wav')
+            self.assertEqual(
+                [p for _, p in manager.get_indexed_file_paths()],
+                ['A/2.wav', 'A/3.wav'])
+            
+            
+    def test_moved_file(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            dir_path = Path(dir_path)
+            dir_paths = [dir_path / 'One', dir_path / 'Two']
+            _create_files(dir_paths[0], ['A/1.wav'])
+            dir_paths[1].mkdir()
+            
+            manager = RecordingManager(_ARCHIVE_DIR_PATH, dir_paths)
+            get = manager.get_absolute_recording_file_path
+            self.assertEqual(get('A/1.wav'), dir_paths[0] / 'A/1.wav')
+            
+            # Move file to other recording directory.
+            (dir_paths[1] / 'A').mkdir()
+            (dir_paths[0] / 'A/1.wav').rename(dir_paths[1] / 'A/1.wav')
+            
+            self.assertEqual(get('A/1.wav'), dir_paths[1] / 'A/1.wav')
+            
+
+def _create_files(dir_path, rel_paths):
+    for rel_path in rel_paths:
+        path = dir_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
 def _get_path_object(p):
     return p if isinstance(p, Path) else Path(p)
 
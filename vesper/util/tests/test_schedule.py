@@ -191,6 +191,50 @@ class ScheduleTests(TestCase):
         self.assertEqual(actual, _INTERVALS[:2])
              
          
+    def test_get_interval_intersections(self):
+        
+        cases = (
+            
+            # query interval that includes all of schedule
+            ((_dt(0), _dt(7)), _INTERVALS),
+            
+            # query intervals that intersect part of schedule
+            ((_dt(1, 30), _dt(3, 30)),
+             (Interval(_dt(1, 30), _dt(2)), Interval(_dt(3), _dt(3, 30)))),
+            ((_dt(3, 30), _dt(3, 45)), (Interval(_dt(3, 30), _dt(3, 45)),)),
+            ((_dt(4), _dt(5)), _dtize(((4, 4), (5, 5)))),
+            
+            # query intervals that do not intersect schedule
+            ((_dt(0), _dt(0, 30)), ()),
+            ((_dt(6, 30), _dt(7)), ()),
+            
+            # empty query interval
+            ((_dt(3, 30), _dt(3)), ())
+            
+        )
+        
+        queries = [Interval(*q) for q, _ in cases]
+        actual = _SCHEDULE.get_interval_intersections(queries)
+        
+        self.assertEqual(len(actual), len(cases))
+        
+        for query, intersections, (_, expected) in \
+                zip(queries, actual, cases):
+            
+            self.assertEqual(tuple(intersections), expected)
+            
+            # Check consistency with `get_intervals`.
+            intervals = _get_intervals(query.start, query.end)
+            self.assertEqual(len(intersections), len(intervals))
+            
+        # no query intervals
+        self.assertEqual(_SCHEDULE.get_interval_intersections([]), [])
+        
+        # empty schedule
+        actual = Schedule(()).get_interval_intersections(queries[:2])
+        self.assertEqual(actual, [[], []])
+             
+         
     def test_get_transitions(self):
          
         cases = (
@@ -1107,6 +1151,45 @@ class ScheduleCompilationTests(TestCase):
             self._assert_schedule(schedule, expected)   
    
     
+    def test_windowed_daily_schedule_compilation(self):
+        
+        spec = '''
+            daily:
+                start_date: 2016-01-01
+                end_date: 2017-12-31
+                start_time: 1 hour after sunset
+                end_time: 30 minutes before sunrise
+        '''
+        
+        context = {'lat': 42.5, 'lon': -76.5, 'time_zone': 'US/Eastern'}
+        
+        complete_schedule = Schedule.compile_yaml(spec, **context)
+        
+        windows = (
+            (_dt2(2016, 6, 1), _dt2(2016, 6, 1)),
+            (_dt2(2016, 6, 1, 12), _dt2(2016, 6, 20, 3)),
+            (_dt2(2015, 12, 25), _dt2(2016, 1, 3)),
+            (_dt2(2017, 12, 30), _dt2(2018, 1, 10)),
+            (None, _dt2(2016, 2, 1)),
+            (_dt2(2017, 11, 1), None),
+        )
+        
+        for start, end in windows:
+            
+            schedule = Schedule.compile_yaml(
+                spec, start=start, end=end, **context)
+            
+            expected = tuple(complete_schedule.get_intervals(start, end))
+            actual = tuple(schedule.get_intervals(start, end))
+            self.assertEqual(actual, expected)
+            
+            # Windowed compilation should omit intervals far from
+            # bounded windows.
+            if start is not None and end is not None:
+                num_intervals = len(tuple(schedule.get_intervals()))
+                self.assertLess(num_intervals, 30)
+   
+    
 def _dt2(year, month, day, hour=0, minute=0, second=0):
     dt = datetime.datetime(year, month, day, hour, minute, second)
     return pytz.utc.localize(dt)
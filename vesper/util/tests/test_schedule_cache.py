@@ -0,0 +1,164 @@
+from pathlib import Path
+import datetime
+import tempfile
+
+import pytz
+
+from vesper.tests.test_case import TestCase
+from vesper.util.schedule import Schedule
+from vesper.util.schedule_cache import ScheduleCache
+
+
+_SPEC = {
+    'daily': {
+        'start_date': datetime.date(2020, 1, 1),
+        'end_date': datetime.date(2020, 12, 31),
+        'start_time': '1 hour after sunset',
+        'end_time': '30 minutes before sunrise'
+    }
+}
+
+_CONTEXT = {'lat': 42.5, 'lon': -76.5, 'time_zone': 'US/Eastern'}
+
+
+def _dt(month, day):
+    return pytz.utc.localize(datetime.datetime(2020, month, day))
+
+
+def _get_intervals(schedule, start=None, end=None):
+    return tuple(schedule.get_intervals(start, end))
+
+
+class ScheduleCacheTests(TestCase):
+    
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.complete_schedule = Schedule.compile_dict(_SPEC, **_CONTEXT)
+        
+        
+    def _assert_schedule(self, schedule, start, end):
+        expected = _get_intervals(self.complete_schedule, start, end)
+        actual = _get_intervals(schedule, start, end)
+        self.assertEqual(actual, expected)
+        
+        
+    def test_get_schedule(self):
+        
+        cache = ScheduleCache()
+        
+        start, end = _dt(3, 1), _dt(3, 10)
+        schedule = cache.get_schedule(_SPEC, start=start, end=end, **_CONTEXT)
+        self._assert_schedule(schedule, start, end)
+        
+        # Requesting the same window or a subwindow should not
+        # recompile the schedule.
+        self.assertIs(
+            cache.get_schedule(_SPEC, start=start, end=end, **_CONTEXT),
+            schedule)
+        self.assertIs(
+            cache.get_schedule(
+                _SPEC, start=_dt(3, 2), end=_dt(3, 5), **_CONTEXT),
+            schedule)
+            
+        # A different location should yield a different schedule.
+        other = cache.get_schedule(
+            _SPEC, lat=30, lon=-90, time_zone='US/Central', start=start,
+            end=end)
+        self.assertNotEqual(
+            _get_intervals(other, start, end),
+            _get_intervals(schedule, start, end))
+            
+            
+    def test_incremental_extension(self):
+        
+        cache = ScheduleCache()
+        
+        windows = (
+            (_dt(6, 10), _dt(6, 20)),
+            (_dt(6, 1), _dt(6, 15)),
+            (_dt(6, 15), _dt(7, 5)),
+            (_dt(8, 1), _dt(8, 3)),
+            (None, _dt(2, 1)),
+            (_dt(11, 1), None)
+        )
+        
+        for start, end in windows:
+            schedule = cache.get_schedule(
+                _SPEC, start=start, end=end, **_CONTEXT)
+            self._assert_schedule(schedule, start, end)
+            
+        # The cached schedule should now be complete.
+        schedule = cache.get_schedule(_SPEC, **_CONTEXT)
+        self.assertEqual(
+            _get_intervals(schedule), _get_intervals(self.complete_schedule))
+            
+            
+    def test_save_and_load(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Schedule Cache.json'
+            
+            start, end = _dt(4, 1), _dt(5, 1)
+            
+            cache = ScheduleCache(file_path)
+            cache.get_schedule(_SPEC, start=start, end=end, **_CONTEXT)
+            cache.save()
+            
+            self.assertTrue(file_path.exists())
+            
+            cache = ScheduleCache(file_path)
+            schedule = cache.get_schedule(
+                _SPEC, start=start, end=end, **_CONTEXT)
+            self._assert_schedule(schedule, start, end)
+            
+            # A corrupt cache file should be ignored.
+            file_path.write_text('bobo')
+            cache = ScheduleCache(file_path)
+            schedule = cache.get_schedule(
+                _SPEC, start=start, end=end, **_CONTEXT)
+            self._assert_schedule(schedule, start, end)
+            
+            
+    def test_save_merges_file_schedules(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Schedule Cache.json'
+            
+            # Two caches that share a file, as for two processes, each
+            # compile a different schedule and save it.
+            other_spec = {
+                'daily': dict(
+                    _SPEC['daily'], end_date=datetime.date(2020, 6, 30))
+            }
+            specs = (_SPEC, other_spec)
+            start, end = _dt(4, 1), _dt(5, 1)
+            caches = [ScheduleCache(file_path) for _ in specs]
+            for cache, spec in zip(caches, specs):
+                cache.get_schedule(spec, start=start, end=end, **_CONTEXT)
+            for cache in caches:
+                cache.save()
+                
+            # The file should contain the schedules of both caches.
+            cache = ScheduleCache(file_path)
+            self.assertEqual(len(cache._entries), 2)
+            
+            # When two caches save the same schedule compiled for
+            # different windows, a saved schedule compiled for a wider
+            # window should be kept.
+            file_path = Path(dir_path) / 'Other Schedule Cache.json'
+            wide_cache = ScheduleCache(file_path)
+            narrow_cache = ScheduleCache(file_path)
+            start, end = _dt(3, 1), _dt(6, 1)
+            wide_cache.get_schedule(_SPEC, start=start, end=end, **_CONTEXT)
+            narrow_cache.get_schedule(
+                _SPEC, start=_dt(4, 10), end=_dt(4, 20), **_CONTEXT)
+            wide_cache.save()
+            narrow_cache.save()
+            
+            cache = ScheduleCache(file_path)
+            entry, = cache._entries.values()
+            self.assertEqual((entry.start, entry.end), (start, end))
+            self._assert_schedule(entry.schedule, start, end)
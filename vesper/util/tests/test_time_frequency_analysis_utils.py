@@ -393,3 +393,85 @@ class TimeFrequencyAnalysisUtilsTests(TestCase):
             expected *= reference_power
             self._test_op(
                 expected, tfa_utils.log_to_linear, spectra, reference_power)
+
+
+    def test_band_energy_analyzer(self):
+
+        rng = np.random.default_rng(0)
+        samples = rng.normal(size=1000)
+        window = np.hanning(50)
+        hop_size = 25
+        dft_size = 64
+
+        spectra = tfa_utils.compute_spectrogram(
+            samples, window, hop_size, dft_size)
+
+        cases = [
+            [(0, 33)],
+            [(10, 11)],
+            [(5, 20)],
+            [(5, 20), (10, 33), (0, 3)]
+        ]
+
+        for bands in cases:
+
+            expected = np.stack(
+                [spectra[:, s:e].sum(axis=1) for s, e in bands], axis=1)
+
+            for method in ('matrix', 'fft', None):
+
+                analyzer = tfa_utils.BandEnergyAnalyzer(
+                    window, hop_size, bands, dft_size, method)
+
+                # double precision
+                actual = analyzer.compute_energies(samples)
+                self._assert_arrays_close(actual, expected)
+
+                # single precision
+                actual = analyzer.compute_energies(
+                    samples.astype('float32'))
+                self.assertEqual(actual.dtype, np.float32)
+                self.assertTrue(np.allclose(actual, expected, rtol=1e-4))
+
+                # too few samples for any records
+                actual = analyzer.compute_energies(samples[:49])
+                self.assertEqual(actual.shape, (0, len(bands)))
+
+
+    def test_band_energy_analyzer_method_choice(self):
+
+        window = np.hanning(120)
+
+        # narrow band
+        analyzer = tfa_utils.BandEnergyAnalyzer(window, 60, [(26, 53)])
+        self.assertEqual(analyzer.method, 'matrix')
+
+        # all bins
+        analyzer = tfa_utils.BandEnergyAnalyzer(window, 60, [(0, 65)])
+        self.assertEqual(analyzer.method, 'fft')
+
+
+    def test_band_energy_analyzer_errors(self):
+
+        window = np.hanning(8)
+
+        cases = [
+
+            # no bands
+            ([], None),
+
+            # empty band
+            ([(2, 2)], None),
+
+            # band past end of spectrum
+            ([(2, 6)], None),
+
+            # bad method
+            ([(2, 4)], 'bobo')
+
+        ]
+
+        for bands, method in cases:
+            self._assert_raises(
+                ValueError, tfa_utils.BandEnergyAnalyzer, window, 4, bands,
+                None, method)
@@ -283,3 +283,233 @@ def denoise(spectra, percentile=50, out=None):
     out += percentiles
 
     return out
+
+
+_BAND_ENERGY_FFT_COST_FACTOR = 16
+"""
+Approximate cost of an FFT of size `n`, in units of `n * log2(n)`
+multiply-adds of a matrix product.
+
+`BandEnergyAnalyzer` uses this to choose between computing band
+energies with a partial DFT matrix product and with an FFT. The value
+is from measurements with NumPy's FFT and BLAS matrix products in
+double precision. Matrix products are relatively faster in single
+precision.
+"""
+
+
+class BandEnergyAnalyzer:
+
+    """
+    Computes energies of a real signal in one or more frequency bands.
+
+    A band energy analyzer divides a signal into hopped records,
+    windows the records, and computes the energy of each windowed
+    record in each of one or more bands of DFT bins. The energy of a
+    record in the band with start bin number `s` and end bin number
+    `e` is the same as:
+
+        compute_spectrogram(samples, window, hop_size, dft_size)[:, s:e]
+            .sum(axis=1)
+
+    but the analyzer does not compute the spectral values of bins
+    outside of the bands, and computes the energies of all of the
+    bands in one pass over the records, so that several detectors
+    that need energies in different bands can share one analyzer.
+
+    For narrow bands the analyzer computes the DFT values of only the
+    bins of the bands, via a matrix product of the records with a
+    partial DFT matrix into which the window is folded. For wide
+    bands, for which an FFT is cheaper, it computes FFTs of the
+    records and then the squared magnitudes of only the bins of the
+    bands.
+    """
+
+
+    def __init__(self, window, hop_size, bands, dft_size=None, method=None):
+
+        """
+        Initializes this analyzer.
+
+        Parameters
+        ----------
+        window : 1-D NumPy array
+            the analysis window.
+
+        hop_size : int
+            the record hop size, in samples.
+
+        bands : sequence of (int, int) pairs
+            the start and end bin numbers of the bands. The end bin
+            number of a band is one past its last bin.
+
+        dft_size : int or None
+            the DFT size, or `None` for the smallest power of two that
+            is at least the window size.
+
+        method : str or None
+            either `'matrix'` to compute band energies with a partial
+            DFT matrix product, `'fft'` to compute them with FFTs, or
+            `None` to choose the method with the lower estimated cost.
+        """
+
+        window_size = len(window)
+
+        if dft_size is None:
+            dft_size = get_dft_size(window_size)
+
+        num_bins = dft_size // 2 + 1
+
+        if len(bands) == 0:
+            raise ValueError('At least one band must be specified.')
+
+        for start_bin_num, end_bin_num in bands:
+            if not 0 <= start_bin_num < end_bin_num <= num_bins:
+                raise ValueError(
+                    f'Bad band bin numbers ({start_bin_num}, '
+                    f'{end_bin_num}) for DFT size {dft_size}.')
+
+        if method is None:
+            method = _choose_band_energy_method(
+                window_size, dft_size, bands)
+
+        elif method not in ('matrix', 'fft'):
+            raise ValueError(f'Unrecognized band energy method "{method}".')
+
+        self._window = np.array(window)
+        self._hop_size = hop_size
+        self._bands = tuple((int(s), int(e)) for s, e in bands)
+        self._dft_size = dft_size
+        self._method = method
+
+        # Bin numbers of union of bands.
+        self._start_bin_num = min(s for s, _ in self._bands)
+        self._end_bin_num = max(e for _, e in self._bands)
+
+        # Mapping from NumPy dtypes to partial DFT matrices.
+        self._dft_matrices = {}
+
+
+    @property
+    def window(self):
+        return self._window
+
+
+    @property
+    def hop_size(self):
+        return self._hop_size
+
+
+    @property
+    def bands(self):
+        return self._bands
+
+
+    @property
+    def dft_size(self):
+        return self._dft_size
+
+
+    @property
+    def method(self):
+        return self._method
+
+
+    def compute_energies(self, samples):
+
+        """
+        Computes band energies of the records of the specified samples.
+
+        Computations are performed in the precision of the samples,
+        which must be either 32-bit or 64-bit floating point.
+
+        Parameters
+        ----------
+        samples : 1-D NumPy array
+            the samples to analyze.
+
+        Returns
+        -------
+        2-D NumPy array
+            the band energies, with one row per record and one
+            column per band.
+        """
+
+        records = _get_analysis_records(
+            samples, len(self._window), self._hop_size)
+
+        if self._method == 'matrix':
+            powers = self._compute_powers_by_matrix(records)
+        else:
+            powers = self._compute_powers_by_fft(records)
+
+        if len(self._bands) == 1:
+            # only one band, and it is the union of the bands
+
+            energies = powers.sum(axis=1)
+            return energies.reshape((len(energies), 1))
+
+        else:
+            # more than one band
+
+            offset = self._start_bin_num
+            energies = [
+                powers[:, s - offset:e - offset].sum(axis=1)
+                for s, e in self._bands]
+            return np.stack(energies, axis=1)
+
+
+    def _compute_powers_by_matrix(self, records):
+
+        matrix = self._get_dft_matrix(records.dtype)
+
+        # The first half of the columns of the product are the real
+        # parts of the DFT values, and the second half are the
+        # imaginary parts (negated, which doesn't matter here).
+        values = records @ matrix
+        values *= values
+        num_bins = self._end_bin_num - self._start_bin_num
+        return values[:, :num_bins] + values[:, num_bins:]
+
+
+    def _get_dft_matrix(self, dtype):
+
+        try:
+            return self._dft_matrices[dtype]
+
+        except KeyError:
+
+            n = np.arange(len(self._window))
+            k = np.arange(self._start_bin_num, self._end_bin_num)
+            angles = (2 * np.pi / self._dft_size) * np.outer(n, k)
+            window = self._window.reshape((len(n), 1))
+            matrix = np.concatenate(
+                (window * np.cos(angles), window * np.sin(angles)), axis=1)
+            matrix = matrix.astype(dtype)
+
+            self._dft_matrices[dtype] = matrix
+            return matrix
+
+
+    def _compute_powers_by_fft(self, records):
+
+        window = self._window.astype(records.dtype, copy=False)
+        stft = np.fft.rfft(window * records, n=self._dft_size)
+        stft = stft[:, self._start_bin_num:self._end_bin_num]
+        return stft.real * stft.real + stft.imag * stft.imag
+
+
+def _choose_band_energy_method(window_size, dft_size, bands):
+
+    """
+    Chooses the band energy computation method with the lower
+    estimated cost per record.
+    """
+
+    num_bins = max(e for _, e in bands) - min(s for s, _ in bands)
+
+    matrix_cost = 2 * window_size * num_bins
+    fft_cost = \
+        _BAND_ENERGY_FFT_COST_FACTOR * dft_size * np.log2(max(dft_size, 2))
+
+    return 'matrix' if matrix_cost <= fft_cost else 'fft'
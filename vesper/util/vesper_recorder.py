@@ -15,7 +15,8 @@ import pytz
 
 from vesper.util.audio_recorder import AudioRecorder, AudioRecorderListener
 from vesper.util.bunch import Bunch
-from vesper.util.schedule import Schedule
+from vesper.util.recorder_detector_runner import RecorderDetectorRunner
+from vesper.util.schedule_cache import ScheduleCache
 import vesper.util.yaml_utils as yaml_utils
 
 
@@ -31,6 +32,7 @@ import vesper.util.yaml_utils as yaml_utils
 _HOME_DIR_VAR_NAME = 'VESPER_RECORDER_HOME'
 _LOG_FILE_NAME = 'Vesper Recorder Log.txt'
 _CONFIG_FILE_NAME = 'Vesper Recorder Config.yaml'
+_SCHEDULE_CACHE_FILE_NAME = 'Schedule Cache.json'
 
 _AUDIO_FILE_NAME_EXTENSION = '.wav'
 _AUDIO_FILE_HEADER_SIZE = 44                # bytes, size of .wav file header
@@ -45,6 +47,8 @@ _DEFAULT_BUFFER_SIZE = .05
 _DEFAULT_TOTAL_BUFFER_SIZE = 60
 _DEFAULT_RECORDINGS_DIR_PATH = 'Recordings'
 _DEFAULT_MAX_AUDIO_FILE_SIZE = 2**31        # bytes
+_DEFAULT_DETECTORS = []
+_DEFAULT_CLIP_SPOOL_DIR_PATH = 'Clip Spool'
 _DEFAULT_PORT_NUM = 8001
 
 
@@ -84,9 +88,17 @@ class VesperRecorder:
         self._recorder.add_listener(_AudioFileWriter(
             c.station_name, c.recordings_dir_path, c.max_audio_file_size))
          
+        if len(c.detectors) != 0:
+            detector_runner = RecorderDetectorRunner(
+                c.station_name, c.detectors, c.clip_spool_dir_path)
+            self._recorder.add_listener(detector_runner)
+        else:
+            detector_runner = None
+            
         server = _HttpServer(
             c.port_num, c.station_name, c.lat, c.lon, c.time_zone,
-            self._recorder, c.recordings_dir_path, c.max_audio_file_size)
+            self._recorder, c.recordings_dir_path, c.max_audio_file_size,
+            detector_runner)
         Thread(target=server.serve_forever, daemon=True).start()
 
         self._recorder.start()
@@ -207,9 +219,16 @@ def _parse_config_file(file_path, home_dir_path):
     total_buffer_size = \
         float(config.get('total_buffer_size', _DEFAULT_TOTAL_BUFFER_SIZE))
     
+    # We compile the schedule via a persistent schedule cache so that
+    # the recorder need not recompute the solar event times of a daily
+    # schedule each time it starts.
     schedule_dict = config.get('schedule', {})
-    schedule = Schedule.compile_dict(
+    schedule_cache_file_path = \
+        os.path.join(home_dir_path, _SCHEDULE_CACHE_FILE_NAME)
+    schedule_cache = ScheduleCache(schedule_cache_file_path)
+    schedule = schedule_cache.get_schedule(
         schedule_dict, lat=lat, lon=lon, time_zone=time_zone)
+    schedule_cache.save()
     
     recordings_dir_path = config.get(
         'recordings_dir_path', _DEFAULT_RECORDINGS_DIR_PATH)
@@ -219,6 +238,13 @@ def _parse_config_file(file_path, home_dir_path):
     max_audio_file_size = config.get(
         'max_audio_file_size', _DEFAULT_MAX_AUDIO_FILE_SIZE)
     
+    detectors = config.get('detectors', _DEFAULT_DETECTORS)
+    
+    clip_spool_dir_path = config.get(
+        'clip_spool_dir_path', _DEFAULT_CLIP_SPOOL_DIR_PATH)
+    if not os.path.isabs(clip_spool_dir_path):
+        clip_spool_dir_path = os.path.join(home_dir_path, clip_spool_dir_path)
+        
     port_num = int(config.get('port_num', _DEFAULT_PORT_NUM))
     
     return Bunch(
@@ -234,6 +260,8 @@ def _parse_config_file(file_path, home_dir_path):
         schedule=schedule,
         recordings_dir_path=recordings_dir_path,
         max_audio_file_size=max_audio_file_size,
+        detectors=detectors,
+        clip_spool_dir_path=clip_spool_dir_path,
         port_num=port_num)
     
     
@@ -507,7 +535,7 @@ class _HttpServer(HTTPServer):
     
     def __init__(
             self, port_num, station_name, lat, lon, time_zone, recorder,
-            recordings_dir_path, max_audio_file_size):
+            recordings_dir_path, max_audio_file_size, detector_runner=None):
         
         address = ('', port_num)
         super().__init__(address, _HttpRequestHandler)
@@ -519,7 +547,8 @@ class _HttpServer(HTTPServer):
             time_zone=time_zone,
             recorder=recorder,
             recordings_dir_path=recordings_dir_path,
-            max_audio_file_size=max_audio_file_size
+            max_audio_file_size=max_audio_file_size,
+            detector_runner=detector_runner
         )
         
     
@@ -553,6 +582,9 @@ your recorder. Refresh the page to update the information.
 <h2>Output Configuration</h2>
 {}
 
+<h2>Detection</h2>
+{}
+
 <h2>Scheduled Recordings</h2>
 {}
 
@@ -612,12 +644,14 @@ class _HttpRequestHandler(BaseHTTPRequestHandler):
         devices_table = self._create_devices_table(devices)
         input_table = self._create_input_table(devices, recorder)
         output_table = self._create_output_table(data)
+        detection_table = self._create_detection_table(data)
         recordings_table = self._create_recordings_table(
             recorder.schedule, data.time_zone, now)
         
         body = _PAGE.format(
             _CSS, VesperRecorder.VERSION_NUMBER, status_table, station_table,
-            devices_table, input_table, output_table, recordings_table)
+            devices_table, input_table, output_table, detection_table,
+            recordings_table)
         
         return body.encode()
     
@@ -720,6 +754,33 @@ class _HttpRequestHandler(BaseHTTPRequestHandler):
         return _create_table(rows)
 
 
+    def _create_detection_table(self, data):
+        
+        runner = data.detector_runner
+        
+        if runner is None:
+            return '<p>No detectors are configured.</p>'
+            
+        status = runner.get_status()
+        
+        rows = (
+            ('Detectors', ', '.join(runner.detector_names)),
+            ('Clip Spool Directory', os.path.abspath(runner.spool_dir_path)),
+            ('Detecting', 'Yes' if status.running else 'No'),
+            ('Detection Lag (seconds)', _format_float(status.lag, 2)),
+            ('Max Detection Lag (seconds)', _format_float(status.max_lag, 2)),
+            ('Queued Input Buffers', status.queue_size),
+            ('Dropped Input (seconds)',
+                _format_float(status.dropped_duration, 2)),
+            ('Recent CPU Headroom (percent)',
+                _format_headroom(status.recent_load)),
+            ('CPU Headroom (percent)', _format_headroom(status.load)),
+            ('Clips Detected', status.num_clips)
+        )
+        
+        return _create_table(rows)
+        
+        
     def _create_recordings_table(self, schedule, time_zone, now):
         rows = [
             self._create_recordings_table_row(index, interval, time_zone, now)
@@ -738,6 +799,22 @@ class _HttpRequestHandler(BaseHTTPRequestHandler):
         else:
             status = 'Current'
         return (index, start_time, end_time, status)
+
+
+def _format_float(x, num_digits):
+    return 'None' if x is None else '{:.{}f}'.format(x, num_digits)
+
+
+def _format_headroom(load):
+    
+    # The headroom is the percentage of real time that detection
+    # does not use. Negative headroom means that detection is not
+    # keeping up with input.
+    
+    if load is None:
+        return 'None'
+    else:
+        return _format_float(100 * (1 - load), 1)
         
         
 def _format_datetime(dt, time_zone=None):